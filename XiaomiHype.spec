@@ -1,4 +1,9 @@
 # -*- mode: python ; coding: utf-8 -*-
+#
+# 为启动速度打包：
+# - onedir：单文件模式每次启动都要把整个程序解压到临时目录，onedir直接从安装目录加载
+# - 不使用UPX：UPX压缩的DLL每次加载都要解压，还容易被杀毒软件逐个扫描
+# - 排除用不到的大模块，减小PYZ和需要加载的DLL数量
 
 
 a = Analysis(
@@ -6,11 +11,17 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[],
-    hiddenimports=['bleak.backends.winrt', 'asyncio'],
+    # bleak在第一次扫描时才导入，后端模块需要显式声明；模拟后端用于 --simulate
+    hiddenimports=['bleak.backends.winrt', 'asyncio', 'qasync', 'simulated_device'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    excludes=[
+        'tkinter', 'unittest', 'pydoc', 'doctest', 'lib2to3', 'numpy',
+        'PyQt5.QtWebEngine', 'PyQt5.QtWebEngineCore', 'PyQt5.QtWebEngineWidgets',
+        'PyQt5.QtMultimedia', 'PyQt5.QtQml', 'PyQt5.QtQuick', 'PyQt5.QtSql',
+        'PyQt5.QtBluetooth', 'PyQt5.QtNetwork', 'PyQt5.QtDesigner', 'PyQt5.QtTest',
+    ],
     noarchive=False,
     optimize=0,
 )
@@ -19,16 +30,13 @@ pyz = PYZ(a.pure)
 exe = EXE(
     pyz,
     a.scripts,
-    a.binaries,
-    a.datas,
     [],
+    exclude_binaries=True,
     name='XiaomiHype',
     debug=False,
     bootloader_ignore_signals=False,
     strip=False,
-    upx=True,
-    upx_exclude=[],
-    runtime_tmpdir=None,
+    upx=False,
     console=False,
     disable_windowed_traceback=False,
     argv_emulation=False,
@@ -37,3 +45,13 @@ exe = EXE(
     entitlements_file=None,
     icon='favicon.ico',
 )
+
+coll = COLLECT(
+    exe,
+    a.binaries,
+    a.datas,
+    strip=False,
+    upx=False,
+    upx_exclude=[],
+    name='XiaomiHype',
+)
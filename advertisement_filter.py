@@ -0,0 +1,88 @@
+"""
+广告数据过滤
+
+在扫描线程中对广告数据去重和限流，只有有意义的变化才转发给GUI线程：
+- 首次出现的地址
+- 是否支持HRS的判断发生变化
+- 服务数据（如广播的心率值）发生变化
+- 信号强度变化超过阈值
+内容没有变化的广告包在限流间隔内只转发一次。
+"""
+import time
+
+
+class _AdvertisementState:
+    """单个地址最近一次转发的广告状态"""
+    __slots__ = ("is_hrs", "service_data", "rssi", "forwarded_at")
+
+    def __init__(self, is_hrs, service_data, rssi, forwarded_at):
+        self.is_hrs = is_hrs
+        self.service_data = service_data
+        self.rssi = rssi
+        self.forwarded_at = forwarded_at
+
+
+class AdvertisementFilter:
+    """按地址去重并限流的广告数据过滤器"""
+
+    def __init__(self, hrs_only=True, rssi_delta=10, unchanged_interval=5.0, clock=time.monotonic):
+        # 只转发支持HRS的设备的广告数据（其他设备已通过device_found加入列表）
+        self.hrs_only = hrs_only
+        # 信号强度变化超过该值（dBm）才视为有意义的变化
+        self.rssi_delta = rssi_delta
+        # 内容没有变化的广告包最短转发间隔（秒）
+        self.unchanged_interval = unchanged_interval
+        self.clock = clock
+        self._states = {}  # key: device address, value: _AdvertisementState
+
+        # 计数器
+        self.received = 0
+        self.forwarded = 0
+
+    def accept(self, device, advertisement_data, is_hrs):
+        """返回True表示该广告数据需要转发给GUI"""
+        self.received += 1
+        if self.hrs_only and not is_hrs:
+            return False
+
+        now = self.clock()
+        service_data = getattr(advertisement_data, 'service_data', None)
+        rssi = getattr(advertisement_data, 'rssi', None)
+        state = self._states.get(device.address)
+
+        if state is None:
+            self._states[device.address] = _AdvertisementState(is_hrs, service_data, rssi, now)
+        elif (state.is_hrs != is_hrs
+              or state.service_data != service_data
+              or self._rssi_changed(state.rssi, rssi)
+              or now - state.forwarded_at >= self.unchanged_interval):
+            state.is_hrs = is_hrs
+            state.service_data = service_data
+            state.rssi = rssi
+            state.forwarded_at = now
+        else:
+            return False
+
+        self.forwarded += 1
+        return True
+
+    def _rssi_changed(self, previous, current):
+        """信号强度变化是否超过阈值"""
+        if previous is None or current is None:
+            return previous != current
+        return abs(current - previous) >= self.rssi_delta
+
+    @property
+    def dropped(self):
+        """被过滤掉的广告包数量"""
+        return self.received - self.forwarded
+
+    def forget(self, address):
+        """设备已消失，移除其状态（再次出现时视为首次出现）"""
+        self._states.pop(address, None)
+
+    def reset(self):
+        """清空状态和计数器"""
+        self._states.clear()
+        self.received = 0
+        self.forwarded = 0
@@ -0,0 +1,155 @@
+"""
+无连接的广告心率监测
+
+团体场景下同时跟踪几百个手环：不建立GATT连接，只从广告的HRS服务数据中读取心率。
+- 按地址索引的设备表，保存每台手环最近的心率、接触状态、RSSI和出现时间
+- 手环重复广播相同的服务数据时只刷新出现时间，不重复解析和输出
+- 超过stale_after秒没有广告的手环标记为过期（通知一次），超过forget_after秒后从表中移除（同样通知一次）
+- 按设备输出：on_heart_rate(address, timestamp, measurement)在每个新的心率值到达时调用；
+  take_updates()取走上次调用以来有变化的手环，界面按显示刷新率读取，开销与广告包数量无关
+ingest()在扫描线程中调用，take_updates()可在其他线程调用，其余方法与ingest()在同一线程调用。
+本模块不依赖Qt。
+"""
+import time
+import threading
+from hrs_parser import HrsParseError, find_hrs_service_data, parse_heart_rate_measurement
+
+# 超过该时长（秒）没有广告的手环视为过期
+STALE_AFTER = 10.0
+
+# 超过该时长（秒）没有广告的手环从设备表中移除
+FORGET_AFTER = 300.0
+
+
+class MonitoredBand:
+    """设备表中的一台手环"""
+    __slots__ = ("address", "name", "heart_rate", "sensor_contact", "rssi",
+                 "first_seen", "last_seen", "last_update", "payload", "stale", "updates")
+
+    def __init__(self, address, name, now):
+        self.address = address
+        self.name = name
+        self.heart_rate = None
+        self.sensor_contact = None
+        self.rssi = None
+        self.first_seen = now
+        self.last_seen = now
+        # 最近一次收到新的心率数据的时间
+        self.last_update = None
+        self.payload = None
+        self.stale = False
+        self.updates = 0
+
+
+class AdvertisementMonitor:
+    """从广告中跟踪多台手环的心率"""
+
+    def __init__(self, on_heart_rate=None, on_stale=None, on_forget=None, stale_after=STALE_AFTER,
+                 forget_after=FORGET_AFTER, clock=time.time):
+        # on_heart_rate(address, timestamp, measurement)：收到新的心率数据
+        self.on_heart_rate = on_heart_rate
+        # on_stale(address)：手环超过stale_after秒没有广告
+        self.on_stale = on_stale
+        # on_forget(address)：手环超过forget_after秒没有广告，已从设备表中移除
+        self.on_forget = on_forget
+        self.stale_after = stale_after
+        self.forget_after = max(forget_after, stale_after)
+        self.clock = clock
+        self._bands = {}  # key: device address, value: MonitoredBand
+        self._updated = {}  # 上次take_updates()以来有变化的手环
+        self._lock = threading.Lock()
+
+        # 计数器
+        self.packets = 0
+        self.duplicates = 0
+        self.ignored = 0
+        self.parse_errors = 0
+
+    def __len__(self):
+        return len(self._bands)
+
+    def __contains__(self, address):
+        return address in self._bands
+
+    def get(self, address):
+        return self._bands.get(address)
+
+    def bands(self):
+        """所有手环（按地址排序）"""
+        return [self._bands[address] for address in sorted(self._bands)]
+
+    def active_count(self):
+        return sum(1 for band in self._bands.values() if not band.stale)
+
+    def ingest(self, device, advertisement_data):
+        """处理一条广告，有新的心率值时返回True"""
+        self.packets += 1
+        data = find_hrs_service_data(advertisement_data.service_data)
+        if data is None:
+            self.ignored += 1
+            return False
+
+        now = self.clock()
+        address = device.address
+        band = self._bands.get(address)
+        if band is None:
+            band = self._bands[address] = MonitoredBand(address, device.name, now)
+        band.last_seen = now
+        band.rssi = advertisement_data.rssi
+        if data == band.payload and not band.stale:
+            self.duplicates += 1
+            return False
+
+        try:
+            measurement = parse_heart_rate_measurement(data)
+        except HrsParseError:
+            self.parse_errors += 1
+            return False
+        band.payload = data
+        band.heart_rate = measurement.heart_rate
+        band.sensor_contact = measurement.sensor_contact
+        band.last_update = now
+        band.stale = False
+        band.updates += 1
+        with self._lock:
+            self._updated[address] = band
+        if self.on_heart_rate:
+            self.on_heart_rate(address, now, measurement)
+        return True
+
+    def sweep(self, now=None):
+        """标记过期的手环并移除太久没有出现的手环，返回新过期的手环地址"""
+        if now is None:
+            now = self.clock()
+        stale_cutoff = now - self.stale_after
+        forget_cutoff = now - self.forget_after
+        newly_stale = []
+        forgotten = []
+        for band in self._bands.values():
+            if band.last_seen < forget_cutoff:
+                forgotten.append(band.address)
+            elif not band.stale and band.last_seen < stale_cutoff:
+                band.stale = True
+                newly_stale.append(band.address)
+        if forgotten:
+            with self._lock:
+                for address in forgotten:
+                    del self._bands[address]
+                    self._updated.pop(address, None)
+            if self.on_forget:
+                for address in forgotten:
+                    self.on_forget(address)
+        if newly_stale:
+            with self._lock:
+                for address in newly_stale:
+                    self._updated[address] = self._bands[address]
+            if self.on_stale:
+                for address in newly_stale:
+                    self.on_stale(address)
+        return newly_stale
+
+    def take_updates(self):
+        """取走上次调用以来有新心率或新过期的手环（可在其他线程调用）"""
+        with self._lock:
+            updated, self._updated = self._updated, {}
+        return list(updated.values())
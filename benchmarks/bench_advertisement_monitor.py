@@ -0,0 +1,182 @@
+"""
+团体广告监测负载测试
+
+1. 单条广告的处理耗时：AdvertisementMonitor.ingest()，分别统计新心率值和重复广播
+2. 模拟大量手环的广告洪泛，经过与无界面模式相同的路径（ScanService → AdvertisementMonitor），
+   扫描器前有一个容量为 --buffer 的接收缓冲区（相当于蓝牙控制器/系统蓝牙栈的缓冲），
+   处理跟不上时缓冲区溢出的广告计为丢弃。手环数量从 --start 开始每次翻倍，
+   直到丢弃比例超过0.1%，输出丢弃前能支持的最大手环数量。
+
+每台手环每秒广播 --advertisement-rate 次，每 --repeat 条广告更新一次心率（手环会重复广播同一个值）。
+
+用法: python benchmarks/bench_advertisement_monitor.py [--advertisement-rate 5] [--seconds 2]
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from advertisement_monitor import AdvertisementMonitor
+from scan_service import ScanService, DUTY_CYCLES
+from hrs_parser import HRS_SERVICE_UUID
+from simulated_device import make_ble_device, make_advertisement
+
+
+def make_packets(count, variants=4):
+    """每台手环预先生成几条广告，避免测试时构造AdvertisementData的开销"""
+    devices = [make_ble_device(f"GRP:{i // 256:02X}:{i % 256:02X}", f"手环{i}") for i in range(count)]
+    packets = [
+        [make_advertisement(None, [HRS_SERVICE_UUID], {HRS_SERVICE_UUID: bytes([0x06, 60 + (i + v) % 120])},
+                            -60 - v) for v in range(variants)]
+        for i in range(count)
+    ]
+    return devices, packets
+
+
+def bench_ingest(count, repeat, rounds=5):
+    """返回(新心率值, 重复广播)的单条处理耗时（纳秒）"""
+    devices, packets = make_packets(count)
+    monitor = AdvertisementMonitor()
+    fresh = duplicate = 0.0
+    fresh_count = duplicate_count = 0
+    for round_index in range(rounds):
+        variant = round_index % len(packets[0])
+        started = time.perf_counter()
+        for device, variants in zip(devices, packets):
+            monitor.ingest(device, variants[variant])
+        fresh += time.perf_counter() - started
+        fresh_count += count
+        started = time.perf_counter()
+        for _ in range(repeat - 1):
+            for device, variants in zip(devices, packets):
+                monitor.ingest(device, variants[variant])
+        duplicate += time.perf_counter() - started
+        duplicate_count += count * (repeat - 1)
+    return 1e9 * fresh / fresh_count, 1e9 * duplicate / max(1, duplicate_count)
+
+
+class FloodScanner:
+    """按固定总速率轮流回调各手环的广告，处理跟不上时有界缓冲区溢出"""
+
+    def __init__(self, callback, devices, packets, rate, repeat, buffer):
+        self.callback = callback
+        self.devices = devices
+        self.packets = packets
+        self.rate = rate * len(devices)
+        self.repeat = repeat
+        self.buffer = buffer
+        self.offered = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.busy = 0.0
+        self._task = None
+
+    async def start(self):
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        devices = self.devices
+        packets = self.packets
+        count = len(devices)
+        backlog = 0
+        while True:
+            await asyncio.sleep(0.005)
+            due = int((loop.time() - started) * self.rate)
+            backlog += due - self.offered
+            self.offered = due
+            if backlog > self.buffer:
+                self.dropped += backlog - self.buffer
+                backlog = self.buffer
+            busy_started = time.perf_counter()
+            for _ in range(backlog):
+                index = self.delivered % count
+                variant = (self.delivered // count // self.repeat) % len(packets[index])
+                self.callback(devices[index], packets[index][variant])
+                self.delivered += 1
+            self.busy += time.perf_counter() - busy_started
+            backlog = 0
+
+
+class FloodBackend:
+    def __init__(self, count, rate, repeat, buffer):
+        self.devices, self.packets = make_packets(count)
+        self.rate = rate
+        self.repeat = repeat
+        self.buffer = buffer
+        self.scanner = None
+
+    def create_scanner(self, detection_callback, service_uuids=None, passive=False):
+        self.scanner = FloodScanner(
+            detection_callback, self.devices, self.packets, self.rate, self.repeat, self.buffer
+        )
+        return self.scanner
+
+
+async def run_flood(count, args):
+    backend = FloodBackend(count, args.advertisement_rate, args.repeat, args.buffer)
+    monitor = AdvertisementMonitor()
+
+    def on_advertisement(device, advertisement_data, is_hrs):
+        if is_hrs:
+            monitor.ingest(device, advertisement_data)
+
+    service = ScanService(
+        backend, DUTY_CYCLES["aggressive"], on_advertisement=on_advertisement, on_window_finished=monitor.sweep
+    )
+    task = asyncio.ensure_future(service.run())
+    await asyncio.sleep(args.seconds)
+    service.stop()
+    await task
+    scanner = backend.scanner
+    return {
+        "bands": count,
+        "tracked": len(monitor),
+        "offered_per_s": scanner.offered / args.seconds,
+        "drop_ratio": scanner.dropped / max(1, scanner.offered),
+        "us_per_packet": 1e6 * scanner.busy / max(1, scanner.delivered),
+        "busy_ratio": scanner.busy / args.seconds,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="团体广告监测负载测试")
+    parser.add_argument("--advertisement-rate", type=float, default=5.0, help="每台手环每秒广告次数")
+    parser.add_argument("--repeat", type=int, default=5, help="同一个心率值重复广播的次数")
+    parser.add_argument("--buffer", type=int, default=1024, help="接收缓冲区容量（条）")
+    parser.add_argument("--seconds", type=float, default=2.0, help="每个手环数量的测试时长")
+    parser.add_argument("--start", type=int, default=100, help="起始手环数量")
+    parser.add_argument("--max-bands", type=int, default=100000)
+    args = parser.parse_args()
+
+    print("单条广告处理耗时（AdvertisementMonitor.ingest）")
+    for count in (100, 1000, 10000):
+        fresh, duplicate = bench_ingest(count, args.repeat)
+        print(f"  {count:>6} 台手环: 新心率值 {fresh:7.0f} ns，重复广播 {duplicate:7.0f} ns")
+
+    print(f"\n广告洪泛（每台 {args.advertisement_rate:g} 次/秒，缓冲区 {args.buffer} 条，每档 {args.seconds:g} 秒）")
+    print(f"{'手环数':>8}{'跟踪数':>8}{'广告/秒':>12}{'丢弃比例':>10}{'us/条':>8}{'处理占用':>10}")
+    supported = None
+    count = args.start
+    while count <= args.max_bands:
+        result = asyncio.run(run_flood(count, args))
+        print(f"{result['bands']:>8}{result['tracked']:>8}{result['offered_per_s']:>12.0f}"
+              f"{100 * result['drop_ratio']:>9.2f}%{result['us_per_packet']:>8.2f}{100 * result['busy_ratio']:>9.0f}%")
+        if result["drop_ratio"] > 0.001:
+            break
+        supported = count
+        count *= 2
+    if supported is not None:
+        print(f"不丢弃广告时支持的最大手环数量: {supported}（按翻倍测试，实际上限在 {supported}～{count} 之间）")
+
+
+if __name__ == "__main__":
+    main()
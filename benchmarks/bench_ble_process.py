@@ -0,0 +1,119 @@
+"""
+独立蓝牙进程性能测试
+
+模拟界面负载（每100 ms有一次40 ms的纯Python计算，相当于一次很重的重绘或布局），
+对比两种架构下样本采集时间戳的抖动：
+- 同进程：连接池和界面负载共用一个事件循环和GIL（与默认模式相同）
+- 独立进程：BleWorkerProcess在工作进程中采集，主进程只按33 ms读取共享内存
+模拟手环以固定频率发送通知，统计相邻样本采集间隔与标称间隔的偏差、最长间隔，
+以及主进程每次读取共享内存样本和事件的耗时。
+
+用法: python benchmarks/bench_ble_process.py [--rate 50] [--seconds 10]
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from device_backend import create_backend
+from connection_pool import ConnectionPool
+from ble_process import BleWorkerProcess
+
+
+def busy(milliseconds):
+    """模拟界面线程上的一次重绘/布局"""
+    deadline = time.perf_counter() + milliseconds / 1000
+    total = 0
+    while time.perf_counter() < deadline:
+        total += sum(range(100))
+    return total
+
+
+def jitter_stats(timestamps, rate):
+    intervals = [b - a for a, b in zip(timestamps, timestamps[1:])]
+    if not intervals:
+        return {}
+    deviations = sorted(abs(interval - 1.0 / rate) * 1000 for interval in intervals)
+    return {
+        "samples": len(timestamps),
+        "jitter_ms_p50": deviations[len(deviations) // 2],
+        "jitter_ms_p99": deviations[int(0.99 * len(deviations))],
+        "max_gap_ms": 1000 * max(intervals),
+    }
+
+
+async def run_in_process(args):
+    backend = create_backend("simulated", notify_rate=args.rate, connect_latency=0.0)
+    timestamps = []
+    pool = ConnectionPool(on_sample=lambda session, ts, hr: timestamps.append(ts), backend=backend)
+    await pool.add(backend.bands[0].device)
+    deadline = time.perf_counter() + args.seconds
+    while time.perf_counter() < deadline:
+        await asyncio.sleep(args.period / 1000 - args.load / 1000)
+        busy(args.load)
+    await pool.close_all()
+    return jitter_stats(timestamps, args.rate)
+
+
+def run_worker_process(args):
+    backend = create_backend("simulated", notify_rate=args.rate, connect_latency=0.0)
+    worker = BleWorkerProcess(backend).start()
+    timestamps = []
+    poll_costs = []
+    try:
+        worker.connect(backend.bands[0].address)
+        while not worker.connected_count():
+            worker.poll()
+            time.sleep(0.01)
+        worker.drain()
+        deadline = time.perf_counter() + args.seconds
+        next_load = time.perf_counter() + args.period / 1000
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            worker.poll()
+            samples = worker.drain()
+            poll_costs.append(time.perf_counter() - started)
+            timestamps.extend(sample[0] for sample in samples)
+            if time.perf_counter() >= next_load:
+                busy(args.load)
+                next_load += args.period / 1000
+            time.sleep(0.033)
+    finally:
+        worker.stop()
+    result = jitter_stats(timestamps, args.rate)
+    poll_costs.sort()
+    result["poll_us_p50"] = 1e6 * poll_costs[len(poll_costs) // 2]
+    result["poll_us_max"] = 1e6 * poll_costs[-1]
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="独立蓝牙进程性能测试")
+    parser.add_argument("--rate", type=float, default=50.0, help="模拟手环通知频率")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--load", type=float, default=40.0, help="每次界面负载的时长（毫秒）")
+    parser.add_argument("--period", type=float, default=100.0, help="界面负载的周期（毫秒）")
+    args = parser.parse_args()
+
+    results = {
+        "同进程": asyncio.run(run_in_process(args)),
+        "独立进程": run_worker_process(args),
+    }
+    print(f"通知频率 {args.rate:g} Hz，界面负载 每{args.period:g} ms 占用 {args.load:g} ms")
+    print(f"{'指标':<16}" + "".join(f"{name:>12}" for name in results))
+    keys = []
+    for result in results.values():
+        keys.extend(key for key in result if key not in keys)
+    for key in keys:
+        values = [result.get(key) for result in results.values()]
+        print(f"{key:<16}" + "".join(
+            f"{'-':>12}" if value is None else (f"{value:>12.2f}" if isinstance(value, float) else f"{value:>12}")
+            for value in values
+        ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""
+心率广播服务负载测试
+
+在本进程中运行BroadcastServer并按固定频率发布样本，订阅者在独立的子进程中运行（各自的asyncio事件循环）：
+- 普通TCP订阅者和WebSocket订阅者持续读取，统计从发布到收到的延迟
+- 慢订阅者只连接不读取（接收缓冲区很小），验证它们被丢弃旧消息或断开，而不拖慢发布和其他订阅者
+
+分两个阶段运行：手环的通知频率（默认1 Hz）和压力频率（默认200 Hz）。
+输出每次publish()的耗时（即蓝牙数据路径上的开销）、服务进程的CPU占用、
+订阅者延迟分位数以及各类订阅者的队列深度和丢弃数。
+所有订阅者在同一个子进程中依次读取，延迟中包含子进程轮流处理几百个连接的时间。
+
+用法: python benchmarks/bench_broadcast.py [--clients 500] [--websocket-clients 50] [--slow-clients 20]
+"""
+import os
+import sys
+import time
+import base64
+import socket
+import asyncio
+import argparse
+import multiprocessing
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from broadcast import BroadcastServer, BROADCAST_MESSAGES_DROPPED, BROADCAST_SLOW_DISCONNECTS
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def _tcp_client(port, arrivals, connected):
+    async with connected:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port, limit=1 << 20)
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            arrivals.append(time.perf_counter())
+    finally:
+        writer.close()
+
+
+async def _websocket_client(port, arrivals, connected):
+    async with connected:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        key = base64.b64encode(os.urandom(16)).decode("ascii")
+        writer.write((
+            f"GET / HTTP/1.1\r\nHost: 127.0.0.1\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+            f"Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n"
+        ).encode("ascii"))
+        await reader.readuntil(b"\r\n\r\n")
+    try:
+        while True:
+            _, length = await reader.readexactly(2)
+            await reader.readexactly(length)
+            arrivals.append(time.perf_counter())
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+def _slow_client(port):
+    """只连接不读取的订阅者"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+    sock.connect(("127.0.0.1", port))
+    return sock
+
+
+def client_process(connection, port, websocket_port, clients, websocket_clients, slow_clients):
+    """子进程：建立所有订阅者连接，按父进程的命令统计收到的消息"""
+    async def main():
+        loop = asyncio.get_running_loop()
+        arrivals = [[] for _ in range(clients + websocket_clients)]
+        # 限制同时建立的连接数，避免超出服务端的监听队列
+        connected = asyncio.Semaphore(50)
+        tasks = [asyncio.ensure_future(_tcp_client(port, arrivals[i], connected)) for i in range(clients)]
+        tasks += [
+            asyncio.ensure_future(_websocket_client(websocket_port, arrivals[clients + i], connected))
+            for i in range(websocket_clients)
+        ]
+        slow = [_slow_client(port) for _ in range(slow_clients)]
+        connection.send("ready")
+        while True:
+            command, publish_times = await loop.run_in_executor(None, connection.recv)
+            if command == "reset":
+                for times in arrivals:
+                    times.clear()
+                connection.send("ok")
+            elif command == "collect":
+                # 没有丢消息的订阅者第k条消息对应第k次发布
+                latencies = []
+                complete = 0
+                for times in arrivals:
+                    if len(times) == len(publish_times):
+                        complete += 1
+                        latencies.extend(arrival - sent for arrival, sent in zip(times, publish_times))
+                connection.send({
+                    "complete_clients": complete,
+                    "received": sum(len(times) for times in arrivals),
+                    "latency_ms_p50": 1000 * percentile(latencies, 0.5),
+                    "latency_ms_p99": 1000 * percentile(latencies, 0.99),
+                    "latency_ms_max": 1000 * max(latencies, default=0.0),
+                })
+            elif command == "stop":
+                break
+        for sock in slow:
+            sock.close()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    asyncio.run(main())
+
+
+async def run_phase(server, connection, rate, seconds):
+    """按rate次/秒发布seconds秒，返回统计结果"""
+    loop = asyncio.get_running_loop()
+    connection.send(("reset", None))
+    await loop.run_in_executor(None, connection.recv)
+    for subscriber in server.subscribers:
+        subscriber.max_queue_depth = 0
+
+    dropped_before = BROADCAST_MESSAGES_DROPPED.value
+    disconnects_before = BROADCAST_SLOW_DISCONNECTS.value
+    publish_times = []
+    publish_costs = []
+    interval = 1.0 / rate
+    next_time = time.perf_counter()
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    for seq in range(int(rate * seconds)):
+        delay = next_time - time.perf_counter()
+        await asyncio.sleep(max(delay, 0))
+        started = time.perf_counter()
+        server.publish(time.time(), 60 + seq % 120, "SIM:00:00:00:00:01", True, (833.0,))
+        publish_costs.append(time.perf_counter() - started)
+        publish_times.append(started)
+        next_time += interval
+    # 等待订阅者读完剩余消息
+    await asyncio.sleep(0.5)
+    cpu = time.process_time() - cpu_start
+    wall = time.perf_counter() - wall_start
+
+    connection.send(("collect", publish_times))
+    result = await loop.run_in_executor(None, connection.recv)
+    stats = server.client_stats()
+    # 有丢弃记录的订阅者视为慢订阅者
+    slow = [s for s in stats if s["dropped"]]
+    fast = [s for s in stats if not s["dropped"]]
+    result.update({
+        "published": len(publish_times),
+        "subscribers": len(stats),
+        "publish_us_p50": 1e6 * percentile(publish_costs, 0.5),
+        "publish_us_p99": 1e6 * percentile(publish_costs, 0.99),
+        "server_cpu_percent": 100 * cpu / wall,
+        "fast_max_queue_depth": max((s["max_queue_depth"] for s in fast), default=0),
+        "slow_connected": len(slow),
+        "slow_max_queue_depth": max((s["max_queue_depth"] for s in slow), default=0),
+        "slow_disconnected": BROADCAST_SLOW_DISCONNECTS.value - disconnects_before,
+        "messages_dropped": BROADCAST_MESSAGES_DROPPED.value - dropped_before,
+    })
+    return result
+
+
+async def main_async(args):
+    server = await BroadcastServer(
+        port=0, websocket_port=0, max_queue=args.max_queue, stall_timeout=args.stall_timeout,
+        send_buffer_size=args.send_buffer_size,
+    ).start()
+    parent, child = multiprocessing.Pipe()
+    process = multiprocessing.Process(target=client_process, args=(
+        child, server.port, server.websocket_port, args.clients, args.websocket_clients, args.slow_clients
+    ), daemon=True)
+    process.start()
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, parent.recv)
+    total = args.clients + args.websocket_clients + args.slow_clients
+    while len(server.subscribers) < total:
+        await asyncio.sleep(0.05)
+
+    results = {}
+    for rate, seconds in ((args.rate, args.seconds), (args.stress_rate, args.stress_seconds)):
+        results[f"{rate:g} Hz"] = await run_phase(server, parent, rate, seconds)
+
+    parent.send(("stop", None))
+    process.join(5)
+    await server.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="心率广播服务负载测试")
+    parser.add_argument("--clients", type=int, default=500, help="TCP订阅者数")
+    parser.add_argument("--websocket-clients", type=int, default=50, help="WebSocket订阅者数")
+    parser.add_argument("--slow-clients", type=int, default=20, help="只连接不读取的订阅者数")
+    parser.add_argument("--rate", type=float, default=1.0, help="手环通知频率")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--stress-rate", type=float, default=200.0, help="压力测试发布频率")
+    parser.add_argument("--stress-seconds", type=float, default=5.0)
+    parser.add_argument("--max-queue", type=int, default=64)
+    parser.add_argument("--stall-timeout", type=float, default=2.0)
+    parser.add_argument("--send-buffer-size", type=int, default=16 * 1024,
+                        help="每个订阅者的发送缓冲区上限（字节），0表示系统默认值")
+    args = parser.parse_args()
+
+    results = asyncio.run(main_async(args))
+    print(f"订阅者: TCP {args.clients}，WebSocket {args.websocket_clients}，慢订阅者 {args.slow_clients}")
+    print(f"{'指标':<26}" + "".join(f"{name:>12}" for name in results))
+    first = next(iter(results.values()))
+    for key in first:
+        print(f"{key:<26}" + "".join(
+            f"{result[key]:>12.3f}" if isinstance(result[key], float) else f"{result[key]:>12}"
+            for result in results.values()
+        ))
+
+
+if __name__ == "__main__":
+    main()
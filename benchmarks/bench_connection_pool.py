@@ -0,0 +1,75 @@
+"""
+多设备连接池扩展性测试（使用模拟的HRS外设，无需蓝牙硬件）
+
+对不同的设备数量N，测量：
+- 每个会话的内存占用（tracemalloc）
+- 每个设备的CPU占用和每条通知的处理耗时
+
+用法: python benchmarks/bench_connection_pool.py [--rate 10] [--duration 3] [--counts 1,10,50,100,250]
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from connection_pool import ConnectionPool
+from simulated_device import SimulatedBackend
+
+
+async def measure(count, rate, duration):
+    """测量N个并发会话的资源占用"""
+    backend = SimulatedBackend.with_default_band(
+        count=count, notify_rate=rate, connect_latency=0.0, include_rr=False, sensor_contact=None
+    )
+    pool = ConnectionPool(backend=backend)
+    devices = [band.device for band in backend.bands]
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    await asyncio.gather(*(pool.add(device) for device in devices))
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    memory = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+
+    start_notifications = sum(s.notification_count for s in pool.sessions.values())
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    await asyncio.sleep(duration)
+    cpu = time.process_time() - cpu_start
+    wall = time.perf_counter() - wall_start
+    notifications = sum(s.notification_count for s in pool.sessions.values()) - start_notifications
+
+    await pool.close_all()
+    return {
+        "devices": count,
+        "memory_per_device_kb": memory / count / 1024,
+        "cpu_percent_per_device": 100.0 * cpu / wall / count,
+        "us_per_notification": 1e6 * cpu / max(notifications, 1),
+        "notifications_per_s": notifications / wall,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多设备连接池扩展性测试")
+    parser.add_argument("--rate", type=float, default=10.0, help="每个设备的通知频率（Hz）")
+    parser.add_argument("--duration", type=float, default=3.0, help="每组测量时长（秒）")
+    parser.add_argument("--counts", default="1,10,50,100,250", help="设备数量列表")
+    args = parser.parse_args()
+
+    print(f"通知频率 {args.rate} Hz/设备，每组 {args.duration} 秒")
+    for count in [int(c) for c in args.counts.split(",")]:
+        r = asyncio.run(measure(count, args.rate, args.duration))
+        print(
+            f"N={r['devices']:>4}: 内存 {r['memory_per_device_kb']:.1f} KB/设备, "
+            f"CPU {r['cpu_percent_per_device']:.3f}%/设备, "
+            f"{r['us_per_notification']:.1f} us/通知, 总计 {r['notifications_per_s']:.0f} 通知/秒"
+        )
+
+
+if __name__ == "__main__":
+    main()
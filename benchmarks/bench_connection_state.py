@@ -0,0 +1,82 @@
+"""
+连接状态机性能测试
+
+模拟不响应的手环（停止通知和断开连接各卡住 --hang 秒），对比两种做法：
+- 直接等待：与原来的实现相同，依次await stop_notify()和disconnect()
+- 状态机：ConnectionStateMachine，每一步都有时限
+统计切换设备和退出（断开）的耗时。原来的关闭窗口流程在界面线程上run_until_complete这些步骤，
+耗时即界面卡住的时间；现在这些步骤在事件循环中异步执行，界面只是等待更短的时间后关闭。
+
+用法: python benchmarks/bench_connection_state.py [--hang 20] [--rounds 3]
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from connection_state import ConnectionStateMachine
+from hrs_parser import HEART_RATE_CHAR_UUID
+from simulated_device import SimulatedBackend
+
+
+def make_backend(hang):
+    backend = SimulatedBackend.with_default_band(count=2, notify_rate=20.0, connect_latency=0.0)
+    for band in backend.bands:
+        band.disconnect_latency = hang
+    return backend
+
+
+async def run_direct(hang):
+    backend = make_backend(hang)
+    clients = [backend.create_client(band.device) for band in backend.bands]
+
+    async def release(client):
+        await client.stop_notify(HEART_RATE_CHAR_UUID)
+        await client.disconnect()
+
+    await clients[0].connect()
+    await clients[0].start_notify(HEART_RATE_CHAR_UUID, lambda sender, data: None)
+    started = time.perf_counter()
+    await release(clients[0])
+    await clients[1].connect()
+    await clients[1].start_notify(HEART_RATE_CHAR_UUID, lambda sender, data: None)
+    switch_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    await release(clients[1])
+    return switch_time, time.perf_counter() - started
+
+
+async def run_state_machine(hang):
+    backend = make_backend(hang)
+    machine = ConnectionStateMachine(backend, lambda sender, data: None)
+    await machine.connect(backend.bands[0].device)
+    started = time.perf_counter()
+    await machine.connect(backend.bands[1].device)
+    switch_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    await machine.shutdown()
+    return switch_time, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="连接状态机性能测试")
+    parser.add_argument("--hang", type=float, default=20.0, help="手环不响应的时长（秒）")
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"手环停止通知和断开连接各卡住 {args.hang:g} 秒")
+    print(f"{'方式':<10}{'切换设备(秒)':>14}{'退出(秒)':>12}")
+    for name, run in (("直接等待", run_direct), ("状态机", run_state_machine)):
+        results = [asyncio.run(run(args.hang)) for _ in range(args.rounds)]
+        switch_time = max(result[0] for result in results)
+        exit_time = max(result[1] for result in results)
+        print(f"{name:<10}{switch_time:>14.2f}{exit_time:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
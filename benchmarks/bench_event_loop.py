@@ -0,0 +1,133 @@
+"""
+对比定时器轮询与Qt/asyncio集成事件循环两种模式：
+- 通知到界面的延迟（模拟蓝牙后端线程投递心率通知）
+- 空闲时的事件循环唤醒次数与CPU占用
+
+用法: python benchmarks/bench_event_loop.py [--samples 50] [--idle 3]
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def run_mode(mode, samples, idle_seconds):
+    """在当前进程中测量单个模式，返回结果字典"""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5.QtWidgets import QApplication
+    from PyQt5.QtCore import QAbstractEventDispatcher, QTimer
+    import main
+
+    # 按心率值匹配发送和收到的通知，关闭显示前的中值/变化速率过滤
+    main.HEART_RATE_FILTER = False
+    app = QApplication(sys.argv)
+    loop = main.create_event_loop(app) if mode == "integrated" else None
+    if mode == "integrated" and loop is None:
+        raise RuntimeError("集成模式需要安装qasync")
+    window = main.HeartRateMonitor(loop)
+    asyncio_loop = window.loop
+
+    wakeups = [0]
+    QAbstractEventDispatcher.instance().awake.connect(lambda: wakeups.__setitem__(0, wakeups[0] + 1))
+
+    latencies = []
+    sent_at = {}
+
+    def on_update(heart_rate):
+        if heart_rate in sent_at:
+            latencies.append(time.perf_counter() - sent_at.pop(heart_rate))
+
+    window.heart_rate_update.connect(on_update)
+
+    result = {}
+
+    def producer():
+        # 模拟蓝牙后端线程：随机间隔投递心率通知
+        for i in range(samples):
+            time.sleep(random.uniform(0.02, 0.12))
+            heart_rate = 60 + i
+            sent_at[heart_rate] = time.perf_counter()
+            asyncio_loop.call_soon_threadsafe(
+                window._heart_rate_callback, None, bytearray([0x00, heart_rate])
+            )
+
+    def measure_idle():
+        wakeups[0] = 0
+        cpu_start = time.process_time()
+        wall_start = time.perf_counter()
+
+        def finish():
+            wall = time.perf_counter() - wall_start
+            result["idle_wakeups_per_s"] = wakeups[0] / wall
+            result["idle_cpu_percent"] = 100.0 * (time.process_time() - cpu_start) / wall
+            app.quit()
+
+        QTimer.singleShot(int(idle_seconds * 1000), finish)
+
+    def start():
+        thread = threading.Thread(target=producer, daemon=True)
+        thread.start()
+
+        def wait_producer():
+            if thread.is_alive() or len(latencies) < samples and sent_at:
+                QTimer.singleShot(50, wait_producer)
+            else:
+                measure_idle()
+
+        QTimer.singleShot(50, wait_producer)
+
+    QTimer.singleShot(0, start)
+    if loop is not None:
+        with loop:
+            loop.run_forever()
+    else:
+        app.exec_()
+
+    latencies.sort()
+    result["mode"] = mode
+    result["samples"] = len(latencies)
+    result["latency_mean_ms"] = 1000 * sum(latencies) / max(len(latencies), 1)
+    result["latency_p50_ms"] = 1000 * latencies[len(latencies) // 2] if latencies else None
+    result["latency_max_ms"] = 1000 * latencies[-1] if latencies else None
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="事件循环模式延迟与空闲唤醒对比")
+    parser.add_argument("--samples", type=int, default=50)
+    parser.add_argument("--idle", type=float, default=3.0)
+    parser.add_argument("--mode", choices=["timer", "integrated"])
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(run_mode(args.mode, args.samples, args.idle)))
+        return
+
+    # 每种模式在独立进程中运行，避免事件循环互相影响
+    for mode in ("timer", "integrated"):
+        output = subprocess.run(
+            [sys.executable, __file__, "--mode", mode,
+             "--samples", str(args.samples), "--idle", str(args.idle)],
+            capture_output=True, text=True,
+        )
+        lines = [line for line in output.stdout.splitlines() if line.startswith("{")]
+        if output.returncode != 0 or not lines:
+            print(f"{mode}: 运行失败\n{output.stderr}")
+            continue
+        r = json.loads(lines[-1])
+        print(
+            f"{mode:>10}: 延迟 平均 {r['latency_mean_ms']:.2f} ms, "
+            f"P50 {r['latency_p50_ms']:.2f} ms, 最大 {r['latency_max_ms']:.2f} ms | "
+            f"空闲唤醒 {r['idle_wakeups_per_s']:.1f} 次/秒, CPU {r['idle_cpu_percent']:.2f}%"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+悬浮窗绘制性能测试
+
+对比原先基于QLabel的悬浮窗和直接绘制的FloatWindow：
+- 每次心率更新的CPU时间和帧耗时（更新 + 处理到绘制完成）
+- 拖动大小滑块时每一步的耗时，以及窗口被隐藏的次数（闪烁）
+
+以及三种显示样式在真实事件循环中连续运行时的CPU占用、每秒重绘次数、
+单次重绘耗时和整窗重绘耗时（可达到的最高帧率）。
+
+用法: python benchmarks/bench_float_window.py [--updates 2000] [--seconds 3]
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtCore import Qt, QEvent, QObject, QTimer, QEventLoop
+from PyQt5.QtWidgets import QApplication, QWidget, QLabel, QVBoxLayout
+
+from float_window import FloatWindow, FLOAT_WINDOW_STYLES
+
+
+class LabelFloatWindow(QWidget):
+    """原先的悬浮窗实现：QLabel + 样式表，调整大小时隐藏再显示"""
+
+    def __init__(self):
+        super().__init__()
+        self.window_size = 150
+        self.setWindowFlags(Qt.FramelessWindowHint | Qt.WindowStaysOnTopHint)
+        self.setAttribute(Qt.WA_TranslucentBackground)
+        self.resize(self.window_size, self.window_size)
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        self.heart_rate_label = QLabel(self)
+        self.heart_rate_label.setAlignment(Qt.AlignCenter)
+        self.heart_rate_label.setStyleSheet(
+            f"font-size: {self.window_size // 2}px; font-weight: bold; color: red;"
+        )
+        self.heart_rate_label.setText("0")
+        layout.addWidget(self.heart_rate_label)
+
+    def update_heart_rate(self, heart_rate):
+        self.heart_rate_label.setText(str(heart_rate))
+
+    def set_size(self, size):
+        self.window_size = size
+        self.resize(size, size)
+        self.heart_rate_label.setStyleSheet(
+            f"font-size: {size // 2}px; font-weight: bold; color: red;"
+        )
+        if self.isVisible():
+            self.hide()
+            self.show()
+
+
+class EventCounter(QObject):
+    """统计窗口及子控件收到的绘制和隐藏事件"""
+
+    def __init__(self, window):
+        super().__init__()
+        self.paints = 0
+        self.hides = 0
+        for widget in [window] + window.findChildren(QWidget):
+            widget.installEventFilter(self)
+
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Paint:
+            self.paints += 1
+        elif event.type() == QEvent.Hide:
+            self.hides += 1
+        return False
+
+
+def bench_updates(app, window, count):
+    """每次更新后处理事件直到绘制完成"""
+    counter = EventCounter(window)
+    frame_times = []
+    cpu_start = time.process_time()
+    for i in range(count):
+        heart_rate = 60 + (i * 7) % 120
+        start = time.perf_counter()
+        window.update_heart_rate(heart_rate)
+        app.processEvents()
+        frame_times.append(time.perf_counter() - start)
+    cpu = time.process_time() - cpu_start
+    return {
+        "cpu_us_per_update": 1e6 * cpu / count,
+        "frame_ms_p50": 1000 * statistics.median(frame_times),
+        "frame_ms_p95": 1000 * sorted(frame_times)[int(0.95 * (count - 1))],
+        "paints_per_update": counter.paints / count,
+    }
+
+
+def bench_resize(app, window, sweeps):
+    """模拟来回拖动大小滑块（100到200，步长1）"""
+    counter = EventCounter(window)
+    step_times = []
+    sizes = list(range(100, 201)) + list(range(200, 99, -1))
+    for _ in range(sweeps):
+        for size in sizes:
+            start = time.perf_counter()
+            window.set_size(size)
+            app.processEvents()
+            step_times.append(time.perf_counter() - start)
+    return {
+        "resize_ms_p50": 1000 * statistics.median(step_times),
+        "resize_ms_p95": 1000 * sorted(step_times)[int(0.95 * (len(step_times) - 1))],
+        "hides_per_step": counter.hides / len(step_times),
+    }
+
+
+def bench_style(app, cls, seconds, update_rate, full_frames=300):
+    """在事件循环中运行悬浮窗，按update_rate次/秒更新心率"""
+    paint_times = []
+
+    def timed_paint(self, event):
+        start = time.perf_counter()
+        cls.paintEvent(self, event)
+        paint_times.append(time.perf_counter() - start)
+
+    window = type(cls.__name__, (cls,), {"paintEvent": timed_paint})()
+    window.show()
+    app.processEvents()
+
+    # 整窗重绘耗时：可达到的最高帧率
+    start = time.perf_counter()
+    for _ in range(full_frames):
+        window.repaint()
+    full_frame = (time.perf_counter() - start) / full_frames
+
+    paint_times.clear()
+    step = [0]
+
+    def update():
+        step[0] += 1
+        window.update_heart_rate(60 + (step[0] * 13) % 120)
+
+    timer = QTimer()
+    timer.timeout.connect(update)
+    timer.start(int(1000 / update_rate))
+    loop = QEventLoop()
+    QTimer.singleShot(int(seconds * 1000), loop.quit)
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    loop.exec_()
+    wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+    timer.stop()
+    window.close()
+    return {
+        "cpu_percent": 100 * cpu / wall,
+        "paints_per_s": len(paint_times) / wall,
+        "paint_ms_p50": 1000 * statistics.median(paint_times) if paint_times else 0.0,
+        "full_frame_ms": 1000 * full_frame,
+        "max_fps": 1 / full_frame,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="悬浮窗绘制性能测试")
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--sweeps", type=int, default=3)
+    parser.add_argument("--seconds", type=float, default=3.0, help="每种样式连续运行的时间")
+    parser.add_argument("--update-rate", type=float, default=2.0, help="每秒心率更新次数")
+    args = parser.parse_args()
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    results = {}
+    for name, cls in (("QLabel", LabelFloatWindow), ("自绘", FloatWindow)):
+        window = cls()
+        window.show()
+        app.processEvents()
+        result = bench_updates(app, window, args.updates)
+        result.update(bench_resize(app, window, args.sweeps))
+        results[name] = result
+        window.close()
+
+    print(f"{'指标':<22}" + "".join(f"{name:>12}" for name in results))
+    for key in results["QLabel"]:
+        print(f"{key:<22}" + "".join(f"{results[name][key]:>12.3f}" for name in results))
+
+    styles = {name: bench_style(app, cls, args.seconds, args.update_rate)
+              for name, cls in FLOAT_WINDOW_STYLES.items()}
+    print(f"\n显示样式（每秒更新 {args.update_rate:g} 次，运行 {args.seconds:g} 秒）")
+    print(f"{'指标':<22}" + "".join(f"{name:>10}" for name in styles))
+    for key in styles["简约数字"]:
+        print(f"{key:<22}" + "".join(f"{styles[name][key]:>12.3f}" for name in styles))
+
+
+if __name__ == "__main__":
+    main()
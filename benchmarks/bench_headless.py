@@ -0,0 +1,59 @@
+"""
+无界面模式的资源占用测试
+
+分别以新进程运行无界面模式（headless.py --simulate，持续输出样本）和界面程序（main.py --simulate），
+运行相同时长后结束进程，对比峰值内存（RSS）和CPU时间。
+界面程序在模拟后端下启动后不会自动连接设备，测得的是它空闲时的占用。
+
+用法: python benchmarks/bench_headless.py [--seconds 10] [--notify-rate 1]
+仅支持Linux/macOS（通过os.wait4读取子进程的资源占用）。
+"""
+import os
+import sys
+import time
+import signal
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_process(command, seconds):
+    """运行命令seconds秒后发送SIGTERM，返回(峰值RSS MB, CPU秒)"""
+    env = dict(os.environ)
+    env.setdefault("QT_QPA_PLATFORM", "offscreen")
+    process = subprocess.Popen(
+        command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    time.sleep(seconds)
+    process.send_signal(signal.SIGTERM)
+    _, _, usage = os.wait4(process.pid, 0)
+    process.returncode = 0  # 已由wait4回收
+    # ru_maxrss在Linux上的单位是KB，在macOS上是字节
+    max_rss = usage.ru_maxrss / 1024 if sys.platform != "darwin" else usage.ru_maxrss / 1024 / 1024
+    return max_rss, usage.ru_utime + usage.ru_stime
+
+
+def main():
+    parser = argparse.ArgumentParser(description="无界面模式的资源占用测试")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--notify-rate", type=float, default=1.0, help="模拟手环每秒通知次数")
+    args = parser.parse_args()
+
+    commands = {
+        "headless": [sys.executable, os.path.join(ROOT, "headless.py"), "--simulate",
+                     "--notify-rate", str(args.notify_rate)],
+        "Qt界面": [sys.executable, os.path.join(ROOT, "main.py"), "--simulate"],
+    }
+    results = {name: run_process(command, args.seconds) for name, command in commands.items()}
+
+    print(f"{'模式':<12}{'峰值RSS(MB)':>14}{'CPU时间(s)':>14}{'CPU占用(%)':>14}")
+    for name, (max_rss, cpu) in results.items():
+        print(f"{name:<12}{max_rss:>14.1f}{cpu:>14.2f}{100 * cpu / args.seconds:>14.2f}")
+    headless_rss, headless_cpu = results["headless"]
+    gui_rss, gui_cpu = results["Qt界面"]
+    print(f"\nheadless / Qt界面: 内存 {headless_rss / gui_rss:.0%}，CPU时间 {headless_cpu / gui_cpu:.0%}")
+
+
+if __name__ == "__main__":
+    main()
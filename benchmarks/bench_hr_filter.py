@@ -0,0 +1,87 @@
+"""
+心率值过滤性能测试
+
+测量HeartRateFilter.update()每个样本的耗时（中值、合理范围、接触检测和变化速率限制全部启用），
+并与每个样本都对窗口排序取中值的方式对比。输入为带尖峰、0值和接触丢失的模拟心率。
+逐个样本计时，输出中位数、99分位和最大值，用于确认过滤阶段不会增加可见的延迟。
+
+用法: python benchmarks/bench_hr_filter.py [--samples 100000]
+"""
+import os
+import sys
+import math
+import time
+import random
+import argparse
+from collections import deque
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hr_filter import HeartRateFilter
+
+
+def make_samples(count, seed=1):
+    rng = random.Random(seed)
+    samples = []
+    for i in range(count):
+        heart_rate = int(90 + 40 * math.sin(i / 300) + rng.gauss(0, 2))
+        contact = True
+        roll = rng.random()
+        if roll < 0.01:
+            heart_rate = rng.randint(150, 220)  # 尖峰
+        elif roll < 0.015:
+            heart_rate = 0
+        elif roll < 0.02:
+            contact = False
+        samples.append((i * 0.05, heart_rate, contact))
+    return samples
+
+
+def bench_filter(samples, window):
+    hr_filter = HeartRateFilter(window=window)
+    costs = []
+    clock = time.perf_counter
+    for timestamp, heart_rate, contact in samples:
+        start = clock()
+        hr_filter.update(timestamp, heart_rate, contact)
+        costs.append(clock() - start)
+    return costs
+
+
+def bench_sorted(samples, window):
+    values = deque(maxlen=window)
+    costs = []
+    clock = time.perf_counter
+    for _, heart_rate, _ in samples:
+        start = clock()
+        values.append(heart_rate)
+        ordered = sorted(values)
+        ordered[len(ordered) // 2]
+        costs.append(clock() - start)
+    return costs
+
+
+def summarize(costs):
+    ordered = sorted(costs)
+    return (
+        1e6 * ordered[len(ordered) // 2],
+        1e6 * ordered[int(0.99 * len(ordered))],
+        1e6 * ordered[-1],
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="心率值过滤性能测试")
+    parser.add_argument("--samples", type=int, default=100000)
+    args = parser.parse_args()
+
+    samples = make_samples(args.samples)
+    print(f"{'窗口':<6}{'方式':<10}{'p50(µs)':>10}{'p99(µs)':>10}{'最大(µs)':>10}")
+    for window in (5, 15, 61, 255):
+        for name, bench in (("过滤器", bench_filter), ("排序", bench_sorted)):
+            p50, p99, worst = summarize(bench(samples, window))
+            print(f"{window:<6}{name:<10}{p50:>10.2f}{p99:>10.2f}{worst:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
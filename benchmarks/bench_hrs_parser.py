@@ -0,0 +1,70 @@
+"""
+心率测量数据解析性能测试
+
+对比原先只解析心率值的写法、完整字段的单条解析和批量解析。
+
+用法: python benchmarks/bench_hrs_parser.py [--count 100000]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from hrs_parser import parse_heart_rate_measurement, parse_batch
+
+
+def legacy_parse(data):
+    """原_heart_rate_callback中的解析方式（只取心率值）"""
+    if data[0] & 0x01:
+        heart_rate = int.from_bytes(data[1:3], byteorder='little')
+    else:
+        heart_rate = data[1]
+    return heart_rate
+
+
+def make_payloads(count, seed=0):
+    """生成包含各种标志位组合的测试数据"""
+    rng = random.Random(seed)
+    payloads = []
+    for _ in range(count):
+        flags = rng.choice([0x00, 0x06, 0x16, 0x1E, 0x01, 0x17])
+        heart_rate = rng.randint(50, 180)
+        payload = bytearray([flags])
+        if flags & 0x01:
+            payload += heart_rate.to_bytes(2, 'little')
+        else:
+            payload.append(heart_rate)
+        if flags & 0x08:
+            payload += rng.randint(0, 2000).to_bytes(2, 'little')
+        if flags & 0x10:
+            for _ in range(rng.randint(1, 3)):
+                payload += rng.randint(300, 1200).to_bytes(2, 'little')
+        payloads.append(bytes(payload))
+    return payloads
+
+
+def timed(label, func, count):
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {elapsed * 1000:8.1f} ms  {1e9 * elapsed / count:8.0f} ns/条")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="心率测量数据解析性能测试")
+    parser.add_argument("--count", type=int, default=100000)
+    args = parser.parse_args()
+
+    payloads = make_payloads(args.count)
+    print(f"测试数据: {args.count} 条")
+    timed("原解析方式（仅心率值）", lambda: [legacy_parse(p) for p in payloads], args.count)
+    timed("完整解析（单条）", lambda: [parse_heart_rate_measurement(p) for p in payloads], args.count)
+    timed("完整解析（批量）", lambda: parse_batch(payloads), args.count)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+流式HRV统计性能测试
+
+对比不同窗口长度下每个心搏的更新耗时（加入RR间期并读取RMSSD、SDNN、pNN50和平均心率）：
+- 流式：RollingHrv，每个心搏常数次加减
+- 重新计算：每个心搏都对整个窗口重新计算（作为对照，耗时随窗口长度线性增长）
+
+用法: python benchmarks/bench_hrv.py [--beats 20000]
+"""
+import os
+import sys
+import math
+import time
+import random
+import argparse
+from collections import deque
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hrv import RollingHrv
+
+
+def make_rr_stream(count, seed=1):
+    rng = random.Random(seed)
+    return [800 + 120 * math.sin(i / 30) + rng.gauss(0, 40) for i in range(count)]
+
+
+def bench_streaming(rr_stream, window_seconds):
+    hrv = RollingHrv(window_seconds)
+    # 先填满窗口，只统计稳定状态下的耗时
+    hrv.add_intervals(rr_stream[:len(rr_stream) // 2])
+    measured = rr_stream[len(rr_stream) // 2:]
+    start = time.perf_counter()
+    for rr in measured:
+        hrv.add(rr)
+        hrv.stats()
+    return (time.perf_counter() - start) / len(measured)
+
+
+def bench_recompute(rr_stream, window_seconds, limit):
+    window = deque()
+    total = 0.0
+    measured = 0
+    elapsed = 0.0
+    for index, rr in enumerate(rr_stream):
+        window.append(rr)
+        total += rr
+        while total > window_seconds * 1000:
+            total -= window.popleft()
+        if index < len(rr_stream) // 2:
+            continue
+        start = time.perf_counter()
+        values = list(window)
+        mean = sum(values) / len(values)
+        math.sqrt(sum((v - mean) ** 2 for v in values) / (len(values) - 1))
+        diffs = [values[i] - values[i - 1] for i in range(1, len(values))]
+        math.sqrt(sum(d * d for d in diffs) / len(diffs))
+        sum(1 for d in diffs if abs(d) > 50) / len(diffs)
+        elapsed += time.perf_counter() - start
+        measured += 1
+        if measured >= limit:
+            break
+    return elapsed / measured
+
+
+def main():
+    parser = argparse.ArgumentParser(description="流式HRV统计性能测试")
+    parser.add_argument("--beats", type=int, default=20000, help="窗口填满后统计的心搏数")
+    parser.add_argument("--recompute-beats", type=int, default=500, help="重新计算方式统计的心搏数")
+    args = parser.parse_args()
+
+    windows = (30, 60, 300, 1800, 3600)
+    print(f"{'窗口(秒)':<10}{'窗口心搏数':>10}{'流式(µs/心搏)':>16}{'重新计算(µs/心搏)':>20}")
+    for window_seconds in windows:
+        # 前一半用于填满窗口
+        beats_in_window = int(window_seconds / 0.8)
+        rr_stream = make_rr_stream(2 * max(args.beats, beats_in_window + args.recompute_beats))
+        streaming = bench_streaming(rr_stream, window_seconds)
+        recompute = bench_recompute(rr_stream, window_seconds, args.recompute_beats)
+        print(f"{window_seconds:<10}{beats_in_window:>10}{1e6 * streaming:>16.2f}{1e6 * recompute:>20.1f}")
+
+
+if __name__ == "__main__":
+    main()
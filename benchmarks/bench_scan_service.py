@@ -0,0 +1,126 @@
+"""
+常驻后台扫描服务性能测试
+
+1. 点击"扫描"到设备列表包含全部模拟手环的用时：
+   - 每次新建：与原来相同，每次点击新建ScanThread、事件循环和扫描器
+   - 常驻服务：ScanServiceThread已在后台运行，点击只是boost()，列表已是最新的
+2. 各占空比下扫描器实际处于扫描状态的时间比例和扫描器创建次数（时间按 --speedup 倍压缩）
+
+用法: python benchmarks/bench_scan_service.py [--bands 5] [--advertisement-rate 1] [--rounds 5]
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from simulated_device import SimulatedBackend
+from scan_service import ScanService, DutyCycle, DUTY_CYCLES
+
+
+def wait_for_devices(thread_factory, addresses, rounds):
+    """每轮调用一次thread_factory(on_found)模拟点击，返回全部设备出现在列表中的用时（毫秒）"""
+    times = []
+    for _ in range(rounds):
+        found = set()
+        done = threading.Event()
+
+        def on_found(device, is_hrs):
+            found.add(device.address)
+            if found >= addresses:
+                done.set()
+
+        started = time.perf_counter()
+        finish = thread_factory(on_found)
+        done.wait(30)
+        times.append(1000 * (time.perf_counter() - started))
+        finish()
+    return times
+
+
+def bench_click_to_list(args):
+    # 没有Qt事件循环，信号直接在扫描线程中调用
+    from PyQt5.QtCore import Qt
+    import main
+
+    backend = SimulatedBackend.with_default_band(
+        count=args.bands, advertisement_rate=args.advertisement_rate
+    )
+    addresses = {band.address for band in backend.bands}
+
+    def per_click(on_found):
+        thread = main.ScanThread(backend, timeout=30.0)
+        thread.device_found.connect(on_found, Qt.DirectConnection)
+        thread.start()
+
+        def finish():
+            thread.stop()
+            thread.wait()
+        return finish
+
+    service = main.ScanServiceThread(backend, DUTY_CYCLES["balanced"])
+    known = {}
+    service.device_found.connect(
+        lambda device, is_hrs: known.__setitem__(device.address, device), Qt.DirectConnection
+    )
+    service.start()
+    # 程序启动后后台扫描已运行一段时间
+    while len(known) < args.bands:
+        time.sleep(0.05)
+
+    def resident(on_found):
+        # 点击时界面直接使用已有的设备列表
+        for device in list(known.values()):
+            on_found(device, True)
+        service.boost(main.SCAN_TIMEOUT)
+        return lambda: None
+
+    results = {
+        "每次新建": wait_for_devices(per_click, addresses, args.rounds),
+        "常驻服务": wait_for_devices(resident, addresses, args.rounds),
+    }
+    service.stop()
+    service.wait()
+    return results
+
+
+async def measure_duty_cycle(duty, seconds, speedup):
+    backend = SimulatedBackend.with_default_band(count=3, advertisement_rate=10.0 * speedup)
+    scaled = DutyCycle(duty.name, duty.window / speedup, duty.interval / speedup, duty.passive)
+    service = ScanService(backend, scaled)
+    task = asyncio.ensure_future(service.run())
+    await asyncio.sleep(seconds)
+    service.stop()
+    await task
+    return service
+
+
+def main():
+    parser = argparse.ArgumentParser(description="常驻后台扫描服务性能测试")
+    parser.add_argument("--bands", type=int, default=5)
+    parser.add_argument("--advertisement-rate", type=float, default=1.0, help="模拟手环每秒广告次数")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--seconds", type=float, default=3.0, help="每种占空比的测试时长")
+    parser.add_argument("--speedup", type=float, default=20.0, help="占空比时间压缩倍数")
+    args = parser.parse_args()
+
+    print(f"{args.bands} 个模拟手环，每秒广告 {args.advertisement_rate:g} 次")
+    print(f"{'点击扫描到列表完整':<12}{'p50(ms)':>10}{'max(ms)':>10}")
+    for name, times in bench_click_to_list(args).items():
+        times.sort()
+        print(f"{name:<14}{times[len(times) // 2]:>10.1f}{times[-1]:>10.1f}")
+
+    print(f"\n占空比（时间压缩 {args.speedup:g} 倍，运行 {args.seconds:g} 秒）")
+    print(f"{'名称':<12}{'标称比例':>10}{'实测比例':>10}{'创建扫描器':>10}{'启动次数':>10}")
+    for name, duty in DUTY_CYCLES.items():
+        service = asyncio.run(measure_duty_cycle(duty, args.seconds, args.speedup))
+        print(f"{name:<14}{duty.ratio:>10.2f}{service.scanning_ratio:>10.2f}"
+              f"{service.scanner_created:>12}{service.scanner_starts:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+会话录制文件写入与查询性能测试
+
+生成一个多小时的模拟会话（1 Hz，含RR间期和接触状态），测量：
+- 每个样本占用的字节数
+- 重新打开文件（建立索引）的耗时
+- 按时间范围查询的耗时
+
+用法: python benchmarks/bench_session_recorder.py [--hours 8]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from session_recorder import SessionWriter, SessionReader
+
+
+def main():
+    parser = argparse.ArgumentParser(description="会话录制文件性能测试")
+    parser.add_argument("--hours", type=float, default=8.0)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    count = int(args.hours * 3600)
+    start = 1_700_000_000.0
+    path = os.path.join(tempfile.mkdtemp(), "session.xhr")
+
+    # 模拟时钟，使分批刷新的节奏与实时录制一致
+    now = [0.0]
+    writer = SessionWriter(path, fsync=False, clock=lambda: now[0])
+    heart_rate = 70
+    began = time.perf_counter()
+    for i in range(count):
+        now[0] = float(i)
+        heart_rate = max(45, min(180, heart_rate + rng.randint(-2, 2)))
+        rr = 60000.0 / heart_rate
+        writer.write(start + i, heart_rate, sensor_contact=True,
+                     rr_intervals=(rr,), address="AA:BB:CC:DD:EE:FF")
+    writer.close()
+    write_time = time.perf_counter() - began
+    size = os.path.getsize(path)
+
+    began = time.perf_counter()
+    reader = SessionReader(path)
+    open_time = time.perf_counter() - began
+
+    query_start = start + count / 2
+    began = time.perf_counter()
+    samples = reader.query(query_start, query_start + 300)
+    query_time = time.perf_counter() - began
+    reader.close()
+
+    print(f"样本数 {count}（{args.hours} 小时），文件 {size / 1024:.1f} KB，{size / count:.2f} 字节/样本")
+    print(f"写入 {write_time * 1000:.0f} ms（{1e6 * write_time / count:.1f} us/样本）")
+    print(f"打开并建立索引 {open_time * 1000:.2f} ms")
+    print(f"查询5分钟范围 {query_time * 1000:.2f} ms（{len(samples)} 个样本）")
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+启动耗时测试：多次以新进程启动 main.py --profile-startup，统计各阶段耗时的中位数
+- interpreter: 从创建进程到开始执行main.py（Python解释器自身启动）
+- import:      main.py导入模块（PyQt5、asyncio、qasync等）
+- app:         创建QApplication和事件循环
+- ui:          构建主界面
+- first_paint: 显示窗口到第一次绘制完成
+- total:       从创建进程到第一次绘制完成
+
+用法: python benchmarks/bench_startup.py [--runs 10] [--output startup.json] [--real-backend]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_once(real_backend):
+    """启动一次并解析输出的阶段耗时"""
+    env = dict(os.environ)
+    env.setdefault("QT_QPA_PLATFORM", "offscreen")
+    command = [sys.executable, os.path.join(ROOT, "main.py"), "--profile-startup"]
+    if not real_backend:
+        command.append("--simulate")
+    spawned_at = time.time()
+    output = subprocess.run(
+        command, cwd=ROOT, env=env, capture_output=True, text=True, timeout=60
+    ).stdout
+    for line in output.splitlines():
+        if line.startswith("STARTUP_PROFILE "):
+            profile = json.loads(line[len("STARTUP_PROFILE "):])
+            phases = profile["phases_ms"]
+            interpreter = 1000 * (profile["wall_started_at"] - spawned_at)
+            result = {"interpreter": interpreter}
+            result.update(phases)
+            result["total"] = interpreter + phases["total"]
+            return result
+    raise RuntimeError(f"未得到启动耗时输出:\n{output}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="启动耗时测试")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--output", help="结果保存为JSON")
+    parser.add_argument("--real-backend", action="store_true", help="使用真实蓝牙后端和设备缓存启动")
+    args = parser.parse_args()
+
+    run_once(args.real_backend)  # 预热文件系统缓存和.pyc
+    runs = [run_once(args.real_backend) for _ in range(args.runs)]
+    summary = {}
+    print(f"{'阶段':<14}{'中位数':>10}{'最小':>10}{'最大':>10}")
+    for phase in runs[0]:
+        values = [run[phase] for run in runs]
+        summary[phase] = {
+            "median_ms": statistics.median(values), "min_ms": min(values), "max_ms": max(values)
+        }
+        print(f"{phase:<14}{statistics.median(values):>10.1f}{min(values):>10.1f}{max(values):>10.1f}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"runs": runs, "summary": summary}, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已保存到 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
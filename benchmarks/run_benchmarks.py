@@ -0,0 +1,299 @@
+"""
+端到端性能测试套件
+
+在无界面的offscreen Qt平台上，使用模拟手环后端测量：
+- 通知到界面的延迟：通知数据到达 -> heart_rate_update -> 悬浮窗重绘
+- 心率数据解析吞吐量（单条/批量）
+- _on_advertisement_received 处理广告数据的吞吐量
+- 连接耗时（点击连接到状态变为已连接）
+- 扫描到第一个可选设备的用时
+
+结果以JSON保存，可与另一次提交的结果对比以发现性能退化。
+
+用法:
+    python benchmarks/run_benchmarks.py --output results.json
+    python benchmarks/run_benchmarks.py --output new.json --compare results.json
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import statistics
+import subprocess
+from unittest.mock import patch
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from bench_hrs_parser import make_payloads
+
+
+class Results:
+    """收集测量结果，每个指标记录数值、单位以及越大还是越小越好"""
+
+    def __init__(self):
+        self.metrics = {}
+
+    def add(self, name, value, unit, better="lower"):
+        self.metrics[name] = {"value": value, "unit": unit, "better": better}
+        print(f"  {name:<42} {value:12.3f} {unit}")
+
+    def add_distribution(self, name, values, unit):
+        values = sorted(values)
+        self.add(f"{name}.mean", statistics.fmean(values), unit)
+        self.add(f"{name}.p50", values[len(values) // 2], unit)
+        self.add(f"{name}.p95", values[min(len(values) - 1, int(len(values) * 0.95))], unit)
+        self.add(f"{name}.max", values[-1], unit)
+
+
+def bench_parser(results, count):
+    """心率数据解析吞吐量"""
+    from hrs_parser import parse_heart_rate_measurement, parse_batch
+
+    print("解析吞吐量")
+    payloads = make_payloads(count)
+    start = time.perf_counter()
+    for payload in payloads:
+        parse_heart_rate_measurement(payload)
+    results.add("parser.single_per_s", count / (time.perf_counter() - start), "条/秒", "higher")
+    start = time.perf_counter()
+    parse_batch(payloads)
+    results.add("parser.batch_per_s", count / (time.perf_counter() - start), "条/秒", "higher")
+
+
+async def wait_for(predicate, timeout=5.0):
+    """在事件循环中等待条件满足"""
+    deadline = time.perf_counter() + timeout
+    while not predicate():
+        if time.perf_counter() > deadline:
+            raise TimeoutError("等待超时")
+        await asyncio.sleep(0.001)
+
+
+async def bench_notification_latency(results, window, samples):
+    """通知数据到达到悬浮窗重绘的延迟"""
+    from PyQt5.QtCore import QObject, QEvent
+    from PyQt5.QtWidgets import QWidget
+    import main
+
+    print("通知到界面延迟")
+    state = {"sent_at": None, "signal": [], "paint": []}
+
+    class PaintWatcher(QObject):
+        def eventFilter(self, obj, event):
+            if event.type() == QEvent.Paint and state["sent_at"] is not None:
+                state["paint"].append(1000 * (time.perf_counter() - state["sent_at"]))
+                state["sent_at"] = None
+            return False
+
+    def on_update(heart_rate):
+        if state["sent_at"] is not None:
+            state["signal"].append(1000 * (time.perf_counter() - state["sent_at"]))
+
+    # 每条通知使用不同的心率值来触发重绘，不能经过中值和变化速率过滤；
+    # 测量中途超时也要恢复，不影响后面的测试
+    with patch.object(main, "HEART_RATE_FILTER", False):
+        window.show_float_window()
+        await asyncio.sleep(0.2)
+        watcher = PaintWatcher()
+        float_window = window.float_window
+        widgets = [float_window] + float_window.findChildren(QWidget)
+        for widget in widgets:
+            widget.installEventFilter(watcher)
+        window.heart_rate_update.connect(on_update)
+        try:
+            loop = asyncio.get_running_loop()
+            for i in range(samples):
+                # 每次使用不同的心率值，确保界面确实需要重绘
+                payload = bytearray([0x16, 60 + i % 100, 0x00, 0x04])
+                state["sent_at"] = time.perf_counter()
+                loop.call_soon_threadsafe(window._heart_rate_callback, None, payload)
+                await wait_for(lambda: state["sent_at"] is None, timeout=2.0)
+                await asyncio.sleep(0.005)
+        finally:
+            window.heart_rate_update.disconnect(on_update)
+            for widget in widgets:
+                widget.removeEventFilter(watcher)
+            window.hide_float_window()
+    results.add_distribution("latency.notification_to_signal_ms", state["signal"], "ms")
+    results.add_distribution("latency.notification_to_paint_ms", state["paint"], "ms")
+
+
+async def bench_advertisements(results, window, count):
+    """_on_advertisement_received 的处理吞吐量"""
+    from simulated_device import SimulatedBand
+
+    print("广告数据处理")
+    band = SimulatedBand(advertise_heart_rate=True, seed=3)
+    advertisements = [band.advertisement() for _ in range(count)]
+    start = time.perf_counter()
+    for advertisement in advertisements:
+        window._on_advertisement_received(band.device, advertisement)
+    elapsed = time.perf_counter() - start
+    results.add("advertisement.handled_per_s", count / elapsed, "条/秒", "higher")
+    results.add("advertisement.us_per_packet", 1e6 * elapsed / count, "us")
+    await asyncio.sleep(0)
+
+
+async def bench_connect(results, window, backend, rounds):
+    """点击连接到状态变为已连接的耗时"""
+    import connection_state
+
+    print("连接耗时")
+    window.devices = [band.device for band in backend.bands]
+    window.device_combo.clear()
+    for device in window.devices:
+        window.device_combo.addItem(device.name)
+    window.device_combo.setCurrentIndex(0)
+
+    durations = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        window._on_connect_clicked()
+        await wait_for(lambda: window.is_connected)
+        durations.append(1000 * (time.perf_counter() - start))
+        window._on_disconnect_clicked()
+        await wait_for(lambda: window.connection.state == connection_state.IDLE)
+    results.add_distribution("connect.click_to_connected_ms", durations, "ms")
+
+
+async def bench_scan(results, backend, rounds):
+    """扫描到第一个可选设备的用时"""
+    import main
+    from scan_policy import FirstHrsDevicePolicy
+
+    print("扫描")
+    times = []
+    for _ in range(rounds):
+        thread = main.ScanThread(backend, FirstHrsDevicePolicy())
+        thread.start()
+        await wait_for(lambda: thread.isFinished(), timeout=main.SCAN_TIMEOUT + 2)
+        times.append(1000 * thread.time_to_first_device)
+    results.add_distribution("scan.time_to_first_device_ms", times, "ms")
+
+
+async def bench_startup_connect(results, loop, rounds):
+    """有设备缓存时，从创建主窗口到显示第一个心率值的用时（定向查找 + 连接 + 第一条通知）"""
+    import main
+    from device_cache import DeviceCache
+    from simulated_device import SimulatedBackend
+
+    print("启动自动连接")
+    times = []
+    for _ in range(rounds):
+        backend = SimulatedBackend.with_default_band(
+            count=3, notify_rate=50.0, connect_latency=0.0, advertisement_rate=100.0
+        )
+        cache = DeviceCache()
+        cache.remember(backend.bands[-1].address, backend.bands[-1].name)
+        started_at = time.perf_counter()
+        window = main.HeartRateMonitor(loop, backend, cache)
+        await wait_for(lambda: window.first_heart_rate_at is not None, timeout=main.SCAN_TIMEOUT + 5)
+        times.append(1000 * (window.first_heart_rate_at - started_at))
+        await window.connection.disconnect()
+        if window.scan_service:
+            window.scan_service.stop()
+            window.scan_service.wait()
+        window.deleteLater()
+    results.add_distribution("startup.window_to_first_heart_rate_ms", times, "ms")
+
+
+def run_gui_benchmarks(results, args):
+    """在offscreen Qt中运行需要界面的测试"""
+    from PyQt5.QtWidgets import QApplication
+    import main
+    from simulated_device import SimulatedBackend
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    loop = main.create_event_loop(app)
+    if loop is None:
+        print("未安装qasync，跳过需要界面的测试")
+        return
+    # 广告间隔10 ms时，首个设备的期望出现时间约为5 ms
+    backend = SimulatedBackend.with_default_band(
+        notify_rate=1.0, connect_latency=args.connect_latency, advertisement_rate=100.0
+    )
+    window = main.HeartRateMonitor(loop, backend)
+    window.show()
+
+    async def run_all():
+        await bench_notification_latency(results, window, args.samples)
+        await bench_advertisements(results, window, args.advertisements)
+        await bench_connect(results, window, backend, args.connect_rounds)
+        await bench_scan(results, backend, args.scan_rounds)
+        await bench_startup_connect(results, loop, args.scan_rounds)
+
+    with loop:
+        loop.run_until_complete(run_all())
+        window.hide()
+
+
+def collect_metadata():
+    """记录运行环境和当前提交，便于对比"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True
+        ).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "commit": commit,
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+    }
+
+
+def compare(current, baseline_path, threshold):
+    """与基准结果对比，返回退化的指标数量"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)["metrics"]
+    regressions = 0
+    print(f"\n与 {baseline_path} 对比（退化阈值 {threshold:.0%}）")
+    for name, metric in current.items():
+        if name not in baseline:
+            continue
+        old = baseline[name]["value"]
+        new = metric["value"]
+        if not old:
+            continue
+        change = (new - old) / old
+        worse = change > threshold if metric["better"] == "lower" else change < -threshold
+        regressions += worse
+        mark = "退化" if worse else ""
+        print(f"  {name:<42} {old:12.3f} -> {new:12.3f} ({change:+.1%}) {mark}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="端到端性能测试套件")
+    parser.add_argument("--output", help="结果JSON文件路径")
+    parser.add_argument("--compare", help="用于对比的基准结果JSON文件")
+    parser.add_argument("--threshold", type=float, default=0.2, help="视为退化的变化比例")
+    parser.add_argument("--samples", type=int, default=100, help="延迟测试的通知次数")
+    parser.add_argument("--parser-count", type=int, default=100000)
+    parser.add_argument("--advertisements", type=int, default=20000)
+    parser.add_argument("--connect-rounds", type=int, default=20)
+    parser.add_argument("--connect-latency", type=float, default=0.0, help="模拟手环的连接耗时（秒）")
+    parser.add_argument("--scan-rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    results = Results()
+    bench_parser(results, args.parser_count)
+    run_gui_benchmarks(results, args)
+
+    report = {"meta": collect_metadata(), "metrics": results.metrics}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已保存到 {args.output}")
+    if args.compare:
+        sys.exit(1 if compare(results.metrics, args.compare, args.threshold) else 0)
+
+
+if __name__ == "__main__":
+    main()
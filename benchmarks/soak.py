@@ -0,0 +1,314 @@
+"""
+加速长时间运行（浸泡）测试
+
+在无界面的offscreen Qt平台上用模拟手环驱动 HeartRateMonitor，时间按 --speedup 倍压缩
+（通知、广告频率乘以该倍数，连接时长和扫描占空比除以该倍数），反复执行：
+1. 点击"扫描"，等待扫描结束
+2. 单设备：连接 -> 显示悬浮窗并切换样式 -> 接收 --connected-seconds（压缩前）的通知 -> 断开
+3. 多设备（每 --multi-every 轮一次）：所有模拟手环加入连接池 -> 接收通知 -> 全部断开
+每 --sample-interval 秒记录一次RSS、Python对象数量和tracemalloc跟踪的内存。
+预热 --warmup-cycles 轮后记录基准（缓存、历史数据档位和Qt内部缓存在预热期间填满），
+结束时输出对象类型数量和分配位置（tracemalloc）相对基准增长最多的条目；
+任一项增长超过阈值时以非零状态退出。
+
+用法:
+    python benchmarks/soak.py --duration 600 --speedup 60 --output soak.json
+    python benchmarks/soak.py --duration 30 --max-rss-growth 5
+RSS在Linux上读取/proc/self/statm；其他平台使用峰值RSS（resource模块），Windows上不记录RSS。
+"""
+import os
+import sys
+import gc
+import json
+import time
+import asyncio
+import argparse
+import tracemalloc
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+
+def read_rss():
+    """当前进程的RSS（MB），无法读取时返回None"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss在Linux上的单位是KB，在macOS上是字节
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss / 1024 / 1024 if sys.platform == "darwin" else max_rss / 1024
+
+
+def count_objects():
+    """gc跟踪的对象总数和按类型的数量"""
+    objects = gc.get_objects()
+    return len(objects), Counter(type(obj).__name__ for obj in objects)
+
+
+async def wait_for(predicate, timeout):
+    """在事件循环中等待条件满足"""
+    deadline = time.perf_counter() + timeout
+    while not predicate():
+        if time.perf_counter() > deadline:
+            raise TimeoutError("等待超时")
+        await asyncio.sleep(0.005)
+
+
+class Sampler:
+    """定期记录内存占用，保存预热结束时的基准"""
+
+    def __init__(self, trace_filters):
+        self.trace_filters = trace_filters
+        self.started_at = time.perf_counter()
+        self.samples = []
+        self.baseline = None
+        self.baseline_types = None
+        self.baseline_snapshot = None
+        self.types = None
+
+    def sample(self, cycles, notifications, simulated_seconds):
+        gc.collect()
+        objects, types = count_objects()
+        traced, _ = tracemalloc.get_traced_memory()
+        sample = {
+            "elapsed": time.perf_counter() - self.started_at,
+            "simulated_hours": simulated_seconds / 3600,
+            "cycles": cycles,
+            "notifications": notifications,
+            "rss_mb": read_rss(),
+            "objects": objects,
+            "traced_mb": traced / 1024 / 1024,
+        }
+        self.samples.append(sample)
+        self.types = types
+        rss = f"{sample['rss_mb']:10.1f}" if sample["rss_mb"] is not None else f"{'-':>10}"
+        print(f"{sample['elapsed']:>8.0f}{sample['simulated_hours']:>10.2f}{cycles:>8}{notifications:>10}"
+              f"{rss}{objects:>10}{sample['traced_mb']:>10.2f}")
+        return sample
+
+    def set_baseline(self, *sample_args):
+        # 先保存快照，基准RSS包含快照本身占用的内存
+        self.baseline_snapshot = tracemalloc.take_snapshot().filter_traces(self.trace_filters)
+        self.baseline = self.sample(*sample_args)
+        self.baseline_types = self.types
+
+    def growth(self):
+        """最后一次记录相对基准的增长"""
+        last = self.samples[-1]
+        rss = None
+        if last["rss_mb"] is not None and self.baseline["rss_mb"] is not None:
+            rss = last["rss_mb"] - self.baseline["rss_mb"]
+        return {
+            "rss_mb": rss,
+            "objects": last["objects"] - self.baseline["objects"],
+            "traced_mb": last["traced_mb"] - self.baseline["traced_mb"],
+        }
+
+    def top_types(self, limit):
+        growth = Counter(self.types)
+        growth.subtract(self.baseline_types)
+        return [(name, count) for name, count in growth.most_common(limit) if count > 0]
+
+    def top_allocators(self, limit):
+        snapshot = tracemalloc.take_snapshot().filter_traces(self.trace_filters)
+        stats = snapshot.compare_to(self.baseline_snapshot, "lineno")
+        return [stat for stat in stats[:limit] if stat.size_diff > 0]
+
+
+async def connect_single(window, index, timeout):
+    import connection_state
+
+    window.device_combo.setCurrentIndex(index)
+    window._on_connect_clicked()
+    await wait_for(lambda: window.connection.state == connection_state.CONNECTED, timeout)
+
+
+async def disconnect_all(window, timeout):
+    import connection_state
+
+    window._on_disconnect_clicked()
+    await wait_for(
+        lambda: window.connection.state == connection_state.IDLE and not len(window.connection_pool), timeout
+    )
+
+
+async def connect_pool(window, count, timeout):
+    window.multi_device_checkbox.setChecked(True)
+    for index in range(count):
+        window.device_combo.setCurrentIndex(index)
+        window._on_connect_clicked()
+    await wait_for(lambda: len(window.connection_pool.connected_sessions()) == count, timeout)
+
+
+async def run_soak(window, backend, sampler, args):
+    """执行连接/断开/扫描循环，返回完成的轮数"""
+    import main
+
+    loop = asyncio.get_running_loop()
+    timeout = main.CLOSE_TIMEOUT + main.SCAN_TIMEOUT + 5
+    connected_for = args.connected_seconds / args.speedup
+    # 悬浮窗设置区域在第一次展开时才创建
+    window._ensure_float_settings()
+    styles = [window.style_combo.itemText(i) for i in range(window.style_combo.count())]
+    started_at = loop.time()
+    next_sample = started_at
+    cycles = 0
+
+    def notifications():
+        return sum(band.notifications_sent for band in backend.bands)
+
+    def sample_args():
+        return cycles, notifications(), (loop.time() - started_at) * args.speedup
+
+    while loop.time() - started_at < args.duration:
+        window._on_scan_clicked()
+        await wait_for(lambda: not window.is_scanning, timeout)
+        # 后台扫描的设备列表中模拟手环的顺序不固定，按地址选择
+        addresses = [device.address for device in window.devices]
+        bands = [addresses.index(band.address) for band in backend.bands if band.address in addresses]
+
+        if args.multi_every and cycles % args.multi_every == args.multi_every - 1 and len(bands) > 1:
+            await connect_pool(window, len(bands), timeout)
+            await asyncio.sleep(connected_for)
+        else:
+            window.multi_device_checkbox.setChecked(False)
+            await connect_single(window, bands[cycles % len(bands)], timeout)
+            window.show_float_window()
+            window.style_combo.setCurrentIndex(cycles % len(styles))
+            await asyncio.sleep(connected_for)
+            window.hide_float_window()
+        await disconnect_all(window, timeout)
+        cycles += 1
+
+        if cycles == args.warmup_cycles:
+            sampler.set_baseline(*sample_args())
+            next_sample = loop.time() + args.sample_interval
+        elif cycles > args.warmup_cycles and loop.time() >= next_sample:
+            sampler.sample(*sample_args())
+            next_sample = loop.time() + args.sample_interval
+
+    if sampler.baseline is None:
+        raise RuntimeError(f"运行时间内只完成 {cycles} 轮，未完成预热，请增大 --duration")
+    if sampler.samples[-1]["cycles"] != cycles:
+        sampler.sample(*sample_args())
+    return cycles
+
+
+def report(sampler, args, cycles):
+    """输出增长最多的对象类型和分配位置，返回超过阈值的项目"""
+    growth = sampler.growth()
+    print(f"\n完成 {cycles} 轮，相对预热后基准的增长:")
+    limits = {"rss_mb": args.max_rss_growth, "objects": args.max_object_growth,
+              "traced_mb": args.max_traced_growth}
+    names = {"rss_mb": "RSS(MB)", "objects": "Python对象", "traced_mb": "tracemalloc(MB)"}
+    failures = []
+    for key, limit in limits.items():
+        value = growth[key]
+        if value is None:
+            print(f"  {names[key]:<18}{'-':>10}  （未记录）")
+            continue
+        exceeded = value > limit
+        if exceeded:
+            failures.append(key)
+        print(f"  {names[key]:<18}{value:>10.2f}  阈值 {limit:g}{'  超过阈值' if exceeded else ''}")
+
+    print(f"\n对象数量增长最多的类型:")
+    for name, count in sampler.top_types(args.top):
+        print(f"  {count:>+8}  {name}")
+    print(f"\n内存增长最多的分配位置（tracemalloc）:")
+    allocators = sampler.top_allocators(args.top)
+    for stat in allocators:
+        frame = stat.traceback[0]
+        print(f"  {stat.size_diff / 1024:>+9.1f} KB {stat.count_diff:>+7}  {frame.filename}:{frame.lineno}")
+    return failures, growth, allocators
+
+
+def main():
+    parser = argparse.ArgumentParser(description="加速长时间运行测试")
+    parser.add_argument("--duration", type=float, default=120.0, help="运行时长（秒，实际时间）")
+    parser.add_argument("--speedup", type=float, default=60.0, help="时间压缩倍数")
+    parser.add_argument("--bands", type=int, default=3, help="模拟手环数量")
+    parser.add_argument("--connected-seconds", type=float, default=300.0,
+                        help="每轮保持连接的时长（秒，压缩前）")
+    parser.add_argument("--multi-every", type=int, default=3, help="每隔多少轮使用一次多设备连接，0表示不使用")
+    parser.add_argument("--warmup-cycles", type=int, default=3)
+    parser.add_argument("--sample-interval", type=float, default=10.0, help="记录间隔（秒，实际时间）")
+    parser.add_argument("--trace-frames", type=int, default=1, help="tracemalloc保存的调用栈深度")
+    parser.add_argument("--max-rss-growth", type=float, default=20.0, help="RSS增长阈值（MB）")
+    parser.add_argument("--max-object-growth", type=int, default=5000, help="Python对象数量增长阈值")
+    parser.add_argument("--max-traced-growth", type=float, default=5.0, help="tracemalloc内存增长阈值（MB）")
+    parser.add_argument("--top", type=int, default=10, help="输出增长最多的前几项")
+    parser.add_argument("--output", help="结果JSON文件路径")
+    args = parser.parse_args()
+
+    tracemalloc.start(args.trace_frames)
+    from PyQt5.QtWidgets import QApplication
+    import main
+    import scan_service
+    from device_cache import DeviceCache
+    from simulated_device import SimulatedBackend
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    loop = main.create_event_loop(app)
+    if loop is None:
+        print("未安装qasync，无法运行")
+        sys.exit(2)
+    main.AUTO_CONNECT_ON_STARTUP = False
+    # 后台扫描的占空比按相同倍数压缩
+    balanced = scan_service.DUTY_CYCLES[main.SCAN_DUTY_CYCLE or "balanced"]
+    scan_service.DUTY_CYCLES["soak"] = scan_service.DutyCycle(
+        "soak", balanced.window / args.speedup, balanced.interval / args.speedup, balanced.passive
+    )
+    main.SCAN_DUTY_CYCLE = "soak"
+    main.SCAN_TIMEOUT = max(0.5, main.SCAN_TIMEOUT / args.speedup)
+
+    backend = SimulatedBackend.with_default_band(
+        count=args.bands, notify_rate=args.speedup, advertisement_rate=args.speedup, connect_latency=0.0
+    )
+    window = main.HeartRateMonitor(loop, backend, DeviceCache())
+    window.show()
+    sampler = Sampler([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, os.path.abspath(__file__)),
+    ])
+
+    print(f"{args.bands} 个模拟手环，时间压缩 {args.speedup:g} 倍，运行 {args.duration:g} 秒")
+    print(f"{'用时(s)':>8}{'模拟(小时)':>10}{'轮数':>8}{'通知数':>10}{'RSS(MB)':>10}{'对象数':>10}{'跟踪(MB)':>10}")
+    with loop:
+        cycles = loop.run_until_complete(run_soak(window, backend, sampler, args))
+        window.hide()
+        window.close()
+    failures, growth, allocators = report(sampler, args, cycles)
+
+    if args.output:
+        result = {
+            "args": vars(args),
+            "cycles": cycles,
+            "samples": sampler.samples,
+            "growth": growth,
+            "failures": failures,
+            "top_types": sampler.top_types(args.top),
+            "top_allocators": [
+                {"location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                 "size_diff": stat.size_diff, "count_diff": stat.count_diff}
+                for stat in allocators
+            ],
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已保存到 {args.output}")
+    if failures:
+        print("\n内存增长超过阈值")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,481 @@
+"""
+独立的蓝牙工作进程
+
+扫描和连接运行在单独的进程中（独立的解释器、GIL和asyncio事件循环），
+GUI进程中的重绘、布局和模态对话框都不会推迟蓝牙回调，样本时间戳在工作进程收到通知时记录：
+- 样本写入共享内存中的环形缓冲区（SharedSampleRing），GUI按显示刷新率读取，不经过序列化
+- 命令（扫描、连接、断开、退出）和事件（发现设备、广告数据、连接状态）各走一条单向Pipe
+- 工作进程崩溃或被结束时GUI不受影响：BleWorkerProcess.poll()发现进程退出后重新启动，并恢复之前的连接
+
+共享内存由GUI进程创建和释放，工作进程重启后继续使用同一块缓冲区。
+本模块不依赖Qt，工作进程中也不创建任何Qt对象。
+"""
+import sys
+import signal
+import struct
+import asyncio
+import multiprocessing
+from multiprocessing import shared_memory
+
+from connection_pool import ConnectionPool
+from reconnect import ReconnectPolicy
+from advertisement_filter import AdvertisementFilter
+from hrs_parser import find_hrs_service_data, is_hrs_advertisement
+from scan_policy import ScanStopPolicy
+import metrics
+
+# 扫描时长（秒）
+SCAN_TIMEOUT = 5.0
+
+# 退出时等待工作进程断开连接的最长时间（秒），超时后强制结束进程
+SHUTDOWN_TIMEOUT = 5.0
+
+# 工作进程连续异常退出的最大重启次数（连接成功后重新计数）
+MAX_RESTARTS = 5
+
+# 每个样本最多携带的RR间期个数（1 Hz通知时通常只有1~2个）
+MAX_RR_PER_SAMPLE = 4
+
+# 一个工作进程最多分配的设备序号数（样本记录中设备序号为16位）
+MAX_DEVICE_INDEXES = 0x10000
+
+# 共享内存布局：128字节的头部 + 定长样本记录
+# 写指针只由工作进程修改，读指针只由GUI进程修改，两者放在不同的缓存行
+_HEADER_SIZE = 128
+_WRITE_OFFSET = 0
+_OVERRUNS_OFFSET = 8
+_CAPACITY_OFFSET = 16
+_READ_OFFSET = 64
+_INDEX = struct.Struct("<Q")
+# 时间戳, 心率, 接触状态(-1未知/0/1), 设备序号, RR间期个数, RR间期(1/1024秒)
+_RECORD = struct.Struct(f"<dHbxHBx{MAX_RR_PER_SAMPLE}H")
+_CONTACT_CODES = {None: -1, False: 0, True: 1}
+_CONTACT_VALUES = {-1: None, 0: False, 1: True}
+
+
+class SharedSampleRing:
+    """共享内存中的单生产者/单消费者心率样本环形缓冲区
+
+    与SampleRingBuffer相同，生产者只修改写指针，消费者只修改读指针，不加锁；
+    样本记录写完之后才移动写指针。
+    """
+
+    def __init__(self, capacity=4096, name=None):
+        if name is None:
+            # 容量取2的幂，便于用位运算计算下标
+            size = 1
+            while size < capacity:
+                size <<= 1
+            self._shm = shared_memory.SharedMemory(create=True, size=_HEADER_SIZE + size * _RECORD.size)
+            self._shm.buf[:_HEADER_SIZE] = bytes(_HEADER_SIZE)
+            _INDEX.pack_into(self._shm.buf, _CAPACITY_OFFSET, size)
+            self.owner = True
+        else:
+            self._shm = _attach_shared_memory(name)
+            size = _INDEX.unpack_from(self._shm.buf, _CAPACITY_OFFSET)[0]
+            self.owner = False
+        self.capacity = size
+        self._mask = size - 1
+        self._buffer = self._shm.buf
+
+    @classmethod
+    def attach(cls, name):
+        """在其他进程中按名称打开已创建的缓冲区"""
+        return cls(name=name)
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    @property
+    def overruns(self):
+        """缓冲区已满时被丢弃的样本数"""
+        return _INDEX.unpack_from(self._buffer, _OVERRUNS_OFFSET)[0]
+
+    def push(self, timestamp, heart_rate, sensor_contact=None, device_index=0, rr_intervals=()):
+        """写入一个样本（工作进程调用），缓冲区已满时返回False"""
+        buffer = self._buffer
+        write_index = _INDEX.unpack_from(buffer, _WRITE_OFFSET)[0]
+        if write_index - _INDEX.unpack_from(buffer, _READ_OFFSET)[0] >= self.capacity:
+            _INDEX.pack_into(buffer, _OVERRUNS_OFFSET, self.overruns + 1)
+            return False
+        rr_units = [min(0xFFFF, int(round(rr * 1.024))) for rr in rr_intervals[:MAX_RR_PER_SAMPLE]]
+        count = len(rr_units)
+        rr_units.extend([0] * (MAX_RR_PER_SAMPLE - count))
+        _RECORD.pack_into(
+            buffer, _HEADER_SIZE + (write_index & self._mask) * _RECORD.size,
+            timestamp, heart_rate, _CONTACT_CODES[sensor_contact], device_index, count, *rr_units
+        )
+        # 数据写完后再移动写指针，GUI进程才能看到这个样本
+        _INDEX.pack_into(buffer, _WRITE_OFFSET, write_index + 1)
+        return True
+
+    def drain(self, max_samples=None):
+        """取出所有未读样本（GUI进程调用）
+
+        返回[(时间戳, 心率, 接触状态, 设备序号, RR间期元组(毫秒)), ...]
+        """
+        buffer = self._buffer
+        read_index = _INDEX.unpack_from(buffer, _READ_OFFSET)[0]
+        available = _INDEX.unpack_from(buffer, _WRITE_OFFSET)[0] - read_index
+        if max_samples is not None and available > max_samples:
+            available = max_samples
+        samples = []
+        unpack_from = _RECORD.unpack_from
+        for index in range(read_index, read_index + available):
+            record = unpack_from(buffer, _HEADER_SIZE + (index & self._mask) * _RECORD.size)
+            timestamp, heart_rate, contact, device_index, count = record[:5]
+            rr_intervals = tuple(units * 1000 / 1024 for units in record[5:5 + count])
+            samples.append((timestamp, heart_rate, _CONTACT_VALUES[contact], device_index, rr_intervals))
+        _INDEX.pack_into(buffer, _READ_OFFSET, read_index + available)
+        return samples
+
+    def __len__(self):
+        """当前未读样本数"""
+        buffer = self._buffer
+        return _INDEX.unpack_from(buffer, _WRITE_OFFSET)[0] - _INDEX.unpack_from(buffer, _READ_OFFSET)[0]
+
+    def close(self):
+        self._buffer = None
+        self._shm.close()
+
+    def unlink(self):
+        """释放共享内存（只由创建者调用）"""
+        self._shm.unlink()
+
+
+def _attach_shared_memory(name):
+    """打开已有的共享内存，释放只由创建者负责"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python 3.13之前没有track参数；工作进程与GUI进程共用同一个resource_tracker，重复登记不会提前释放
+        return shared_memory.SharedMemory(name=name)
+
+
+class RemoteDevice:
+    """工作进程中设备在GUI进程中的代表（只有地址和名称）"""
+    __slots__ = ("address", "name")
+
+    def __init__(self, address, name):
+        self.address = address
+        self.name = name
+
+    def __repr__(self):
+        return f"RemoteDevice({self.address!r}, {self.name!r})"
+
+
+class RemoteAdvertisement:
+    """工作进程转发的广告数据（只保留HRS相关的字段）"""
+    __slots__ = ("rssi", "service_uuids", "service_data")
+
+    def __init__(self, rssi, service_uuids, service_data):
+        self.rssi = rssi
+        self.service_uuids = service_uuids
+        self.service_data = service_data
+
+
+class _WorkerService:
+    """工作进程内的命令处理：扫描、连接池和样本写入"""
+
+    def __init__(self, commands, events, ring, backend, auto_reconnect=True):
+        self.commands = commands
+        self.events = events
+        self.ring = ring
+        self.backend = backend
+        policy = ReconnectPolicy() if auto_reconnect else ReconnectPolicy(max_attempts=0)
+        self.connection_pool = ConnectionPool(
+            on_sample=self._on_sample, on_status=self._on_status, backend=backend,
+            reconnect_policy=policy,
+        )
+        self.devices = {}  # key: device address, value: 扫描到的设备对象
+        self.device_indexes = {}  # key: device address, value: 样本记录中的设备序号
+        self.scan_task = None
+        self.connect_tasks = set()
+
+    def _send(self, *event):
+        try:
+            self.events.send(event)
+        except (OSError, ValueError):
+            pass  # GUI进程已退出，命令循环会读到EOF
+
+    def _device_index(self, address):
+        """设备地址对应的序号，序号不回收，用完时抛出RuntimeError而不是与已有设备重复"""
+        index = self.device_indexes.get(address)
+        if index is None:
+            if len(self.device_indexes) >= MAX_DEVICE_INDEXES:
+                raise RuntimeError(f"设备序号已用完（最多 {MAX_DEVICE_INDEXES} 个设备）")
+            index = self.device_indexes[address] = len(self.device_indexes)
+        return index
+
+    def _send_status(self, address, status, connected):
+        self._send("status", address, self._device_index(address), status, connected)
+
+    def _on_status(self, session, status, connected):
+        self._send_status(session.address, status, connected)
+
+    def _on_sample(self, session, timestamp, heart_rate):
+        measurement = session.last_measurement
+        if not self.ring.push(
+            timestamp, heart_rate, measurement.sensor_contact,
+            self._device_index(session.address), measurement.rr_intervals,
+        ):
+            metrics.SAMPLES_DROPPED.inc()
+
+    async def run(self):
+        """按顺序处理GUI进程的命令，直到收到stop或GUI进程退出"""
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                command = await loop.run_in_executor(None, self.commands.recv)
+            except (EOFError, OSError):
+                print("GUI进程已退出，蓝牙进程结束")
+                break
+            name, args = command[0], command[1:]
+            if name == "stop":
+                break
+            if name == "scan":
+                if self.scan_task is not None and not self.scan_task.done():
+                    self.scan_task.cancel()
+                self.scan_task = asyncio.ensure_future(self._scan(*args))
+            elif name == "connect":
+                task = asyncio.ensure_future(self._connect(*args))
+                self.connect_tasks.add(task)
+                task.add_done_callback(self.connect_tasks.discard)
+            elif name == "disconnect":
+                self._cancel_connects()
+                await self.connection_pool.close_all()
+                self._send("disconnected")
+        await self._shutdown()
+
+    def _cancel_connects(self):
+        for task in list(self.connect_tasks):
+            task.cancel()
+
+    async def _shutdown(self):
+        if self.scan_task is not None:
+            self.scan_task.cancel()
+        self._cancel_connects()
+        try:
+            await asyncio.wait_for(self.connection_pool.close_all(), SHUTDOWN_TIMEOUT)
+        except Exception as e:
+            print(f"蓝牙进程退出时断开连接失败: {str(e)}")
+
+    async def _scan(self, stop_policy=None, timeout=SCAN_TIMEOUT):
+        """扫描设备，发现的设备和过滤后的HRS广告数据发送给GUI进程"""
+        stop_policy = stop_policy or ScanStopPolicy()
+        advertisement_filter = AdvertisementFilter()
+        hrs_addresses = set()
+        seen = set()
+        stop_event = asyncio.Event()
+
+        def callback(device, advertisement_data):
+            is_hrs = is_hrs_advertisement(advertisement_data)
+            self.devices[device.address] = device
+            if device.address not in seen or (is_hrs and device.address not in hrs_addresses):
+                seen.add(device.address)
+                if is_hrs:
+                    hrs_addresses.add(device.address)
+                self._send("device", device.address, device.name, is_hrs)
+            metrics.ADVERTISEMENTS_RECEIVED.inc()
+            if advertisement_filter.accept(device, advertisement_data, is_hrs):
+                metrics.ADVERTISEMENTS_FORWARDED.inc()
+                self._send(
+                    "advertisement", device.address, getattr(advertisement_data, "rssi", None), is_hrs,
+                    find_hrs_service_data(getattr(advertisement_data, "service_data", None)),
+                )
+            if stop_policy.should_stop(device, advertisement_data, is_hrs):
+                stop_event.set()
+
+        try:
+            scanner = self.backend.create_scanner(callback)
+            await scanner.start()
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                await scanner.stop()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"扫描过程中发生错误: {str(e)}")
+            self._send("scan_failed", str(e))
+            return
+        self._send("scan_finished")
+
+    async def _connect(self, address, exclusive=True):
+        """连接设备；exclusive为True时先断开其他设备。未扫描到过的地址先按地址查找"""
+        # 先分配设备序号，之后的状态和样本都能带上序号
+        try:
+            self._device_index(address)
+        except RuntimeError as e:
+            print(f"无法连接设备 {address}: {str(e)}")
+            return
+        if exclusive:
+            for other in list(self.connection_pool.sessions):
+                if other != address:
+                    await self.connection_pool.remove(other)
+        device = self.devices.get(address)
+        if device is None:
+            self._send_status(address, "正在查找设备...", False)
+            device = await self._find_device(address)
+            if device is None:
+                self._send_status(address, "未找到设备", False)
+                return
+        await self.connection_pool.add(device)
+
+    async def _find_device(self, address):
+        """扫描直到指定地址出现（工作进程重启后设备对象需要重新获取）"""
+        found = asyncio.Event()
+
+        def callback(device, advertisement_data):
+            if device.address.upper() == address.upper():
+                self.devices[address] = device
+                found.set()
+
+        scanner = self.backend.create_scanner(callback)
+        await scanner.start()
+        try:
+            await asyncio.wait_for(found.wait(), SCAN_TIMEOUT)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            await scanner.stop()
+        return self.devices.get(address)
+
+
+def worker_main(commands, events, ring_name, backend, auto_reconnect=True):
+    """工作进程入口"""
+    # Ctrl+C由GUI进程处理，工作进程等待stop命令或GUI进程退出
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    ring = SharedSampleRing.attach(ring_name)
+    try:
+        asyncio.run(_WorkerService(commands, events, ring, backend, auto_reconnect).run())
+    finally:
+        ring.close()
+
+
+class BleWorkerProcess:
+    """在GUI进程中管理蓝牙工作进程：发送命令、读取事件和样本、异常退出后重启"""
+
+    def __init__(self, backend, capacity=4096, auto_reconnect=True, max_restarts=MAX_RESTARTS):
+        self.backend = backend
+        self.auto_reconnect = auto_reconnect
+        self.max_restarts = max_restarts
+        self.ring = SharedSampleRing(capacity)
+        self.process = None
+        self._commands = None
+        self._events = None
+        # 连续异常退出次数，有设备连接成功后清零
+        self.restarts = 0
+        self.failed = False
+        self._stopping = False
+        # 需要保持连接的设备地址，工作进程重启后按顺序重新连接
+        self.wanted_addresses = []
+        self.addresses = {}  # key: 样本记录中的设备序号, value: device address
+        self.connected = {}  # key: device address, value: 是否已连接
+
+    def start(self):
+        """启动工作进程（spawn方式，不继承GUI进程的线程和Qt状态）"""
+        context = multiprocessing.get_context("spawn")
+        commands_reader, self._commands = context.Pipe(duplex=False)
+        self._events, events_writer = context.Pipe(duplex=False)
+        self.process = context.Process(
+            target=worker_main, name="XiaomiHype-BLE", daemon=True,
+            args=(commands_reader, events_writer, self.ring.name, self.backend, self.auto_reconnect),
+        )
+        self.process.start()
+        # 子进程已持有副本，关闭本进程中的另一端
+        commands_reader.close()
+        events_writer.close()
+        return self
+
+    def _send(self, *command):
+        try:
+            self._commands.send(command)
+        except (OSError, ValueError, AttributeError):
+            pass  # 工作进程已退出，下一次poll()时重启
+
+    def scan(self, stop_policy=None, timeout=SCAN_TIMEOUT):
+        self._send("scan", stop_policy, timeout)
+
+    def connect(self, address, exclusive=True):
+        if exclusive:
+            self.wanted_addresses.clear()
+        if address not in self.wanted_addresses:
+            self.wanted_addresses.append(address)
+        self._send("connect", address, exclusive)
+
+    def disconnect(self):
+        self.wanted_addresses.clear()
+        self._send("disconnect")
+
+    def address_for(self, device_index):
+        return self.addresses.get(device_index, "")
+
+    def connected_count(self):
+        return sum(1 for connected in self.connected.values() if connected)
+
+    def drain(self, max_samples=None):
+        return self.ring.drain(max_samples)
+
+    def poll(self):
+        """读取工作进程发来的事件；进程异常退出时重启并恢复连接，返回事件列表"""
+        events = []
+        try:
+            while self._events is not None and self._events.poll():
+                events.append(self._events.recv())
+        except (EOFError, OSError):
+            pass
+        for event in events:
+            if event[0] == "status":
+                _, address, index, _, connected = event
+                self.addresses[index] = address
+                self.connected[address] = connected
+                if connected:
+                    self.restarts = 0
+            elif event[0] == "disconnected":
+                self.connected.clear()
+        if not self._stopping and self.process is not None and not self.process.is_alive():
+            events.append(self._restart())
+        return events
+
+    def _restart(self):
+        exitcode = self.process.exitcode
+        self.process = None
+        self._close_pipes()
+        self.connected.clear()
+        print(f"蓝牙进程异常退出 (退出码 {exitcode})", file=sys.stderr)
+        if self.restarts >= self.max_restarts:
+            self.failed = True
+            return ("worker_failed", exitcode)
+        self.restarts += 1
+        self.start()
+        for position, address in enumerate(self.wanted_addresses):
+            self._send("connect", address, position == 0)
+        print(f"蓝牙进程已重启（第{self.restarts}次）")
+        return ("worker_restarted", exitcode, self.restarts)
+
+    def _close_pipes(self):
+        for connection in (self._commands, self._events):
+            if connection is not None:
+                connection.close()
+        self._commands = self._events = None
+
+    def stop(self, timeout=SHUTDOWN_TIMEOUT):
+        """让工作进程断开连接并退出，超时后强制结束，然后释放共享内存"""
+        self._stopping = True
+        if self.process is not None:
+            self._send("stop")
+            self.process.join(timeout + 1)
+            if self.process.is_alive():
+                print("蓝牙进程未在限定时间内退出，强制结束")
+                self.process.terminate()
+                self.process.join(1)
+            self.process = None
+        self._close_pipes()
+        if self.ring.overruns:
+            print(f"共享样本缓冲区溢出 {self.ring.overruns} 次")
+        self.ring.close()
+        self.ring.unlink()
@@ -0,0 +1,172 @@
+"""
+独立的蓝牙I/O线程
+
+BleakClient和心率数据解析都运行在该线程自己的asyncio事件循环中，
+解析结果写入SampleRingBuffer，由GUI线程按显示刷新率读取。
+界面重绘或模态对话框卡顿时，数据接收不受影响。
+"""
+import time
+import asyncio
+import threading
+from PyQt5.QtCore import QThread, pyqtSignal
+from device_backend import BleakBackend
+from hrs_parser import HEART_RATE_CHAR_UUID, HrsParseError, parse_heart_rate_measurement
+from reconnect import ReconnectPolicy, RecoveryTracker, reconnect_with_backoff
+from connection_state import release_client
+import metrics
+
+
+# 线程退出时断开连接的最长等待时间（秒）
+SHUTDOWN_TIMEOUT = 5.0
+
+
+class BleWorkerThread(QThread):
+    """运行蓝牙连接和心率解析的后台线程"""
+    connection_status = pyqtSignal(str, bool)
+
+    def __init__(self, sample_buffer, backend=None, auto_reconnect=True, parent=None):
+        super().__init__(parent)
+        self.sample_buffer = sample_buffer
+        self.backend = backend or BleakBackend()
+        self.loop = None
+        self.client = None
+        # 设备意外断开后自动重连
+        self.auto_reconnect = auto_reconnect
+        self.reconnect_policy = ReconnectPolicy()
+        self.recovery = RecoveryTracker()
+        self._reconnect_task = None
+        self.parse_errors = 0
+        self.notification_intervals = metrics.IntervalTracker(
+            metrics.NOTIFICATION_INTERVAL, metrics.NOTIFICATION_JITTER
+        )
+        self._loop_ready = threading.Event()
+
+    def run(self):
+        """运行线程内的事件循环，直到stop()被调用"""
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self._loop_ready.set()
+        try:
+            self.loop.run_forever()
+            self._cancel_reconnect()
+            # 退出前尽量断开连接，但不无限等待
+            try:
+                self.loop.run_until_complete(
+                    asyncio.wait_for(self._release_client(), SHUTDOWN_TIMEOUT)
+                )
+            except Exception as e:
+                print(f"退出时断开连接失败: {str(e)}")
+        finally:
+            self.loop.close()
+
+    def _submit(self, coro):
+        """把协程提交到线程内的事件循环执行"""
+        self._loop_ready.wait()
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def connect_device(self, device):
+        """连接设备（可在任意线程调用）"""
+        return self._submit(self._connect_to_device(device))
+
+    def disconnect_device(self):
+        """断开当前设备（可在任意线程调用）"""
+        return self._submit(self._disconnect_device())
+
+    def stop(self):
+        """请求线程退出"""
+        if self._loop_ready.is_set() and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+
+    async def _connect_to_device(self, device):
+        """在I/O线程中连接设备并启动心率通知（用户发起的连接）"""
+        self._cancel_reconnect()
+        self.recovery.reset()
+        await self._release_client()
+        await self._open_client(device)
+
+    async def _open_client(self, device):
+        """创建客户端、连接并启动心率通知，成功返回True"""
+        started_at = time.perf_counter()
+        client = None
+        try:
+            self.connection_status.emit("连接中...", False)
+            client = self.client = self.backend.create_client(
+                device, timeout=20.0,
+                disconnected_callback=lambda client: self._on_disconnected(client, device),
+            )
+            await client.connect()
+            if client.is_connected:
+                self.notification_intervals.reset()
+                await client.start_notify(HEART_RATE_CHAR_UUID, self._heart_rate_callback)
+                metrics.CONNECT_DURATION.observe(time.perf_counter() - started_at)
+                self.recovery.on_recovered()
+                self.connection_status.emit("已连接", True)
+                print(f"成功连接到设备 {device.address}，已启动心率通知（独立I/O线程）")
+                return True
+            metrics.CONNECT_FAILURES.inc()
+            self.connection_status.emit("连接失败", False)
+        except Exception as e:
+            metrics.CONNECT_FAILURES.inc()
+            print(f"连接设备时发生错误: {str(e)}")
+            # 已连接但启动通知失败时断开连接，避免泄漏
+            if self.client is client:
+                self.client = None
+            if client is not None:
+                await release_client(client)
+            self.connection_status.emit(f"连接失败: {str(e)}", False)
+        return False
+
+    def _on_disconnected(self, client, device):
+        """设备意外断开时由bleak调用（I/O线程），只有重连取决于auto_reconnect"""
+        if client is not self.client:
+            return
+        self.client = None
+        self.recovery.on_disconnected()
+        self.connection_status.emit("连接已断开", False)
+        if not self.auto_reconnect:
+            return
+        if self._reconnect_task is None or self._reconnect_task.done():
+            self._reconnect_task = asyncio.ensure_future(self._reconnect(device))
+
+    async def _reconnect(self, device):
+        """用同一个设备对象按退避策略重连，不重新扫描"""
+        def on_attempt(attempt):
+            self.connection_status.emit(f"重连中 (第{attempt}次)", False)
+
+        await reconnect_with_backoff(
+            lambda: self._open_client(device), self.reconnect_policy, on_attempt=on_attempt
+        )
+
+    def _cancel_reconnect(self):
+        if self._reconnect_task is not None and not self._reconnect_task.done():
+            self._reconnect_task.cancel()
+        self._reconnect_task = None
+
+    async def _disconnect_device(self):
+        """在I/O线程中断开设备"""
+        self._cancel_reconnect()
+        await self._release_client()
+        self.connection_status.emit("未连接", False)
+
+    async def _release_client(self):
+        """停止通知并断开当前客户端"""
+        client = self.client
+        self.client = None
+        if client is not None:
+            await release_client(client)
+
+    def _heart_rate_callback(self, sender, data):
+        """心率数据回调函数，在I/O线程中解析并写入环形缓冲区"""
+        metrics.NOTIFICATIONS_RECEIVED.inc()
+        self.notification_intervals.tick(time.perf_counter())
+        try:
+            measurement = parse_heart_rate_measurement(data)
+        except HrsParseError:
+            self.parse_errors += 1
+            metrics.PARSE_ERRORS.inc()
+            return
+        self.recovery.on_sample()
+        if not self.sample_buffer.push(
+            time.time(), measurement.heart_rate, measurement.sensor_contact, measurement.rr_intervals
+        ):
+            metrics.SAMPLES_DROPPED.inc()
@@ -0,0 +1,375 @@
+"""
+本地心率广播服务
+
+在asyncio事件循环中提供本地TCP和WebSocket服务，把每个心率样本推送给所有订阅者
+（直播叠加层、浏览器源、本地工具等）。本模块不依赖Qt。
+消息为JSON，TCP每行一条，WebSocket每帧一条:
+    {"t": 时间戳(秒), "address": 设备地址, "hr": 心率, "contact": 接触状态或null, "rr": [RR间期(毫秒)...]}
+
+发布样本时不做任何网络I/O：消息只编码一次，追加到每个订阅者的有界队列后立即返回，
+随后在一次事件循环回调中统一写给所有订阅者。内核发送缓冲区已满的订阅者暂停写入，
+由它自己的发送任务等待缓冲区腾出空间，期间新消息留在队列中，慢订阅者不会拖慢蓝牙数据路径。
+队列写满时按溢出策略处理：
+- "drop_oldest": 丢弃最旧的消息，只保留最近的max_queue条；持续写满超过stall_timeout秒后断开
+- "disconnect":  立即断开
+每个订阅者的队列深度、最大深度、已发送和已丢弃的消息数可通过client_stats()和指标端点查看。
+"""
+import time
+import json
+import base64
+import socket
+import asyncio
+import hashlib
+from struct import Struct
+from collections import deque
+import metrics
+
+OVERFLOW_DROP_OLDEST = "drop_oldest"
+OVERFLOW_DISCONNECT = "disconnect"
+
+PROTOCOL_TCP = "tcp"
+PROTOCOL_WEBSOCKET = "websocket"
+
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+WEBSOCKET_OPCODE_TEXT = 0x1
+WEBSOCKET_OPCODE_CLOSE = 0x8
+WEBSOCKET_OPCODE_PING = 0x9
+WEBSOCKET_OPCODE_PONG = 0xA
+# 订阅者发来的帧只处理控制帧，超过该长度视为异常连接
+WEBSOCKET_MAX_CLIENT_FRAME = 64 * 1024
+_UINT16_BE = Struct("!H")
+_UINT64_BE = Struct("!Q")
+
+BROADCAST_SUBSCRIBERS = metrics.REGISTRY.gauge(
+    "xiaomihype_broadcast_subscribers", "当前连接的广播订阅者数")
+BROADCAST_MESSAGES_PUBLISHED = metrics.REGISTRY.counter(
+    "xiaomihype_broadcast_messages_published_total", "广播的心率样本数")
+BROADCAST_MESSAGES_DROPPED = metrics.REGISTRY.counter(
+    "xiaomihype_broadcast_messages_dropped_total", "订阅者队列已满被丢弃的消息数")
+BROADCAST_SLOW_DISCONNECTS = metrics.REGISTRY.counter(
+    "xiaomihype_broadcast_slow_disconnects_total", "因读取过慢被断开的订阅者数")
+
+
+class _QueueDepthGauge:
+    """每个订阅者的队列深度（按client标签输出）"""
+    kind = "gauge"
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self.servers = []
+
+    def samples(self):
+        for server in tuple(self.servers):
+            for subscriber in tuple(server.subscribers):
+                yield (
+                    f'{self.name}{{client="{subscriber.peer}",protocol="{subscriber.protocol}"}}',
+                    len(subscriber.queue),
+                )
+
+
+BROADCAST_QUEUE_DEPTH = metrics.REGISTRY.register(_QueueDepthGauge(
+    "xiaomihype_broadcast_queue_depth", "广播订阅者待发送的消息数"))
+
+
+def sample_to_json(timestamp, address, heart_rate, sensor_contact=None, rr_intervals=()):
+    """把一个样本编码为一行JSON（不含换行）"""
+    return json.dumps({
+        "t": round(timestamp, 3),
+        "address": address,
+        "hr": heart_rate,
+        "contact": sensor_contact,
+        "rr": [round(rr, 1) for rr in rr_intervals],
+    }, ensure_ascii=False, separators=(",", ":"))
+
+
+def websocket_frame(payload, opcode=WEBSOCKET_OPCODE_TEXT):
+    """编码一个服务端到客户端的WebSocket帧（不加掩码，FIN=1）"""
+    length = len(payload)
+    if length < 126:
+        header = bytes((0x80 | opcode, length))
+    elif length < 0x10000:
+        header = bytes((0x80 | opcode, 126)) + _UINT16_BE.pack(length)
+    else:
+        header = bytes((0x80 | opcode, 127)) + _UINT64_BE.pack(length)
+    return header + payload
+
+
+def websocket_accept_key(key):
+    """握手响应中的Sec-WebSocket-Accept"""
+    digest = hashlib.sha1((key + WEBSOCKET_GUID).encode("ascii")).digest()
+    return base64.b64encode(digest).decode("ascii")
+
+
+class Subscriber:
+    """一个订阅者连接：有界消息队列，发送缓冲区满时由发送任务等待腾出空间"""
+
+    def __init__(self, server, reader, writer, protocol):
+        self.server = server
+        self.reader = reader
+        self.writer = writer
+        self.transport = writer.transport
+        self.protocol = protocol
+        peer = writer.get_extra_info("peername")
+        self.peer = f"{peer[0]}:{peer[1]}" if isinstance(peer, tuple) else str(peer)
+        self.queue = deque()
+        self.max_queue_depth = 0
+        self.sent = 0
+        self.dropped = 0
+        self.closed = False
+        self.close_reason = None
+        self._full_since = None
+        sock = writer.get_extra_info("socket")
+        if sock is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            if server.send_buffer_size:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, server.send_buffer_size)
+        if server.send_buffer_size:
+            self.transport.set_write_buffer_limits(high=server.send_buffer_size)
+        # 传输层缓冲超过高水位（内核发送缓冲区已满）时暂停写入，等待发送任务腾出空间
+        self._high_water = self.transport.get_write_buffer_limits()[1]
+        self._draining = False
+        self._wakeup = asyncio.Event()
+        self._sender = None
+
+    def offer(self, message, now):
+        """把消息放入队列，不做网络I/O"""
+        if self.closed:
+            return
+        queue = self.queue
+        if len(queue) >= self.server.max_queue:
+            if self.server.overflow == OVERFLOW_DISCONNECT:
+                self.close("队列已满")
+                return
+            queue.popleft()
+            self.dropped += 1
+            BROADCAST_MESSAGES_DROPPED.inc()
+            if self._full_since is None:
+                self._full_since = now
+            elif now - self._full_since >= self.server.stall_timeout:
+                self.close("读取过慢")
+                return
+        queue.append(message)
+        if len(queue) > self.max_queue_depth:
+            self.max_queue_depth = len(queue)
+
+    def flush(self):
+        """把队列中的消息交给传输层（非阻塞）"""
+        if self._draining or self.closed:
+            return
+        queue = self.queue
+        transport = self.transport
+        while queue:
+            transport.write(queue.popleft())
+            self.sent += 1
+        self._full_since = None
+        if transport.get_write_buffer_size() > self._high_water:
+            self._draining = True
+            self._wakeup.set()
+
+    async def run(self):
+        """发送队列中的消息，直到连接关闭"""
+        self._sender = asyncio.ensure_future(self._send_loop())
+        try:
+            if self.protocol == PROTOCOL_WEBSOCKET:
+                await self._read_websocket()
+            else:
+                # TCP订阅者不需要发送数据，读到EOF表示对方已关闭
+                while await self.reader.read(4096):
+                    pass
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.close()
+            self._sender.cancel()
+            await asyncio.gather(self._sender, return_exceptions=True)
+
+    async def _send_loop(self):
+        """等待发送缓冲区腾出空间后继续写出队列中的消息"""
+        try:
+            while not self.closed:
+                await self._wakeup.wait()
+                self._wakeup.clear()
+                # 期间新消息在有界队列中累积，写满后按溢出策略处理
+                await self.writer.drain()
+                self._draining = False
+                self.flush()
+        except (ConnectionError, RuntimeError):
+            self.close()
+
+    async def _read_websocket(self):
+        """处理订阅者发来的帧：回应ping，收到close后关闭"""
+        reader = self.reader
+        while True:
+            first, second = await reader.readexactly(2)
+            opcode = first & 0x0F
+            length = second & 0x7F
+            if length == 126:
+                (length,) = _UINT16_BE.unpack(await reader.readexactly(2))
+            elif length == 127:
+                (length,) = _UINT64_BE.unpack(await reader.readexactly(8))
+            if length > WEBSOCKET_MAX_CLIENT_FRAME:
+                return
+            mask = await reader.readexactly(4) if second & 0x80 else b"\x00\x00\x00\x00"
+            payload = bytes(b ^ mask[i & 3] for i, b in enumerate(await reader.readexactly(length)))
+            if opcode == WEBSOCKET_OPCODE_CLOSE:
+                self.writer.write(websocket_frame(payload[:2], WEBSOCKET_OPCODE_CLOSE))
+                return
+            if opcode == WEBSOCKET_OPCODE_PING:
+                # 控制帧直接写出，不进入可能被丢弃的消息队列
+                self.writer.write(websocket_frame(payload, WEBSOCKET_OPCODE_PONG))
+
+    def close(self, reason=None):
+        """关闭连接（可重复调用）"""
+        if self.closed:
+            return
+        self.closed = True
+        self.close_reason = reason
+        if reason is not None:
+            BROADCAST_SLOW_DISCONNECTS.inc()
+            print(f"广播订阅者 {self.peer} 已断开: {reason}，丢弃 {self.dropped} 条消息")
+        self._wakeup.set()
+        self.writer.close()
+        self.server._remove(self)
+
+    def stats(self):
+        return {
+            "peer": self.peer,
+            "protocol": self.protocol,
+            "queue_depth": len(self.queue),
+            "max_queue_depth": self.max_queue_depth,
+            "sent": self.sent,
+            "dropped": self.dropped,
+        }
+
+
+class BroadcastServer:
+    """本地TCP / WebSocket心率广播服务"""
+
+    def __init__(self, port=9465, websocket_port=None, host="127.0.0.1", max_queue=64,
+                 overflow=OVERFLOW_DROP_OLDEST, stall_timeout=10.0, send_buffer_size=None,
+                 clock=time.monotonic):
+        if overflow not in (OVERFLOW_DROP_OLDEST, OVERFLOW_DISCONNECT):
+            raise ValueError(f"未知的溢出策略: {overflow}")
+        self.host = host
+        # 端口为None表示不启动该协议，为0时由系统分配（启动后可从port/websocket_port读取）
+        self.port = port
+        self.websocket_port = websocket_port
+        self.max_queue = max_queue
+        self.overflow = overflow
+        self.stall_timeout = stall_timeout
+        # 每个订阅者的内核发送缓冲区和传输层缓冲上限（字节），None表示使用系统默认值；
+        # 调小后读得慢的订阅者更早进入丢弃旧消息的流程，收到的数据更新，而不是积压在缓冲区中
+        self.send_buffer_size = send_buffer_size
+        self.clock = clock
+        self.subscribers = set()
+        self.messages_published = 0
+        self._flush_scheduled = False
+        self._loop = None
+        self._servers = []
+        self._tasks = set()
+
+    async def start(self):
+        """开始监听，返回self"""
+        # 记下事件循环：QTimer驱动事件循环时，publish()在Qt定时器回调中调用，此时没有正在运行的循环
+        self._loop = asyncio.get_running_loop()
+        if self.port is not None:
+            server = await asyncio.start_server(self._handle_tcp, self.host, self.port)
+            self.port = server.sockets[0].getsockname()[1]
+            self._servers.append(server)
+        if self.websocket_port is not None:
+            server = await asyncio.start_server(self._handle_websocket, self.host, self.websocket_port)
+            self.websocket_port = server.sockets[0].getsockname()[1]
+            self._servers.append(server)
+        BROADCAST_QUEUE_DEPTH.servers.append(self)
+        return self
+
+    def publish(self, timestamp, heart_rate, address="", sensor_contact=None, rr_intervals=()):
+        """把一个样本推送给所有订阅者，返回订阅者数"""
+        subscribers = self.subscribers
+        if not subscribers:
+            return 0
+        self.messages_published += 1
+        BROADCAST_MESSAGES_PUBLISHED.inc()
+        payload = sample_to_json(timestamp, address, heart_rate, sensor_contact, rr_intervals).encode("utf-8")
+        line = frame = None
+        now = self.clock()
+        for subscriber in tuple(subscribers):
+            if subscriber.protocol == PROTOCOL_WEBSOCKET:
+                if frame is None:
+                    frame = websocket_frame(payload)
+                subscriber.offer(frame, now)
+            else:
+                if line is None:
+                    line = payload + b"\n"
+                subscriber.offer(line, now)
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            self._loop.call_soon_threadsafe(self._flush)
+        return len(subscribers)
+
+    def _flush(self):
+        """把本轮发布的消息写给所有订阅者"""
+        self._flush_scheduled = False
+        for subscriber in tuple(self.subscribers):
+            subscriber.flush()
+
+    def client_stats(self):
+        """每个订阅者的队列深度和收发统计"""
+        return [subscriber.stats() for subscriber in tuple(self.subscribers)]
+
+    async def close(self):
+        """停止监听并断开所有订阅者"""
+        for server in self._servers:
+            server.close()
+        for subscriber in tuple(self.subscribers):
+            subscriber.close()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        for server in self._servers:
+            await server.wait_closed()
+        self._servers = []
+        if self in BROADCAST_QUEUE_DEPTH.servers:
+            BROADCAST_QUEUE_DEPTH.servers.remove(self)
+
+    async def _serve(self, subscriber):
+        task = asyncio.current_task()
+        self._tasks.add(task)
+        self.subscribers.add(subscriber)
+        BROADCAST_SUBSCRIBERS.inc()
+        try:
+            await subscriber.run()
+        finally:
+            self._tasks.discard(task)
+
+    def _remove(self, subscriber):
+        if subscriber in self.subscribers:
+            self.subscribers.discard(subscriber)
+            BROADCAST_SUBSCRIBERS.dec()
+
+    async def _handle_tcp(self, reader, writer):
+        await self._serve(Subscriber(self, reader, writer, PROTOCOL_TCP))
+
+    async def _handle_websocket(self, reader, writer):
+        """完成WebSocket握手后按订阅者处理"""
+        try:
+            request = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), 5.0)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            writer.close()
+            return
+        headers = {}
+        for line in request.decode("latin-1").split("\r\n")[1:]:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        key = headers.get("sec-websocket-key")
+        if headers.get("upgrade", "").lower() != "websocket" or not key:
+            writer.write(b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+            writer.close()
+            return
+        writer.write((
+            "HTTP/1.1 101 Switching Protocols\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {websocket_accept_key(key)}\r\n\r\n"
+        ).encode("ascii"))
+        await self._serve(Subscriber(self, reader, writer, PROTOCOL_WEBSOCKET))
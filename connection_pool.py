@@ -0,0 +1,227 @@
+"""
+多设备连接池
+
+在同一个asyncio事件循环中同时保持多个BleakClient会话，
+每个会话有独立的心率数据流、连接状态和重连状态。
+本模块不依赖Qt，可以在GUI或纯asyncio程序中使用。
+"""
+import time
+import asyncio
+from device_backend import BleakBackend
+from sample_buffer import SampleRingBuffer
+from hrs_parser import HEART_RATE_CHAR_UUID, HrsParseError, parse_heart_rate_measurement
+from reconnect import ReconnectPolicy, RecoveryTracker, reconnect_with_backoff
+from connection_state import release_client
+import metrics
+
+
+class DeviceSession:
+    """单个设备的连接会话"""
+
+    def __init__(self, device, on_sample=None, on_status=None, backend=None,
+                 connect_timeout=20.0, reconnect_policy=None, buffer_capacity=None):
+        self.device = device
+        self.address = device.address
+        self.name = device.name or "未知设备"
+        self.on_sample = on_sample
+        self.on_status = on_status
+        self.backend = backend or BleakBackend()
+        self.connect_timeout = connect_timeout
+        self.reconnect_policy = reconnect_policy or ReconnectPolicy()
+
+        # 每个会话独立的心率数据流：未设置回调时写入环形缓冲区供调用方读取
+        if buffer_capacity is None:
+            buffer_capacity = 0 if on_sample else 1024
+        self.samples = SampleRingBuffer(buffer_capacity) if buffer_capacity else None
+        self.client = None
+        self.status = "未连接"
+        self.is_connected = False
+        self.last_heart_rate = 0
+        self.last_measurement = None
+        self.notification_count = 0
+        self.parse_errors = 0
+        self.notification_intervals = metrics.IntervalTracker(
+            metrics.NOTIFICATION_INTERVAL, metrics.NOTIFICATION_JITTER
+        )
+
+        # 重连状态
+        self.recovery = RecoveryTracker()
+        self.reconnect_attempts = 0
+        self.reconnect_count = 0
+        self._reconnect_task = None
+        self._closing = False
+        # 进行中的连接（create_client -> connect -> start_notify）
+        self._connect_task = None
+
+    def _set_status(self, status, connected):
+        """更新会话状态并通知回调"""
+        self.status = status
+        self.is_connected = connected
+        if self.on_status:
+            self.on_status(self, status, connected)
+
+    @property
+    def connecting(self):
+        """是否有进行中的连接"""
+        return self._connect_task is not None and not self._connect_task.done()
+
+    async def start(self):
+        """连接设备并启动心率通知，成功返回True
+
+        已有进行中的连接时等待它的结果，不会对同一设备发起第二个连接；
+        连接期间调用stop()会取消连接并返回False。
+        """
+        if not self.connecting:
+            self._closing = False
+            self._connect_task = asyncio.ensure_future(self._connect())
+        return await self._connect_task
+
+    async def _connect(self):
+        self._set_status("连接中...", False)
+        started_at = time.perf_counter()
+        client = None
+        try:
+            client = self.client = self.backend.create_client(
+                self.device, disconnected_callback=self._on_disconnected,
+                timeout=self.connect_timeout,
+            )
+            await client.connect()
+            self.notification_intervals.reset()
+            await client.start_notify(HEART_RATE_CHAR_UUID, self._heart_rate_callback)
+        except asyncio.CancelledError:
+            # 被stop()取消：释放已建立的连接，由stop()更新状态
+            await self._release_failed(client)
+            return False
+        except Exception as e:
+            metrics.CONNECT_FAILURES.inc()
+            print(f"[{self.address}] 连接设备时发生错误: {str(e)}")
+            # 连接成功但启动通知失败时，已建立的连接也要断开
+            await self._release_failed(client)
+            self._set_status(f"连接失败: {str(e)}", False)
+            return False
+        metrics.CONNECT_DURATION.observe(time.perf_counter() - started_at)
+        self.reconnect_attempts = 0
+        self.recovery.on_recovered()
+        self._set_status("已连接", True)
+        return True
+
+    async def _release_failed(self, client):
+        """断开连接失败时已创建的客户端"""
+        if client is None:
+            return
+        if self.client is client:
+            self.client = None
+        await release_client(client, label=self.address)
+
+    async def stop(self):
+        """取消进行中的连接，停止通知并断开连接，不再自动重连"""
+        self._closing = True
+        if self._reconnect_task and not self._reconnect_task.done():
+            self._reconnect_task.cancel()
+        if self.connecting:
+            # 连接任务自己释放已创建的客户端
+            self._connect_task.cancel()
+            await asyncio.gather(self._connect_task, return_exceptions=True)
+        client = self.client
+        self.client = None
+        if client is not None:
+            await release_client(client, label=self.address)
+        self._set_status("未连接", False)
+
+    def _on_disconnected(self, client):
+        """设备意外断开时由bleak调用"""
+        if self._closing or client is not self.client:
+            return
+        self.client = None
+        self.recovery.on_disconnected()
+        self._set_status("连接已断开", False)
+        if self._reconnect_task is None or self._reconnect_task.done():
+            self._reconnect_task = asyncio.ensure_future(self._reconnect())
+
+    async def _reconnect(self):
+        """用已知的设备对象按退避策略重连，不重新扫描"""
+        def on_attempt(attempt):
+            self.reconnect_attempts = attempt
+            self._set_status(f"重连中 (第{attempt}次)", False)
+
+        if await reconnect_with_backoff(
+            self.start, self.reconnect_policy,
+            should_continue=lambda: not self._closing, on_attempt=on_attempt,
+        ):
+            self.reconnect_count += 1
+
+    def _heart_rate_callback(self, sender, data):
+        """心率数据回调函数"""
+        metrics.NOTIFICATIONS_RECEIVED.inc()
+        self.notification_intervals.tick(time.perf_counter())
+        try:
+            measurement = parse_heart_rate_measurement(data)
+        except HrsParseError:
+            self.parse_errors += 1
+            metrics.PARSE_ERRORS.inc()
+            return
+        heart_rate = measurement.heart_rate
+        timestamp = time.time()
+        self.recovery.on_sample()
+        self.notification_count += 1
+        self.last_measurement = measurement
+        self.last_heart_rate = heart_rate
+        if self.samples is not None and not self.samples.push(
+            timestamp, heart_rate, measurement.sensor_contact, measurement.rr_intervals
+        ):
+            metrics.SAMPLES_DROPPED.inc()
+        if self.on_sample:
+            self.on_sample(self, timestamp, heart_rate)
+
+
+class ConnectionPool:
+    """同时管理多个设备会话的连接池"""
+
+    def __init__(self, on_sample=None, on_status=None, backend=None, **session_options):
+        self.on_sample = on_sample
+        self.on_status = on_status
+        self.backend = backend or BleakBackend()
+        self.session_options = session_options
+        self.sessions = {}  # key: device address, value: DeviceSession
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def __contains__(self, address):
+        return address in self.sessions
+
+    def get(self, address):
+        """按地址获取会话"""
+        return self.sessions.get(address)
+
+    def connected_sessions(self):
+        """当前已连接的会话列表"""
+        return [session for session in self.sessions.values() if session.is_connected]
+
+    async def add(self, device):
+        """连接设备并加入连接池，已存在的会话会被复用
+
+        会话正在连接时不会发起第二个连接，而是等待进行中的连接完成。
+        """
+        session = self.sessions.get(device.address)
+        if session is None:
+            session = DeviceSession(
+                device, on_sample=self.on_sample, on_status=self.on_status,
+                backend=self.backend, **self.session_options
+            )
+            self.sessions[device.address] = session
+        if not session.is_connected:
+            await session.start()
+        return session
+
+    async def remove(self, address):
+        """断开设备并从连接池移除"""
+        session = self.sessions.pop(address, None)
+        if session is not None:
+            await session.stop()
+
+    async def close_all(self):
+        """并发断开所有设备"""
+        sessions = list(self.sessions.values())
+        self.sessions.clear()
+        await asyncio.gather(*(session.stop() for session in sessions), return_exceptions=True)
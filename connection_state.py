@@ -0,0 +1,230 @@
+"""
+单设备连接的生命周期状态机
+
+连接过程的每一步都在可取消的任务中执行，并有各自的时限：
+
+    未连接 -> 连接中 -> 订阅通知 -> 已连接 --(意外断开)--> 重连中 -> 连接中 ...
+    任意状态 --(断开/切换设备)--> 断开中 -> 未连接 / 连接中
+    shutdown() 之后为已关闭，不再接受请求
+
+新的连接或断开请求会先取消进行中的任务（连接、订阅或重连等待），再在时限内释放旧的客户端，
+因此切换设备和退出程序的耗时有确定的上限（StepTimeouts.teardown），不会等满bleak的连接超时，
+所有等待都在事件循环中进行，不阻塞界面。
+本模块不依赖Qt。
+"""
+import time
+import asyncio
+from hrs_parser import HEART_RATE_CHAR_UUID
+from reconnect import ReconnectPolicy, RecoveryTracker, reconnect_with_backoff
+import metrics
+
+# 连接状态
+IDLE = "idle"
+CONNECTING = "connecting"
+SUBSCRIBING = "subscribing"
+CONNECTED = "connected"
+RECONNECTING = "reconnecting"
+DISCONNECTING = "disconnecting"
+CLOSED = "closed"
+
+# 允许的状态转换（转换到当前状态总是允许的，用于更新状态说明）
+TRANSITIONS = {
+    IDLE: {CONNECTING, DISCONNECTING, CLOSED},
+    CONNECTING: {SUBSCRIBING, IDLE, RECONNECTING, DISCONNECTING, CLOSED},
+    SUBSCRIBING: {CONNECTED, IDLE, RECONNECTING, DISCONNECTING, CLOSED},
+    CONNECTED: {RECONNECTING, IDLE, DISCONNECTING, CLOSED},
+    RECONNECTING: {CONNECTING, IDLE, DISCONNECTING, CLOSED},
+    DISCONNECTING: {IDLE, CONNECTING, CLOSED},
+    CLOSED: set(),
+}
+
+
+class StepTimeouts:
+    """各步骤的时限（秒）"""
+
+    def __init__(self, connect=20.0, start_notify=5.0, stop_notify=1.5, disconnect=2.5, cancel=0.5):
+        self.connect = connect
+        self.start_notify = start_notify
+        self.stop_notify = stop_notify
+        self.disconnect = disconnect
+        # 等待被取消的任务结束的时间
+        self.cancel = cancel
+
+    @property
+    def teardown(self):
+        """取消进行中的任务并释放客户端的最长耗时"""
+        return self.cancel + self.stop_notify + self.disconnect
+
+
+DEFAULT_TIMEOUTS = StepTimeouts()
+
+
+async def release_client(client, timeouts=DEFAULT_TIMEOUTS, label=""):
+    """在时限内停止心率通知并断开客户端，超时或出错只打印日志"""
+    prefix = f"[{label}] " if label else ""
+    try:
+        if not client.is_connected:
+            return
+    except Exception:
+        return
+    try:
+        await asyncio.wait_for(client.stop_notify(HEART_RATE_CHAR_UUID), timeouts.stop_notify)
+    except asyncio.TimeoutError:
+        print(f"{prefix}停止通知超时（{timeouts.stop_notify:g} 秒），直接断开")
+    except Exception as e:
+        print(f"{prefix}停止通知失败 (可能已断开): {str(e)}")
+    try:
+        await asyncio.wait_for(client.disconnect(), timeouts.disconnect)
+    except asyncio.TimeoutError:
+        print(f"{prefix}断开连接超时（{timeouts.disconnect:g} 秒），不再等待")
+    except Exception as e:
+        print(f"{prefix}断开连接失败: {str(e)}")
+
+
+class ConnectionStateMachine:
+    """单设备连接：连接、订阅、自动重连、断开和切换设备"""
+
+    def __init__(self, backend, notification_callback, on_state=None, timeouts=None,
+                 reconnect_policy=None, auto_reconnect=True, loop=None):
+        self.backend = backend
+        self.notification_callback = notification_callback
+        # on_state(state, detail)：每次状态变化时调用，detail为显示给用户的说明（可能为None）
+        self.on_state = on_state
+        self.timeouts = timeouts or DEFAULT_TIMEOUTS
+        self.reconnect_policy = reconnect_policy or ReconnectPolicy()
+        self.auto_reconnect = auto_reconnect
+        self.loop = loop
+        self.recovery = RecoveryTracker()
+        self.state = IDLE
+        self.device = None
+        self.client = None
+        self.last_error = None
+        self._task = None
+
+    @property
+    def is_connected(self):
+        return self.state == CONNECTED
+
+    def _set_state(self, state, detail=None):
+        if state != self.state and state not in TRANSITIONS[self.state]:
+            raise RuntimeError(f"非法的连接状态转换: {self.state} -> {state}")
+        self.state = state
+        if self.on_state:
+            self.on_state(state, detail)
+
+    def _start(self, step, *args):
+        """取消进行中的任务，在它结束后执行新的步骤"""
+        if self.state == CLOSED:
+            return None
+        previous = self._task
+        if previous is not None and not previous.done():
+            previous.cancel()
+        loop = self.loop or asyncio.get_event_loop()
+        self._task = loop.create_task(self._run_after(previous, step, *args))
+        return self._task
+
+    async def _run_after(self, previous, step, *args):
+        if previous is not None and not previous.done():
+            # 被取消的任务只会停在某个await上，不做清理，很快就会结束
+            await asyncio.wait({previous}, timeout=self.timeouts.cancel)
+        return await step(*args)
+
+    def connect(self, device):
+        """连接设备，已连接或正在连接其他设备时先断开，返回生命周期任务"""
+        return self._start(self._switch, device)
+
+    def disconnect(self):
+        """断开当前设备（包括取消进行中的连接或重连），返回生命周期任务"""
+        return self._start(self._disconnect, IDLE)
+
+    async def shutdown(self):
+        """退出前调用：在StepTimeouts.teardown内断开，之后不再接受请求"""
+        task = self._start(self._disconnect, CLOSED)
+        if task is None:
+            return
+        try:
+            await asyncio.wait_for(asyncio.shield(task), self.timeouts.teardown + 0.5)
+        except asyncio.TimeoutError:
+            task.cancel()
+            self.client = None
+            print("断开连接超过时限，直接关闭")
+            if self.state != CLOSED:
+                self._set_state(CLOSED)
+
+    async def _switch(self, device):
+        await self._release()
+        self.device = device
+        self.recovery.reset()
+        if not await self._open(device):
+            self._set_state(IDLE, f"连接失败: {self.last_error}")
+
+    async def _disconnect(self, final_state):
+        await self._release()
+        self._set_state(final_state)
+
+    async def _release(self):
+        """释放当前客户端（有客户端时先进入断开中状态）"""
+        client = self.client
+        self.client = None
+        if client is not None:
+            self._set_state(DISCONNECTING)
+            await release_client(client, self.timeouts)
+
+    async def _open(self, device):
+        """连接并启动心率通知，每一步都有时限，成功返回True"""
+        self._set_state(CONNECTING)
+        started_at = time.perf_counter()
+        # 直接传入device对象而不是地址，避免内部二次扫描
+        client = self.client = self.backend.create_client(
+            device, timeout=self.timeouts.connect, disconnected_callback=self._on_disconnected,
+        )
+        try:
+            await asyncio.wait_for(client.connect(), self.timeouts.connect)
+            self._set_state(SUBSCRIBING)
+            # 只启动心率测量特征值的通知，避免触发小米手环对批量读取的保护机制
+            await asyncio.wait_for(
+                client.start_notify(HEART_RATE_CHAR_UUID, self.notification_callback),
+                self.timeouts.start_notify,
+            )
+        except asyncio.TimeoutError:
+            self.last_error = "超时"
+        except Exception as e:
+            self.last_error = str(e)
+        else:
+            metrics.CONNECT_DURATION.observe(time.perf_counter() - started_at)
+            self.recovery.on_recovered()
+            self._set_state(CONNECTED)
+            return True
+        metrics.CONNECT_FAILURES.inc()
+        print(f"连接设备 {device.address} 失败: {self.last_error}")
+        self.client = None
+        await release_client(client, self.timeouts)
+        return False
+
+    def _on_disconnected(self, client):
+        """设备意外断开时由bleak调用"""
+        if client is not self.client or self.state != CONNECTED:
+            return
+        self.client = None
+        self.recovery.on_disconnected()
+        if not self.auto_reconnect:
+            self._set_state(IDLE, "连接已断开")
+            return
+        self._set_state(RECONNECTING, "连接已断开")
+        self._start(self._reconnect, self.device)
+
+    async def _reconnect(self, device):
+        """用同一个设备对象按退避策略重连，不重新扫描"""
+        async def attempt():
+            if await self._open(device):
+                return True
+            self._set_state(RECONNECTING, f"重连失败: {self.last_error}")
+            return False
+
+        def on_attempt(number):
+            self._set_state(RECONNECTING, f"重连中 (第{number}次)")
+
+        if await reconnect_with_backoff(attempt, self.reconnect_policy, on_attempt=on_attempt):
+            print(f"设备 {device.address} 已重连，恢复耗时 {self.recovery.last_recovery_time:.2f} 秒")
+        else:
+            self._set_state(IDLE, "重连失败")
@@ -0,0 +1,46 @@
+"""
+蓝牙设备后端
+
+扫描和连接都通过后端对象创建，默认使用bleak访问真实蓝牙，
+也可以换成simulated_device.SimulatedBackend在没有蓝牙硬件的环境中运行。
+
+后端需要提供：
+    create_scanner(detection_callback, service_uuids=None, passive=False)
+        返回带有 async start() / async stop() 的扫描器，可多次启动和停止；
+        passive为被动扫描，平台不支持时使用主动扫描
+    create_client(device, disconnected_callback=None, timeout=20.0)
+        返回与BleakClient接口一致的客户端
+        （async connect/disconnect/start_notify/stop_notify, is_connected, address）
+
+bleak（以及Windows上的WinRT绑定）在第一次扫描或连接时才导入，不拖慢程序启动。
+"""
+
+
+class BleakBackend:
+    """使用bleak访问真实蓝牙设备"""
+    name = "bleak"
+
+    def create_scanner(self, detection_callback, service_uuids=None, passive=False):
+        from bleak import BleakScanner
+        options = {"service_uuids": service_uuids} if service_uuids else {}
+        if passive:
+            try:
+                return BleakScanner(detection_callback, scanning_mode="passive", **options)
+            except Exception as e:
+                # macOS不支持被动扫描，BlueZ需要额外的过滤条件
+                print(f"不支持被动扫描，使用主动扫描: {str(e)}")
+        return BleakScanner(detection_callback, **options)
+
+    def create_client(self, device, disconnected_callback=None, timeout=20.0):
+        from bleak import BleakClient
+        return BleakClient(device, disconnected_callback=disconnected_callback, timeout=timeout)
+
+
+def create_backend(name="bleak", **options):
+    """按名称创建设备后端: "bleak" 或 "simulated" """
+    if name == "simulated":
+        from simulated_device import SimulatedBackend
+        return SimulatedBackend.with_default_band(**options)
+    if name == "bleak":
+        return BleakBackend()
+    raise ValueError(f"未知的设备后端: {name}")
@@ -0,0 +1,122 @@
+"""
+设备缓存
+
+把连接过的设备（地址、名称、最近一次RSSI、是否支持HRS）保存在本地JSON文件中，
+启动时据此直接定位常用设备，不必每次都完整扫描再手动选择。
+本模块不依赖Qt和bleak。
+"""
+import os
+import json
+import time
+
+
+class CachedDevice:
+    """缓存中的一台设备"""
+    __slots__ = ("address", "name", "rssi", "supports_hrs", "last_connected")
+
+    def __init__(self, address, name="", rssi=None, supports_hrs=False, last_connected=0.0):
+        self.address = address
+        self.name = name
+        self.rssi = rssi
+        self.supports_hrs = supports_hrs
+        self.last_connected = last_connected
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data["address"], data.get("name") or "", data.get("rssi"),
+            bool(data.get("supports_hrs")), float(data.get("last_connected") or 0.0),
+        )
+
+    def __repr__(self):
+        return f"CachedDevice({self.address!r}, name={self.name!r}, rssi={self.rssi})"
+
+
+class DeviceCache:
+    """
+    连接过的设备列表，按最近连接时间排序。
+
+    path为None时只保存在内存中（模拟后端和测试使用）。
+    """
+
+    def __init__(self, path=None, max_devices=20, clock=time.time):
+        self.path = path
+        self.max_devices = max_devices
+        self.clock = clock
+        self.devices = {}  # key: device address, value: CachedDevice
+        if path:
+            self.load()
+
+    def __len__(self):
+        return len(self.devices)
+
+    def __contains__(self, address):
+        return address in self.devices
+
+    def get(self, address):
+        return self.devices.get(address)
+
+    def load(self):
+        """读取缓存文件，文件不存在或损坏时视为空缓存"""
+        self.devices = {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            for item in data.get("devices", []):
+                device = CachedDevice.from_dict(item)
+                self.devices[device.address] = device
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"读取设备缓存失败，已忽略: {str(e)}")
+
+    def save(self):
+        """写入临时文件后替换，避免中途退出留下半个文件"""
+        if not self.path:
+            return
+        data = {"devices": [device.to_dict() for device in self.recent()]}
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            temp_path = self.path + ".tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            print(f"保存设备缓存失败: {str(e)}")
+
+    def recent(self):
+        """按最近连接时间从新到旧排列的设备"""
+        return sorted(self.devices.values(), key=lambda device: device.last_connected, reverse=True)
+
+    def preferred(self, default_address=""):
+        """启动时优先连接的设备地址：指定的默认地址，否则为最近连接的设备"""
+        if default_address:
+            return default_address
+        recent = self.recent()
+        return recent[0].address if recent else None
+
+    def remember(self, address, name="", rssi=None, supports_hrs=None, save=True):
+        """记录一次成功连接"""
+        device = self.devices.get(address)
+        if device is None:
+            device = self.devices[address] = CachedDevice(address)
+        if name:
+            device.name = name
+        if rssi is not None:
+            device.rssi = rssi
+        if supports_hrs is not None:
+            device.supports_hrs = supports_hrs
+        device.last_connected = self.clock()
+        if len(self.devices) > self.max_devices:
+            for stale in self.recent()[self.max_devices:]:
+                del self.devices[stale.address]
+        if save:
+            self.save()
+        return device
+
+    def forget(self, address):
+        if self.devices.pop(address, None) is not None:
+            self.save()
@@ -0,0 +1,583 @@
+"""
+心率悬浮窗
+
+直接绘制心率数字，不使用QLabel：
+- 当前字号和颜色下的每个字符第一次用到时渲染成QPixmap并缓存，之后绘制只是贴图，不再排版文字
+- 所有数字按同一宽度排列，心率变化时只重绘变化了的那几位数字所在的区域
+- 调整大小时只重新渲染字形并重绘，不重建样式表，也不需要隐藏再显示窗口
+
+另外两种样式在此基础上增加缓存的背景层：
+- 表盘样式（DialFloatWindow）：表盘只绘制一次到缓存位图，指针以60 fps动画移动，每帧只重绘指针扫过的区域
+- 动态图形（GraphFloatWindow）：曲线画在一块环形位图上，每前进一个像素只追加一段线段，
+  显示时把环形位图分两段贴到窗口上实现滚动，不重绘历史曲线
+"""
+import math
+import time
+from array import array
+from PyQt5.QtCore import Qt, QPoint, QPointF, QRect, QRectF, QTimer
+from PyQt5.QtGui import QColor, QFont, QFontMetrics, QPainter, QPen, QPixmap
+from PyQt5.QtWidgets import QWidget
+
+
+# 悬浮窗数字颜色
+DIGIT_COLOR = QColor("red")
+
+# 断开连接时显示的占位符
+DISCONNECTED_TEXT = "--"
+
+# 动画帧间隔（毫秒），约60 fps
+FRAME_INTERVAL_MS = 16
+
+# 表盘和曲线的心率显示范围
+HEART_RATE_MIN = 40
+HEART_RATE_MAX = 200
+
+# 动态图形显示的时间跨度（秒）
+GRAPH_SECONDS = 60
+
+
+class GlyphCache:
+    """某一字号和颜色下预渲染的字符位图（每个字符第一次用到时渲染）"""
+    CHARACTERS = "0123456789-"
+
+    def __init__(self, pixel_size, color, device_pixel_ratio=1.0):
+        self.pixel_size = pixel_size
+        self.color = QColor(color)
+        self.device_pixel_ratio = device_pixel_ratio
+        self.font = QFont()
+        self.font.setPixelSize(max(1, pixel_size))
+        self.font.setBold(True)
+        self.metrics = QFontMetrics(self.font)
+        # 所有字符使用相同的宽度（取最宽的数字），相同位数的心率布局不变
+        self.cell_width = max(self.metrics.horizontalAdvance(c) for c in self.CHARACTERS)
+        self.cell_height = self.metrics.height()
+        self.pixmaps = {}
+
+    def pixmap(self, character):
+        pixmap = self.pixmaps.get(character)
+        if pixmap is None and character in self.CHARACTERS:
+            pixmap = self.pixmaps[character] = self._render(character)
+        return pixmap
+
+    def _render(self, character):
+        font, metrics = self.font, self.metrics
+        ratio = self.device_pixel_ratio
+        pixmap = QPixmap(int(self.cell_width * ratio), int(self.cell_height * ratio))
+        pixmap.setDevicePixelRatio(ratio)
+        pixmap.fill(Qt.transparent)
+        painter = QPainter(pixmap)
+        painter.setRenderHint(QPainter.TextAntialiasing)
+        painter.setFont(font)
+        painter.setPen(self.color)
+        x = (self.cell_width - metrics.horizontalAdvance(character)) / 2
+        painter.drawText(int(x), metrics.ascent(), character)
+        painter.end()
+        return pixmap
+
+
+class FloatWindow(QWidget):
+    """简约数字样式的悬浮窗"""
+
+    # 最多保留的字形缓存数（拖动大小滑块来回调整时可以直接复用）
+    MAX_GLYPH_CACHES = 8
+
+    def __init__(self):
+        super().__init__()
+
+        # 悬浮窗设置
+        self.is_topmost = True
+        self.is_fixed = False
+        self.window_size = 150
+        self.current_heart_rate = 0
+        self.text = "0"
+
+        self._glyph_caches = {}
+        self._glyphs = None
+
+        # 初始化界面
+        self.setup_ui()
+
+    def setup_ui(self):
+        """设置悬浮窗界面"""
+        # 设置窗口属性
+        self.setWindowFlags(Qt.FramelessWindowHint | Qt.WindowStaysOnTopHint)
+        self.setAttribute(Qt.WA_TranslucentBackground)
+
+        # 设置窗口大小
+        self.resize(self.window_size, self.window_size)
+
+        # 鼠标事件变量
+        self.dragging = False
+        self.drag_start_position = QPoint()
+
+    def glyph_pixel_size(self):
+        """数字的字号（像素）"""
+        return self.window_size // 2
+
+    def text_anchor(self, text):
+        """数字整体的中心点"""
+        return QPoint(self.width() // 2, self.height() // 2)
+
+    def glyphs(self):
+        """当前大小对应的字形缓存"""
+        ratio = self.devicePixelRatioF()
+        key = (self.glyph_pixel_size(), ratio)
+        glyphs = self._glyph_caches.get(key)
+        if glyphs is None:
+            if len(self._glyph_caches) >= self.MAX_GLYPH_CACHES:
+                self._glyph_caches.pop(next(iter(self._glyph_caches)))
+            glyphs = self._glyph_caches[key] = GlyphCache(key[0], DIGIT_COLOR, ratio)
+        self._glyphs = glyphs
+        return glyphs
+
+    def _text_rects(self, text):
+        """text中每个字符在窗口中的位置（整体居中）"""
+        glyphs = self._glyphs or self.glyphs()
+        anchor = self.text_anchor(text)
+        x = anchor.x() - glyphs.cell_width * len(text) // 2
+        y = anchor.y() - glyphs.cell_height // 2
+        return [
+            QRect(x + index * glyphs.cell_width, y, glyphs.cell_width, glyphs.cell_height)
+            for index in range(len(text))
+        ]
+
+    def _set_text(self, text):
+        """更换显示的文本，只把变化的字符区域标记为需要重绘"""
+        if text == self.text:
+            return
+        old_rects = self._text_rects(self.text)
+        new_rects = self._text_rects(text)
+        dirty = QRect()
+        if len(text) == len(self.text):
+            for rect, old, new in zip(new_rects, self.text, text):
+                if old != new:
+                    dirty = dirty.united(rect)
+        else:
+            for rect in old_rects + new_rects:
+                dirty = dirty.united(rect)
+        self.text = text
+        self.update(dirty)
+
+    def update_heart_rate(self, heart_rate):
+        """更新心率显示"""
+        self.current_heart_rate = heart_rate
+        self._set_text(str(heart_rate))
+
+    def show_disconnected(self):
+        """断开期间显示占位符，避免一直停留在最后一个心率值"""
+        self.current_heart_rate = 0
+        self._set_text(DISCONNECTED_TEXT)
+
+    def paintEvent(self, event):
+        """只绘制与重绘区域相交的字符"""
+        clip = event.rect()
+        painter = QPainter(self)
+        # 半透明窗口需要先把重绘区域清成透明
+        painter.setCompositionMode(QPainter.CompositionMode_Source)
+        painter.fillRect(clip, Qt.transparent)
+        painter.setCompositionMode(QPainter.CompositionMode_SourceOver)
+        self._paint_text(painter, clip)
+        painter.end()
+
+    def _paint_text(self, painter, clip):
+        glyphs = self.glyphs()
+        for rect, character in zip(self._text_rects(self.text), self.text):
+            if rect.intersects(clip):
+                pixmap = glyphs.pixmap(character)
+                if pixmap is not None:
+                    painter.drawPixmap(rect.topLeft(), pixmap)
+
+    def set_topmost(self, is_topmost):
+        """设置窗口是否置顶"""
+        self.is_topmost = is_topmost
+        flags = self.windowFlags()
+        if is_topmost:
+            self.setWindowFlags(flags | Qt.WindowStaysOnTopHint)
+        else:
+            self.setWindowFlags(flags & ~Qt.WindowStaysOnTopHint)
+        self.show()
+
+    def set_fixed(self, is_fixed):
+        """设置窗口是否固定"""
+        self.is_fixed = is_fixed
+
+    def set_size(self, size):
+        """设置窗口大小：只重新选择字形缓存并重绘，不隐藏窗口"""
+        if size == self.window_size:
+            return
+        self.window_size = size
+        self._glyphs = None
+        self.resize(size, size)
+        self.update()
+
+    # 鼠标事件处理
+    def mousePressEvent(self, event):
+        """鼠标按下事件"""
+        if not self.is_fixed and event.button() == Qt.LeftButton:
+            self.dragging = True
+            self.drag_start_position = event.globalPos() - self.frameGeometry().topLeft()
+            event.accept()
+        super().mousePressEvent(event)
+
+    def mouseMoveEvent(self, event):
+        """鼠标移动事件"""
+        if not self.is_fixed and self.dragging and event.buttons() & Qt.LeftButton:
+            new_position = event.globalPos() - self.drag_start_position
+            self.move(new_position)
+            event.accept()
+        super().mouseMoveEvent(event)
+
+    def mouseReleaseEvent(self, event):
+        """鼠标释放事件"""
+        if event.button() == Qt.LeftButton:
+            self.dragging = False
+            event.accept()
+        super().mouseReleaseEvent(event)
+
+
+def _value_ratio(value):
+    """心率在显示范围内的位置（0到1）"""
+    value = min(max(value, HEART_RATE_MIN), HEART_RATE_MAX)
+    return (value - HEART_RATE_MIN) / (HEART_RATE_MAX - HEART_RATE_MIN)
+
+
+class DialFloatWindow(FloatWindow):
+    """表盘样式的悬浮窗"""
+
+    # 表盘刻度从左下（225度）顺时针转到右下（-45度）
+    START_ANGLE = 225
+    SWEEP_ANGLE = 270
+    # 心率区间颜色
+    ZONES = ((HEART_RATE_MIN, 100, QColor(60, 200, 90)), (100, 150, QColor(255, 170, 0)),
+             (150, HEART_RATE_MAX, QColor(230, 40, 40)))
+    # 指针每帧向目标值靠近的比例
+    NEEDLE_SMOOTHING = 0.2
+
+    def __init__(self):
+        super().__init__()
+        self._face = None
+        self._face_key = None
+        self.needle_value = float(HEART_RATE_MIN)
+        self.target_value = float(HEART_RATE_MIN)
+        self._frame_timer = QTimer(self)
+        self._frame_timer.setTimerType(Qt.PreciseTimer)
+        self._frame_timer.setInterval(FRAME_INTERVAL_MS)
+        self._frame_timer.timeout.connect(self._animate)
+
+    def glyph_pixel_size(self):
+        return self.window_size // 6
+
+    def text_anchor(self, text):
+        # 表盘下方没有刻度的缺口处
+        return QPoint(self.width() // 2, int(self.height() * 0.8))
+
+    def _geometry(self):
+        """表盘圆心和半径"""
+        center = QPointF(self.width() / 2, self.height() / 2)
+        return center, min(self.width(), self.height()) / 2 - 2
+
+    def _angle(self, value):
+        """心率对应的角度（度，0度指向右侧，逆时针为正）"""
+        return self.START_ANGLE - self.SWEEP_ANGLE * _value_ratio(value)
+
+    def _needle_tip(self, value):
+        center, radius = self._geometry()
+        angle = math.radians(self._angle(value))
+        length = radius * 0.78
+        return QPointF(center.x() + math.cos(angle) * length, center.y() - math.sin(angle) * length)
+
+    def _needle_rect(self, value):
+        """指针（含中心圆点）占据的区域"""
+        center, radius = self._geometry()
+        margin = radius * 0.08 + 2
+        rect = QRectF(center, self._needle_tip(value)).normalized()
+        return rect.adjusted(-margin, -margin, margin, margin).toAlignedRect()
+
+    def _face_pixmap(self):
+        """表盘位图，只在大小变化时重新绘制"""
+        ratio = self.devicePixelRatioF()
+        key = (self.width(), self.height(), ratio)
+        if self._face_key != key:
+            self._face = self._render_face(ratio)
+            self._face_key = key
+        return self._face
+
+    def _render_face(self, ratio):
+        pixmap = QPixmap(int(self.width() * ratio), int(self.height() * ratio))
+        pixmap.setDevicePixelRatio(ratio)
+        pixmap.fill(Qt.transparent)
+        center, radius = self._geometry()
+        painter = QPainter(pixmap)
+        painter.setRenderHint(QPainter.Antialiasing)
+
+        # 半透明底盘
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(QColor(0, 0, 0, 160))
+        painter.drawEllipse(center, radius, radius)
+
+        # 心率区间色带
+        band = radius * 0.08
+        arc_radius = radius - band
+        arc_rect = QRectF(center.x() - arc_radius, center.y() - arc_radius, 2 * arc_radius, 2 * arc_radius)
+        for low, high, color in self.ZONES:
+            painter.setPen(QPen(color, band, Qt.SolidLine, Qt.FlatCap))
+            start = self._angle(high)
+            painter.drawArc(arc_rect, int(start * 16), int((self._angle(low) - start) * 16))
+
+        # 刻度和数字
+        font = QFont()
+        font.setPixelSize(max(1, int(radius * 0.14)))
+        painter.setFont(font)
+        label_radius = radius * 0.62
+        for value in range(HEART_RATE_MIN, HEART_RATE_MAX + 1, 10):
+            major = value % 40 == 0
+            angle = math.radians(self._angle(value))
+            cos, sin = math.cos(angle), -math.sin(angle)
+            inner = radius - band * (3.2 if major else 2.4)
+            outer = radius - band * 1.6
+            painter.setPen(QPen(QColor(255, 255, 255, 230 if major else 140), 2 if major else 1))
+            painter.drawLine(QPointF(center.x() + cos * inner, center.y() + sin * inner),
+                             QPointF(center.x() + cos * outer, center.y() + sin * outer))
+            if major:
+                size = radius * 0.3
+                painter.drawText(
+                    QRectF(center.x() + cos * label_radius - size / 2,
+                           center.y() + sin * label_radius - size / 2, size, size),
+                    Qt.AlignCenter, str(value),
+                )
+        painter.end()
+        return pixmap
+
+    def paintEvent(self, event):
+        """表盘直接贴图，指针和数字只在重绘区域内绘制"""
+        clip = event.rect()
+        painter = QPainter(self)
+        # 表盘位图覆盖整个窗口（含透明部分），用Source模式贴图同时完成清除
+        painter.setCompositionMode(QPainter.CompositionMode_Source)
+        painter.drawPixmap(0, 0, self._face_pixmap())
+        painter.setCompositionMode(QPainter.CompositionMode_SourceOver)
+        self._paint_text(painter, clip)
+        self._paint_needle(painter)
+        painter.end()
+
+    def _paint_needle(self, painter):
+        center, radius = self._geometry()
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(QPen(DIGIT_COLOR, max(2.0, radius * 0.04), Qt.SolidLine, Qt.RoundCap))
+        painter.drawLine(center, self._needle_tip(self.needle_value))
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(QColor(230, 230, 230))
+        painter.drawEllipse(center, radius * 0.06, radius * 0.06)
+
+    def _move_needle(self, value):
+        self.target_value = float(value)
+        if not self._frame_timer.isActive():
+            self._frame_timer.start()
+
+    def _animate(self):
+        """每帧把指针向目标值移动一步，只重绘新旧指针覆盖的区域"""
+        delta = self.target_value - self.needle_value
+        if abs(delta) < 0.05:
+            value = self.target_value
+            self._frame_timer.stop()
+        else:
+            value = self.needle_value + delta * self.NEEDLE_SMOOTHING
+        dirty = self._needle_rect(self.needle_value)
+        self.needle_value = value
+        self.update(dirty.united(self._needle_rect(value)))
+
+    def update_heart_rate(self, heart_rate):
+        super().update_heart_rate(heart_rate)
+        self._move_needle(heart_rate)
+
+    def show_disconnected(self):
+        super().show_disconnected()
+        self._move_needle(HEART_RATE_MIN)
+
+
+class GraphFloatWindow(FloatWindow):
+    """动态图形样式的悬浮窗：心率曲线从右向左滚动"""
+
+    LINE_COLOR = QColor(255, 60, 60)
+    GRID_VALUES = (60, 100, 140, 180)
+
+    def __init__(self, seconds=GRAPH_SECONDS, clock=time.monotonic):
+        super().__init__()
+        self.seconds = seconds
+        self.clock = clock
+        # 最新的心率，0表示没有数据（断开期间曲线留空）
+        self.latest_value = 0
+        # 环形位图及每一列对应的心率（与位图列一一对应）
+        self._canvas = None
+        self._background = None
+        self._columns = array("H")
+        self._column = -1
+        self._next_column_at = None
+        # 只在下一列到期时唤醒，而不是每帧轮询
+        self._column_timer = QTimer(self)
+        self._column_timer.setSingleShot(True)
+        self._column_timer.setTimerType(Qt.PreciseTimer)
+        self._column_timer.timeout.connect(self._advance)
+
+    def glyph_pixel_size(self):
+        return self.window_size // 5
+
+    def text_anchor(self, text):
+        # 右上角，右对齐
+        glyphs = self._glyphs or self.glyphs()
+        return QPoint(self.width() - glyphs.cell_width * len(text) // 2 - 4,
+                      glyphs.cell_height // 2 + 2)
+
+    def _column_interval(self):
+        """曲线前进一个像素的时间（秒）"""
+        return self.seconds / max(1, self.width())
+
+    def _y(self, value):
+        padding = 4
+        return self.height() - padding - _value_ratio(value) * (self.height() - 2 * padding)
+
+    def _ensure_canvas(self):
+        ratio = self.devicePixelRatioF()
+        if (self._canvas is not None and self._canvas.width() == int(self.width() * ratio)
+                and self._canvas.height() == int(self.height() * ratio)):
+            return
+        # 大小变化时按新尺寸重画保留下来的历史（只在调整大小时发生）
+        history = self._ordered_columns()
+        self._canvas = QPixmap(int(self.width() * ratio), int(self.height() * ratio))
+        self._canvas.setDevicePixelRatio(ratio)
+        self._canvas.fill(Qt.transparent)
+        self._background = self._render_background(ratio)
+        self._columns = array("H", [0]) * max(1, self.width())
+        self._column = -1
+        self._write_columns(history[-len(self._columns):])
+
+    def _render_background(self, ratio):
+        pixmap = QPixmap(int(self.width() * ratio), int(self.height() * ratio))
+        pixmap.setDevicePixelRatio(ratio)
+        pixmap.fill(QColor(0, 0, 0, 140))
+        painter = QPainter(pixmap)
+        painter.setPen(QPen(QColor(255, 255, 255, 50), 1))
+        for value in self.GRID_VALUES:
+            y = int(self._y(value))
+            painter.drawLine(0, y, self.width(), y)
+        painter.end()
+        return pixmap
+
+    def _ordered_columns(self):
+        """从旧到新排列的每列心率"""
+        if self._column < 0:
+            return []
+        split = self._column + 1
+        return list(self._columns[split:]) + list(self._columns[:split])
+
+    def _write_columns(self, values):
+        """把若干列追加到环形位图：清除该列旧内容，再画一段连接上一列的线段"""
+        if not values:
+            return
+        width = len(self._columns)
+        painter = QPainter(self._canvas)
+        painter.setRenderHint(QPainter.Antialiasing)
+        pen = QPen(self.LINE_COLOR, 2)
+        for value in values:
+            previous = self._columns[self._column] if self._column >= 0 else 0
+            x = (self._column + 1) % width
+            self._columns[x] = value
+            self._column = x
+            painter.setCompositionMode(QPainter.CompositionMode_Source)
+            painter.fillRect(x, 0, 1, self.height(), Qt.transparent)
+            painter.setCompositionMode(QPainter.CompositionMode_SourceOver)
+            if value and previous:
+                painter.setPen(pen)
+                painter.drawLine(QPointF(x - 0.5, self._y(previous)), QPointF(x + 0.5, self._y(value)))
+        painter.end()
+
+    def _advance(self):
+        """写入所有已到期的列并滚动显示，然后等待下一列"""
+        now = self.clock()
+        interval = self._column_interval()
+        if self._next_column_at is None:
+            self._next_column_at = now
+        due = int((now - self._next_column_at) / interval) + 1 if now >= self._next_column_at else 0
+        if due:
+            self._ensure_canvas()
+            due = min(due, len(self._columns))
+            self._write_columns([self.latest_value] * due)
+            self._next_column_at += due * interval
+            if self._next_column_at <= now:
+                # 隐藏了很久，直接从现在开始计时
+                self._next_column_at = now + interval
+            self.update()
+        self._schedule_next()
+
+    def _schedule_next(self):
+        if self.isVisible() and self._next_column_at is not None:
+            delay = self._next_column_at - self.clock()
+            self._column_timer.start(max(1, int(delay * 1000)))
+
+    def load_history(self, samples, now=None):
+        """用已有的心率数据[(时间戳, 心率), ...]填充曲线（时间戳为time.time()）"""
+        now = time.time() if now is None else now
+        self._ensure_canvas()
+        width = len(self._columns)
+        interval = self._column_interval()
+        values = []
+        index = 0
+        value = 0
+        for column in range(width):
+            column_end = now - (width - 1 - column) * interval
+            while index < len(samples) and samples[index][0] <= column_end:
+                value = samples[index][1]
+                index += 1
+            values.append(value)
+        self._write_columns(values)
+        if samples:
+            self.latest_value = samples[-1][1]
+        self.update()
+
+    def paintEvent(self, event):
+        """背景直接贴图，环形位图分两段贴出，最旧的列在左、最新的列在右"""
+        self._ensure_canvas()
+        clip = event.rect()
+        width, height = self.width(), self.height()
+        ratio = self._canvas.devicePixelRatio()
+        split = self._column + 1
+        painter = QPainter(self)
+        painter.setCompositionMode(QPainter.CompositionMode_Source)
+        painter.drawPixmap(0, 0, self._background)
+        painter.setCompositionMode(QPainter.CompositionMode_SourceOver)
+        painter.drawPixmap(QRectF(0, 0, width - split, height), self._canvas,
+                           QRectF(split * ratio, 0, (width - split) * ratio, height * ratio))
+        if split:
+            painter.drawPixmap(QRectF(width - split, 0, split, height), self._canvas,
+                               QRectF(0, 0, split * ratio, height * ratio))
+        self._paint_text(painter, clip)
+        painter.end()
+
+    def update_heart_rate(self, heart_rate):
+        super().update_heart_rate(heart_rate)
+        self.latest_value = heart_rate
+
+    def show_disconnected(self):
+        super().show_disconnected()
+        self.latest_value = 0
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self._advance()
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self._column_timer.stop()
+
+
+# 悬浮窗样式名称（与主界面“显示样式”下拉框一致）
+FLOAT_WINDOW_STYLES = {
+    "简约数字": FloatWindow,
+    "表盘样式": DialFloatWindow,
+    "动态图形": GraphFloatWindow,
+}
+
+
+def create_float_window(style="简约数字"):
+    """按样式名称创建悬浮窗，未知样式使用简约数字"""
+    return FLOAT_WINDOW_STYLES.get(style, FloatWindow)()
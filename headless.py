@@ -0,0 +1,497 @@
+"""
+无界面（headless）运行模式
+
+不依赖Qt，在普通asyncio事件循环中复用扫描、HRS识别、连接、心率解析和自动重连逻辑，
+把心率样本以JSON行或紧凑的二进制格式输出到标准输出或文件，适合在常开的小主机上长期运行。
+样本数据写到标准输出时，所有状态和错误信息都改为输出到标准错误。
+
+JSON行格式（每个样本一行）:
+    {"t": 时间戳(秒), "address": 设备地址, "hr": 心率, "contact": 接触状态或null, "rr": [RR间期(毫秒)...]}
+
+二进制流格式（小端序）：
+    流头:     b"XHRL" + 版本(u8)
+    设备记录: b"D" + 设备编号(u8) + 地址长度(u8) + 地址(UTF-8)，设备第一次出现时写入
+    样本记录: b"S" + 设备编号(u8) + 时间戳(i64, 毫秒) + 心率(u16) + 标志(u8) + RR个数(u8)
+              + RR间期(u16, 1/1024秒)...
+    标志位:   bit0-1 接触状态(0=不支持, 1=未接触, 2=接触)，与会话录制文件相同
+1 Hz带一个RR间期时每个样本16字节。
+
+用法:
+    python headless.py --simulate --duration 10
+    python headless.py --address AA:BB:CC:DD:EE:FF --format binary --output hr.bin
+    python headless.py --all --record session.xhr --metrics-port 9464
+    python headless.py --format none --broadcast-port 9465 --websocket-port 9466
+    python headless.py --advertisements --output group.jsonl
+
+--advertisements为团体广告监测：不连接设备，从广告的HRS服务数据中读取附近所有手环的心率，
+每个新的心率值输出一个样本（没有RR间期）；指定--address时只输出这些手环。
+"""
+import os
+import sys
+import time
+import signal
+import asyncio
+import argparse
+from struct import Struct
+
+from device_backend import create_backend
+from connection_pool import ConnectionPool
+from device_cache import DeviceCache
+from reconnect import ReconnectPolicy
+from session_recorder import RecordedSample, SessionWriter, RR_UNITS_PER_MS
+from hrs_parser import is_hrs_advertisement
+from scan_policy import FirstHrsDevicePolicy, ScanStopPolicy
+from scan_service import ScanService, DUTY_CYCLES
+from advertisement_monitor import AdvertisementMonitor
+from broadcast import BroadcastServer, sample_to_json
+import metrics
+
+# 扫描设备的最长时间（秒）
+SCAN_TIMEOUT = 10.0
+
+# 连接过的设备缓存文件（与界面程序共用，未指定地址时连接最近连接的设备）
+DEVICE_CACHE_PATH = os.path.join(os.path.expanduser("~"), "XiaomiHype", "devices.json")
+
+STREAM_MAGIC = b"XHRL"
+STREAM_VERSION = 1
+STREAM_HEADER = Struct("<4sB")
+DEVICE_RECORD = Struct("<cBB")
+SAMPLE_RECORD = Struct("<cBqHBB")
+RR_VALUE = Struct("<H")
+
+RECORD_DEVICE = b"D"
+RECORD_SAMPLE = b"S"
+
+# 二进制流的设备编号为一个字节
+MAX_STREAM_DEVICES = 256
+
+
+class StreamFormatError(ValueError):
+    """二进制样本流格式错误"""
+
+
+def _encode_contact(sensor_contact):
+    if sensor_contact is None:
+        return 0
+    return 2 if sensor_contact else 1
+
+
+class JsonLinesSink:
+    """把样本按JSON行写入文本流"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.samples_written = 0
+
+    def write(self, timestamp, address, measurement):
+        self.stream.write(sample_to_json(
+            timestamp, address, measurement.heart_rate, measurement.sensor_contact, measurement.rr_intervals
+        ) + "\n")
+        # 每个样本立即刷新，下游程序（管道、tail -f）能实时读到
+        self.stream.flush()
+        self.samples_written += 1
+
+    def close(self):
+        self.stream.flush()
+
+
+class BinarySink:
+    """把样本按紧凑的二进制记录写入字节流"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.samples_written = 0
+        # 超出设备编号范围而丢弃的样本数
+        self.samples_dropped = 0
+        self._devices = {}  # key: address, value: 设备编号
+        self.stream.write(STREAM_HEADER.pack(STREAM_MAGIC, STREAM_VERSION))
+
+    def write(self, timestamp, address, measurement):
+        record = bytearray()
+        device_index = self._devices.get(address)
+        if device_index is None:
+            if len(self._devices) >= MAX_STREAM_DEVICES:
+                if not self.samples_dropped:
+                    print(f"二进制流最多支持 {MAX_STREAM_DEVICES} 台设备，之后出现的设备不输出")
+                self.samples_dropped += 1
+                return
+            device_index = self._devices[address] = len(self._devices)
+            encoded = address.encode("utf-8")
+            record += DEVICE_RECORD.pack(RECORD_DEVICE, device_index, len(encoded)) + encoded
+        rr_intervals = measurement.rr_intervals[:255]
+        record += SAMPLE_RECORD.pack(
+            RECORD_SAMPLE, device_index, int(round(timestamp * 1000)),
+            min(measurement.heart_rate, 0xFFFF), _encode_contact(measurement.sensor_contact),
+            len(rr_intervals),
+        )
+        for rr in rr_intervals:
+            record += RR_VALUE.pack(min(int(round(rr * RR_UNITS_PER_MS)), 0xFFFF))
+        self.stream.write(record)
+        self.stream.flush()
+        self.samples_written += 1
+
+    def close(self):
+        self.stream.flush()
+
+
+def _read_exact(stream, size):
+    data = stream.read(size)
+    if len(data) < size:
+        raise EOFError
+    return data
+
+
+def read_binary_stream(stream):
+    """逐个读取二进制样本流中的样本（RecordedSample），流末尾不完整的记录被忽略"""
+    try:
+        magic, version = STREAM_HEADER.unpack(_read_exact(stream, STREAM_HEADER.size))
+    except EOFError:
+        return
+    if magic != STREAM_MAGIC:
+        raise StreamFormatError("不是心率样本流")
+    if version != STREAM_VERSION:
+        raise StreamFormatError(f"不支持的样本流版本: {version}")
+
+    addresses = {}
+    while True:
+        try:
+            record_type = _read_exact(stream, 1)
+            if record_type == RECORD_DEVICE:
+                device_index, length = DEVICE_RECORD.unpack(
+                    record_type + _read_exact(stream, DEVICE_RECORD.size - 1)
+                )[1:]
+                addresses[device_index] = _read_exact(stream, length).decode("utf-8")
+            elif record_type == RECORD_SAMPLE:
+                _, device_index, timestamp, heart_rate, flags, count = SAMPLE_RECORD.unpack(
+                    record_type + _read_exact(stream, SAMPLE_RECORD.size - 1)
+                )
+                rr_data = _read_exact(stream, RR_VALUE.size * count)
+                rr_intervals = tuple(
+                    value / RR_UNITS_PER_MS for (value,) in RR_VALUE.iter_unpack(rr_data)
+                )
+                contact = flags & 0x03
+                sensor_contact = None if contact == 0 else contact == 2
+                yield RecordedSample(
+                    timestamp / 1000, heart_rate, sensor_contact, rr_intervals,
+                    addresses.get(device_index, ""),
+                )
+            else:
+                raise StreamFormatError(f"未知的记录类型: {record_type!r}")
+        except EOFError:
+            return
+
+
+class _AllAddressesPolicy(ScanStopPolicy):
+    """所有指定地址的设备都出现后停止"""
+
+    def __init__(self, addresses):
+        self.remaining = {address.upper() for address in addresses}
+
+    def should_stop(self, device, advertisement_data, is_hrs):
+        self.remaining.discard(device.address.upper())
+        return not self.remaining
+
+
+async def scan_for_devices(backend, addresses=(), connect_all=False, timeout=SCAN_TIMEOUT):
+    """扫描要连接的设备，返回 {地址: (设备, RSSI)}
+
+    指定了地址时只返回这些设备，全部出现后立即停止；
+    否则返回支持HRS的设备，connect_all为False时发现第一个就停止。
+    """
+    wanted = {address.upper() for address in addresses}
+    if wanted:
+        stop_policy = _AllAddressesPolicy(wanted)
+    elif connect_all:
+        stop_policy = ScanStopPolicy()
+    else:
+        stop_policy = FirstHrsDevicePolicy()
+
+    found = {}
+    stop_event = asyncio.Event()
+
+    def callback(device, advertisement_data):
+        metrics.ADVERTISEMENTS_RECEIVED.inc()
+        is_hrs = is_hrs_advertisement(advertisement_data)
+        if (device.address.upper() in wanted) if wanted else is_hrs:
+            found[device.address] = (device, getattr(advertisement_data, "rssi", None))
+        if stop_policy.should_stop(device, advertisement_data, is_hrs):
+            stop_event.set()
+
+    # 不使用系统蓝牙栈的服务UUID过滤：部分手环只在服务数据中广播HRS
+    scanner = backend.create_scanner(callback)
+    await scanner.start()
+    try:
+        await asyncio.wait_for(stop_event.wait(), timeout)
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        await scanner.stop()
+    return found
+
+
+class HeadlessMonitor:
+    """无界面的心率监测：扫描、连接并把样本写入输出"""
+
+    def __init__(self, backend, sink, addresses=(), connect_all=False, scan_timeout=SCAN_TIMEOUT,
+                 device_cache=None, recorder=None, auto_reconnect=True, max_samples=None,
+                 broadcast_server=None, advertisements_only=False):
+        self.backend = backend
+        # sink为None时不输出样本（例如只通过广播服务提供数据）
+        self.sink = sink
+        self.addresses = list(addresses)
+        self.connect_all = connect_all
+        self.scan_timeout = scan_timeout
+        self.device_cache = device_cache
+        self.recorder = recorder
+        self.broadcast_server = broadcast_server
+        self.auto_reconnect = auto_reconnect
+        # 收到指定数量的样本后退出（None表示一直运行）
+        self.max_samples = max_samples
+        self.samples_received = 0
+        self.device_rssi = {}  # key: device address, value: 扫描时的RSSI
+        # 团体广告监测：不连接，只从广告中读取心率
+        self.advertisements_only = advertisements_only
+        self.advertisement_monitor = None
+
+        policy = ReconnectPolicy() if auto_reconnect else ReconnectPolicy(max_attempts=0)
+        self.connection_pool = ConnectionPool(
+            on_sample=self._on_sample, on_status=self._on_status, backend=backend,
+            reconnect_policy=policy,
+        )
+        self._stop_event = None
+
+    def stop(self):
+        """请求退出（可在信号处理函数中调用）"""
+        if self._stop_event is not None:
+            self._stop_event.set()
+
+    async def run(self, duration=None):
+        """扫描并连接设备，运行到duration秒、收到足够的样本或调用stop()，返回收到的样本数"""
+        self._stop_event = asyncio.Event()
+        if self.broadcast_server is not None:
+            await self.broadcast_server.start()
+            print(f"心率广播: tcp={self.broadcast_server.port}, websocket={self.broadcast_server.websocket_port}")
+        flush_task = None
+        if self.recorder is not None:
+            flush_task = asyncio.ensure_future(self._flush_recorder())
+        try:
+            return await self._run(duration)
+        finally:
+            # 包括未找到或未能连接设备而提前返回的情况
+            if flush_task is not None:
+                flush_task.cancel()
+            if self.recorder is not None:
+                self.recorder.flush()
+            if self.sink is not None:
+                self.sink.close()
+            if self.broadcast_server is not None:
+                await self.broadcast_server.close()
+
+    async def _flush_recorder(self):
+        """没有新样本（例如设备断开重连）时也按间隔写出录制缓存"""
+        while True:
+            await asyncio.sleep(self.recorder.flush_interval)
+            self.recorder.flush_if_due()
+
+    async def _run(self, duration):
+        if self.advertisements_only:
+            return await self._run_advertisements(duration)
+        addresses = self.addresses
+        if not addresses and not self.connect_all and self.device_cache is not None:
+            preferred = self.device_cache.preferred()
+            if preferred:
+                print(f"查找上次连接的设备: {preferred}")
+                addresses = [preferred]
+
+        found = await scan_for_devices(self.backend, addresses, self.connect_all, self.scan_timeout)
+        if not found:
+            print("未找到可连接的心率设备")
+            return 0
+        for address, (device, rssi) in found.items():
+            self.device_rssi[address] = rssi
+            print(f"发现设备: {device.name or '未知设备'} ({address}), RSSI: {rssi}")
+
+        results = await asyncio.gather(
+            *(self.connection_pool.add(device) for device, _ in found.values())
+        )
+        if not any(session.is_connected for session in results):
+            await self.connection_pool.close_all()
+            return 0
+
+        try:
+            await asyncio.wait_for(self._stop_event.wait(), duration)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            await self.connection_pool.close_all()
+        return self.samples_received
+
+    async def _run_advertisements(self, duration):
+        """团体广告监测：连续扫描，直到duration秒、收到足够的样本或调用stop()"""
+        wanted = {address.upper() for address in self.addresses}
+
+        def on_heart_rate(address, timestamp, measurement):
+            if not wanted or address.upper() in wanted:
+                self._output(timestamp, address, measurement)
+
+        def on_stale(address):
+            if not wanted or address.upper() in wanted:
+                print(f"[{address}] 超过 {monitor.stale_after:g} 秒没有广告")
+
+        monitor = self.advertisement_monitor = AdvertisementMonitor(on_heart_rate, on_stale)
+
+        def on_advertisement(device, advertisement_data, is_hrs):
+            metrics.ADVERTISEMENTS_RECEIVED.inc()
+            if is_hrs:
+                monitor.ingest(device, advertisement_data)
+
+        service = ScanService(
+            self.backend, DUTY_CYCLES["aggressive"], on_advertisement=on_advertisement,
+            on_window_finished=monitor.sweep, on_error=lambda error: print(f"扫描失败，稍后重试: {error}"),
+        )
+        task = asyncio.ensure_future(service.run())
+        try:
+            await asyncio.wait_for(self._stop_event.wait(), duration)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            service.stop()
+            await task
+        print(f"广告: 收到 {monitor.packets} 条，重复 {monitor.duplicates} 条，手环 {len(monitor)} 台")
+        return self.samples_received
+
+    def _on_sample(self, session, timestamp, heart_rate):
+        """连接池收到心率样本"""
+        self._output(timestamp, session.address, session.last_measurement)
+
+    def _output(self, timestamp, address, measurement):
+        """把一个样本写入输出、广播和录制文件"""
+        heart_rate = measurement.heart_rate
+        self.samples_received += 1
+        if self.sink is not None:
+            try:
+                self.sink.write(timestamp, address, measurement)
+            except BrokenPipeError:
+                # 下游程序已退出（例如 | head）
+                self.stop()
+                return
+        if self.broadcast_server is not None:
+            self.broadcast_server.publish(
+                timestamp, heart_rate, address, measurement.sensor_contact, measurement.rr_intervals
+            )
+        if self.recorder is not None:
+            self.recorder.write(
+                timestamp, heart_rate, measurement.sensor_contact, measurement.rr_intervals, address
+            )
+        if self.max_samples is not None and self.samples_received >= self.max_samples:
+            self.stop()
+
+    def _on_status(self, session, status, connected):
+        """连接池会话状态变化"""
+        print(f"[{session.address}] {status}")
+        if connected:
+            if self.device_cache is not None:
+                self.device_cache.remember(
+                    session.address, session.name, self.device_rssi.get(session.address), supports_hrs=True
+                )
+        elif status == "连接已断开" and not self.auto_reconnect:
+            if not self.connection_pool.connected_sessions():
+                self.stop()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="无界面心率监测：把心率样本输出为JSON行或二进制流")
+    parser.add_argument("--address", action="append", default=[],
+                        help="要连接的设备地址（可重复指定）；不指定时连接最近连接的设备或第一个HRS设备")
+    parser.add_argument("--all", action="store_true", help="连接扫描到的所有HRS设备")
+    parser.add_argument("--advertisements", action="store_true",
+                        help="团体广告监测：不连接设备，从广告中读取附近所有手环的心率")
+    parser.add_argument("--format", choices=("jsonl", "binary", "none"), default="jsonl",
+                        help="输出格式，none表示不输出样本（配合广播服务使用）")
+    parser.add_argument("--output", default="-", help="输出文件，- 表示标准输出")
+    parser.add_argument("--record", help="同时录制到会话文件（.xhr）")
+    parser.add_argument("--duration", type=float, help="运行时长（秒），默认一直运行")
+    parser.add_argument("--samples", type=int, help="收到指定数量的样本后退出")
+    parser.add_argument("--scan-timeout", type=float, default=SCAN_TIMEOUT, help="最长扫描时间（秒）")
+    parser.add_argument("--no-reconnect", action="store_true", help="断开后不自动重连，所有设备断开后退出")
+    parser.add_argument("--device-cache", default=DEVICE_CACHE_PATH, help="设备缓存文件，空字符串表示不使用")
+    parser.add_argument("--metrics-port", type=int, help="启动本地指标端点")
+    parser.add_argument("--broadcast-port", type=int, help="启动本地TCP心率广播（每行一条JSON）")
+    parser.add_argument("--websocket-port", type=int, help="启动本地WebSocket心率广播")
+    parser.add_argument("--simulate", action="store_true", help="使用进程内模拟手环")
+    parser.add_argument("--bands", type=int, default=1, help="模拟手环数量（--simulate）")
+    parser.add_argument("--notify-rate", type=float, default=1.0, help="模拟手环每秒通知次数（--simulate）")
+    parser.add_argument("--advertisement-rate", type=float, default=5.0, help="模拟手环每秒广告次数（--simulate）")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    stream = sink = None
+    if args.format != "none":
+        if args.output == "-":
+            stream = sys.stdout.buffer if args.format == "binary" else sys.stdout
+            # 标准输出只用于样本数据，其他模块打印的状态信息改为输出到标准错误
+            sys.stdout = sys.stderr
+        elif args.format == "binary":
+            stream = open(args.output, "wb")
+        else:
+            stream = open(args.output, "w", encoding="utf-8")
+        sink = BinarySink(stream) if args.format == "binary" else JsonLinesSink(stream)
+
+    if args.simulate:
+        backend = create_backend(
+            "simulated", count=args.bands, notify_rate=args.notify_rate,
+            advertise_heart_rate=args.advertisements, advertisement_rate=args.advertisement_rate,
+        )
+        # 模拟手环不写入真实设备缓存
+        device_cache = None
+    else:
+        backend = create_backend("bleak")
+        device_cache = DeviceCache(args.device_cache) if args.device_cache else None
+
+    recorder = SessionWriter(args.record) if args.record else None
+    broadcast_server = None
+    if args.broadcast_port is not None or args.websocket_port is not None:
+        broadcast_server = BroadcastServer(args.broadcast_port, args.websocket_port)
+    monitor = HeadlessMonitor(
+        backend, sink, addresses=args.address, connect_all=args.all,
+        scan_timeout=args.scan_timeout, device_cache=device_cache, recorder=recorder,
+        auto_reconnect=not args.no_reconnect, max_samples=args.samples, broadcast_server=broadcast_server,
+        advertisements_only=args.advertisements,
+    )
+
+    metrics_server = None
+    if args.metrics_port is not None:
+        metrics_server = metrics.MetricsServer(args.metrics_port).start()
+        print(f"指标端点: http://127.0.0.1:{metrics_server.port}/metrics")
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signum, monitor.stop)
+            except (NotImplementedError, RuntimeError):
+                # Windows的事件循环不支持信号处理函数，Ctrl+C以KeyboardInterrupt结束
+                pass
+        return await monitor.run(args.duration)
+
+    started_at = time.perf_counter()
+    try:
+        count = asyncio.run(run())
+    except KeyboardInterrupt:
+        count = monitor.samples_received
+    finally:
+        if recorder is not None:
+            recorder.close()
+        if metrics_server is not None:
+            metrics_server.stop()
+        if stream is not None and stream is not sys.__stdout__ and stream is not getattr(sys.__stdout__, "buffer", None):
+            stream.close()
+    print(f"共输出 {count} 个样本，用时 {time.perf_counter() - started_at:.1f} 秒")
+    return 0 if count else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
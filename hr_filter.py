@@ -0,0 +1,149 @@
+"""
+心率值过滤
+
+位于解析和显示之间，避免接触不良和偶发的错误值让悬浮窗跳动：
+- 接触检测：设备报告未接触（sensor_contact为False）时丢弃该值，并清空中值窗口
+- 合理范围：超出[min_hr, max_hr]的值（如未佩戴时的0）直接丢弃
+- 滑动中值：最近window个值的中值，去除持续时间短于半个窗口的尖峰
+- 变化速率：相邻两次输出的变化不超过max_slew bpm/秒，真实的快速变化以该速率跟随
+超过gap_seconds没有数据后重新开始，第一个值直接输出，不与断开前的数据混合。
+
+中值用树状数组（Fenwick树）按心率值计数，插入、移出和查询第k小的值都是O(log V)
+（V为心率取值范围，约256），单个样本的处理耗时与窗口长度无关。
+本模块不依赖Qt。
+"""
+from collections import deque
+
+# 合理的心率范围（bpm）
+MIN_HEART_RATE = 30
+MAX_HEART_RATE = 220
+
+# 中值窗口长度（样本数），1 Hz通知时相当于最多2秒的尖峰会被去除
+MEDIAN_WINDOW = 5
+
+# 相邻两次输出允许的最大变化速率（bpm/秒）
+MAX_SLEW = 10.0
+
+# 超过该时长没有数据视为数据中断（秒）
+GAP_SECONDS = 5.0
+
+
+class RunningMedian:
+    """滑动窗口中值，值为[0, max_value]内的整数"""
+
+    def __init__(self, window, max_value=MAX_HEART_RATE):
+        self.window = window
+        self._size = max_value + 1
+        self._tree = [0] * (self._size + 1)
+        # 不超过取值范围的最大2的幂，用于按位下降查找第k小的值
+        self._top_bit = 1 << (self._size.bit_length() - 1)
+        self._values = deque()
+
+    def __len__(self):
+        return len(self._values)
+
+    def clear(self):
+        values = self._values
+        while values:
+            self._update(values.pop(), -1)
+
+    def _update(self, value, delta):
+        index = value + 1
+        tree = self._tree
+        size = self._size
+        while index <= size:
+            tree[index] += delta
+            index += index & -index
+
+    def _kth(self, k):
+        """第k小的值（k从1开始）"""
+        tree = self._tree
+        position = 0
+        bit = self._top_bit
+        while bit:
+            candidate = position + bit
+            if candidate <= self._size and tree[candidate] < k:
+                position = candidate
+                k -= tree[candidate]
+            bit >>= 1
+        return position
+
+    def add(self, value):
+        """加入一个值，窗口已满时移出最旧的值，返回当前中值"""
+        values = self._values
+        if len(values) == self.window:
+            self._update(values.popleft(), -1)
+        values.append(value)
+        self._update(value, 1)
+        return self.median()
+
+    def median(self):
+        """当前窗口的中值，偶数个值时取中间两个值的平均（四舍五入）"""
+        count = len(self._values)
+        if not count:
+            return None
+        low = self._kth((count + 1) // 2)
+        if count % 2:
+            return low
+        return (low + self._kth(count // 2 + 1) + 1) // 2
+
+
+class HeartRateFilter:
+    """单个设备的心率值过滤器，update()返回要显示的心率，丢弃时返回None"""
+
+    def __init__(self, window=MEDIAN_WINDOW, min_hr=MIN_HEART_RATE, max_hr=MAX_HEART_RATE,
+                 max_slew=MAX_SLEW, gap_seconds=GAP_SECONDS):
+        self.min_hr = min_hr
+        self.max_hr = max_hr
+        self.max_slew = max_slew
+        self.gap_seconds = gap_seconds
+        self._median = RunningMedian(max(1, window), max_hr)
+        self._last_output = None
+        self._last_timestamp = None
+
+        # 计数器
+        self.accepted = 0
+        self.rejected_no_contact = 0
+        self.rejected_implausible = 0
+        self.slew_limited = 0
+
+    @property
+    def rejected(self):
+        return self.rejected_no_contact + self.rejected_implausible
+
+    def reset(self):
+        """清空窗口，下一个值直接输出"""
+        self._median.clear()
+        self._last_output = None
+        self._last_timestamp = None
+
+    def update(self, timestamp, heart_rate, sensor_contact=None):
+        """处理一个心率值；sensor_contact为None表示设备不支持接触检测"""
+        if sensor_contact is False:
+            self.rejected_no_contact += 1
+            self.reset()
+            return None
+        if heart_rate < self.min_hr or heart_rate > self.max_hr:
+            self.rejected_implausible += 1
+            return None
+
+        last_timestamp = self._last_timestamp
+        if last_timestamp is not None and timestamp - last_timestamp > self.gap_seconds:
+            self.reset()
+            last_timestamp = None
+        self._last_timestamp = timestamp
+
+        output = self._median.add(heart_rate)
+        last_output = self._last_output
+        if last_output is not None and self.max_slew:
+            # 至少允许每个样本变化1 bpm，避免通知很密集时输出停住不动
+            limit = max(1, int(self.max_slew * (timestamp - last_timestamp)))
+            if output > last_output + limit:
+                output = last_output + limit
+                self.slew_limited += 1
+            elif output < last_output - limit:
+                output = last_output - limit
+                self.slew_limited += 1
+        self._last_output = output
+        self.accepted += 1
+        return output
@@ -0,0 +1,196 @@
+"""
+心率历史数据存储
+
+所有存储空间在创建时按容量一次性分配，长时间运行内存不会增长：
+- 原始数据：最近的全分辨率样本（时间戳 + 心率）
+- 1秒档：每秒一个点（平均/最小/最大心率）
+- 1分钟档：每分钟一个点（平均/最小/最大心率）
+
+追加为O(1)，按时间范围查询为O(log n)定位 + 返回点数。
+
+内存占用（每个点：原始数据10字节，降采样档16字节）：
+- 原始数据（1 Hz）：约 36 KB/小时
+- 1秒档：约 57.6 KB/小时
+- 1分钟档：约 0.94 KB/小时
+默认容量（原始1小时、1秒档24小时、1分钟档7天）共预分配约 1.58 MB。
+"""
+from array import array
+
+
+class _RawRing:
+    """全分辨率样本环形存储"""
+    __slots__ = ("capacity", "timestamps", "values", "start", "size")
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.timestamps = array('d', bytes(8 * capacity))
+        self.values = array('H', bytes(2 * capacity))
+        self.start = 0
+        self.size = 0
+
+    def append(self, timestamp, value):
+        if self.size < self.capacity:
+            slot = (self.start + self.size) % self.capacity
+            self.size += 1
+        else:
+            # 已满时覆盖最旧的样本
+            slot = self.start
+            self.start = (self.start + 1) % self.capacity
+        self.timestamps[slot] = timestamp
+        self.values[slot] = value
+
+    def timestamp_at(self, index):
+        return self.timestamps[(self.start + index) % self.capacity]
+
+    def bisect(self, timestamp):
+        """返回第一个时间戳不小于timestamp的逻辑下标"""
+        low, high = 0, self.size
+        while low < high:
+            middle = (low + high) // 2
+            if self.timestamp_at(middle) < timestamp:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def slots(self, start_index, end_index):
+        """逻辑下标区间对应的物理下标"""
+        for index in range(start_index, end_index):
+            yield (self.start + index) % self.capacity
+
+
+class _TierRing(_RawRing):
+    """降采样档环形存储（平均/最小/最大）"""
+    __slots__ = ("minimums", "maximums", "interval",
+                 "bucket_start", "bucket_sum", "bucket_count", "bucket_min", "bucket_max")
+
+    def __init__(self, capacity, interval):
+        super().__init__(capacity)
+        self.values = array('f', bytes(4 * capacity))
+        self.minimums = array('H', bytes(2 * capacity))
+        self.maximums = array('H', bytes(2 * capacity))
+        self.interval = interval
+        self.bucket_start = None
+        self.bucket_sum = 0
+        self.bucket_count = 0
+        self.bucket_min = 0
+        self.bucket_max = 0
+
+    def add(self, timestamp, value):
+        """把一个样本累加到当前时间桶，跨入新桶时写出上一个桶"""
+        bucket_start = timestamp - timestamp % self.interval
+        if bucket_start != self.bucket_start:
+            self.flush()
+            self.bucket_start = bucket_start
+            self.bucket_sum = value
+            self.bucket_count = 1
+            self.bucket_min = value
+            self.bucket_max = value
+            return
+        self.bucket_sum += value
+        self.bucket_count += 1
+        if value < self.bucket_min:
+            self.bucket_min = value
+        elif value > self.bucket_max:
+            self.bucket_max = value
+
+    def flush(self):
+        """把当前时间桶写入存储"""
+        if not self.bucket_count:
+            return
+        if self.size < self.capacity:
+            slot = (self.start + self.size) % self.capacity
+            self.size += 1
+        else:
+            slot = self.start
+            self.start = (self.start + 1) % self.capacity
+        self.timestamps[slot] = self.bucket_start
+        self.values[slot] = self.bucket_sum / self.bucket_count
+        self.minimums[slot] = self.bucket_min
+        self.maximums[slot] = self.bucket_max
+        self.bucket_count = 0
+
+
+class HeartRateHistory:
+    """固定内存的心率时间序列，带1秒和1分钟降采样档"""
+
+    TIERS = ("raw", "1s", "1min")
+
+    def __init__(self, raw_capacity=3600, second_capacity=86400, minute_capacity=10080):
+        self._raw = _RawRing(raw_capacity)
+        self._seconds = _TierRing(second_capacity, 1.0)
+        self._minutes = _TierRing(minute_capacity, 60.0)
+        self.last_timestamp = None
+
+    def __len__(self):
+        """全分辨率样本数"""
+        return self._raw.size
+
+    def append(self, timestamp, heart_rate):
+        """追加一个样本，时间戳应单调不减"""
+        if self.last_timestamp is not None and timestamp < self.last_timestamp:
+            timestamp = self.last_timestamp
+        self.last_timestamp = timestamp
+        self._raw.append(timestamp, heart_rate)
+        self._seconds.add(timestamp, heart_rate)
+        self._minutes.add(timestamp, heart_rate)
+
+    def query(self, start, end, tier="raw"):
+        """
+        查询[start, end)时间范围内的数据
+        tier为"raw"时返回[(时间戳, 心率), ...]，
+        为"1s"或"1min"时返回[(时间桶起点, 平均, 最小, 最大), ...]
+        """
+        if tier == "raw":
+            ring = self._raw
+            first = ring.bisect(start)
+            last = ring.bisect(end)
+            return [(ring.timestamps[slot], ring.values[slot]) for slot in ring.slots(first, last)]
+
+        ring = self._seconds if tier == "1s" else self._minutes
+        if tier not in ("1s", "1min"):
+            raise ValueError(f"未知的数据档位: {tier}")
+        first = ring.bisect(start)
+        last = ring.bisect(end)
+        points = [
+            (ring.timestamps[slot], ring.values[slot], ring.minimums[slot], ring.maximums[slot])
+            for slot in ring.slots(first, last)
+        ]
+        # 尚未写出的当前时间桶也返回，保证能查到最新数据
+        if ring.bucket_count and start <= ring.bucket_start < end:
+            points.append((
+                ring.bucket_start, ring.bucket_sum / ring.bucket_count,
+                ring.bucket_min, ring.bucket_max,
+            ))
+        return points
+
+    def query_auto(self, start, end, max_points=600):
+        """按点数上限自动选择最细的可用档位查询"""
+        span = end - start
+        for tier, interval, ring in (("raw", None, self._raw), ("1s", 1.0, self._seconds)):
+            # 原始数据只有在覆盖整个查询范围时才使用
+            covered = ring.size and ring.timestamp_at(0) <= start
+            if interval is None:
+                if covered and ring.bisect(end) - ring.bisect(start) <= max_points:
+                    return tier, self.query(start, end, tier)
+            elif covered and span / interval <= max_points:
+                return tier, self.query(start, end, tier)
+        return "1min", self.query(start, end, "1min")
+
+    def latest(self):
+        """最新的全分辨率样本，没有数据时返回None"""
+        if not self._raw.size:
+            return None
+        slot = (self._raw.start + self._raw.size - 1) % self._raw.capacity
+        return self._raw.timestamps[slot], self._raw.values[slot]
+
+    def memory_bytes(self):
+        """预分配的存储空间（字节）"""
+        total = 0
+        for ring in (self._raw, self._seconds, self._minutes):
+            for column in (ring.timestamps, ring.values):
+                total += column.itemsize * len(column)
+        for ring in (self._seconds, self._minutes):
+            for column in (ring.minimums, ring.maximums):
+                total += column.itemsize * len(column)
+        return total
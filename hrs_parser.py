@@ -0,0 +1,238 @@
+"""
+心率测量（0x2A37）数据解析
+
+按照蓝牙HRS协议解析心率测量特征值的全部字段：
+- 标志位 bit0: 心率值格式（0=UINT8, 1=UINT16）
+- 标志位 bit1-2: 传感器接触状态（bit2=是否支持, bit1=是否接触）
+- 标志位 bit3: 是否包含能量消耗（UINT16，单位kJ）
+- 标志位 bit4: 是否包含RR间期（UINT16，单位1/1024秒，可有多个）
+
+解析直接在原始缓冲区（bytes/bytearray/memoryview）上按下标读取，不产生切片拷贝。
+GATT通知和广告服务数据共用同一个解析函数。
+"""
+from array import array
+from struct import Struct
+
+# HRS服务和特征值UUID
+HRS_SERVICE_UUID = "0000180d-0000-1000-8000-00805f9b34fb"
+HEART_RATE_CHAR_UUID = "00002a37-0000-1000-8000-00805f9b34fb"
+HRS_SERVICE_SHORT_UUID = 0x180D
+HEART_RATE_MEASUREMENT_CHAR_SHORT_UUID = 0x2A37
+
+# 标志位
+FLAG_HEART_RATE_UINT16 = 0x01
+FLAG_SENSOR_CONTACT_DETECTED = 0x02
+FLAG_SENSOR_CONTACT_SUPPORTED = 0x04
+FLAG_ENERGY_EXPENDED = 0x08
+FLAG_RR_INTERVALS = 0x10
+
+# 传感器接触状态取值（批量解析的数组中使用）
+CONTACT_UNSUPPORTED = -1
+CONTACT_NOT_DETECTED = 0
+CONTACT_DETECTED = 1
+
+# RR间期单位换算：1/1024秒 -> 毫秒
+RR_UNIT_MS = 1000.0 / 1024.0
+
+_UINT16 = Struct('<H')
+
+
+class HrsParseError(ValueError):
+    """心率测量数据格式错误"""
+
+
+class HeartRateMeasurement:
+    """一次心率测量的解析结果"""
+    __slots__ = ("flags", "heart_rate", "sensor_contact", "energy_expended", "rr_intervals")
+
+    def __init__(self, flags, heart_rate, sensor_contact=None, energy_expended=None, rr_intervals=()):
+        self.flags = flags
+        self.heart_rate = heart_rate
+        # None表示设备不支持接触检测，否则为是否接触
+        self.sensor_contact = sensor_contact
+        # 累计能量消耗（kJ），不包含时为None
+        self.energy_expended = energy_expended
+        # RR间期（毫秒）
+        self.rr_intervals = rr_intervals
+
+    def __repr__(self):
+        return (
+            f"HeartRateMeasurement(heart_rate={self.heart_rate}, "
+            f"sensor_contact={self.sensor_contact}, "
+            f"energy_expended={self.energy_expended}, "
+            f"rr_intervals={self.rr_intervals})"
+        )
+
+
+def _as_buffer(data):
+    """bytes/bytearray/memoryview直接使用，其他支持缓冲区协议的对象包装为memoryview（均不拷贝）"""
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        return data
+    return memoryview(data)
+
+
+_rr_structs = {}
+
+
+def _rr_struct(count):
+    """按RR间期个数缓存的解包器"""
+    unpacker = _rr_structs.get(count)
+    if unpacker is None:
+        unpacker = _rr_structs[count] = Struct(f'<{count}H')
+    return unpacker
+
+
+def parse_heart_rate_measurement(data):
+    """解析一条0x2A37数据，返回HeartRateMeasurement，格式错误时抛出HrsParseError"""
+    view = _as_buffer(data)
+    length = len(view)
+    if length < 2:
+        raise HrsParseError(f"数据长度不足: {length} 字节")
+
+    flags = view[0]
+    if flags & FLAG_HEART_RATE_UINT16:
+        if length < 3:
+            raise HrsParseError("UINT16心率值不完整")
+        heart_rate = view[1] | (view[2] << 8)
+        offset = 3
+    else:
+        heart_rate = view[1]
+        offset = 2
+
+    sensor_contact = None
+    if flags & FLAG_SENSOR_CONTACT_SUPPORTED:
+        sensor_contact = bool(flags & FLAG_SENSOR_CONTACT_DETECTED)
+
+    energy_expended = None
+    if flags & FLAG_ENERGY_EXPENDED:
+        if length < offset + 2:
+            raise HrsParseError("能量消耗字段不完整")
+        energy_expended = view[offset] | (view[offset + 1] << 8)
+        offset += 2
+
+    rr_intervals = ()
+    if flags & FLAG_RR_INTERVALS:
+        count = (length - offset) >> 1
+        if count:
+            rr_intervals = tuple(
+                [value * RR_UNIT_MS for value in _rr_struct(count).unpack_from(view, offset)]
+            )
+
+    return HeartRateMeasurement(flags, heart_rate, sensor_contact, energy_expended, rr_intervals)
+
+
+def find_hrs_service_data(service_data):
+    """从广告服务数据中查找HRS服务的数据，没有时返回None"""
+    if not service_data:
+        return None
+    for uuid, data in service_data.items():
+        if uuid.startswith("0x180d") or uuid == str(HRS_SERVICE_SHORT_UUID) or uuid == HRS_SERVICE_UUID:
+            return data
+    return None
+
+
+def is_hrs_advertisement(advertisement_data):
+    """检查广告数据是否表明设备支持HRS服务"""
+    # 检查服务UUID列表中是否包含HRS服务
+    if HRS_SERVICE_UUID.lower() in advertisement_data.service_uuids:
+        return True
+
+    # 检查服务数据中是否包含HRS服务
+    return find_hrs_service_data(getattr(advertisement_data, 'service_data', None)) is not None
+
+
+class HeartRateBatch:
+    """批量解析结果，各字段为紧凑的数值数组（支持缓冲区协议，可零拷贝转为NumPy数组）"""
+
+    def __init__(self):
+        self.heart_rate = array('H')
+        # 取值见CONTACT_*常量
+        self.sensor_contact = array('b')
+        # 不包含能量消耗时为-1
+        self.energy_expended = array('l')
+        # 所有RR间期（毫秒）依次存放，第i条数据的RR间期为
+        # rr_intervals[rr_offsets[i]:rr_offsets[i + 1]]
+        self.rr_intervals = array('d')
+        self.rr_offsets = array('L', [0])
+        # 格式错误被跳过的数据在输入中的下标
+        self.errors = []
+
+    def __len__(self):
+        return len(self.heart_rate)
+
+    def rr_intervals_of(self, index):
+        """第index条数据的RR间期"""
+        return self.rr_intervals[self.rr_offsets[index]:self.rr_offsets[index + 1]]
+
+    def to_numpy(self):
+        """转换为NumPy数组字典（需要安装numpy）"""
+        import numpy
+        return {
+            "heart_rate": numpy.frombuffer(self.heart_rate, dtype=numpy.uint16),
+            "sensor_contact": numpy.frombuffer(self.sensor_contact, dtype=numpy.int8),
+            "energy_expended": numpy.frombuffer(self.energy_expended, dtype=self.energy_expended.typecode),
+            "rr_intervals": numpy.frombuffer(self.rr_intervals, dtype=numpy.float64),
+            "rr_offsets": numpy.frombuffer(self.rr_offsets, dtype=self.rr_offsets.typecode),
+        }
+
+
+def parse_batch(payloads):
+    """批量解析多条0x2A37数据（用于离线处理录制的数据），格式错误的数据会被跳过"""
+    batch = HeartRateBatch()
+    heart_rates = []
+    contacts = []
+    energies = []
+    rr_raw = []
+    rr_ends = []
+    errors = batch.errors
+    rr_end = 0
+
+    # 按标志位预先计算接触状态，避免逐条分支
+    contact_by_flags = [
+        (CONTACT_DETECTED if flags & FLAG_SENSOR_CONTACT_DETECTED else CONTACT_NOT_DETECTED)
+        if flags & FLAG_SENSOR_CONTACT_SUPPORTED else CONTACT_UNSUPPORTED
+        for flags in range(256)
+    ]
+
+    for index, data in enumerate(payloads):
+        length = len(data)
+        if length < 2:
+            errors.append(index)
+            continue
+
+        flags = data[0]
+        if flags & FLAG_HEART_RATE_UINT16:
+            if length < 3:
+                errors.append(index)
+                continue
+            heart_rate = data[1] | (data[2] << 8)
+            offset = 3
+        else:
+            heart_rate = data[1]
+            offset = 2
+
+        energy = -1
+        if flags & FLAG_ENERGY_EXPENDED:
+            if length < offset + 2:
+                errors.append(index)
+                continue
+            energy = data[offset] | (data[offset + 1] << 8)
+            offset += 2
+
+        heart_rates.append(heart_rate)
+        contacts.append(contact_by_flags[flags])
+        energies.append(energy)
+        if flags & FLAG_RR_INTERVALS:
+            count = (length - offset) >> 1
+            if count:
+                rr_raw.extend(_rr_struct(count).unpack_from(data, offset))
+                rr_end += count
+        rr_ends.append(rr_end)
+
+    # 最后一次性转换为紧凑数组
+    batch.heart_rate.extend(heart_rates)
+    batch.sensor_contact.extend(contacts)
+    batch.energy_expended.extend(energies)
+    batch.rr_intervals.extend([value * RR_UNIT_MS for value in rr_raw])
+    batch.rr_offsets.extend(rr_ends)
+    return batch
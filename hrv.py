@@ -0,0 +1,189 @@
+"""
+流式心率变异性（HRV）分析
+
+对0x2A37数据中的RR间期做滑动窗口统计：RMSSD、SDNN、pNN50和平均心率。
+窗口按时间长度（默认最近60秒的心搏）滑动，每个心搏只做常数次加减：
+进入窗口时加入累计量，离开窗口时减去，不重新遍历窗口，单次更新的耗时与窗口长度无关。
+
+RR间期按协议原始单位（1/1024秒）取整后用整数累计，加减任意多次都不会产生浮点误差积累。
+超出合理范围的RR间期视为伪迹被丢弃，并中断逐搏差值链（伪迹前后的两个心搏不计算差值）；
+断线重连后同样调用mark_gap()中断差值链。
+本模块不依赖Qt。
+"""
+import math
+from array import array
+
+# RR间期单位换算：毫秒 <-> 1/1024秒
+RR_UNITS_PER_MS = 1024.0 / 1000.0
+
+# 合理的RR间期范围（毫秒），对应约24~200 bpm
+MIN_RR_MS = 300.0
+MAX_RR_MS = 2500.0
+
+# pNN50阈值：相邻RR间期相差超过50毫秒（51.2个1/1024秒单位，即至少52）
+NN50_UNITS = 52
+
+# 差值数组中表示"与前一个心搏之间没有有效差值"
+_NO_DIFF = 1 << 30
+
+
+class HrvStats:
+    """某一时刻的HRV统计结果（毫秒 / 百分比 / bpm）"""
+    __slots__ = ("rmssd", "sdnn", "pnn50", "mean_hr", "beats")
+
+    def __init__(self, rmssd, sdnn, pnn50, mean_hr, beats):
+        self.rmssd = rmssd
+        self.sdnn = sdnn
+        self.pnn50 = pnn50
+        self.mean_hr = mean_hr
+        self.beats = beats
+
+    def __repr__(self):
+        return (
+            f"HrvStats(rmssd={self.rmssd:.1f}, sdnn={self.sdnn:.1f}, pnn50={self.pnn50:.1f}, "
+            f"mean_hr={self.mean_hr:.1f}, beats={self.beats})"
+        )
+
+
+class RollingHrv:
+    """滑动窗口HRV统计，每个心搏O(1)更新"""
+
+    def __init__(self, window_seconds=60.0, min_rr=MIN_RR_MS, max_rr=MAX_RR_MS):
+        self.window_seconds = window_seconds
+        self._window_units = int(window_seconds * 1024)
+        self._min_units = int(math.ceil(min_rr * RR_UNITS_PER_MS))
+        self._max_units = int(max_rr * RR_UNITS_PER_MS)
+        # 窗口内最多的心搏数由最短RR间期决定，存储空间一次性分配
+        capacity = self._window_units // self._min_units + 2
+        self._rr = array('l', [0]) * capacity
+        self._diffs = array('l', [0]) * capacity
+        self._capacity = capacity
+        self.rejected = 0
+        self.reset()
+
+    def reset(self):
+        """清空窗口"""
+        self._head = 0  # 最旧心搏的下标
+        self._count = 0
+        self._previous = None  # 上一个有效心搏的RR间期，None表示差值链已中断
+        # 窗口内RR间期的和与平方和
+        self._sum = 0
+        self._sum_squares = 0
+        # 窗口内有效逐搏差值（不含最旧心搏与其前一个心搏的差值）的个数、平方和与NN50个数
+        self._diff_count = 0
+        self._diff_squares = 0
+        self._nn50 = 0
+
+    def mark_gap(self):
+        """数据中断（断线、丢包）后调用，下一个心搏不与之前的心搏计算差值"""
+        self._previous = None
+
+    def add(self, rr_ms):
+        """加入一个RR间期（毫秒），伪迹返回False"""
+        rr = int(round(rr_ms * RR_UNITS_PER_MS))
+        if rr < self._min_units or rr > self._max_units:
+            self.rejected += 1
+            self._previous = None
+            return False
+
+        previous = self._previous
+        self._previous = rr
+        diff = _NO_DIFF if previous is None else rr - previous
+
+        # 窗口已满（按心搏数）时先移出最旧的心搏
+        if self._count == self._capacity:
+            self._evict()
+
+        # 窗口中第一个心搏的差值指向窗口外，不计入
+        if not self._count:
+            diff = _NO_DIFF
+        slot = (self._head + self._count) % self._capacity
+        self._rr[slot] = rr
+        self._diffs[slot] = diff
+        self._count += 1
+        self._sum += rr
+        self._sum_squares += rr * rr
+        if diff != _NO_DIFF:
+            self._add_diff(diff)
+
+        # 按时间长度移出超出窗口的心搏（均摊O(1)）
+        while self._sum > self._window_units and self._count > 1:
+            self._evict()
+        return True
+
+    def add_intervals(self, rr_intervals):
+        """加入一条测量数据中的所有RR间期"""
+        for rr_ms in rr_intervals:
+            self.add(rr_ms)
+
+    def _add_diff(self, diff):
+        self._diff_count += 1
+        self._diff_squares += diff * diff
+        if diff >= NN50_UNITS or diff <= -NN50_UNITS:
+            self._nn50 += 1
+
+    def _remove_diff(self, diff):
+        self._diff_count -= 1
+        self._diff_squares -= diff * diff
+        if diff >= NN50_UNITS or diff <= -NN50_UNITS:
+            self._nn50 -= 1
+
+    def _evict(self):
+        """移出最旧的心搏，新的最旧心搏与它之间的差值也不再属于窗口"""
+        head = self._head
+        rr = self._rr[head]
+        self._sum -= rr
+        self._sum_squares -= rr * rr
+        self._head = (head + 1) % self._capacity
+        self._count -= 1
+        if self._count:
+            diff = self._diffs[self._head]
+            if diff != _NO_DIFF:
+                self._remove_diff(diff)
+                self._diffs[self._head] = _NO_DIFF
+
+    @property
+    def beats(self):
+        """窗口内的心搏数"""
+        return self._count
+
+    @property
+    def mean_rr(self):
+        """平均RR间期（毫秒）"""
+        if not self._count:
+            return 0.0
+        return self._sum / self._count / RR_UNITS_PER_MS
+
+    @property
+    def mean_hr(self):
+        """平均心率（bpm，由平均RR间期换算）"""
+        if not self._sum:
+            return 0.0
+        return 60.0 * 1024 * self._count / self._sum
+
+    @property
+    def sdnn(self):
+        """RR间期的样本标准差（毫秒）"""
+        count = self._count
+        if count < 2:
+            return 0.0
+        variance = (count * self._sum_squares - self._sum * self._sum) / (count * (count - 1))
+        return math.sqrt(max(variance, 0)) / RR_UNITS_PER_MS
+
+    @property
+    def rmssd(self):
+        """相邻RR间期差值的均方根（毫秒）"""
+        if not self._diff_count:
+            return 0.0
+        return math.sqrt(self._diff_squares / self._diff_count) / RR_UNITS_PER_MS
+
+    @property
+    def pnn50(self):
+        """相邻RR间期相差超过50毫秒的比例（%）"""
+        if not self._diff_count:
+            return 0.0
+        return 100.0 * self._nn50 / self._diff_count
+
+    def stats(self):
+        """当前窗口的统计结果"""
+        return HrvStats(self.rmssd, self.sdnn, self.pnn50, self.mean_hr, self._count)
@@ -1,36 +1,193 @@
+import os
 import sys
+import time
+
+# 进程启动时间，用于统计冷启动到显示第一个心率值的耗时（需在导入Qt和bleak之前记录）
+PROCESS_STARTED_AT = time.perf_counter()
+
 import asyncio
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QLabel, QComboBox, QPushButton,
-    QVBoxLayout, QHBoxLayout, QSlider, QCheckBox, QDialog, QMessageBox, QGroupBox
+    QVBoxLayout, QHBoxLayout, QSlider, QCheckBox, QDialog, QMessageBox, QGroupBox,
+    QTableWidget, QTableWidgetItem, QHeaderView
 )
-from PyQt5.QtCore import QPoint
 from PyQt5.QtCore import Qt, QTimer, pyqtSignal, QThread
 from PyQt5.QtGui import QPalette, QColor
-from bleak import BleakScanner, BleakClient
-from bleak.backends.device import BLEDevice
-from bleak.backends.scanner import AdvertisementData
+from device_backend import create_backend
+from sample_buffer import SampleRingBuffer
+from ble_worker import BleWorkerThread, SHUTDOWN_TIMEOUT
+from connection_pool import ConnectionPool
+from hr_history import HeartRateHistory
+from hrv import RollingHrv
+from hr_filter import HeartRateFilter
+from session_recorder import SessionWriter
+from device_cache import DeviceCache
+from reconnect import ReconnectPolicy
+import connection_state
+from connection_state import ConnectionStateMachine
+import metrics
+from advertisement_filter import AdvertisementFilter
+from hrs_parser import (
+    HRS_SERVICE_UUID, HRS_SERVICE_SHORT_UUID,
+    HEART_RATE_MEASUREMENT_CHAR_SHORT_UUID, HeartRateMeasurement, HrsParseError,
+    parse_heart_rate_measurement, find_hrs_service_data, is_hrs_advertisement
+)
+from scan_policy import (
+    ScanStopPolicy, FirstHrsDevicePolicy, KnownAddressPolicy, RssiThresholdPolicy
+)
+from scan_service import ScanService, get_duty_cycle, STOP_TIMEOUT as SCAN_SERVICE_STOP_TIMEOUT
+from advertisement_monitor import AdvertisementMonitor
+from startup_profile import StartupProfiler
+from float_window import FLOAT_WINDOW_STYLES, GraphFloatWindow, create_float_window
 
-# HRS服务和特征值UUID
-HRS_SERVICE_UUID = "0000180d-0000-1000-8000-00805f9b34fb"
-HEART_RATE_CHAR_UUID = "00002a37-0000-1000-8000-00805f9b34fb"
-HRS_SERVICE_SHORT_UUID = 0x180D
-HEART_RATE_MEASUREMENT_CHAR_SHORT_UUID = 0x2A37
+# 模块导入完成的时间（启动耗时分析用）
+IMPORTS_DONE_AT = time.perf_counter()
 
-# 默认设备MAC地址（可配置）
+# 默认设备MAC地址（可配置），为空时使用设备缓存中最近连接的设备
 DEFAULT_DEVICE_MAC = ""
 
+# 启动时是否自动查找并连接默认设备（只扫描该地址，发现后立即停止扫描并连接）
+AUTO_CONNECT_ON_STARTUP = True
+
+# 连接过的设备缓存文件
+DEVICE_CACHE_PATH = os.path.join(os.path.expanduser("~"), "XiaomiHype", "devices.json")
+
+# 设备后端: "bleak"（真实蓝牙）或 "simulated"（进程内模拟手环，也可用 --simulate 启动参数指定）
+DEVICE_BACKEND = "bleak"
+
+# 是否让Qt与asyncio共用同一个事件循环（需要安装qasync，未安装时回退到定时器轮询）
+USE_INTEGRATED_EVENT_LOOP = True
+
+# 定时器轮询模式下处理事件循环的间隔（毫秒）
+EVENT_LOOP_POLL_INTERVAL_MS = 100
+
+# 是否在独立线程中运行蓝牙连接和心率解析，GUI按显示刷新率读取样本
+USE_BLE_IO_THREAD = False
+
+# 是否在独立进程中运行蓝牙扫描和连接（优先于USE_BLE_IO_THREAD），样本通过共享内存传给GUI进程
+USE_BLE_WORKER_PROCESS = False
+
+# 独立I/O线程/进程模式下GUI读取样本缓冲区的间隔（毫秒）
+DISPLAY_REFRESH_INTERVAL_MS = 33
+
+# 样本环形缓冲区容量
+SAMPLE_BUFFER_CAPACITY = 4096
+
+# 最长扫描时间（秒）
+SCAN_TIMEOUT = 5.0
+
+# 扫描提前结束策略: None（扫满SCAN_TIMEOUT）、"first_hrs"（发现第一个HRS设备）、
+# "known_address"（发现DEFAULT_DEVICE_MAC）、"rssi"（发现信号强于SCAN_RSSI_THRESHOLD的HRS设备）
+SCAN_STOP_POLICY = None
+SCAN_RSSI_THRESHOLD = -60
+
+# 常驻后台扫描的占空比: "low_power"（每30秒被动扫描2秒）、"balanced"（每12秒扫描4秒）、
+# "aggressive"（连续扫描），见scan_service.DUTY_CYCLES；None表示每次点击"扫描"时新建扫描线程
+SCAN_DUTY_CYCLE = "balanced"
+
+# 团体广告监测：不连接设备，从广告中同时跟踪附近所有手环的心率（连续扫描，按设备显示和输出）
+ADVERTISEMENT_MONITOR = False
+GROUP_REFRESH_INTERVAL_MS = 250
+
+# 是否让系统蓝牙栈只上报广播了HRS服务UUID的设备（后端支持时生效，不广播UUID的手环将无法被发现）
+SCAN_SERVICE_UUID_FILTER = False
+
+# 本地指标端点端口（http://127.0.0.1:端口/metrics），默认不启动，需要时设为端口号（如9464）
+METRICS_PORT = None
+
+# 本地心率广播端口（TCP每行一条JSON / WebSocket每帧一条JSON），默认不启动，需要时设为端口号（如9465 / 9466）
+BROADCAST_PORT = None
+BROADCAST_WEBSOCKET_PORT = None
+
+# 每个广播订阅者最多缓存的消息数，读得慢的订阅者只保留最近的消息
+BROADCAST_MAX_QUEUE = 64
+
+# 心率录制文件保存目录
+RECORDING_DIR = os.path.join(os.path.expanduser("~"), "XiaomiHype", "recordings")
+
+# 录制的样本最多缓存多少秒后写入文件（fsync在后台线程执行，不阻塞界面）
+RECORDING_FLUSH_INTERVAL = 10.0
+
+# 扫描线程中内容未变化的广告数据最短转发间隔（秒）
+ADVERTISEMENT_UNCHANGED_INTERVAL = 5.0
+
+# 设备意外断开后是否自动重连（带抖动的指数退避，不重新扫描）
+AUTO_RECONNECT = True
+
+# HRV统计窗口（秒）与开始显示所需的最少心搏数
+HRV_WINDOW_SECONDS = 60.0
+HRV_MIN_BEATS = 10
+
+# 显示前过滤心率值（接触检测、合理范围、滑动中值、变化速率限制），设为False时直接显示解析出的心率
+HEART_RATE_FILTER = True
+HEART_RATE_MEDIAN_WINDOW = 5
+HEART_RATE_MAX_SLEW = 10.0  # bpm/秒
+
+# 连接状态对应的界面文字
+CONNECTION_STATE_TEXT = {
+    connection_state.IDLE: "未连接",
+    connection_state.CONNECTING: "连接中...",
+    connection_state.SUBSCRIBING: "连接中...",
+    connection_state.CONNECTED: "已连接",
+    connection_state.RECONNECTING: "连接已断开",
+    connection_state.DISCONNECTING: "断开中...",
+    connection_state.CLOSED: "未连接",
+}
+
+# 关闭窗口时等待断开连接、关闭服务的最长时间（秒），超时后直接退出
+CLOSE_TIMEOUT = connection_state.DEFAULT_TIMEOUTS.teardown + 1.0
+
+# 快速启动：悬浮窗设置区域在第一次展开时才创建，指标端点在首次绘制之后才启动
+FAST_STARTUP = True
+
+
+def create_scan_stop_policy(name=None):
+    """根据配置名称创建扫描停止策略"""
+    if name == "first_hrs":
+        return FirstHrsDevicePolicy()
+    if name == "known_address":
+        return KnownAddressPolicy([DEFAULT_DEVICE_MAC])
+    if name == "rssi":
+        return RssiThresholdPolicy(SCAN_RSSI_THRESHOLD)
+    return ScanStopPolicy()
+
+
 class ScanThread(QThread):
     """扫描蓝牙设备的线程"""
     scan_finished = pyqtSignal(list)
     scan_failed = pyqtSignal(str)
-    advertisement_received = pyqtSignal(BLEDevice, AdvertisementData)
+    # 使用object类型，避免GUI线程为声明信号而在启动时导入bleak
+    advertisement_received = pyqtSignal(object, object)  # BLEDevice, AdvertisementData
+    device_found = pyqtSignal(object, bool)  # 设备, 是否支持HRS
+    
+    def __init__(self, backend, stop_policy=None, timeout=SCAN_TIMEOUT, parent=None):
+        super().__init__(parent)
+        self.backend = backend
+        self.stop_policy = stop_policy or ScanStopPolicy()
+        self.timeout = timeout
+        # 在扫描线程中过滤广告数据，只把有意义的变化转发给GUI线程
+        self.advertisement_filter = AdvertisementFilter(
+            unchanged_interval=ADVERTISEMENT_UNCHANGED_INTERVAL
+        )
+        # 从开始扫描到发现第一个可选设备的时间（秒）
+        self.time_to_first_device = None
+        self._loop = None
+        self._stop_event = None
+    
+    def stop(self):
+        """提前结束扫描（可在任意线程调用），扫描器会在时限内停止"""
+        loop = self._loop
+        if loop is not None and self._stop_event is not None and not loop.is_closed():
+            try:
+                loop.call_soon_threadsafe(self._stop_event.set)
+            except RuntimeError:
+                pass
     
     def run(self):
         """运行扫描任务"""
         try:
             # 创建新的事件循环
-            loop = asyncio.new_event_loop()
+            loop = self._loop = asyncio.new_event_loop()
             asyncio.set_event_loop(loop)
             
             # 扫描蓝牙设备并接收广告数据
@@ -45,158 +202,188 @@ class ScanThread(QThread):
         
         # 用于存储扫描到的设备
         discovered_devices = {}
+        hrs_addresses = set()
+        stop_event = self._stop_event = asyncio.Event()
+        started_at = time.perf_counter()
         
         def callback(device, advertisement_data):
             """广告数据回调函数"""
+            is_hrs = is_hrs_advertisement(advertisement_data)
+            is_new = device.address not in discovered_devices
             # 存储设备
             discovered_devices[device.address] = device
-            self.advertisement_received.emit(device, advertisement_data)
+            
+            # 新设备或新确认支持HRS的设备立即通知界面
+            if is_new or (is_hrs and device.address not in hrs_addresses):
+                if is_hrs:
+                    hrs_addresses.add(device.address)
+                if self.time_to_first_device is None:
+                    self.time_to_first_device = time.perf_counter() - started_at
+                    metrics.SCAN_TIME_TO_FIRST_DEVICE.set(self.time_to_first_device)
+                self.device_found.emit(device, is_hrs)
+            
+            metrics.ADVERTISEMENTS_RECEIVED.inc()
+            if self.advertisement_filter.accept(device, advertisement_data, is_hrs):
+                metrics.ADVERTISEMENTS_FORWARDED.inc()
+                self.advertisement_received.emit(device, advertisement_data)
+            
+            if self.stop_policy.should_stop(device, advertisement_data, is_hrs):
+                stop_event.set()
         
-        # 使用BleakScanner接收广告数据，设置超时时间为10秒
-        scanner = BleakScanner(callback)
+        if SCAN_SERVICE_UUID_FILTER:
+            # 由系统蓝牙栈过滤，不广播HRS服务的设备不会进入回调
+            scanner = self.backend.create_scanner(callback, service_uuids=[HRS_SERVICE_UUID])
+        else:
+            scanner = self.backend.create_scanner(callback)
         
         try:
-            # 开始扫描
+            # 开始扫描，满足停止策略或超时后结束
             await scanner.start()
-            # 减少扫描时间到5秒，提高连接速度
-            await asyncio.sleep(5.0)
+            try:
+                await asyncio.wait_for(stop_event.wait(), self.timeout)
+            except asyncio.TimeoutError:
+                pass
         except Exception as e:
             print(f"扫描过程中发生错误: {str(e)}")
             self.scan_failed.emit(str(e))
         finally:
-            await scanner.stop()
+            try:
+                await asyncio.wait_for(scanner.stop(), connection_state.DEFAULT_TIMEOUTS.cancel)
+            except asyncio.TimeoutError:
+                print("停止扫描超时")
+        
+        print(
+            f"广告数据: 收到 {self.advertisement_filter.received} 条，"
+            f"转发 {self.advertisement_filter.forwarded} 条"
+        )
         
         # 获取扫描到的所有设备
         devices = list(discovered_devices.values())
         self.scan_finished.emit(devices)
 
 
-class FloatWindow(QWidget):
-    """简约数字样式的悬浮窗"""
+class ScanServiceThread(QThread):
+    """常驻的后台扫描线程：事件循环和扫描器只创建一次，按占空比持续扫描并维护设备表"""
+    scan_finished = pyqtSignal(list)  # 一次boost结束
+    scan_failed = pyqtSignal(str)
+    advertisement_received = pyqtSignal(object, object)  # BLEDevice, AdvertisementData
+    device_found = pyqtSignal(object, bool)  # 设备, 是否支持HRS
+    device_lost = pyqtSignal(str)  # 设备地址
     
-    def __init__(self):
-        super().__init__()
-        
-        # 悬浮窗设置
-        self.is_topmost = True
-        self.is_fixed = False
-        self.window_size = 150
-        self.current_heart_rate = 0
-        
-        # 初始化界面
-        self.setup_ui()
-        
-    def setup_ui(self):
-        """设置悬浮窗界面"""
-        # 设置窗口属性
-        self.setWindowFlags(Qt.FramelessWindowHint | Qt.WindowStaysOnTopHint)
-        self.setAttribute(Qt.WA_TranslucentBackground)
-        
-        # 设置窗口大小
-        self.resize(self.window_size, self.window_size)
-        
-        # 创建布局
-        layout = QVBoxLayout(self)
-        layout.setContentsMargins(0, 0, 0, 0)
-        
-        # 创建心率显示标签
-        self.heart_rate_label = QLabel(self)
-        self.heart_rate_label.setAlignment(Qt.AlignCenter)
-        self.heart_rate_label.setStyleSheet(
-            f"font-size: {self.window_size // 2}px; "
-            f"font-weight: bold; "
-            f"color: red;"
+    def __init__(self, backend, duty_cycle, monitor=None, parent=None):
+        super().__init__(parent)
+        # 和ScanThread一样在扫描线程中过滤广告数据
+        self.advertisement_filter = AdvertisementFilter(
+            unchanged_interval=ADVERTISEMENT_UNCHANGED_INTERVAL
         )
-        self.heart_rate_label.setText("0")
-        
-        layout.addWidget(self.heart_rate_label)
-        
-        # 鼠标事件变量
-        self.dragging = False
-        self.drag_start_position = QPoint()
-        
-    def update_heart_rate(self, heart_rate):
-        """更新心率显示"""
-        self.current_heart_rate = heart_rate
-        self.heart_rate_label.setText(str(heart_rate))
-    
-    def set_topmost(self, is_topmost):
-        """设置窗口是否置顶"""
-        self.is_topmost = is_topmost
-        flags = self.windowFlags()
-        if is_topmost:
-            self.setWindowFlags(flags | Qt.WindowStaysOnTopHint)
-        else:
-            self.setWindowFlags(flags & ~Qt.WindowStaysOnTopHint)
-        self.show()
-    
-    def set_fixed(self, is_fixed):
-        """设置窗口是否固定"""
-        self.is_fixed = is_fixed
-    
-    def set_size(self, size):
-        """设置窗口大小"""
-        self.window_size = size
-        self.resize(size, size)
-        self.heart_rate_label.setStyleSheet(
-            f"font-size: {size // 2}px; "
-            f"font-weight: bold; "
-            f"color: red;"
+        # 团体广告监测：每条广告都在扫描线程中处理，界面按刷新率读取有变化的手环
+        self.monitor = monitor
+        self.service = ScanService(
+            backend, duty_cycle,
+            on_device_found=self.device_found.emit,
+            on_device_lost=self._on_device_lost,
+            on_advertisement=self._on_advertisement,
+            on_boost_finished=self.scan_finished.emit,
+            on_error=self.scan_failed.emit,
+            on_window_finished=monitor.sweep if monitor is not None else None,
+            service_uuids=[HRS_SERVICE_UUID] if SCAN_SERVICE_UUID_FILTER else None,
         )
-        # 确保窗口正确显示更新后的大小
-        if self.isVisible():
-            self.hide()
-            self.show()
-    
-    # 鼠标事件处理
-    def mousePressEvent(self, event):
-        """鼠标按下事件"""
-        if not self.is_fixed and event.button() == Qt.LeftButton:
-            self.dragging = True
-            self.drag_start_position = event.globalPos() - self.frameGeometry().topLeft()
-            event.accept()
-        super().mousePressEvent(event)
-    
-    def mouseMoveEvent(self, event):
-        """鼠标移动事件"""
-        if not self.is_fixed and self.dragging and event.buttons() & Qt.LeftButton:
-            new_position = event.globalPos() - self.drag_start_position
-            self.move(new_position)
-            event.accept()
-        super().mouseMoveEvent(event)
-    
-    def mouseReleaseEvent(self, event):
-        """鼠标释放事件"""
-        if event.button() == Qt.LeftButton:
-            self.dragging = False
-            event.accept()
-        super().mouseReleaseEvent(event)
+    
+    def run(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            loop.run_until_complete(self.service.run())
+        except Exception as e:
+            self.scan_failed.emit(str(e))
+        finally:
+            loop.close()
+    
+    def boost(self, seconds, stop_policy=None):
+        """临时连续扫描（可在任意线程调用）"""
+        self.service.boost(seconds, stop_policy)
+    
+    def stop(self):
+        """结束扫描（可在任意线程调用）"""
+        self.service.stop()
+    
+    def _on_advertisement(self, device, advertisement_data, is_hrs):
+        metrics.ADVERTISEMENTS_RECEIVED.inc()
+        if self.monitor is not None and is_hrs:
+            self.monitor.ingest(device, advertisement_data)
+        if self.advertisement_filter.accept(device, advertisement_data, is_hrs):
+            metrics.ADVERTISEMENTS_FORWARDED.inc()
+            self.advertisement_received.emit(device, advertisement_data)
+    
+    def _on_device_lost(self, address):
+        self.advertisement_filter.forget(address)
+        self.device_lost.emit(address)
 
 
 # 为HeartRateMonitor类添加缺失的方法
 class HeartRateMonitor(QMainWindow):
     """主窗口类"""
     heart_rate_update = pyqtSignal(int)
+    measurement_received = pyqtSignal(object)  # HeartRateMeasurement
+    device_heart_rate_update = pyqtSignal(str, int)  # 设备地址, 心率
+    group_band_forgotten = pyqtSignal(str)  # 团体广告监测中被移除的手环地址
+    hrv_update = pyqtSignal(object)  # HrvStats
     connection_status = pyqtSignal(str, bool)
     
-    def __init__(self):
+    def __init__(self, loop=None, backend=None, device_cache=None):
         super().__init__()
         self.setWindowTitle("心率监测控制面板")
         # self.setFixedSize(500, 200)
         
         # 变量初始化
+        self.backend = backend or create_backend(DEVICE_BACKEND)
         self.devices = []
         self.selected_device = None
-        self.client = None
+        # 单设备连接状态机正在接收通知的设备地址（多设备模式下selected_device可能已指向连接池中的其他设备）
+        self.notification_address = ""
         self.current_heart_rate = 0
+        self.parse_errors = 0
+        self.hrv = RollingHrv(HRV_WINDOW_SECONDS)
+        self.hr_filters = {}  # key: device address, value: HeartRateFilter
+        self.notification_intervals = metrics.IntervalTracker(
+            metrics.NOTIFICATION_INTERVAL, metrics.NOTIFICATION_JITTER
+        )
         self.is_scanning = False
         self.is_connected = False
         self.loop = None
-        self.connect_task = None
         self.monitor_task = None
         
-        # 扫描线程
+        # 单设备连接的生命周期（连接、订阅、自动重连、断开都是可取消、有时限的任务）
+        self.reconnect_policy = ReconnectPolicy()
+        self.connection = ConnectionStateMachine(
+            self.backend, self._heart_rate_callback, on_state=self._on_connection_state,
+            reconnect_policy=self.reconnect_policy, auto_reconnect=AUTO_RECONNECT,
+        )
+        self.recovery = self.connection.recovery
+        self._shutdown_pending = False
+        self._shutdown_done = False
+        
+        # 扫描线程（每次扫描新建），或常驻的后台扫描线程
         self.scan_thread = None
+        self.scan_service = None
+        
+        # 团体广告监测
+        self.advertisement_monitor = None
+        self.group_rows = {}  # key: device address, value: 表格行号
+        
+        # 独立蓝牙I/O线程及其样本缓冲区
+        self.ble_worker = None
+        self.sample_buffer = None
+        self.sample_drain_timer = None
+        
+        # 独立蓝牙进程（BleWorkerProcess）
+        self.ble_process = None
+        self.ble_process_timer = None
+        
+        # 多设备连接池，与单设备连接共用同一个事件循环
+        self.connection_pool = ConnectionPool(
+            on_sample=self._on_pool_sample, on_status=self._on_pool_status, backend=self.backend
+        )
         
         # 悬浮窗
         self.float_window = None
@@ -204,22 +391,269 @@ class HeartRateMonitor(QMainWindow):
         
         # 用于存储支持HRS的设备
         self.hrs_devices = {}  # key: device address, value: device
+        self.device_rssi = {}  # key: device address, value: 最近一次广告的RSSI
+        
+        # 连接过的设备缓存，以及启动时等待自动连接的设备地址
+        self.device_cache = device_cache if device_cache is not None else DeviceCache()
+        self.auto_connect_address = None
+        self.first_heart_rate_at = None
+        
+        # 心率历史数据（固定内存，带1秒/1分钟降采样档）
+        self.hr_history = HeartRateHistory()
+        
+        # 心率录制（没有新样本时也按间隔写出缓存的样本）
+        self.session_writer = None
+        self.recording_flush_timer = None
+        
+        # 本地心率广播服务
+        self.broadcast_server = None
         
         # 设置界面
         self.setup_ui()
         
-        # 创建并启动事件循环
-        self.loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(self.loop)
-        
-        # 使用QTimer定期处理事件循环
-        self.event_loop_timer = QTimer()
-        self.event_loop_timer.timeout.connect(self._process_event_loop)
-        self.event_loop_timer.start(100)  # 每100毫秒处理一次事件循环
+        self.event_loop_timer = None
+        if loop is not None:
+            # 集成模式：Qt与asyncio共用同一个调度器，回调在数据到达时立即执行
+            self.loop = loop
+        else:
+            # 创建并启动事件循环
+            self.loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self.loop)
+            
+            # 使用QTimer定期处理事件循环
+            self.event_loop_timer = QTimer()
+            self.event_loop_timer.timeout.connect(self._process_event_loop)
+            self.event_loop_timer.start(EVENT_LOOP_POLL_INTERVAL_MS)
+        self.connection.loop = self.loop
         
         # 连接信号
         self.heart_rate_update.connect(self._on_heart_rate_updated)
+        self.hrv_update.connect(self._on_hrv_updated)
         self.connection_status.connect(self._on_connection_status_changed)
+        
+        if USE_BLE_WORKER_PROCESS:
+            self._start_ble_process()
+        elif USE_BLE_IO_THREAD:
+            self._start_ble_worker()
+        
+        # 独立进程模式由工作进程扫描
+        if ADVERTISEMENT_MONITOR and not USE_BLE_WORKER_PROCESS:
+            self._start_advertisement_monitor()
+        elif SCAN_DUTY_CYCLE and not USE_BLE_WORKER_PROCESS:
+            self._start_scan_service()
+        
+        if AUTO_CONNECT_ON_STARTUP:
+            QTimer.singleShot(0, self._connect_preferred_device)
+    
+    def _connect_preferred_device(self):
+        """启动时查找默认设备：只等该地址出现，发现后立即停止扫描并连接"""
+        address = self.device_cache.preferred(DEFAULT_DEVICE_MAC)
+        if not address or self.is_scanning:
+            return
+        cached = self.device_cache.get(address)
+        name = cached.name if cached and cached.name else address
+        print(f"正在查找上次连接的设备: {name}")
+        self.auto_connect_address = address
+        self.status_value.setText(f"正在查找 {name}...")
+        self._start_scan(KnownAddressPolicy([address]))
+    
+    def _remember_device(self, device):
+        """连接成功后把设备写入缓存，下次启动时直接查找"""
+        self.device_cache.remember(
+            device.address, device.name or "", self.device_rssi.get(device.address), supports_hrs=True
+        )
+    
+    def _start_scan_service(self, duty_cycle=SCAN_DUTY_CYCLE):
+        """启动常驻的后台扫描线程"""
+        self.scan_service = ScanServiceThread(
+            self.backend, get_duty_cycle(duty_cycle), self.advertisement_monitor
+        )
+        self.scan_service.device_found.connect(self._on_device_found)
+        self.scan_service.device_lost.connect(self._on_device_lost)
+        self.scan_service.scan_finished.connect(self._on_scan_finished)
+        self.scan_service.scan_failed.connect(self._on_scan_service_failed)
+        self.scan_service.advertisement_received.connect(self._on_advertisement_received)
+        self.scan_service.start()
+    
+    def _start_advertisement_monitor(self):
+        """启动团体广告监测：连续扫描，按刷新率更新每台手环的心率"""
+        # 手环在扫描线程中被移除，通过信号在GUI线程中删除表格行
+        self.group_band_forgotten.connect(self._remove_group_row)
+        self.advertisement_monitor = AdvertisementMonitor(on_forget=self.group_band_forgotten.emit)
+        self._start_scan_service("aggressive")
+        
+        self.group_table = QTableWidget(0, 3)
+        self.group_table.setHorizontalHeaderLabels(["手环", "心率", "RSSI"])
+        self.group_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.group_table.verticalHeader().setVisible(False)
+        self.group_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.group_table.setMinimumHeight(200)
+        self.main_layout.addWidget(self.group_table)
+        
+        self.group_refresh_timer = QTimer()
+        self.group_refresh_timer.timeout.connect(self._refresh_group_monitor)
+        self.group_refresh_timer.start(GROUP_REFRESH_INTERVAL_MS)
+    
+    def _refresh_group_monitor(self):
+        """读取有变化的手环，更新表格并按设备输出（录制和本地广播）"""
+        table = self.group_table
+        index = self.device_combo.currentIndex()
+        selected = self.devices[index].address if 0 <= index < len(self.devices) else None
+        for band in self.advertisement_monitor.take_updates():
+            row = self.group_rows.get(band.address)
+            if row is None:
+                row = self.group_rows[band.address] = table.rowCount()
+                table.insertRow(row)
+                table.setItem(row, 0, QTableWidgetItem(f"{band.name or '未知设备'} ({band.address})"))
+                table.setItem(row, 1, QTableWidgetItem())
+                table.setItem(row, 2, QTableWidgetItem())
+            if band.stale:
+                table.item(row, 1).setText("--")
+                self.device_heart_rate_update.emit(band.address, 0)
+                continue
+            table.item(row, 1).setText(str(band.heart_rate))
+            table.item(row, 2).setText(str(band.rssi))
+            self.device_heart_rate_update.emit(band.address, band.heart_rate)
+            # 两次刷新之间同一台手环的多个值只输出最新的一个
+            self._record_sample(band.last_update, band.heart_rate, address=band.address)
+            if band.address == selected:
+                # 悬浮窗显示设备列表中选中的手环
+                heart_rate = self._filter_heart_rate(
+                    band.address, band.last_update, band.heart_rate, band.sensor_contact
+                )
+                if heart_rate is not None:
+                    self.heart_rate_update.emit(heart_rate)
+    
+    def _remove_group_row(self, address):
+        """删除已从广告监测设备表中移除的手环所在的行"""
+        row = self.group_rows.get(address)
+        # 移除后又重新出现的手环保留原来的行
+        if row is None or address in self.advertisement_monitor:
+            return
+        del self.group_rows[address]
+        self.group_table.removeRow(row)
+        for other, other_row in self.group_rows.items():
+            if other_row > row:
+                self.group_rows[other] = other_row - 1
+    
+    def _start_ble_worker(self):
+        """启动独立的蓝牙I/O线程"""
+        self.sample_buffer = SampleRingBuffer(SAMPLE_BUFFER_CAPACITY)
+        self.ble_worker = BleWorkerThread(self.sample_buffer, self.backend, AUTO_RECONNECT)
+        self.ble_worker.connection_status.connect(self._on_worker_status_changed)
+        
+        # 按显示刷新率读取样本，仅在连接期间运行
+        self.sample_drain_timer = QTimer()
+        self.sample_drain_timer.timeout.connect(self._drain_sample_buffer)
+        
+        self.ble_worker.start()
+    
+    def _start_ble_process(self):
+        """启动独立的蓝牙工作进程"""
+        # 只在启用时导入（multiprocessing和共享内存不影响默认模式的启动耗时）
+        from ble_process import BleWorkerProcess
+        self.ble_process = BleWorkerProcess(
+            self.backend, SAMPLE_BUFFER_CAPACITY, AUTO_RECONNECT
+        ).start()
+        
+        # 事件、样本和进程存活状态都按显示刷新率读取
+        self.ble_process_timer = QTimer()
+        self.ble_process_timer.timeout.connect(self._poll_ble_process)
+        self.ble_process_timer.start(DISPLAY_REFRESH_INTERVAL_MS)
+    
+    def _poll_ble_process(self):
+        """处理工作进程发来的事件，并读取共享内存中的样本"""
+        from ble_process import RemoteAdvertisement, RemoteDevice
+        for event in self.ble_process.poll():
+            kind = event[0]
+            if kind == "device":
+                _, address, name, is_hrs = event
+                self._on_device_found(RemoteDevice(address, name), is_hrs)
+            elif kind == "advertisement":
+                _, address, rssi, is_hrs, hrs_data = event
+                device = self.hrs_devices.get(address) or RemoteDevice(address, None)
+                self._on_advertisement_received(device, RemoteAdvertisement(
+                    rssi, [HRS_SERVICE_UUID] if is_hrs else [],
+                    {HRS_SERVICE_UUID: hrs_data} if hrs_data is not None else {},
+                ))
+            elif kind == "scan_finished":
+                self._on_scan_finished([])
+            elif kind == "scan_failed":
+                self._on_scan_failed(event[1])
+            elif kind == "status":
+                _, address, _, status, connected = event
+                self._on_process_status(address, status, connected)
+            elif kind == "disconnected":
+                self.is_connected = False
+                self.current_heart_rate = 0
+                self.connection_status.emit("未连接", False)
+            elif kind == "worker_restarted":
+                if self.is_scanning:
+                    self._on_scan_finished([])
+                self.is_connected = False
+                self.connection_status.emit(f"蓝牙进程已重启 (第{event[2]}次)", False)
+            elif kind == "worker_failed":
+                self.ble_process_timer.stop()
+                self.is_connected = False
+                self.connection_status.emit("蓝牙进程多次异常退出，请重启程序", False)
+        
+        for timestamp, heart_rate, contact, device_index, rr_intervals in self.ble_process.drain():
+            address = self.ble_process.address_for(device_index)
+            measurement = HeartRateMeasurement(0, heart_rate, contact, None, rr_intervals)
+            self._record_sample(timestamp, heart_rate, measurement, address)
+            self.device_heart_rate_update.emit(address, heart_rate)
+            if self.selected_device is None or address != self.selected_device.address:
+                continue
+            filtered = self._filter_heart_rate(address, timestamp, heart_rate, contact)
+            if filtered is not None:
+                self.heart_rate_update.emit(filtered)
+            self._update_hrv(measurement)
+            metrics.GUI_UPDATE_LATENCY.observe(time.time() - timestamp)
+    
+    def _on_process_status(self, address, status, connected):
+        """工作进程中任一设备的状态变化回调"""
+        print(f"[{address}] {status}")
+        if connected:
+            for device in self.devices:
+                if device.address == address:
+                    self._remember_device(device)
+        elif self.selected_device is not None and address == self.selected_device.address:
+            self.hrv.mark_gap()
+        connected_count = self.ble_process.connected_count()
+        self.is_connected = connected_count > 0
+        if connected_count > 1:
+            self.connection_status.emit(f"已连接 {connected_count} 台设备", True)
+        elif connected_count:
+            self.connection_status.emit("已连接", True)
+        else:
+            self.current_heart_rate = 0
+            self.connection_status.emit(status, False)
+    
+    def _on_worker_status_changed(self, status, connected):
+        """I/O线程连接状态变化回调"""
+        self.is_connected = connected
+        if connected:
+            if self.selected_device is not None:
+                self._remember_device(self.selected_device)
+            self.sample_drain_timer.start(DISPLAY_REFRESH_INTERVAL_MS)
+        else:
+            self.sample_drain_timer.stop()
+            self._drain_sample_buffer()
+            self.hrv.mark_gap()
+            self.current_heart_rate = 0
+        self.connection_status.emit(status, connected)
+    
+    def _drain_sample_buffer(self):
+        """读取I/O线程写入的心率样本并分发"""
+        address = self.selected_device.address if self.selected_device else ""
+        for timestamp, heart_rate, contact, rr_intervals in self.sample_buffer.drain():
+            measurement = HeartRateMeasurement(0, heart_rate, contact, None, rr_intervals)
+            self._record_sample(timestamp, heart_rate, measurement, address)
+            filtered = self._filter_heart_rate(address, timestamp, heart_rate, contact)
+            if filtered is not None:
+                self.heart_rate_update.emit(filtered)
+            self._update_hrv(measurement)
+            metrics.GUI_UPDATE_LATENCY.observe(time.time() - timestamp)
     
     def setup_ui(self):
         """设置主界面布局"""
@@ -274,8 +708,17 @@ class HeartRateMonitor(QMainWindow):
         self.disconnect_button.clicked.connect(self._on_disconnect_clicked)
         self.disconnect_button.setEnabled(False)
         
+        self.multi_device_checkbox = QCheckBox("多设备同时连接")
+        self.multi_device_checkbox.setChecked(False)
+        
         row2_layout.addWidget(self.connect_button)
         row2_layout.addWidget(self.disconnect_button)
+        row2_layout.addWidget(self.multi_device_checkbox)
+        
+        self.record_checkbox = QCheckBox("录制心率")
+        self.record_checkbox.setChecked(False)
+        self.record_checkbox.toggled.connect(self._on_record_toggled)
+        row2_layout.addWidget(self.record_checkbox)
         main_layout.addLayout(row2_layout)
         
         # 第三行：连接状态显示
@@ -289,7 +732,33 @@ class HeartRateMonitor(QMainWindow):
         row3_layout.addStretch()
         main_layout.addLayout(row3_layout)
         
-        # 第四行：悬浮窗设置区域
+        # HRV统计（手环未发送RR间期时保持"--"）
+        self.hrv_value = QLabel("HRV: --")
+        self.hrv_value.setStyleSheet("color: gray;")
+        main_layout.addWidget(self.hrv_value)
+        
+        # 第四行：悬浮窗设置区域（快速启动模式下第一次展开时才创建）
+        self.main_layout = main_layout
+        self.float_group = None
+        self.float_settings_button = None
+        if FAST_STARTUP:
+            self.float_settings_button = QPushButton("悬浮窗设置 ▸")
+            self.float_settings_button.setCheckable(True)
+            self.float_settings_button.toggled.connect(self._on_float_settings_toggled)
+            main_layout.addWidget(self.float_settings_button)
+        else:
+            self._ensure_float_settings()
+    
+    def _on_float_settings_toggled(self, checked):
+        """展开或收起悬浮窗设置区域"""
+        self._ensure_float_settings()
+        self.float_group.setVisible(checked)
+        self.float_settings_button.setText("悬浮窗设置 ▾" if checked else "悬浮窗设置 ▸")
+    
+    def _ensure_float_settings(self):
+        """创建悬浮窗设置区域（只创建一次）"""
+        if self.float_group is not None:
+            return
         float_group = QGroupBox("悬浮窗设置")
         float_layout = QVBoxLayout(float_group)
         
@@ -297,9 +766,9 @@ class HeartRateMonitor(QMainWindow):
         style_layout = QHBoxLayout()
         style_label = QLabel("显示样式:")
         self.style_combo = QComboBox()
-        self.style_combo.addItem("简约数字")
-        self.style_combo.addItem("表盘样式")
-        self.style_combo.addItem("动态图形")
+        for style in FLOAT_WINDOW_STYLES:
+            self.style_combo.addItem(style)
+        self.style_combo.currentTextChanged.connect(self._on_style_changed)
         style_layout.addWidget(style_label)
         style_layout.addWidget(self.style_combo)
         float_layout.addLayout(style_layout)
@@ -337,52 +806,108 @@ class HeartRateMonitor(QMainWindow):
         controls_layout.addWidget(self.float_window_toggle_button)
         float_layout.addLayout(controls_layout)
         
-        main_layout.addWidget(float_group)
+        self.float_group = float_group
+        self.main_layout.addWidget(float_group)
+        if self.float_settings_button is not None:
+            self.float_settings_button.setChecked(True)
     
     def _on_scan_clicked(self):
         """扫描按钮点击事件"""
         if self.is_scanning:
             return
-        
+        self.auto_connect_address = None
+        self._start_scan(create_scan_stop_policy(SCAN_STOP_POLICY))
+    
+    def _start_scan(self, stop_policy):
+        """按指定的停止策略启动扫描线程"""
         self.is_scanning = True
         self.scan_button.setEnabled(False)
         self.scan_button.setText("扫描中...")
         
+        if self.scan_service:
+            # 常驻扫描：设备列表已是最新的，临时切换为连续扫描以尽快发现新设备
+            self.scan_service.boost(SCAN_TIMEOUT, stop_policy)
+            return
+        
         # 清空设备列表
         self.devices = []
         self.device_combo.clear()
         self.hrs_devices = {}
         
+        if self.ble_process:
+            # 独立进程模式：由工作进程扫描，结果通过事件返回
+            self.ble_process.scan(stop_policy, SCAN_TIMEOUT)
+            return
+        
         # 启动扫描线程
-        self.scan_thread = ScanThread()
+        self.scan_thread = ScanThread(self.backend, stop_policy)
+        self.scan_thread.device_found.connect(self._on_device_found)
         self.scan_thread.scan_finished.connect(self._on_scan_finished)
         self.scan_thread.scan_failed.connect(self._on_scan_failed)
         self.scan_thread.finished.connect(self._on_scan_thread_finished)
         self.scan_thread.advertisement_received.connect(self._on_advertisement_received)
         self.scan_thread.start()
     
+    def _device_item_text(self, device):
+        """设备列表中显示的文本"""
+        device_name = device.name or "未知设备"
+        hrs_tag = " [HRS]" if device.address in self.hrs_devices else ""
+        return f"{device_name} ({device.address}){hrs_tag}"
+    
+    def _on_device_found(self, device, is_hrs):
+        """扫描过程中发现新设备（或确认设备支持HRS）时立即加入列表"""
+        if is_hrs:
+            self.hrs_devices[device.address] = device
+        
+        for index, known in enumerate(self.devices):
+            if known.address == device.address:
+                self.devices[index] = device
+                self.device_combo.setItemText(index, self._device_item_text(device))
+                return
+        
+        self.devices.append(device)
+        self.device_combo.addItem(self._device_item_text(device))
+        if (len(self.devices) == 1 and self.scan_thread is not None
+                and self.scan_thread.time_to_first_device is not None):
+            print(f"首个可选设备出现用时: {self.scan_thread.time_to_first_device * 1000:.0f} ms")
+    
+    def _on_device_lost(self, address):
+        """后台扫描中设备过期（长时间没有广告）时从列表中移除"""
+        # 连接后的手环通常停止广播，正在使用的设备保留在列表中
+        if self.selected_device is not None and self.selected_device.address == address:
+            return
+        if address in self.connection_pool:
+            return
+        self.hrs_devices.pop(address, None)
+        self.device_rssi.pop(address, None)
+        for index, known in enumerate(self.devices):
+            if known.address == address:
+                del self.devices[index]
+                self.device_combo.removeItem(index)
+                return
+    
     def _on_scan_finished(self, devices):
         """扫描完成回调"""
-        # 结合扫描到的设备和从广告数据中检测到的HRS设备
-        all_devices = list(self.hrs_devices.values())
-        
-        # 确保所有扫描到的设备都包含在内
+        # 补充扫描过程中未通知到的设备
         for device in devices:
-            if device.address not in self.hrs_devices:
-                all_devices.append(device)
-        
-        self.devices = all_devices
-        self.device_combo.clear()
-        
-        for device in all_devices:
-            device_name = device.name or "未知设备"
-            is_hrs = device.address in self.hrs_devices
-            hrs_tag = " [HRS]" if is_hrs else ""
-            self.device_combo.addItem(f"{device_name} ({device.address}){hrs_tag}")
+            if not any(known.address == device.address for known in self.devices):
+                self._on_device_found(device, device.address in self.hrs_devices)
         
         self.is_scanning = False
         self.scan_button.setEnabled(True)
         self.scan_button.setText("扫描")
+        
+        # 启动时的定向查找：找到默认设备后直接连接
+        address = self.auto_connect_address
+        self.auto_connect_address = None
+        if address:
+            for index, device in enumerate(self.devices):
+                if device.address.upper() == address.upper():
+                    self.device_combo.setCurrentIndex(index)
+                    self._on_connect_clicked()
+                    return
+            print(f"未找到设备 {address}，请手动扫描")
+            self.status_value.setText("未找到上次连接的设备，请扫描")
     
     def _process_event_loop(self):
         """定期处理事件循环"""
@@ -402,148 +927,248 @@ class HeartRateMonitor(QMainWindow):
 
     def _on_advertisement_received(self, device, advertisement_data):
         """广告数据接收回调"""
+        rssi = getattr(advertisement_data, 'rssi', None)
+        if rssi is not None:
+            self.device_rssi[device.address] = rssi
+        
         # 检查设备是否支持HRS服务
         if self._is_hrs_device(advertisement_data):
             # 存储支持HRS的设备
             if device.address not in self.hrs_devices:
                 self.hrs_devices[device.address] = device
             
+            # 团体广告监测模式下按设备处理，见_refresh_group_monitor
+            if self.advertisement_monitor is not None:
+                return
+            
             # 尝试解析心率数据
-            heart_rate = self._parse_heart_rate_from_advertisement(advertisement_data)
-            if heart_rate is not None:
-                # 发送心率更新信号
-                self.heart_rate_update.emit(heart_rate)
+            measurement = self._parse_heart_rate_from_advertisement(advertisement_data)
+            if measurement is not None:
+                heart_rate = self._filter_heart_rate(
+                    device.address, time.time(), measurement.heart_rate, measurement.sensor_contact
+                )
+                if heart_rate is not None:
+                    # 发送心率更新信号
+                    self.heart_rate_update.emit(heart_rate)
     
     def _is_hrs_device(self, advertisement_data):
         """检查设备是否支持HRS服务"""
-        # 检查服务UUID列表中是否包含HRS服务
-        if HRS_SERVICE_UUID.lower() in advertisement_data.service_uuids:
-            return True
-        
-        # 检查16位UUID是否包含HRS服务
-        if hasattr(advertisement_data, 'service_data'):
-            for uuid in advertisement_data.service_data:
-                if uuid.startswith("0x180d") or uuid == str(HRS_SERVICE_SHORT_UUID):
-                    return True
-        
-        return False
+        return is_hrs_advertisement(advertisement_data)
     
     def _parse_heart_rate_from_advertisement(self, advertisement_data):
-        """从广告数据中解析心率值"""
-        if not hasattr(advertisement_data, 'service_data'):
-            return None
-        
+        """从广告数据中解析心率测量数据"""
         # 查找HRS服务数据
-        for uuid, data in advertisement_data.service_data.items():
-            if uuid.startswith("0x180d") or uuid == str(HRS_SERVICE_SHORT_UUID):
-                # 解析心率数据 (根据HRS协议)
-                if len(data) >= 2:  # 至少需要2个字节：标志位 + 心率值
-                    try:
-                        flags = data[0]
-                        if flags & 0x01:  # 检查是否使用UINT16格式
-                            if len(data) >= 3:
-                                heart_rate = int.from_bytes(data[1:3], byteorder='little')
-                            else:
-                                heart_rate = data[1]
-                        else:
-                            heart_rate = data[1]
-                        return heart_rate
-                    except (IndexError, ValueError) as e:
-                        print(f"解析心率数据失败: {str(e)}")
-                        print(f"数据: {data}")
+        data = find_hrs_service_data(getattr(advertisement_data, 'service_data', None))
+        if data is None:
+            return None
         
+        # 解析心率数据 (根据HRS协议)
+        try:
+            return parse_heart_rate_measurement(data)
+        except HrsParseError as e:
+            metrics.PARSE_ERRORS.inc()
+            print(f"解析心率数据失败: {str(e)}")
+            print(f"数据: {data}")
         return None
     
     def _on_scan_failed(self, error_msg):
         """扫描失败回调"""
         print(f"扫描失败: {error_msg}")
         self.is_scanning = False
+        self.auto_connect_address = None
         self.scan_button.setEnabled(True)
         self.scan_button.setText("扫描")
         QMessageBox.warning(self, "扫描失败", f"蓝牙扫描失败: {error_msg}")
     
+    def _on_scan_service_failed(self, error_msg):
+        """后台扫描启动失败（如蓝牙已关闭），服务会自动重试，只在用户等待扫描结果时提示"""
+        if self.is_scanning:
+            self._on_scan_failed(error_msg)
+        else:
+            print(f"后台扫描失败，稍后重试: {error_msg}")
+    
     def _on_connect_clicked(self):
         """连接设备按钮点击事件"""
         if self.device_combo.currentIndex() == -1:
             self.status_value.setText("请先选择设备")
             return
         
-        # 断开现有连接
-        if self.client:
-            try:
-                # 尝试停止通知和断开连接
-                if self.client.is_connected:
-                    # 使用异步方式处理断开连接，但立即执行
-                    def disconnect_sync():
-                        try:
-                            # 同步方式执行异步操作
-                            if self.loop and not self.loop.is_closed():
-                                self.loop.run_until_complete(self.client.stop_notify(HEART_RATE_CHAR_UUID))
-                                self.loop.run_until_complete(self.client.disconnect())
-                        except Exception as e:
-                            print(f"断开连接失败: {str(e)}")
-                    
-                    # 在事件循环中执行断开连接操作
-                    if self.loop and not self.loop.is_closed():
-                        self.loop.call_soon_threadsafe(disconnect_sync)
-            except Exception as e:
-                print(f"断开连接过程中发生错误: {str(e)}")
-            finally:
-                # 无论如何都清理资源
-                self.client = None
+        if self.ble_worker:
+            # 独立I/O线程模式：由I/O线程负责断开旧连接并连接新设备
+            self.is_connected = False
+            self.current_heart_rate = 0
+            self.disconnect_button.setEnabled(False)
+            self.hrv.reset()
+            self.selected_device = self.devices[self.device_combo.currentIndex()]
+            self.ble_worker.connect_device(self.selected_device)
+            return
         
-        # 更新状态
-        self.is_connected = False
-        self.current_heart_rate = 0
-        self.disconnect_button.setEnabled(False)
-        self.connection_status.emit("未连接", False)
+        if self.ble_process:
+            # 独立进程模式：多设备模式下保留已有连接
+            self.selected_device = self.devices[self.device_combo.currentIndex()]
+            if not self.multi_device_checkbox.isChecked():
+                self.is_connected = False
+                self.current_heart_rate = 0
+                self.disconnect_button.setEnabled(False)
+                self.hrv.reset()
+            self.ble_process.connect(
+                self.selected_device.address, exclusive=not self.multi_device_checkbox.isChecked()
+            )
+            return
         
-        # 连接选中设备
-        self.selected_device = self.devices[self.device_combo.currentIndex()]
-        self.loop.create_task(self._connect_to_device(self.selected_device))
+        if self.multi_device_checkbox.isChecked():
+            # 多设备模式：保留已有连接，把选中设备加入连接池
+            self.selected_device = self.devices[self.device_combo.currentIndex()]
+            self.loop.create_task(self.connection_pool.add(self.selected_device))
+            return
         
-        # 不要过早启用断开按钮，等连接成功后再启用
-        # self.disconnect_button.setEnabled(True)
+        # 由状态机取消进行中的连接/重连，在时限内断开旧设备后连接选中设备（不阻塞界面）
+        self.hrv.reset()
+        self.current_heart_rate = 0
+        self.selected_device = self.devices[self.device_combo.currentIndex()]
+        self.connection.connect(self.selected_device)
     
-    async def _connect_to_device(self, device):
-        """异步连接设备"""
-        try:
-            self.connection_status.emit("连接中...", False)
-            # 优化：直接传入device对象而不是地址，避免内部二次扫描，显著提高连接速度
-            # 设置较长的超时时间以适应不同设备，但通常会很快连接
-            self.client = BleakClient(device, timeout=20.0)
-            
-            await self.client.connect()
-            if self.client.is_connected:
-                # 极简连接：直接启动心率特征值通知，不进行任何其他操作
-                # 避免触发小米手环对批量读取的保护机制
-                self.is_connected = True
-                self.connection_status.emit("已连接", True)
-                
-                # 仅操作目标特征值：心率测量特征值（0x2A37）
-                await self.client.start_notify(HEART_RATE_CHAR_UUID, self._heart_rate_callback)
-                
-                # 记录成功连接信息
-                print(f"成功连接到设备 {device.address}，已启动心率通知")
-            else:
-                self.connection_status.emit("连接失败", False)
-        except Exception as e:
-            import traceback
-            print(f"连接设备时发生错误: {str(e)}")
-            traceback.print_exc()
-            self.connection_status.emit(f"连接失败: {str(e)}", False)
-            self.is_connected = False
+    def _on_connection_state(self, state, detail):
+        """单设备连接状态机的状态变化回调"""
+        if state == connection_state.SUBSCRIBING:
+            self.notification_intervals.reset()
+            self.notification_address = self.connection.device.address
+        elif state == connection_state.CONNECTED:
+            self._remember_device(self.connection.device)
+            print(f"成功连接到设备 {self.connection.device.address}，已启动心率通知")
+        elif state == connection_state.RECONNECTING and detail == "连接已断开":
+            self.hrv.mark_gap()
+            print(f"设备 {self.connection.device.address} 意外断开，开始自动重连")
+        
+        connected = state == connection_state.CONNECTED
+        self.is_connected = connected or bool(self.connection_pool.connected_sessions())
+        if state in (connection_state.IDLE, connection_state.CLOSED):
+            self.current_heart_rate = 0
+        self.connection_status.emit(detail or CONNECTION_STATE_TEXT[state], connected)
     
     def _heart_rate_callback(self, sender, data):
         """心率数据回调函数"""
-        if data[0] & 0x01:  # 检查是否使用UINT16格式
-            heart_rate = int.from_bytes(data[1:3], byteorder='little')
+        arrived_at = time.perf_counter()
+        metrics.NOTIFICATIONS_RECEIVED.inc()
+        self.notification_intervals.tick(arrived_at)
+        try:
+            measurement = parse_heart_rate_measurement(data)
+        except HrsParseError as e:
+            self.parse_errors += 1
+            metrics.PARSE_ERRORS.inc()
+            print(f"解析心率数据失败: {str(e)}")
+            return
+        self.recovery.on_sample()
+        address = self.notification_address
+        timestamp = time.time()
+        self._record_sample(timestamp, measurement.heart_rate, measurement, address)
+        self.measurement_received.emit(measurement)
+        heart_rate = self._filter_heart_rate(
+            address, timestamp, measurement.heart_rate, measurement.sensor_contact
+        )
+        if heart_rate is not None:
+            self.heart_rate_update.emit(heart_rate)
+        self._update_hrv(measurement)
+        metrics.GUI_UPDATE_LATENCY.observe(time.perf_counter() - arrived_at)
+    
+    def _filter_heart_rate(self, address, timestamp, heart_rate, sensor_contact=None):
+        """按设备过滤要显示的心率值，丢弃时返回None（录制和广播仍使用原始值）"""
+        if not HEART_RATE_FILTER:
+            return heart_rate
+        hr_filter = self.hr_filters.get(address)
+        if hr_filter is None:
+            hr_filter = self.hr_filters[address] = HeartRateFilter(
+                HEART_RATE_MEDIAN_WINDOW, max_slew=HEART_RATE_MAX_SLEW
+            )
+        filtered = hr_filter.update(timestamp, heart_rate, sensor_contact)
+        if filtered is None:
+            metrics.HEART_RATES_FILTERED.inc()
+            # 手环未接触皮肤时悬浮窗显示占位符，而不是停留在最后一个值
+            if sensor_contact is False and self.float_window and self.float_window_visible:
+                self.float_window.show_disconnected()
+        return filtered
+    
+    def _update_hrv(self, measurement):
+        """把测量数据中的RR间期加入HRV窗口，心搏数足够时刷新显示"""
+        if measurement is None or not measurement.rr_intervals:
+            return
+        self.hrv.add_intervals(measurement.rr_intervals)
+        if self.hrv.beats >= HRV_MIN_BEATS:
+            self.hrv_update.emit(self.hrv.stats())
+    
+    def _on_record_toggled(self, checked):
+        """开始或停止录制心率数据"""
+        if checked:
+            try:
+                os.makedirs(RECORDING_DIR, exist_ok=True)
+                path = os.path.join(RECORDING_DIR, time.strftime("session-%Y%m%d-%H%M%S.xhr"))
+                self.session_writer = SessionWriter(
+                    path, flush_interval=RECORDING_FLUSH_INTERVAL, background_fsync=True
+                )
+                if self.recording_flush_timer is None:
+                    self.recording_flush_timer = QTimer()
+                    self.recording_flush_timer.timeout.connect(self._flush_recording)
+                self.recording_flush_timer.start(int(RECORDING_FLUSH_INTERVAL * 1000))
+                print(f"开始录制心率数据: {path}")
+            except OSError as e:
+                self.record_checkbox.setChecked(False)
+                QMessageBox.warning(self, "录制失败", f"无法创建录制文件: {str(e)}")
+        elif self.session_writer:
+            self.recording_flush_timer.stop()
+            self.session_writer.close()
+            print(f"录制结束，共 {self.session_writer.samples_written} 个样本")
+            if self.session_writer.out_of_order:
+                print(f"时间戳回退而未录制的样本: {self.session_writer.out_of_order} 个")
+            self.session_writer = None
+    
+    def _flush_recording(self):
+        """定期写出录制缓存，设备断开等没有新样本的期间也不会滞留数据"""
+        if self.session_writer is not None:
+            self.session_writer.flush_if_due()
+    
+    def start_broadcast_server(self, port=BROADCAST_PORT, websocket_port=BROADCAST_WEBSOCKET_PORT):
+        """在当前事件循环中启动本地心率广播服务"""
+        # 启动后才导入，不增加启动耗时
+        from broadcast import BroadcastServer
+        
+        async def start():
+            try:
+                await server.start()
+            except OSError as e:
+                print(f"心率广播服务启动失败: {str(e)}")
+                self.broadcast_server = None
+                return
+            print(f"心率广播: tcp://127.0.0.1:{server.port}  ws://127.0.0.1:{server.websocket_port}")
+        
+        server = self.broadcast_server = BroadcastServer(port, websocket_port, max_queue=BROADCAST_MAX_QUEUE)
+        self.loop.create_task(start())
+        return server
+    
+    def _record_sample(self, timestamp, heart_rate, measurement=None, address=""):
+        """把样本推送给广播订阅者，录制模式下写入会话文件"""
+        if self.broadcast_server is not None:
+            if measurement is not None:
+                self.broadcast_server.publish(
+                    timestamp, heart_rate, address, measurement.sensor_contact, measurement.rr_intervals
+                )
+            else:
+                self.broadcast_server.publish(timestamp, heart_rate, address)
+        if self.session_writer is None:
+            return
+        if measurement is not None:
+            self.session_writer.write(
+                timestamp, heart_rate, measurement.sensor_contact,
+                measurement.rr_intervals, address
+            )
         else:
-            heart_rate = data[1]
-        self.heart_rate_update.emit(heart_rate)
+            self.session_writer.write(timestamp, heart_rate, address=address)
     
     def _on_connection_status_changed(self, status, connected):
         """连接状态变化回调"""
+        single_connected = self.is_connected and not self.connection_pool.connected_sessions()
+        metrics.CONNECTED_DEVICES.set(
+            len(self.connection_pool.connected_sessions()) + (1 if single_connected else 0)
+        )
         if connected:
             if self.current_heart_rate > 0:
                 self.status_value.setText(f"{status} (心率: {self.current_heart_rate} bpm)")
@@ -557,11 +1182,22 @@ class HeartRateMonitor(QMainWindow):
         else:
             self.status_value.setText(status)
             self.status_value.setStyleSheet("color: pink;")
-            self.disconnect_button.setEnabled(False)
+            # 自动重连期间允许点击断开来放弃重连
+            self.disconnect_button.setEnabled(self.connection.state not in (
+                connection_state.IDLE, connection_state.CLOSED, connection_state.DISCONNECTING
+            ))
+            if self.float_window:
+                self.float_window.show_disconnected()
     
     def _on_heart_rate_updated(self, heart_rate):
         """心率数据更新回调"""
         self.current_heart_rate = heart_rate
+        self.hr_history.append(time.time(), heart_rate)
+        if self.first_heart_rate_at is None:
+            self.first_heart_rate_at = time.perf_counter()
+            cold_start = self.first_heart_rate_at - PROCESS_STARTED_AT
+            metrics.COLD_START_FIRST_HEART_RATE.set(cold_start)
+            print(f"冷启动到第一个心率值用时: {cold_start:.2f} 秒")
         if self.is_connected:
             self.status_value.setText(f"已连接 (心率: {heart_rate} bpm)")
             self.status_value.setStyleSheet("color: green;")
@@ -570,48 +1206,61 @@ class HeartRateMonitor(QMainWindow):
         if self.float_window and self.float_window_visible:
             self.float_window.update_heart_rate(heart_rate)
     
+    def _on_hrv_updated(self, stats):
+        """HRV统计更新回调"""
+        self.hrv_value.setText(
+            f"HRV: RMSSD {stats.rmssd:.0f} ms · SDNN {stats.sdnn:.0f} ms · "
+            f"pNN50 {stats.pnn50:.0f}% · 平均 {stats.mean_hr:.0f} bpm"
+        )
     
     
     
-    async def _disconnect_device(self):
-        """异步断开设备连接任务"""
-        try:
-            if self.client and self.client.is_connected:
-                print("正在断开连接...")
-                try:
-                    await self.client.stop_notify(HEART_RATE_CHAR_UUID)
-                except Exception as e:
-                    print(f"停止通知失败 (可能已断开): {str(e)}")
-                
-                await self.client.disconnect()
-                print("设备已断开连接")
-        except Exception as e:
-            print(f"断开连接失败: {str(e)}")
-        finally:
-            # 清理资源
-            self.client = None
-            self.is_connected = False
-            self.current_heart_rate = 0
-            self.disconnect_button.setEnabled(False)
-            self.connection_status.emit("未连接", False)
-            print("断开连接操作完成")
-
+    
+    def _on_pool_sample(self, session, timestamp, heart_rate):
+        """连接池中任一设备的心率数据回调"""
+        self._record_sample(timestamp, heart_rate, session.last_measurement, session.address)
+        self.device_heart_rate_update.emit(session.address, heart_rate)
+        # 当前选中的设备同时驱动主心率显示
+        if self.selected_device is not None and session.address == self.selected_device.address:
+            measurement = session.last_measurement
+            contact = measurement.sensor_contact if measurement is not None else None
+            filtered = self._filter_heart_rate(session.address, timestamp, heart_rate, contact)
+            if filtered is not None:
+                self.heart_rate_update.emit(filtered)
+            self._update_hrv(measurement)
+            metrics.GUI_UPDATE_LATENCY.observe(time.time() - timestamp)
+    
+    def _on_pool_status(self, session, status, connected):
+        """连接池中任一设备的状态变化回调"""
+        print(f"[{session.address}] {status}")
+        if connected:
+            self._remember_device(session.device)
+        connected_count = len(self.connection_pool.connected_sessions())
+        self.is_connected = connected_count > 0 or self.connection.is_connected
+        if connected_count > 0:
+            self.connection_status.emit(f"已连接 {connected_count} 台设备", True)
+        else:
+            self.connection_status.emit(f"{status} ({session.name})", False)
+    
     def _on_disconnect_clicked(self):
         """断开连接按钮点击事件"""
         print("断开连接按钮被点击")
         self.disconnect_button.setEnabled(False) # 防止重复点击
         
-        if self.client:
-            # 如果 Loop 可用且未关闭，创建断开连接任务
-            if self.loop and not self.loop.is_closed():
-                self.loop.create_task(self._disconnect_device())
-            else:
-                # 如果 Loop 不可用，直接清理状态
-                print("Event loop不可用，强制清理状态")
-                self.client = None
-                self.is_connected = False
-                self.current_heart_rate = 0
-                self.connection_status.emit("未连接", False)
+        if self.ble_worker:
+            self.ble_worker.disconnect_device()
+            return
+        
+        if self.ble_process:
+            self.ble_process.disconnect()
+            return
+        
+        if self.loop is None or self.loop.is_closed():
+            return
+        if len(self.connection_pool):
+            self.loop.create_task(self.connection_pool.close_all())
+        # 取消进行中的连接或重连，在时限内断开当前设备
+        self.connection.disconnect()
     
     def _toggle_float_window(self):
         """切换悬浮窗显示状态"""
@@ -622,12 +1271,9 @@ class HeartRateMonitor(QMainWindow):
     
     def show_float_window(self):
         """显示悬浮窗"""
+        self._ensure_float_settings()
         if not self.float_window:
-            self.float_window = FloatWindow()
-            # 应用当前设置
-            self.float_window.set_size(self.size_slider.value())
-            self.float_window.set_topmost(self.topmost_checkbox.isChecked())
-            self.float_window.set_fixed(self.fixed_checkbox.isChecked())
+            self._create_float_window()
             
         self.float_window.show()
         self.float_window_visible = True
@@ -638,6 +1284,36 @@ class HeartRateMonitor(QMainWindow):
         if self.current_heart_rate > 0:
             self.float_window.update_heart_rate(self.current_heart_rate)
     
+    def _create_float_window(self):
+        """按当前选择的样式创建悬浮窗并应用设置"""
+        self.float_window = create_float_window(self.style_combo.currentText())
+        self.float_window.set_size(self.size_slider.value())
+        self.float_window.set_topmost(self.topmost_checkbox.isChecked())
+        self.float_window.set_fixed(self.fixed_checkbox.isChecked())
+        if isinstance(self.float_window, GraphFloatWindow):
+            # 动态图形用已有的心率历史填满曲线
+            now = time.time()
+            self.float_window.load_history(
+                self.hr_history.query(now - self.float_window.seconds, now + 1), now
+            )
+    
+    def _on_style_changed(self, style):
+        """切换悬浮窗样式：在原位置用新样式重建悬浮窗"""
+        if not self.float_window:
+            return
+        position = self.float_window.pos()
+        visible = self.float_window_visible
+        self.float_window.close()
+        self.float_window.deleteLater()
+        self._create_float_window()
+        self.float_window.move(position)
+        if visible:
+            self.float_window.show()
+            if self.current_heart_rate > 0:
+                self.float_window.update_heart_rate(self.current_heart_rate)
+        else:
+            self.float_window.hide()
+    
     def hide_float_window(self):
         """隐藏悬浮窗"""
         if self.float_window and self.float_window_visible:
@@ -667,46 +1343,141 @@ class HeartRateMonitor(QMainWindow):
     
     def closeEvent(self, event):
         """窗口关闭事件"""
+        # 不在界面线程上同步等待断开：先隐藏窗口，在事件循环中限时断开连接后再真正关闭
+        # 轮询模式下只有Qt事件循环在运行时，定时器才会推进asyncio事件循环
+        loop_alive = self.loop is not None and (
+            self.loop.is_running() or (
+                self.event_loop_timer is not None and self.event_loop_timer.isActive()
+                and QThread.currentThread().loopLevel() > 0
+            )
+        )
+        if loop_alive and not self._shutdown_done:
+            event.ignore()
+            if not self._shutdown_pending:
+                self._shutdown_pending = True
+                self.hide()
+                if self.float_window:
+                    self.float_window.hide()
+                self.loop.create_task(self._shutdown_and_close())
+                # 事件循环本身卡住时的兜底
+                QTimer.singleShot(int((CLOSE_TIMEOUT + 1) * 1000), self._force_close)
+            return
+        
         # 停止事件循环定时器
-        if hasattr(self, 'event_loop_timer') and self.event_loop_timer.isActive():
+        if self.event_loop_timer is not None and self.event_loop_timer.isActive():
             self.event_loop_timer.stop()
         
-        # 使用与断开连接按钮相同的逻辑断开连接
-        if self.client:
-            try:
-                # 尝试停止通知和断开连接
-                if self.client.is_connected and self.loop and not self.loop.is_closed():
-                    # 同步方式执行异步断开连接操作
-                    try:
-                        self.loop.run_until_complete(self.client.stop_notify(HEART_RATE_CHAR_UUID))
-                        self.loop.run_until_complete(self.client.disconnect())
-                    except Exception as e:
-                        print(f"断开连接失败: {str(e)}")
-            except Exception as e:
-                print(f"断开连接过程中发生错误: {str(e)}")
-            finally:
-                # 清理资源
-                self.client = None
+        # 停止独立I/O线程（线程内会在限定时间内断开连接）
+        if self.ble_worker:
+            self.sample_drain_timer.stop()
+            self.ble_worker.stop()
+            self.ble_worker.wait(int((SHUTDOWN_TIMEOUT + 1) * 1000))
+            if self.sample_buffer.overruns:
+                print(f"样本缓冲区溢出 {self.sample_buffer.overruns} 次")
+            self.ble_worker = None
+        
+        # 停止独立蓝牙进程（进程内在限定时间内断开连接，超时后强制结束）
+        if self.ble_process:
+            self.ble_process_timer.stop()
+            self.ble_process.stop(SHUTDOWN_TIMEOUT)
+            self.ble_process = None
+        
+        # 结束录制
+        if self.session_writer:
+            self.record_checkbox.setChecked(False)
+        
+        # Qt事件循环已经退出（没有界面需要响应），直接在时限内断开连接
+        if not self._shutdown_done and self.loop and not self.loop.is_closed() and not self.loop.is_running():
+            self.loop.run_until_complete(self._shutdown_connections())
         
         # 更新状态
         self.is_connected = False
         self.current_heart_rate = 0
         self.disconnect_button.setEnabled(False)
         
-        # 终止扫描线程
+        # 结束扫描线程：先请求扫描器停止，只有线程没有在时限内退出时才强制终止
         if self.scan_thread and self.scan_thread.isRunning():
-            self.scan_thread.terminate()
-            self.scan_thread.wait()
+            self.scan_thread.stop()
+            if not self.scan_thread.wait(int(connection_state.DEFAULT_TIMEOUTS.teardown * 1000)):
+                print("扫描线程未能及时退出，强制终止")
+                self.scan_thread.terminate()
+                self.scan_thread.wait()
         
-        # 关闭事件循环
-        if self.loop:
+        # 结束后台扫描线程
+        if self.advertisement_monitor is not None:
+            self.group_refresh_timer.stop()
+        if self.scan_service:
+            self.scan_service.stop()
+            if not self.scan_service.wait(int((SCAN_SERVICE_STOP_TIMEOUT + 1) * 1000)):
+                print("后台扫描线程未能及时退出，强制终止")
+                self.scan_service.terminate()
+                self.scan_service.wait()
+            self.scan_service = None
+        
+        # 关闭事件循环（集成模式下由qasync负责关闭）
+        if self.loop and self.event_loop_timer is not None:
             if self.loop.is_running():
                 self.loop.stop()
             self.loop.close()
         
         event.accept()
+    
+    async def _shutdown_and_close(self):
+        """异步关闭流程：断开连接后回到Qt事件中关闭窗口"""
+        await self._shutdown_connections()
+        # 回到Qt事件中再关闭窗口（轮询模式下此时仍在事件循环内部，不能关闭事件循环）
+        QTimer.singleShot(0, self._finish_close)
+    
+    async def _shutdown_connections(self):
+        """在CLOSE_TIMEOUT内断开所有连接、关闭广播服务"""
+        if self.scan_thread and self.scan_thread.isRunning():
+            self.scan_thread.stop()
+        if self.scan_service:
+            self.scan_service.stop()
+        steps = [self.connection.shutdown(), self.connection_pool.close_all()]
+        if self.broadcast_server:
+            steps.append(self.broadcast_server.close())
+        try:
+            results = await asyncio.wait_for(
+                asyncio.gather(*steps, return_exceptions=True), CLOSE_TIMEOUT
+            )
+            for result in results:
+                if isinstance(result, Exception):
+                    print(f"关闭过程中发生错误: {str(result)}")
+        except asyncio.TimeoutError:
+            print(f"断开连接超过 {CLOSE_TIMEOUT:g} 秒，直接退出")
+        self.broadcast_server = None
+    
+    def _force_close(self):
+        """事件循环没有在时限内完成关闭流程时直接关闭"""
+        if not self._shutdown_done:
+            print("关闭流程超时，强制退出")
+            self._finish_close()
+    
+    def _finish_close(self):
+        self._shutdown_done = True
+        self.close()
+
+
+def create_event_loop(app):
+    """创建与Qt共用调度器的asyncio事件循环，qasync不可用时返回None"""
+    if not USE_INTEGRATED_EVENT_LOOP:
+        return None
+    try:
+        import qasync
+    except ImportError:
+        print("未安装qasync，使用定时器轮询事件循环")
+        return None
+    loop = qasync.QEventLoop(app)
+    asyncio.set_event_loop(loop)
+    return loop
 
 if __name__ == "__main__":
+    if USE_BLE_WORKER_PROCESS and getattr(sys, "frozen", False):
+        # 打包后的程序启动蓝牙工作进程时需要先交给multiprocessing处理
+        import multiprocessing
+        multiprocessing.freeze_support()
+    profiler = StartupProfiler(PROCESS_STARTED_AT, IMPORTS_DONE_AT)
     app = QApplication(sys.argv)
     
     # 设置应用程序样式
@@ -716,7 +1487,40 @@ if __name__ == "__main__":
     palette.setColor(QPalette.WindowText, QColor(0, 0, 0))
     app.setPalette(palette)
     
-    window = HeartRateMonitor()
+    backend_name = "simulated" if "--simulate" in sys.argv else DEVICE_BACKEND
+    # 模拟后端的设备不写入真实设备缓存
+    device_cache = DeviceCache(DEVICE_CACHE_PATH if backend_name == "bleak" else None)
+    loop = create_event_loop(app)
+    profiler.mark("app")
+    window = HeartRateMonitor(loop, create_backend(backend_name), device_cache)
+    profiler.mark("ui")
+    profiler.watch(window)
+    
+    if "--profile-startup" in sys.argv:
+        # 只测量启动耗时：首次绘制后输出各阶段耗时并退出（benchmarks/bench_startup.py使用）
+        import json
+        profiler.after_first_paint(lambda: print("STARTUP_PROFILE " + json.dumps(profiler.to_dict())))
+        profiler.after_first_paint(app.quit)
+    else:
+        def start_local_services():
+            if METRICS_PORT is not None:
+                try:
+                    metrics_server = metrics.MetricsServer(METRICS_PORT).start()
+                    print(f"指标端点: http://127.0.0.1:{metrics_server.port}/metrics")
+                except OSError as e:
+                    print(f"指标端点启动失败: {str(e)}")
+            if BROADCAST_PORT is not None or BROADCAST_WEBSOCKET_PORT is not None:
+                window.start_broadcast_server()
+        
+        if FAST_STARTUP:
+            profiler.after_first_paint(start_local_services)
+        else:
+            start_local_services()
+    
     window.show()
     
-    sys.exit(app.exec_())
\ No newline at end of file
+    if loop is not None:
+        with loop:
+            loop.run_forever()
+        sys.exit(0)
+    sys.exit(app.exec_())
@@ -0,0 +1,238 @@
+"""
+运行时指标
+
+提供计数器、仪表和直方图，并通过本地HTTP端点以Prometheus文本格式输出。
+热路径上的记录操作只是整数加法或一次二分查找，不加锁、不分配对象。
+（多线程同时递增时极少数情况下可能少计一次，对监控用途可以接受。）
+"""
+import math
+import threading
+from bisect import bisect_left
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """只增不减的计数器"""
+    __slots__ = ("name", "help", "value")
+    kind = "counter"
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def samples(self):
+        yield self.name, self.value
+
+
+class Gauge:
+    """可增可减的仪表"""
+    __slots__ = ("name", "help", "value")
+    kind = "gauge"
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def dec(self, amount=1):
+        self.value -= amount
+
+    def samples(self):
+        yield self.name, self.value
+
+
+class Histogram:
+    """固定分桶的直方图"""
+    __slots__ = ("name", "help", "buckets", "counts", "sum", "count")
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        # 最后一个桶对应+Inf
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self):
+        cumulative = 0
+        for bound, count in zip(self.buckets + (math.inf,), self.counts):
+            cumulative += count
+            yield f'{self.name}_bucket{{le="{_format_value(float(bound))}"}}', cumulative
+        yield f"{self.name}_sum", self.sum
+        yield f"{self.name}_count", self.count
+
+
+class IntervalTracker:
+    """记录事件到达间隔和抖动（间隔与平均间隔偏差的指数滑动平均）"""
+    __slots__ = ("histogram", "jitter_gauge", "last", "mean_interval", "jitter")
+
+    def __init__(self, histogram, jitter_gauge):
+        self.histogram = histogram
+        self.jitter_gauge = jitter_gauge
+        self.last = None
+        self.mean_interval = None
+        self.jitter = 0.0
+
+    def tick(self, now):
+        last = self.last
+        self.last = now
+        if last is None:
+            return
+        interval = now - last
+        self.histogram.observe(interval)
+        if self.mean_interval is None:
+            self.mean_interval = interval
+            return
+        # 与RTP抖动估计相同的1/16平滑系数
+        self.jitter += (abs(interval - self.mean_interval) - self.jitter) / 16
+        self.mean_interval += (interval - self.mean_interval) / 16
+        self.jitter_gauge.set(self.jitter)
+
+    def reset(self):
+        self.last = None
+
+
+class MetricsRegistry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def _register(self, metric):
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def register(self, metric):
+        """注册自定义指标（需提供name、help、kind和samples()），同名指标已存在时返回已有的"""
+        return self._register(metric)
+
+    def counter(self, name, help_text):
+        return self._register(Counter(name, help_text))
+
+    def gauge(self, name, help_text):
+        return self._register(Gauge(name, help_text))
+
+    def histogram(self, name, help_text, buckets):
+        return self._register(Histogram(name, help_text, buckets))
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def render(self):
+        """输出Prometheus文本格式"""
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, value in metric.samples():
+                lines.append(f"{name} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+# 应用指标
+NOTIFICATIONS_RECEIVED = REGISTRY.counter(
+    "xiaomihype_notifications_received_total", "收到的心率通知数")
+SAMPLES_DROPPED = REGISTRY.counter(
+    "xiaomihype_samples_dropped_total", "缓冲区已满被丢弃的样本数")
+PARSE_ERRORS = REGISTRY.counter(
+    "xiaomihype_parse_errors_total", "格式错误的心率测量数据数")
+RECONNECTS = REGISTRY.counter(
+    "xiaomihype_reconnects_total", "意外断开后重连成功的次数")
+CONNECT_FAILURES = REGISTRY.counter(
+    "xiaomihype_connect_failures_total", "连接失败的次数")
+ADVERTISEMENTS_RECEIVED = REGISTRY.counter(
+    "xiaomihype_advertisements_received_total", "扫描线程收到的广告包数")
+ADVERTISEMENTS_FORWARDED = REGISTRY.counter(
+    "xiaomihype_advertisements_forwarded_total", "转发到GUI线程的广告包数")
+HEART_RATES_FILTERED = REGISTRY.counter(
+    "xiaomihype_heart_rates_filtered_total", "显示前被过滤丢弃的心率值数（未接触或超出合理范围）")
+SCAN_TIME_TO_FIRST_DEVICE = REGISTRY.gauge(
+    "xiaomihype_scan_time_to_first_device_seconds", "从开始扫描（或后台扫描boost）到第一个可选设备出现的耗时")
+CONNECTED_DEVICES = REGISTRY.gauge(
+    "xiaomihype_connected_devices", "当前已连接的设备数")
+CONNECT_DURATION = REGISTRY.histogram(
+    "xiaomihype_connect_duration_seconds", "从发起连接到启动通知的耗时",
+    (0.25, 0.5, 1, 2, 3, 5, 10, 20, 30))
+NOTIFICATION_INTERVAL = REGISTRY.histogram(
+    "xiaomihype_notification_interval_seconds", "相邻两次通知的时间间隔",
+    (0.1, 0.25, 0.5, 0.75, 1, 1.25, 1.5, 2, 3, 5, 10))
+NOTIFICATION_JITTER = REGISTRY.gauge(
+    "xiaomihype_notification_jitter_seconds", "通知间隔抖动（平滑后的偏差）")
+COLD_START_FIRST_HEART_RATE = REGISTRY.gauge(
+    "xiaomihype_cold_start_first_heart_rate_seconds", "从进程启动到显示第一个心率值的耗时")
+GUI_UPDATE_LATENCY = REGISTRY.histogram(
+    "xiaomihype_gui_update_latency_seconds", "从收到通知到界面更新完成的耗时",
+    (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1))
+
+
+def _make_handler(registry):
+    """创建请求处理类（http.server在启动端点时才导入，不计入程序启动时间）"""
+    from http.server import BaseHTTPRequestHandler
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/metrics", "/"):
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # 不在控制台打印访问日志
+            pass
+
+    return MetricsHandler
+
+
+class MetricsServer:
+    """在后台线程中提供 /metrics 的本地HTTP服务"""
+
+    def __init__(self, port=9464, host="127.0.0.1", registry=REGISTRY):
+        from http.server import ThreadingHTTPServer
+        self.server = ThreadingHTTPServer((host, port), _make_handler(registry))
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self._thread = threading.Thread(target=self.server.serve_forever, name="metrics", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,103 @@
+"""
+自动重连
+
+设备意外断开后，直接用已知的设备对象（不重新扫描）按带抖动的指数退避重连，
+连接成功后立即重新启动心率通知。同时记录每次断线的恢复耗时和数据中断时长。
+"""
+import time
+import random
+import asyncio
+import metrics
+
+RECONNECT_RECOVERY = metrics.REGISTRY.histogram(
+    "xiaomihype_reconnect_recovery_seconds", "从断开到重新启动通知的耗时",
+    (0.25, 0.5, 1, 2, 5, 10, 30, 60))
+RECONNECT_DATA_GAP = metrics.REGISTRY.histogram(
+    "xiaomihype_reconnect_data_gap_seconds", "断线前最后一个样本到重连后第一个样本的间隔",
+    (0.5, 1, 2, 3, 5, 10, 30, 60))
+
+
+class ReconnectPolicy:
+    """带抖动的指数退避策略"""
+
+    def __init__(self, initial_delay=0.25, multiplier=2.0, max_delay=10.0, jitter=0.5,
+                 max_attempts=None, rng=None):
+        # 第一次重试前的等待时间很短，大多数短暂断线能在1秒左右恢复
+        self.initial_delay = initial_delay
+        self.multiplier = multiplier
+        self.max_delay = max_delay
+        # 等待时间在 [delay * (1 - jitter), delay] 之间随机，避免多台设备同时重试
+        self.jitter = jitter
+        # 最大重试次数，None表示一直重试直到用户断开
+        self.max_attempts = max_attempts
+        self.random = rng or random.Random()
+
+    def delay(self, attempt):
+        """第attempt次（从1开始）重试前的等待时间"""
+        delay = min(self.max_delay, self.initial_delay * self.multiplier ** (attempt - 1))
+        return delay * (1.0 - self.jitter * self.random.random())
+
+    def allows(self, attempt):
+        return self.max_attempts is None or attempt <= self.max_attempts
+
+
+class RecoveryTracker:
+    """记录断线恢复耗时和数据中断时长"""
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.last_sample_at = None
+        self.disconnected_at = None
+        self.awaiting_first_sample = False
+        # 最近一次断线的统计（秒）
+        self.last_recovery_time = None
+        self.last_data_gap = None
+
+    def on_sample(self):
+        """每个样本调用一次，重连后的第一个样本结束数据中断"""
+        now = self.clock()
+        if self.awaiting_first_sample:
+            self.awaiting_first_sample = False
+            if self.last_sample_at is not None:
+                self.last_data_gap = now - self.last_sample_at
+                RECONNECT_DATA_GAP.observe(self.last_data_gap)
+        self.last_sample_at = now
+
+    def on_disconnected(self):
+        self.disconnected_at = self.clock()
+
+    def on_recovered(self):
+        """重新启动通知后调用"""
+        if self.disconnected_at is None:
+            return
+        self.last_recovery_time = self.clock() - self.disconnected_at
+        self.disconnected_at = None
+        self.awaiting_first_sample = True
+        RECONNECT_RECOVERY.observe(self.last_recovery_time)
+        metrics.RECONNECTS.inc()
+
+    def reset(self):
+        self.last_sample_at = None
+        self.disconnected_at = None
+        self.awaiting_first_sample = False
+
+
+async def reconnect_with_backoff(connect, policy, should_continue=lambda: True, on_attempt=None):
+    """
+    按退避策略反复调用 connect()（返回是否成功的协程函数），直到成功、
+    should_continue() 返回False或达到最大次数。返回是否重连成功。
+    """
+    attempt = 0
+    while True:
+        attempt += 1
+        if not policy.allows(attempt):
+            return False
+        await asyncio.sleep(policy.delay(attempt))
+        if not should_continue():
+            return False
+        if on_attempt:
+            on_attempt(attempt)
+        if await connect():
+            return True
+        if not should_continue():
+            return False
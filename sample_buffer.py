@@ -0,0 +1,87 @@
+"""
+心率样本环形缓冲区
+
+单生产者（蓝牙I/O线程）/单消费者（GUI线程）模型：
+生产者只修改写指针，消费者只修改读指针，两边都不需要加锁。
+存储空间在创建时一次性分配，运行过程中不会再产生新的对象。
+"""
+from array import array
+
+# 每个样本最多携带的RR间期个数（1 Hz通知时通常只有1~2个，与SharedSampleRing相同）
+MAX_RR_PER_SAMPLE = 4
+
+# 接触状态的存储编码：-1未知（设备不支持接触检测）/0未接触/1已接触
+_CONTACT_CODES = {None: -1, False: 0, True: 1}
+_CONTACT_VALUES = {-1: None, 0: False, 1: True}
+
+
+class SampleRingBuffer:
+    """预分配的带时间戳心率样本环形缓冲区"""
+
+    def __init__(self, capacity=4096):
+        # 容量取2的幂，便于用位运算计算下标
+        size = 1
+        while size < capacity:
+            size <<= 1
+        self.capacity = size
+        self._mask = size - 1
+        self._timestamps = array('d', bytes(8 * size))
+        self._heart_rates = array('H', bytes(2 * size))
+        self._contacts = array('b', bytes(size))
+        # RR间期以1/1024秒为单位存放（与0x2A37原始数据相同，换算回毫秒不损失精度）
+        self._rr_counts = array('B', bytes(size))
+        self._rr_intervals = array('H', bytes(2 * size * MAX_RR_PER_SAMPLE))
+        # 写指针和读指针只增不减，各自只由一个线程修改
+        self._write_index = 0
+        self._read_index = 0
+        # 缓冲区已满时被丢弃的样本数
+        self.overruns = 0
+
+    def push(self, timestamp, heart_rate, sensor_contact=None, rr_intervals=()):
+        """写入一个样本（生产者线程调用），缓冲区已满时返回False
+
+        rr_intervals为毫秒，超过MAX_RR_PER_SAMPLE个时只保留前面的
+        """
+        write_index = self._write_index
+        if write_index - self._read_index >= self.capacity:
+            self.overruns += 1
+            return False
+        slot = write_index & self._mask
+        self._timestamps[slot] = timestamp
+        self._heart_rates[slot] = heart_rate
+        self._contacts[slot] = _CONTACT_CODES[sensor_contact]
+        count = min(len(rr_intervals), MAX_RR_PER_SAMPLE)
+        base = slot * MAX_RR_PER_SAMPLE
+        for i in range(count):
+            self._rr_intervals[base + i] = min(0xFFFF, int(round(rr_intervals[i] * 1.024)))
+        self._rr_counts[slot] = count
+        # 数据写完后再移动写指针，消费者才能看到这个样本
+        self._write_index = write_index + 1
+        return True
+
+    def drain(self, max_samples=None):
+        """取出所有未读样本（消费者线程调用）
+
+        返回[(时间戳, 心率, 接触状态, RR间期元组(毫秒)), ...]
+        """
+        read_index = self._read_index
+        available = self._write_index - read_index
+        if max_samples is not None and available > max_samples:
+            available = max_samples
+        samples = []
+        for index in range(read_index, read_index + available):
+            slot = index & self._mask
+            base = slot * MAX_RR_PER_SAMPLE
+            rr_intervals = tuple(
+                units * 1000 / 1024 for units in self._rr_intervals[base:base + self._rr_counts[slot]]
+            )
+            samples.append((
+                self._timestamps[slot], self._heart_rates[slot],
+                _CONTACT_VALUES[self._contacts[slot]], rr_intervals,
+            ))
+        self._read_index = read_index + available
+        return samples
+
+    def __len__(self):
+        """当前未读样本数"""
+        return self._write_index - self._read_index
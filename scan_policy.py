@@ -0,0 +1,45 @@
+"""
+扫描提前结束策略
+
+流式扫描时每发现一个设备都会询问策略是否可以停止扫描，
+满足条件后立即结束，而不是等满固定的扫描时长。
+"""
+
+
+class ScanStopPolicy:
+    """扫描停止策略基类：永不提前结束"""
+
+    def should_stop(self, device, advertisement_data, is_hrs):
+        """收到广告数据后调用，返回True表示可以停止扫描"""
+        return False
+
+
+class FirstHrsDevicePolicy(ScanStopPolicy):
+    """发现第一个支持HRS的设备后停止"""
+
+    def should_stop(self, device, advertisement_data, is_hrs):
+        return is_hrs
+
+
+class KnownAddressPolicy(ScanStopPolicy):
+    """发现任一已知地址的设备后停止"""
+
+    def __init__(self, addresses):
+        self.addresses = {address.upper() for address in addresses if address}
+
+    def should_stop(self, device, advertisement_data, is_hrs):
+        return device.address.upper() in self.addresses
+
+
+class RssiThresholdPolicy(ScanStopPolicy):
+    """发现信号强度不低于阈值的设备后停止（默认只考虑HRS设备）"""
+
+    def __init__(self, min_rssi=-60, hrs_only=True):
+        self.min_rssi = min_rssi
+        self.hrs_only = hrs_only
+
+    def should_stop(self, device, advertisement_data, is_hrs):
+        if self.hrs_only and not is_hrs:
+            return False
+        rssi = getattr(advertisement_data, 'rssi', None)
+        return rssi is not None and rssi >= self.min_rssi
@@ -0,0 +1,352 @@
+"""
+常驻的后台扫描服务
+
+扫描器只创建一次（被动/主动扫描切换时除外），按占空比周期性扫描（每interval秒扫描window秒），
+并维护附近设备表：
+- 每条广告更新设备的最后出现时间、RSSI和是否支持HRS
+- 每个扫描窗口结束时，移除超过max_age没有出现的设备（on_device_lost）
+- boost()临时切换为连续扫描（点击"扫描"、启动时查找上次连接的设备），可按停止策略提前结束；
+  设备表中已有的设备先按策略检查一遍，已知设备无需等待下一条广告
+- 记录从启动（或boost）到第一个可选设备出现的耗时（time_to_first_device，同时写入指标）；
+  boost开始时设备表中已有设备则记为0
+这样设备列表随时可用，用户操作不再包含创建线程、事件循环和扫描器的开销。
+除stop()、boost()、set_duty_cycle()外，所有方法都在运行run()的事件循环中调用。
+本模块不依赖Qt。
+"""
+import time
+import asyncio
+from hrs_parser import is_hrs_advertisement
+import metrics
+
+# 设备超过该时长（秒）没有出现在广告中即从设备表移除（至少为两个扫描周期）
+DEVICE_MAX_AGE = 60.0
+
+# 停止扫描器的最长等待时间（秒）
+STOP_TIMEOUT = 2.0
+
+# 启动扫描器失败（如蓝牙已关闭）后的重试间隔（秒）
+RETRY_INTERVAL = 5.0
+
+
+class DutyCycle:
+    """扫描占空比：每interval秒扫描window秒；passive为被动扫描（不发送扫描请求，更省电）"""
+
+    def __init__(self, name, window, interval, passive=False):
+        self.name = name
+        self.window = window
+        self.interval = max(interval, window)
+        self.passive = passive
+
+    @property
+    def continuous(self):
+        return self.window >= self.interval
+
+    @property
+    def ratio(self):
+        return self.window / self.interval
+
+
+DUTY_CYCLES = {
+    # 低功耗：每30秒被动扫描2秒（平台不支持被动扫描时使用主动扫描）
+    "low_power": DutyCycle("low_power", window=2.0, interval=30.0, passive=True),
+    # 均衡：每12秒扫描4秒
+    "balanced": DutyCycle("balanced", window=4.0, interval=12.0),
+    # 积极：连续扫描，每秒检查一次过期设备
+    "aggressive": DutyCycle("aggressive", window=1.0, interval=1.0),
+}
+
+
+def get_duty_cycle(name):
+    """按名称取占空比，未知名称时抛出ValueError"""
+    try:
+        return DUTY_CYCLES[name]
+    except KeyError:
+        raise ValueError(f"未知的扫描占空比: {name}（可选: {', '.join(DUTY_CYCLES)}）") from None
+
+
+class DeviceEntry:
+    """设备表中的一个设备"""
+    __slots__ = ("device", "advertisement", "rssi", "is_hrs", "first_seen", "last_seen")
+
+    def __init__(self, device, advertisement, is_hrs, now):
+        self.device = device
+        self.advertisement = advertisement
+        self.rssi = getattr(advertisement, 'rssi', None)
+        self.is_hrs = is_hrs
+        self.first_seen = now
+        self.last_seen = now
+
+
+class DeviceTable:
+    """按地址索引的附近设备表，带过期"""
+
+    def __init__(self, max_age=DEVICE_MAX_AGE):
+        self.max_age = max_age
+        self._entries = {}  # key: device address, value: DeviceEntry
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, address):
+        return address in self._entries
+
+    def get(self, address):
+        return self._entries.get(address)
+
+    def update(self, device, advertisement, is_hrs, now):
+        """记录一条广告，返回(设备, 是否新设备, 是否新确认支持HRS)"""
+        entry = self._entries.get(device.address)
+        if entry is None:
+            entry = self._entries[device.address] = DeviceEntry(device, advertisement, is_hrs, now)
+            return entry, True, is_hrs
+        became_hrs = is_hrs and not entry.is_hrs
+        entry.device = device
+        entry.advertisement = advertisement
+        entry.rssi = getattr(advertisement, 'rssi', None)
+        entry.is_hrs = entry.is_hrs or is_hrs
+        entry.last_seen = now
+        return entry, False, became_hrs
+
+    def expire(self, now):
+        """移除超过max_age没有出现的设备，返回被移除的设备"""
+        cutoff = now - self.max_age
+        expired = [entry for entry in self._entries.values() if entry.last_seen < cutoff]
+        for entry in expired:
+            del self._entries[entry.device.address]
+        return expired
+
+    def entries(self):
+        """所有设备：支持HRS的在前，同类按信号强度从强到弱"""
+        return sorted(
+            self._entries.values(),
+            key=lambda entry: (not entry.is_hrs, -(entry.rssi if entry.rssi is not None else -999)),
+        )
+
+
+class _Boost:
+    """一次临时的连续扫描"""
+    __slots__ = ("deadline", "stop_policy")
+
+    def __init__(self, deadline, stop_policy):
+        self.deadline = deadline
+        self.stop_policy = stop_policy
+
+
+class ScanService:
+    """按占空比持续扫描并维护设备表"""
+
+    def __init__(self, backend, duty_cycle, on_device_found=None, on_device_lost=None,
+                 on_advertisement=None, on_boost_finished=None, on_error=None,
+                 on_window_finished=None, service_uuids=None, max_age=DEVICE_MAX_AGE, clock=time.monotonic):
+        self.backend = backend
+        self.duty_cycle = duty_cycle
+        # on_device_found(device, is_hrs)：新设备出现或新确认支持HRS
+        self.on_device_found = on_device_found
+        # on_device_lost(address)：设备过期被移除
+        self.on_device_lost = on_device_lost
+        # on_advertisement(device, advertisement_data, is_hrs)：每条广告
+        self.on_advertisement = on_advertisement
+        # on_boost_finished(devices)：一次boost结束（超时或满足停止策略）
+        self.on_boost_finished = on_boost_finished
+        # on_error(message)：启动扫描器失败，稍后自动重试
+        self.on_error = on_error
+        # on_window_finished()：每个扫描窗口结束（连续扫描时每window秒）
+        self.on_window_finished = on_window_finished
+        self.service_uuids = service_uuids
+        self.max_age = max_age
+        self.clock = clock
+        self.table = DeviceTable(self._table_max_age())
+
+        self._loop = None
+        self._wake = None
+        self._stopped = False
+        self._boost = None
+        self._pending_boost = None
+
+        # 统计
+        self.scanner_created = 0
+        self.scanner_starts = 0
+        self.scan_time = 0.0
+        self.started_at = None
+        # 从启动或最近一次boost到第一个可选设备出现的时间（秒）
+        self.time_to_first_device = None
+        self._first_device_since = None
+
+    def _table_max_age(self):
+        # 低占空比时两次扫描之间的设备不能被当作已消失
+        return max(self.max_age, 2 * self.duty_cycle.interval)
+
+    @property
+    def scanning_ratio(self):
+        """启动以来扫描器处于扫描状态的时间比例"""
+        if self.started_at is None:
+            return 0.0
+        elapsed = self.clock() - self.started_at
+        return self.scan_time / elapsed if elapsed > 0 else 0.0
+
+    # ---- 可在任意线程调用 ----
+
+    def stop(self):
+        """结束run()"""
+        self._stopped = True
+        self._wake_up()
+
+    def boost(self, seconds, stop_policy=None):
+        """临时连续扫描seconds秒，满足stop_policy后提前结束，结束时调用on_boost_finished"""
+        self._pending_boost = _Boost(self.clock() + seconds, stop_policy)
+        self._wake_up()
+
+    def set_duty_cycle(self, duty_cycle):
+        """切换占空比，下一个扫描窗口生效"""
+        self.duty_cycle = duty_cycle
+        self._wake_up()
+
+    def _wake_up(self):
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            try:
+                loop.call_soon_threadsafe(self._wake.set)
+            except RuntimeError:
+                pass
+
+    # ---- 事件循环内 ----
+
+    def _create_scanner(self, passive):
+        self.scanner_created += 1
+        options = {"passive": True} if passive else {}
+        if self.service_uuids:
+            options["service_uuids"] = self.service_uuids
+        return self.backend.create_scanner(self._on_detection, **options)
+
+    def _on_detection(self, device, advertisement_data):
+        is_hrs = is_hrs_advertisement(advertisement_data)
+        now = self.clock()
+        entry, is_new, became_hrs = self.table.update(device, advertisement_data, is_hrs, now)
+        if is_new and self.time_to_first_device is None and self._first_device_since is not None:
+            self._set_time_to_first_device(now - self._first_device_since)
+        if (is_new or became_hrs) and self.on_device_found:
+            self.on_device_found(device, entry.is_hrs)
+        if self.on_advertisement:
+            self.on_advertisement(device, advertisement_data, is_hrs)
+        boost = self._boost
+        if (boost is not None and boost.stop_policy is not None
+                and boost.stop_policy.should_stop(device, advertisement_data, is_hrs)):
+            self._finish_boost()
+
+    def _take_pending_boost(self):
+        """开始等待中的boost；设备表中已有满足停止策略的设备时直接结束"""
+        boost = self._pending_boost
+        if boost is None:
+            return
+        self._pending_boost = None
+        self._first_device_since = self.clock()
+        self.time_to_first_device = None
+        if len(self.table):
+            # 设备列表中已有可选的设备
+            self._set_time_to_first_device(0.0)
+        if boost.stop_policy is not None:
+            for entry in self.table.entries():
+                if boost.stop_policy.should_stop(entry.device, entry.advertisement, entry.is_hrs):
+                    self._report_boost_finished()
+                    return
+        self._boost = boost
+
+    def _set_time_to_first_device(self, seconds):
+        self.time_to_first_device = seconds
+        metrics.SCAN_TIME_TO_FIRST_DEVICE.set(seconds)
+
+    def _finish_boost(self):
+        if self._boost is None:
+            return
+        self._boost = None
+        self._wake.set()
+        self._report_boost_finished()
+
+    def _report_boost_finished(self):
+        if self.on_boost_finished:
+            self.on_boost_finished([entry.device for entry in self.table.entries()])
+
+    def _expire(self):
+        self.table.max_age = self._table_max_age()
+        for entry in self.table.expire(self.clock()):
+            if self.on_device_lost:
+                self.on_device_lost(entry.device.address)
+
+    async def _wait(self, timeout):
+        """等待timeout秒，被stop()/boost()/set_duty_cycle()唤醒时提前返回"""
+        if timeout <= 0:
+            return
+        try:
+            await asyncio.wait_for(self._wake.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._wake.clear()
+
+    async def _pause(self, duty):
+        """两个扫描窗口之间的间隔，boost或切换占空比时提前结束"""
+        resume_at = self.clock() + duty.interval - duty.window
+        while not self._stopped:
+            await self._wait(resume_at - self.clock())
+            self._take_pending_boost()
+            if self._boost or self.duty_cycle is not duty or self.clock() >= resume_at:
+                return
+
+    async def _stop_scanner(self, scanner):
+        try:
+            await asyncio.wait_for(scanner.stop(), STOP_TIMEOUT)
+        except asyncio.TimeoutError:
+            print("停止扫描器超时")
+        except Exception as e:
+            print(f"停止扫描器失败: {str(e)}")
+
+    async def run(self):
+        """持续扫描直到stop()"""
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self.started_at = self._first_device_since = self.clock()
+        scanner = None
+        passive = None
+        scanning_since = None
+        try:
+            while not self._stopped:
+                self._take_pending_boost()
+                duty = DUTY_CYCLES["aggressive"] if self._boost else self.duty_cycle
+                if scanner is None or duty.passive != passive:
+                    if scanning_since is not None:
+                        await self._stop_scanner(scanner)
+                        self.scan_time += self.clock() - scanning_since
+                        scanning_since = None
+                    passive = duty.passive
+                    scanner = self._create_scanner(passive)
+                if scanning_since is None:
+                    try:
+                        await scanner.start()
+                    except Exception as e:
+                        scanner = None
+                        if self.on_error:
+                            self.on_error(str(e))
+                        await self._wait(RETRY_INTERVAL)
+                        continue
+                    self.scanner_starts += 1
+                    scanning_since = self.clock()
+
+                window = duty.window
+                if self._boost:
+                    window = min(window, max(0.0, self._boost.deadline - self.clock()))
+                await self._wait(window)
+                self._expire()
+                if self.on_window_finished:
+                    self.on_window_finished()
+                if self._boost and self.clock() >= self._boost.deadline:
+                    self._finish_boost()
+                if self._stopped or self._boost or self._pending_boost or self.duty_cycle.continuous:
+                    continue
+
+                await self._stop_scanner(scanner)
+                self.scan_time += self.clock() - scanning_since
+                scanning_since = None
+                await self._pause(self.duty_cycle)
+        finally:
+            if scanning_since is not None:
+                await self._stop_scanner(scanner)
+                self.scan_time += self.clock() - scanning_since
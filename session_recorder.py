@@ -0,0 +1,437 @@
+"""
+心率会话录制
+
+以只追加的二进制格式记录带时间戳的心率样本（心率、RR间期、接触状态、设备地址），
+读取时通过内存映射打开文件，只扫描数据块头建立索引，按时间范围查询时只解码相关的数据块。
+
+文件格式（小端序）：
+    文件头:   b"XHRS" + 版本(u8) + 保留(3字节)
+    数据块:   类型(1字节) + 负载长度(u32) + 负载CRC32(u32)
+              + 首个时间戳(i64, 毫秒) + 末个时间戳(i64, 毫秒) + 样本数(u32) + 负载
+    类型"D":  设备定义，负载为 设备编号(varint) + 地址(UTF-8)
+    类型"S":  样本块，负载中每个样本依次为
+              时间增量(varint, 毫秒) + 心率增量(zigzag varint) + 标志(1字节)
+              [+ 设备编号(varint)] [+ RR个数(varint) + RR间期(varint, 1/1024秒)...]
+    标志位:   bit0-1 接触状态(0=不支持, 1=未接触, 2=接触), bit2 含RR间期, bit3 设备切换
+
+每批样本整块写入并刷新到磁盘，程序崩溃最多丢失最后一批（没有新样本时由flush_if_due()按间隔写出）；
+样本时间戳必须单调不减，早于上一个样本的样本被拒绝（计入out_of_order），索引才能按时间二分查找。
+打开文件时校验所有数据块的CRC：末尾不完整或校验失败的数据块视为崩溃残留，重新打开追加时会截掉；
+中间校验失败的样本块不进入索引（计入corrupt_blocks），其他数据块仍可读取。
+"""
+import os
+import mmap
+import time
+import zlib
+import threading
+from array import array
+from struct import Struct
+
+MAGIC = b"XHRS"
+VERSION = 1
+FILE_HEADER = Struct("<4sB3x")
+BLOCK_HEADER = Struct("<cIIqqI")
+
+BLOCK_DEVICE = b"D"
+BLOCK_SAMPLES = b"S"
+
+FLAG_CONTACT_MASK = 0x03
+FLAG_RR_INTERVALS = 0x04
+FLAG_DEVICE_CHANGED = 0x08
+
+# RR间期单位换算：毫秒 <-> 1/1024秒
+RR_UNITS_PER_MS = 1024.0 / 1000.0
+
+
+class SessionFormatError(ValueError):
+    """会话文件格式错误"""
+
+
+def _write_varint(buffer, value):
+    """把无符号整数按varint编码追加到buffer"""
+    while value > 0x7F:
+        buffer.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def _read_varint(data, offset):
+    """从offset处解码一个varint，返回(值, 新offset)"""
+    result = 0
+    shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, offset
+        shift += 7
+
+
+def _zigzag(value):
+    return (value << 1) ^ (value >> 63)
+
+
+def _unzigzag(value):
+    return (value >> 1) ^ -(value & 1)
+
+
+def _encode_contact(sensor_contact):
+    if sensor_contact is None:
+        return 0
+    return 2 if sensor_contact else 1
+
+
+class _FsyncThread(threading.Thread):
+    """在后台线程中执行fsync，多次请求合并为一次（界面线程只写入系统缓存，不等待磁盘）"""
+
+    def __init__(self, fileno):
+        super().__init__(name="session-fsync", daemon=True)
+        self.fileno = fileno
+        self._requested = threading.Event()
+        self._stopping = False
+
+    def request(self):
+        self._requested.set()
+
+    def stop(self):
+        """执行最后一次fsync后退出"""
+        self._stopping = True
+        self._requested.set()
+        self.join()
+
+    def run(self):
+        while True:
+            self._requested.wait()
+            self._requested.clear()
+            try:
+                os.fsync(self.fileno)
+            except OSError as e:
+                print(f"录制文件写入磁盘失败: {str(e)}")
+            if self._stopping:
+                return
+
+
+class RecordedSample:
+    """录制文件中的一个样本"""
+    __slots__ = ("timestamp", "heart_rate", "sensor_contact", "rr_intervals", "address")
+
+    def __init__(self, timestamp, heart_rate, sensor_contact, rr_intervals, address):
+        self.timestamp = timestamp
+        self.heart_rate = heart_rate
+        self.sensor_contact = sensor_contact
+        self.rr_intervals = rr_intervals
+        self.address = address
+
+    def __repr__(self):
+        return (
+            f"RecordedSample(timestamp={self.timestamp}, heart_rate={self.heart_rate}, "
+            f"sensor_contact={self.sensor_contact}, rr_intervals={self.rr_intervals}, "
+            f"address={self.address!r})"
+        )
+
+
+class SessionWriter:
+    """只追加的会话录制器，样本分批编码后整块写入"""
+
+    def __init__(self, path, flush_interval=10.0, max_batch=256, fsync=True, background_fsync=False,
+                 clock=time.monotonic):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.fsync = fsync
+        self.clock = clock
+        self.samples_written = 0
+        # 时间戳早于上一个样本而被拒绝的样本数
+        self.out_of_order = 0
+
+        self._devices = {}  # key: address, value: 设备编号
+        self._pending = []
+        self._last_flush = clock()
+        self._last_timestamp = None  # 毫秒
+
+        # 已有文件：读取设备表并截掉崩溃时可能残留的不完整数据块
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            with SessionReader(path) as reader:
+                self._devices = {address: index for index, address in enumerate(reader.devices)}
+                valid_end = reader.valid_end
+                if reader.end_time is not None:
+                    self._last_timestamp = int(round(reader.end_time * 1000))
+            self._file = open(path, "r+b")
+            self._file.truncate(valid_end)
+            self._file.seek(valid_end)
+        else:
+            self._file = open(path, "wb")
+            self._file.write(FILE_HEADER.pack(MAGIC, VERSION))
+
+        # background_fsync：GUI线程调用时fsync在后台线程执行
+        self._fsync_thread = None
+        if fsync and background_fsync:
+            self._fsync_thread = _FsyncThread(self._file.fileno())
+            self._fsync_thread.start()
+        self._sync()
+
+    def write(self, timestamp, heart_rate, sensor_contact=None, rr_intervals=(), address=""):
+        """追加一个样本（时间戳为秒，RR间期为毫秒），时间戳早于上一个样本时拒绝并返回False"""
+        milliseconds = int(round(timestamp * 1000))
+        if self._last_timestamp is not None and milliseconds < self._last_timestamp:
+            self.out_of_order += 1
+            return False
+        self._last_timestamp = milliseconds
+        self._pending.append((milliseconds, heart_rate, sensor_contact, rr_intervals, address))
+        if len(self._pending) >= self.max_batch:
+            self.flush()
+        else:
+            self.flush_if_due()
+        return True
+
+    def flush_if_due(self):
+        """距上次写出超过flush_interval时写出缓存的样本（没有新样本时由调用方定期调用）"""
+        if self._pending and self.clock() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """把缓存的样本编码为一个数据块写入磁盘"""
+        self._last_flush = self.clock()
+        if not self._pending:
+            return
+        samples = self._pending
+        self._pending = []
+
+        payload = bytearray()
+        previous_timestamp = samples[0][0]
+        previous_heart_rate = 0
+        current_device = None
+        for timestamp, heart_rate, sensor_contact, rr_intervals, address in samples:
+            device_index = self._devices.get(address)
+            if device_index is None:
+                device_index = self._write_device(address)
+
+            flags = _encode_contact(sensor_contact)
+            if rr_intervals:
+                flags |= FLAG_RR_INTERVALS
+            if device_index != current_device:
+                flags |= FLAG_DEVICE_CHANGED
+
+            _write_varint(payload, timestamp - previous_timestamp)
+            _write_varint(payload, _zigzag(heart_rate - previous_heart_rate))
+            payload.append(flags)
+            if flags & FLAG_DEVICE_CHANGED:
+                _write_varint(payload, device_index)
+                current_device = device_index
+            if flags & FLAG_RR_INTERVALS:
+                _write_varint(payload, len(rr_intervals))
+                for rr in rr_intervals:
+                    _write_varint(payload, int(round(rr * RR_UNITS_PER_MS)))
+
+            previous_timestamp = timestamp
+            previous_heart_rate = heart_rate
+
+        self._write_block(BLOCK_SAMPLES, payload, samples[0][0], previous_timestamp, len(samples))
+        self.samples_written += len(samples)
+        self._sync()
+
+    def _write_device(self, address):
+        """写入设备定义块，返回设备编号"""
+        device_index = len(self._devices)
+        self._devices[address] = device_index
+        payload = bytearray()
+        _write_varint(payload, device_index)
+        payload += address.encode("utf-8")
+        self._write_block(BLOCK_DEVICE, payload, 0, 0, 0)
+        return device_index
+
+    def _write_block(self, block_type, payload, first_timestamp, last_timestamp, count):
+        header = BLOCK_HEADER.pack(
+            block_type, len(payload), zlib.crc32(payload), first_timestamp, last_timestamp, count
+        )
+        self._file.write(header + payload)
+
+    def _sync(self):
+        self._file.flush()
+        if self._fsync_thread is not None:
+            self._fsync_thread.request()
+        elif self.fsync:
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        """写出剩余样本并关闭文件"""
+        if self._file.closed:
+            return
+        self.flush()
+        if self._fsync_thread is not None:
+            self._fsync_thread.stop()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class SessionReader:
+    """通过内存映射读取会话录制文件，支持按时间范围快速查询"""
+
+    def __init__(self, path):
+        self.path = path
+        self.devices = []
+        # 样本块索引
+        self._block_offsets = array('Q')
+        self._block_first = array('q')
+        self._block_last = array('q')
+        self._block_counts = array('L')
+        # 校验失败而被跳过的样本块数
+        self.corrupt_blocks = 0
+        # 样本块按时间排列（SessionWriter保证这一点）；文件不满足时查询逐块扫描，结果仍然正确
+        self.ordered = True
+
+        self._file = open(path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        if size < FILE_HEADER.size:
+            self._file.close()
+            raise SessionFormatError("文件不完整")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version = FILE_HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise SessionFormatError(f"不支持的文件格式: {magic!r} v{version}")
+        self.valid_end = self._build_index(size)
+
+    def _build_index(self, size):
+        """读取数据块头建立索引并校验每个数据块，返回最后一个有效数据块的结束位置"""
+        data = self._map
+        offset = FILE_HEADER.size
+        valid_end = offset
+        header_size = BLOCK_HEADER.size
+        while offset + header_size <= size:
+            block_type, length, crc, first, last, count = BLOCK_HEADER.unpack_from(data, offset)
+            payload_start = offset + header_size
+            end = payload_start + length
+            if end > size or block_type not in (BLOCK_DEVICE, BLOCK_SAMPLES):
+                break
+            valid = zlib.crc32(data[payload_start:end]) == crc
+            if block_type == BLOCK_DEVICE:
+                # 设备编号必须连续，设备块损坏时后面的样本无法对应到设备
+                if not valid:
+                    break
+                device_index, name_start = _read_varint(data, payload_start)
+                if device_index != len(self.devices):
+                    break
+                self.devices.append(data[name_start:end].decode("utf-8"))
+            elif not valid:
+                self.corrupt_blocks += 1
+                offset = end
+                continue
+            else:
+                if last < first or (self._block_offsets and first < self._block_last[-1]):
+                    self.ordered = False
+                self._block_offsets.append(offset)
+                self._block_first.append(first)
+                self._block_last.append(last)
+                self._block_counts.append(count)
+            offset = valid_end = end
+        # 末尾校验失败的数据块是崩溃时写了一半的，不计为损坏，重新打开追加时截掉
+        if self.corrupt_blocks and offset > valid_end:
+            self.corrupt_blocks -= self._trailing_corrupt(valid_end, offset)
+        return valid_end
+
+    def _trailing_corrupt(self, start, end):
+        """[start, end)内（最后一个有效数据块之后）校验失败的样本块数"""
+        count = 0
+        offset = start
+        while offset < end:
+            length = BLOCK_HEADER.unpack_from(self._map, offset)[1]
+            offset += BLOCK_HEADER.size + length
+            count += 1
+        return count
+
+    def __len__(self):
+        """样本总数"""
+        return sum(self._block_counts)
+
+    @property
+    def start_time(self):
+        """第一个样本的时间戳（秒），没有样本时为None"""
+        return self._block_first[0] / 1000 if self._block_offsets else None
+
+    @property
+    def end_time(self):
+        """最后一个样本的时间戳（秒），没有样本时为None"""
+        return self._block_last[-1] / 1000 if self._block_offsets else None
+
+    def _first_block(self, start_ms):
+        """第一个可能包含不早于start_ms样本的数据块"""
+        low, high = 0, len(self._block_last)
+        while low < high:
+            middle = (low + high) // 2
+            if self._block_last[middle] < start_ms:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _decode_block(self, block_index):
+        """解码一个样本块，逐个返回RecordedSample"""
+        offset = self._block_offsets[block_index]
+        _, length, _, first, _, count = BLOCK_HEADER.unpack_from(self._map, offset)
+        data = self._map
+        position = offset + BLOCK_HEADER.size
+        timestamp = first
+        heart_rate = 0
+        address = ""
+        for _ in range(count):
+            delta, position = _read_varint(data, position)
+            timestamp += delta
+            encoded, position = _read_varint(data, position)
+            heart_rate += _unzigzag(encoded)
+            flags = data[position]
+            position += 1
+            if flags & FLAG_DEVICE_CHANGED:
+                device_index, position = _read_varint(data, position)
+                address = self.devices[device_index]
+            rr_intervals = ()
+            if flags & FLAG_RR_INTERVALS:
+                rr_count, position = _read_varint(data, position)
+                values = []
+                for _ in range(rr_count):
+                    value, position = _read_varint(data, position)
+                    values.append(value / RR_UNITS_PER_MS)
+                rr_intervals = tuple(values)
+            contact = flags & FLAG_CONTACT_MASK
+            sensor_contact = None if contact == 0 else contact == 2
+            yield RecordedSample(timestamp / 1000, heart_rate, sensor_contact, rr_intervals, address)
+
+    def query(self, start, end):
+        """返回时间戳在[start, end)（秒）内的样本列表"""
+        start_ms = int(round(start * 1000))
+        end_ms = int(round(end * 1000))
+        samples = []
+        first_block = self._first_block(start_ms) if self.ordered else 0
+        for block_index in range(first_block, len(self._block_offsets)):
+            if self._block_first[block_index] >= end_ms:
+                if self.ordered:
+                    break
+                continue
+            for sample in self._decode_block(block_index):
+                milliseconds = int(round(sample.timestamp * 1000))
+                if start_ms <= milliseconds < end_ms:
+                    samples.append(sample)
+        return samples
+
+    def __iter__(self):
+        for block_index in range(len(self._block_offsets)):
+            yield from self._decode_block(block_index)
+
+    def close(self):
+        """关闭内存映射和文件"""
+        if getattr(self, "_map", None) is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,286 @@
+"""
+模拟的HRS心率手环
+
+在进程内模拟支持HRS协议的手环，提供与bleak一致的扫描器和客户端接口，
+用于在没有蓝牙硬件的普通Linux机器上运行应用、测试和性能测试。
+可配置通知频率、广告洪泛、连接延迟、断线和格式错误的数据。
+"""
+import random
+import asyncio
+from bleak.backends.device import BLEDevice
+from bleak.backends.scanner import AdvertisementData
+from hrs_parser import HRS_SERVICE_UUID, HEART_RATE_CHAR_UUID
+
+
+def make_ble_device(address, name):
+    """创建BLEDevice（兼容不同bleak版本的构造参数）"""
+    try:
+        return BLEDevice(address, name, None)
+    except TypeError:
+        return BLEDevice(address, name, None, -50)
+
+
+def make_advertisement(local_name=None, service_uuids=(), service_data=None, rssi=-60):
+    """创建AdvertisementData"""
+    return AdvertisementData(
+        local_name=local_name, manufacturer_data={}, service_data=service_data or {},
+        service_uuids=list(service_uuids), tx_power=None, rssi=rssi, platform_data=(),
+    )
+
+
+class SimulatedBand:
+    """一个模拟手环的行为配置和心率数据生成"""
+
+    def __init__(self, address="SIM:00:00:00:00:01", name="模拟手环", notify_rate=1.0,
+                 heart_rate=72, include_rr=True, sensor_contact=True, rssi=-55,
+                 advertise_heart_rate=False, advertisement_rate=5.0,
+                 connect_latency=0.2, connect_failure_rate=0.0, fail_notify=False, disconnect_latency=0.0,
+                 dropout_interval=None, dropout_duration=1.0,
+                 malformed_rate=0.0, seed=None):
+        self.address = address
+        self.name = name
+        # 每秒心率通知次数（真实手环约1 Hz）
+        self.notify_rate = notify_rate
+        self.heart_rate = heart_rate
+        self.include_rr = include_rr
+        self.sensor_contact = sensor_contact
+        self.rssi = rssi
+        # 是否在广告服务数据中广播心率
+        self.advertise_heart_rate = advertise_heart_rate
+        self.advertisement_rate = advertisement_rate
+        # 连接耗时（秒）和连接失败概率
+        self.connect_latency = connect_latency
+        self.connect_failure_rate = connect_failure_rate
+        # 连接成功但启动通知失败（模拟订阅被拒绝的手环）
+        self.fail_notify = fail_notify
+        # 停止通知和断开连接各自的耗时（秒），模拟不响应的手环
+        self.disconnect_latency = disconnect_latency
+        # 平均断线间隔（秒，None表示不断线）及断线后不可用的时长
+        self.dropout_interval = dropout_interval
+        self.dropout_duration = dropout_duration
+        # 格式错误的通知所占比例
+        self.malformed_rate = malformed_rate
+
+        self.random = random.Random(seed)
+        self.device = make_ble_device(address, name)
+        self.notifications_sent = 0
+        self.dropouts = 0
+        self._unavailable_until = 0.0
+
+    def next_heart_rate(self):
+        """心率随机游走"""
+        self.heart_rate = max(40, min(200, self.heart_rate + self.random.randint(-2, 2)))
+        return self.heart_rate
+
+    def make_payload(self):
+        """生成一条0x2A37通知数据"""
+        if self.malformed_rate and self.random.random() < self.malformed_rate:
+            # 格式错误：长度不足或UINT16心率值被截断
+            return bytearray(self.random.choice([b"", b"\x00", b"\x01\x48"]))
+
+        heart_rate = self.next_heart_rate()
+        flags = 0x00
+        if self.sensor_contact is not None:
+            flags |= 0x04 | (0x02 if self.sensor_contact else 0x00)
+        payload = bytearray([flags, heart_rate])
+        if self.include_rr:
+            payload[0] |= 0x10
+            rr = int(round(60.0 / heart_rate * 1024))
+            payload += rr.to_bytes(2, "little")
+        return payload
+
+    def advertisement(self):
+        """生成一条广告数据"""
+        service_data = {}
+        if self.advertise_heart_rate:
+            service_data[HRS_SERVICE_UUID] = bytes([0x00, self.next_heart_rate()])
+        rssi = self.rssi + self.random.randint(-3, 3)
+        return make_advertisement(self.name, [HRS_SERVICE_UUID], service_data, rssi)
+
+    def is_available(self, now):
+        """断线后的一段时间内无法连接"""
+        return now >= self._unavailable_until
+
+    def mark_dropout(self, now):
+        self.dropouts += 1
+        self._unavailable_until = now + self.dropout_duration
+
+
+class SimulatedScanner:
+    """模拟的扫描器，按配置频率回调广告数据"""
+
+    def __init__(self, backend, detection_callback, service_uuids=None):
+        self.backend = backend
+        self.detection_callback = detection_callback
+        self.service_uuids = [uuid.lower() for uuid in service_uuids or []]
+        self._tasks = []
+
+    async def start(self):
+        for band in self.backend.bands:
+            self._tasks.append(asyncio.ensure_future(self._advertise_band(band)))
+        if self.backend.flood_rate > 0 and not self.service_uuids:
+            self._tasks.append(asyncio.ensure_future(self._flood()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _advertise_band(self, band):
+        # 第一条广告在首个间隔内随机出现
+        await asyncio.sleep(band.random.uniform(0, 1.0 / band.advertisement_rate))
+        await _run_at_rate(
+            band.advertisement_rate,
+            lambda: self.detection_callback(band.device, band.advertisement()),
+        )
+
+    async def _flood(self):
+        """模拟拥挤环境中大量无关设备的广告"""
+        devices = [
+            make_ble_device(f"NOISE:{i // 256:02X}:{i % 256:02X}", None)
+            for i in range(self.backend.flood_devices)
+        ]
+        rng = random.Random(0)
+
+        def emit():
+            device = devices[rng.randrange(len(devices))]
+            self.detection_callback(device, make_advertisement(rssi=rng.randint(-100, -40)))
+
+        await _run_at_rate(self.backend.flood_rate, emit)
+
+
+class SimulatedClient:
+    """模拟的BleakClient"""
+
+    def __init__(self, backend, device, disconnected_callback=None, timeout=20.0):
+        self.backend = backend
+        self.band = backend.find_band(device)
+        self.address = device.address if hasattr(device, "address") else device
+        self.disconnected_callback = disconnected_callback
+        self.timeout = timeout
+        self.is_connected = False
+        self._notify_task = None
+        self._dropout_task = None
+
+    async def connect(self, **kwargs):
+        if self.band is None:
+            raise RuntimeError(f"设备 {self.address} 不存在")
+        loop = asyncio.get_running_loop()
+        await asyncio.sleep(self.band.connect_latency)
+        if not self.band.is_available(loop.time()):
+            raise TimeoutError(f"设备 {self.address} 不可用")
+        if self.band.connect_failure_rate and self.band.random.random() < self.band.connect_failure_rate:
+            raise RuntimeError(f"连接设备 {self.address} 失败")
+        self.is_connected = True
+        self.backend.connects += 1
+        if self.band.dropout_interval:
+            self._dropout_task = asyncio.ensure_future(self._dropout_loop())
+        return True
+
+    async def start_notify(self, char_uuid, callback, **kwargs):
+        if not self.is_connected:
+            raise RuntimeError("设备未连接")
+        if char_uuid.lower() != HEART_RATE_CHAR_UUID:
+            raise ValueError(f"不支持的特征值: {char_uuid}")
+        if self.band.fail_notify:
+            raise RuntimeError("订阅失败")
+        self._stop_notify_task()
+        band = self.band
+
+        def notify():
+            band.notifications_sent += 1
+            callback(None, band.make_payload())
+
+        self._notify_task = asyncio.ensure_future(_run_at_rate(band.notify_rate, notify))
+
+    async def stop_notify(self, char_uuid):
+        self._stop_notify_task()
+        await asyncio.sleep(self.band.disconnect_latency)
+
+    async def disconnect(self):
+        self._stop_notify_task()
+        await asyncio.sleep(self.band.disconnect_latency)
+        if self._dropout_task:
+            self._dropout_task.cancel()
+            self._dropout_task = None
+        if self.is_connected:
+            self.backend.disconnects += 1
+        self.is_connected = False
+        return True
+
+    def _stop_notify_task(self):
+        if self._notify_task:
+            self._notify_task.cancel()
+            self._notify_task = None
+
+    async def _dropout_loop(self):
+        """按指数分布的随机间隔模拟断线"""
+        await asyncio.sleep(self.band.random.expovariate(1.0 / self.band.dropout_interval))
+        self._stop_notify_task()
+        self.is_connected = False
+        self._dropout_task = None
+        self.band.mark_dropout(asyncio.get_running_loop().time())
+        if self.disconnected_callback:
+            self.disconnected_callback(self)
+
+
+class SimulatedBackend:
+    """模拟设备后端，接口与device_backend.BleakBackend一致"""
+    name = "simulated"
+
+    def __init__(self, bands=(), flood_devices=0, flood_rate=0.0):
+        self.bands = list(bands)
+        # 广告洪泛：无关设备数量和每秒广告总数
+        self.flood_devices = flood_devices
+        self.flood_rate = flood_rate if flood_devices else 0.0
+        # 成功建立和主动断开的连接数
+        self.connects = 0
+        self.disconnects = 0
+
+    @classmethod
+    def with_default_band(cls, count=1, flood_devices=0, flood_rate=0.0, **band_options):
+        """创建包含count个模拟手环的后端"""
+        bands = [
+            SimulatedBand(
+                address=f"SIM:00:00:00:{n // 256:02X}:{n % 256:02X}",
+                name=f"模拟手环{n}", seed=n, **band_options
+            )
+            for n in range(1, count + 1)
+        ]
+        return cls(bands, flood_devices=flood_devices, flood_rate=flood_rate)
+
+    def find_band(self, device):
+        address = device.address if hasattr(device, "address") else device
+        for band in self.bands:
+            if band.address.upper() == address.upper():
+                return band
+        return None
+
+    def create_scanner(self, detection_callback, service_uuids=None, passive=False):
+        return SimulatedScanner(self, detection_callback, service_uuids)
+
+    def create_client(self, device, disconnected_callback=None, timeout=20.0):
+        return SimulatedClient(self, device, disconnected_callback, timeout)
+
+
+async def _run_at_rate(rate, action, max_burst=1000):
+    """按固定频率调用action；频率很高时按批补齐，避免依赖过细的定时精度"""
+    loop = asyncio.get_running_loop()
+    interval = 1.0 / rate
+    next_time = loop.time()
+    while True:
+        next_time += interval
+        delay = next_time - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        else:
+            # 落后时不休眠，但每批次后让出一次事件循环
+            burst = 0
+            while delay <= 0 and burst < max_burst:
+                action()
+                burst += 1
+                next_time += interval
+                delay = next_time - loop.time()
+            await asyncio.sleep(max(delay, 0))
+        action()
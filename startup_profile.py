@@ -0,0 +1,78 @@
+"""
+启动耗时分析
+
+把启动过程分为几个阶段：模块导入、创建QApplication和事件循环、构建主界面、首次绘制。
+主窗口第一次绘制后打印各阶段耗时，并执行推迟到首次绘制之后的启动任务（例如启动指标端点），
+让这些任务不占用用户看到窗口之前的时间。
+"""
+import time
+from PyQt5.QtCore import QObject, QEvent, QTimer
+from PyQt5.QtWidgets import QApplication, QWidget
+
+
+class StartupProfiler(QObject):
+    """记录启动各阶段的结束时间，并在首次绘制后执行推迟的任务"""
+
+    def __init__(self, process_started_at, imports_done_at, clock=time.perf_counter):
+        super().__init__()
+        self.clock = clock
+        self.process_started_at = process_started_at
+        # 进程启动时的墙上时间，外部测试脚本用它计算解释器自身的启动耗时
+        self.wall_started_at = time.time() - (clock() - process_started_at)
+        self.marks = [("import", imports_done_at)]
+        self.window = None
+        self._deferred = []
+
+    def mark(self, phase):
+        """记录一个阶段的结束时间"""
+        self.marks.append((phase, self.clock()))
+
+    def watch(self, window):
+        """等待window（或其子控件）第一次绘制"""
+        self.window = window
+        QApplication.instance().installEventFilter(self)
+
+    def after_first_paint(self, callback):
+        """首次绘制完成后在事件循环中调用callback"""
+        self._deferred.append(callback)
+
+    @property
+    def first_paint_done(self):
+        return self.marks[-1][0] == "first_paint"
+
+    def eventFilter(self, obj, event):
+        if (event.type() == QEvent.Paint and isinstance(obj, QWidget)
+                and obj.window() is self.window and not self.first_paint_done):
+            self.mark("first_paint")
+            QApplication.instance().removeEventFilter(self)
+            # 等这次绘制结束后再执行推迟的任务
+            QTimer.singleShot(0, self._run_deferred)
+        return False
+
+    def _run_deferred(self):
+        print(self.summary())
+        for callback in self._deferred:
+            try:
+                callback()
+            except Exception as e:
+                print(f"启动任务执行失败: {str(e)}")
+        self._deferred = []
+
+    def phases(self):
+        """各阶段耗时（毫秒），total为进程启动到最后一个阶段结束"""
+        result = {}
+        previous = self.process_started_at
+        for phase, at in self.marks:
+            result[phase] = 1000 * (at - previous)
+            previous = at
+        result["total"] = 1000 * (previous - self.process_started_at)
+        return result
+
+    def to_dict(self):
+        return {"phases_ms": self.phases(), "wall_started_at": self.wall_started_at}
+
+    def summary(self):
+        names = {"import": "导入", "app": "初始化", "ui": "界面", "first_paint": "首次绘制", "total": "合计"}
+        return "启动用时: " + ", ".join(
+            f"{names.get(phase, phase)} {value:.0f} ms" for phase, value in self.phases().items()
+        )
@@ -0,0 +1,73 @@
+"""
+广告数据过滤测试：去重、限流和有意义的变化
+
+运行: python -m pytest test/test_advertisement_filter.py  或  python test/test_advertisement_filter.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from advertisement_filter import AdvertisementFilter
+from hrs_parser import HRS_SERVICE_UUID
+from simulated_device import make_ble_device, make_advertisement
+
+DEVICE = make_ble_device("AA:BB:CC:DD:EE:01", "手环")
+
+
+def hrs_advertisement(heart_rate=70, rssi=-60):
+    return make_advertisement(None, [HRS_SERVICE_UUID], {HRS_SERVICE_UUID: bytes([0x06, heart_rate])}, rssi)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_dedupes_and_rate_limits_unchanged_packets():
+    clock = FakeClock()
+    ad_filter = AdvertisementFilter(rssi_delta=10, unchanged_interval=5.0, clock=clock)
+    assert ad_filter.accept(DEVICE, hrs_advertisement(), True)
+    # 内容相同、信号强度变化不足阈值的广告在限流间隔内被丢弃
+    for rssi in (-60, -55, -69):
+        clock.now += 1.0
+        assert not ad_filter.accept(DEVICE, hrs_advertisement(rssi=rssi), True)
+    clock.now = 5.0
+    assert ad_filter.accept(DEVICE, hrs_advertisement(), True)
+    assert (ad_filter.received, ad_filter.forwarded, ad_filter.dropped) == (5, 2, 3)
+
+
+def test_forwards_meaningful_changes():
+    clock = FakeClock()
+    ad_filter = AdvertisementFilter(rssi_delta=10, clock=clock)
+    assert ad_filter.accept(DEVICE, hrs_advertisement(70), True)
+    # 服务数据（广播的心率值）变化
+    assert ad_filter.accept(DEVICE, hrs_advertisement(71), True)
+    # 信号强度变化达到阈值，相对上次转发的值计算
+    assert not ad_filter.accept(DEVICE, hrs_advertisement(71, rssi=-65), True)
+    assert ad_filter.accept(DEVICE, hrs_advertisement(71, rssi=-70), True)
+    # 其他地址首次出现
+    other = make_ble_device("AA:BB:CC:DD:EE:02", None)
+    assert ad_filter.accept(other, hrs_advertisement(71, rssi=-70), True)
+
+
+def test_non_hrs_devices():
+    ad_filter = AdvertisementFilter(clock=FakeClock())
+    assert not ad_filter.accept(DEVICE, make_advertisement("其他设备"), False)
+    ad_filter = AdvertisementFilter(hrs_only=False, clock=FakeClock())
+    assert ad_filter.accept(DEVICE, make_advertisement("其他设备"), False)
+    # 是否支持HRS的判断发生变化
+    assert ad_filter.accept(DEVICE, make_advertisement("其他设备"), True)
+    ad_filter.reset()
+    assert ad_filter.received == ad_filter.forwarded == 0
+    assert ad_filter.accept(DEVICE, make_advertisement("其他设备"), True)
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"{name}: 通过")
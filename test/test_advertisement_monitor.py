@@ -0,0 +1,114 @@
+"""
+团体广告监测测试：设备表去重、过期和移除，界面删除已移除手环的表格行，以及无界面模式按设备输出（模拟手环，不建立连接）
+
+运行: python -m pytest test/test_advertisement_monitor.py  或  python test/test_advertisement_monitor.py
+"""
+import io
+import os
+import sys
+import json
+import asyncio
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from advertisement_monitor import AdvertisementMonitor
+from headless import HeadlessMonitor, JsonLinesSink
+from hrs_parser import HRS_SERVICE_UUID
+from simulated_device import SimulatedBackend, make_ble_device, make_advertisement
+
+
+def _advertisement(heart_rate, rssi=-60):
+    return make_advertisement(None, [HRS_SERVICE_UUID], {HRS_SERVICE_UUID: bytes([0x06, heart_rate])}, rssi)
+
+
+def test_monitor_dedupes_and_tracks_staleness():
+    now = [0.0]
+    outputs, stale = [], []
+    monitor = AdvertisementMonitor(
+        on_heart_rate=lambda address, ts, measurement: outputs.append((address, measurement.heart_rate)),
+        on_stale=stale.append, stale_after=5.0, forget_after=20.0, clock=lambda: now[0],
+    )
+    a, b = make_ble_device("AA:01", "手环A"), make_ble_device("BB:02", "手环B")
+    assert monitor.ingest(a, _advertisement(70))
+    assert not monitor.ingest(a, _advertisement(70, rssi=-50))
+    assert monitor.ingest(b, _advertisement(90))
+    assert not monitor.ingest(b, make_advertisement("耳机"))
+    now[0] = 3.0
+    assert monitor.ingest(a, _advertisement(72))
+    assert outputs == [("AA:01", 70), ("BB:02", 90), ("AA:01", 72)]
+    assert (monitor.duplicates, monitor.ignored) == (1, 1)
+    assert sorted(band.address for band in monitor.take_updates()) == ["AA:01", "BB:02"]
+    assert monitor.take_updates() == []
+
+    now[0] = 6.0
+    assert monitor.sweep() == ["BB:02"] and stale == ["BB:02"]
+    assert [band.stale for band in monitor.take_updates()] == [True]
+    assert monitor.active_count() == 1
+    # 过期后重新出现，即使数据相同也重新输出
+    assert monitor.ingest(b, _advertisement(90))
+    now[0] = 30.0
+    forgotten = []
+    monitor.on_forget = forgotten.append
+    monitor.sweep()
+    assert len(monitor) == 0 and sorted(forgotten) == ["AA:01", "BB:02"]
+    assert monitor.take_updates() == []
+
+
+def test_headless_outputs_every_band_without_connecting():
+    backend = SimulatedBackend.with_default_band(
+        count=30, advertise_heart_rate=True, advertisement_rate=20.0
+    )
+    stream = io.StringIO()
+    monitor = HeadlessMonitor(backend, JsonLinesSink(stream), advertisements_only=True)
+    count = asyncio.run(monitor.run(duration=0.6))
+
+    lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert len(lines) == count > 30
+    assert {line["address"] for line in lines} == {band.address for band in backend.bands}
+    assert backend.connects == 0
+    assert len(monitor.advertisement_monitor) == 30
+
+
+
+def test_gui_removes_rows_of_forgotten_bands():
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5.QtWidgets import QApplication
+    from PyQt5.QtCore import QTimer
+    import main
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    backend = SimulatedBackend.with_default_band(count=3, advertise_heart_rate=True, advertisement_rate=20.0)
+    advertisement_monitor = main.ADVERTISEMENT_MONITOR
+    main.ADVERTISEMENT_MONITOR = True
+    try:
+        window = main.HeartRateMonitor(None, backend)
+    finally:
+        main.ADVERTISEMENT_MONITOR = advertisement_monitor
+    QTimer.singleShot(500, app.quit)
+    app.exec_()
+    window.scan_service.stop()
+    assert window.scan_service.wait(5000)
+    app.processEvents()
+    table = window.group_table
+    assert table.rowCount() == 3
+
+    # 中间一行的手环超过forget_after秒没有广告
+    monitor = window.advertisement_monitor
+    removed = table.item(1, 0).text()
+    address = next(address for address, row in window.group_rows.items() if row == 1)
+    monitor.get(address).last_seen -= monitor.forget_after + 1
+    monitor.sweep()
+    app.processEvents()
+    window.close()
+
+    assert table.rowCount() == 2 and address not in window.group_rows
+    assert removed not in [table.item(row, 0).text() for row in range(2)]
+    for other, row in window.group_rows.items():
+        assert other in table.item(row, 0).text()
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"{name}: 通过")
@@ -0,0 +1,106 @@
+"""
+独立蓝牙工作进程测试：共享内存环形缓冲区，以及工作进程崩溃后自动重启并恢复连接（模拟手环）
+
+运行: python -m pytest test/test_ble_process.py  或  python test/test_ble_process.py
+"""
+import os
+import sys
+import time
+import asyncio
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ble_process import BleWorkerProcess, SharedSampleRing, MAX_RR_PER_SAMPLE, MAX_DEVICE_INDEXES, _WorkerService
+from device_backend import create_backend
+from simulated_device import SimulatedBackend
+
+
+def test_shared_ring_round_trip_and_overrun():
+    ring = SharedSampleRing(capacity=6)
+    reader = SharedSampleRing.attach(ring.name)
+    try:
+        assert ring.capacity == reader.capacity == 8
+        assert ring.push(1.5, 72, True, 2, (833.0, 1000.0))
+        assert ring.push(2.5, 180, None, 0, (500.0,) * (MAX_RR_PER_SAMPLE + 2))
+        samples = reader.drain()
+        assert samples[0] == (1.5, 72, True, 2, (833.0078125, 1000.0))
+        assert samples[1][:4] == (2.5, 180, None, 0) and len(samples[1][4]) == MAX_RR_PER_SAMPLE
+
+        for i in range(10):
+            ring.push(float(i), 60 + i, False)
+        assert len(reader) == 8 and ring.overruns == 2
+        assert [sample[1] for sample in reader.drain(max_samples=3)] == [60, 61, 62]
+        assert len(ring) == 5
+    finally:
+        reader.close()
+        ring.close()
+        ring.unlink()
+
+
+def test_device_indexes_do_not_wrap():
+    ring = SharedSampleRing(capacity=8)
+    try:
+        service = _WorkerService(None, None, ring, SimulatedBackend.with_default_band())
+        for i in range(300):
+            assert service._device_index(f"SIM:{i}") == i
+        assert service._device_index("SIM:0") == 0
+        ring.push(1.0, 70, True, service._device_index("SIM:299"))
+        assert ring.drain()[0][3] == 299
+
+        # 序号用完时明确拒绝新设备，而不是与已有设备重复
+        service.device_indexes = {f"SIM:{i}": i for i in range(MAX_DEVICE_INDEXES)}
+        assert service._device_index(f"SIM:{MAX_DEVICE_INDEXES - 1}") == MAX_DEVICE_INDEXES - 1
+        try:
+            service._device_index("SIM:new")
+            assert False, "序号用完时应抛出RuntimeError"
+        except RuntimeError:
+            pass
+        asyncio.run(service._connect(service.backend.bands[0].device.address))
+        assert not service.connection_pool.sessions
+    finally:
+        ring.close()
+        ring.unlink()
+
+
+def _poll_until(worker, condition, timeout=10.0):
+    events = []
+    samples = []
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        events.extend(worker.poll())
+        samples.extend(worker.drain())
+        if condition(events, samples):
+            break
+        time.sleep(0.02)
+    return events, samples
+
+
+def test_worker_restarts_and_reconnects_after_crash():
+    backend = create_backend("simulated", notify_rate=20.0, connect_latency=0.0)
+    address = backend.bands[0].address
+    worker = BleWorkerProcess(backend, capacity=1024).start()
+    try:
+        worker.scan(None, 1.0)
+        events, _ = _poll_until(worker, lambda events, _: any(e[0] == "scan_finished" for e in events))
+        assert ("device", address, backend.bands[0].name, True) in events
+
+        worker.connect(address)
+        _, samples = _poll_until(worker, lambda _, samples: len(samples) >= 5)
+        assert len(samples) >= 5
+        assert all(worker.address_for(sample[3]) == address and sample[2] is True for sample in samples)
+
+        # 模拟蓝牙后端崩溃：GUI进程侧重启工作进程并重新连接同一台设备
+        worker.process.kill()
+        events, samples = _poll_until(worker, lambda _, samples: len(samples) >= 5)
+        assert any(event[0] == "worker_restarted" for event in events)
+        assert len(samples) >= 5 and worker.connected_count() == 1
+    finally:
+        worker.stop()
+    assert worker.process is None
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"{name}: 通过")
@@ -0,0 +1,54 @@
+"""
+独立I/O线程的连接和断开处理测试（模拟手环，直接运行协程，不启动线程）
+
+运行: python -m pytest test/test_ble_worker.py  或  python test/test_ble_worker.py
+"""
+import os
+import sys
+import asyncio
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ble_worker import BleWorkerThread
+from sample_buffer import SampleRingBuffer
+from simulated_device import SimulatedBackend
+
+
+def make_worker(backend, auto_reconnect=True):
+    worker = BleWorkerThread(SampleRingBuffer(64), backend=backend, auto_reconnect=auto_reconnect)
+    statuses = []
+    worker.connection_status.connect(lambda status, connected: statuses.append((status, connected)))
+    return worker, statuses
+
+
+def test_notify_failure_disconnects_client():
+    backend = SimulatedBackend.with_default_band(connect_latency=0.0, fail_notify=True)
+    worker, statuses = make_worker(backend)
+    connected = asyncio.run(worker._open_client(backend.bands[0].device))
+    assert not connected and worker.client is None
+    assert statuses[-1] == ("连接失败: 订阅失败", False)
+    # 已建立的连接被断开，不会泄漏
+    assert backend.connects == 1 and backend.disconnects == 1
+
+
+def test_disconnect_without_auto_reconnect_still_clears_client():
+    backend = SimulatedBackend.with_default_band(
+        connect_latency=0.0, notify_rate=20.0, dropout_interval=0.05
+    )
+    worker, statuses = make_worker(backend, auto_reconnect=False)
+
+    async def run():
+        assert await worker._open_client(backend.bands[0].device)
+        await asyncio.sleep(1.0)
+
+    asyncio.run(run())
+    assert backend.bands[0].dropouts == 1
+    assert worker.client is None and worker._reconnect_task is None
+    assert statuses == [("连接中...", False), ("已连接", True), ("连接已断开", False)]
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"{name}: 通过")
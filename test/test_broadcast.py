@@ -0,0 +1,146 @@
+"""
+本地心率广播服务测试（TCP / WebSocket，仅使用本机回环地址）
+
+运行: python -m pytest test/test_broadcast.py  或  python test/test_broadcast.py
+"""
+import os
+import sys
+import json
+import base64
+import asyncio
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from broadcast import BroadcastServer, OVERFLOW_DISCONNECT, websocket_frame
+
+
+async def wait_for_subscribers(server, count):
+    while len(server.subscribers) < count:
+        await asyncio.sleep(0.01)
+
+
+async def open_websocket(port):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    key = base64.b64encode(os.urandom(16)).decode("ascii")
+    writer.write((
+        f"GET / HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+        f"Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n"
+    ).encode("ascii"))
+    response = await reader.readuntil(b"\r\n\r\n")
+    assert response.startswith(b"HTTP/1.1 101")
+    return reader, writer
+
+
+async def read_websocket_frame(reader):
+    first, length = await reader.readexactly(2)
+    assert length < 126
+    return first & 0x0F, await reader.readexactly(length)
+
+
+def test_tcp_and_websocket_subscribers_receive_samples():
+    async def run():
+        server = await BroadcastServer(port=0, websocket_port=0).start()
+        tcp_reader, tcp_writer = await asyncio.open_connection("127.0.0.1", server.port)
+        ws_reader, ws_writer = await open_websocket(server.websocket_port)
+        await wait_for_subscribers(server, 2)
+
+        assert server.publish(1700000000.5, 72, "AA:BB", True, (833.0,)) == 2
+        line = json.loads(await tcp_reader.readline())
+        opcode, payload = await read_websocket_frame(ws_reader)
+
+        # 客户端的ping帧（带掩码）应收到pong
+        mask = b"\x01\x02\x03\x04"
+        ws_writer.write(bytes((0x89, 0x80 | 2)) + mask + bytes(b ^ mask[i] for i, b in enumerate(b"hi")))
+        pong = await read_websocket_frame(ws_reader)
+
+        tcp_writer.close()
+        ws_writer.close()
+        await server.close()
+        return line, opcode, json.loads(payload), pong
+
+    line, opcode, message, pong = asyncio.run(run())
+    assert line == {"t": 1700000000.5, "address": "AA:BB", "hr": 72, "contact": True, "rr": [833.0]}
+    assert opcode == 0x1 and message == line
+    assert pong == (0xA, b"hi")
+
+
+def test_publish_without_running_loop():
+    # QTimer驱动事件循环时，publish()在Qt定时器回调中调用，事件循环此时并未运行
+    loop = asyncio.new_event_loop()
+    try:
+        server = loop.run_until_complete(BroadcastServer(port=0).start())
+        reader, writer = loop.run_until_complete(asyncio.open_connection("127.0.0.1", server.port))
+        loop.run_until_complete(wait_for_subscribers(server, 1))
+        assert server.publish(1.0, 65) == 1
+        line = json.loads(loop.run_until_complete(asyncio.wait_for(reader.readline(), 5)))
+        writer.close()
+        loop.run_until_complete(server.close())
+    finally:
+        loop.close()
+    assert line["hr"] == 65
+
+
+def test_slow_subscriber_keeps_only_latest_messages():
+    async def run():
+        server = await BroadcastServer(port=0, max_queue=8).start()
+        reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+        await wait_for_subscribers(server, 1)
+
+        # 发布时不让出事件循环，发送任务来不及写出，队列只保留最近8条
+        for heart_rate in range(60, 160):
+            server.publish(0.0, heart_rate)
+        stats = server.client_stats()[0]
+        received = [json.loads(await reader.readline())["hr"] for _ in range(8)]
+        writer.close()
+        await server.close()
+        return stats, received
+
+    stats, received = asyncio.run(run())
+    assert stats["queue_depth"] == stats["max_queue_depth"] == 8
+    assert stats["dropped"] == 92
+    assert received == list(range(152, 160))
+
+
+def test_overflow_disconnect_and_stall_timeout():
+    async def run():
+        now = [0.0]
+        strict = await BroadcastServer(port=0, max_queue=4, overflow=OVERFLOW_DISCONNECT).start()
+        lenient = await BroadcastServer(port=0, max_queue=4, stall_timeout=5.0, clock=lambda: now[0]).start()
+        connections = [
+            await asyncio.open_connection("127.0.0.1", strict.port),
+            await asyncio.open_connection("127.0.0.1", lenient.port),
+        ]
+        await wait_for_subscribers(strict, 1)
+        await wait_for_subscribers(lenient, 1)
+        subscriber = next(iter(lenient.subscribers))
+
+        for _ in range(5):
+            strict.publish(0.0, 70)
+        # 队列写满后持续超过stall_timeout才断开
+        for step in range(10):
+            now[0] = step
+            lenient.publish(0.0, 70)
+        for _, writer in connections:
+            writer.close()
+        await strict.close()
+        await lenient.close()
+        return strict, lenient, subscriber
+
+    strict, lenient, subscriber = asyncio.run(run())
+    assert not strict.subscribers
+    assert subscriber.close_reason == "读取过慢"
+    # 第5次发布时队列首次写满，第10次（已满5秒）时断开
+    assert subscriber.dropped == 6
+
+
+def test_websocket_frame_lengths():
+    assert websocket_frame(b"x" * 10)[:2] == bytes((0x81, 10))
+    assert websocket_frame(b"x" * 300)[:4] == bytes((0x81, 126, 1, 44))
+    assert websocket_frame(b"x" * 70000)[:2] == bytes((0x81, 127))
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"{name}: 通过")
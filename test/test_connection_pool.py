@@ -0,0 +1,75 @@
+"""
+多设备连接池测试（模拟手环，无需蓝牙硬件）
+
+运行: python -m pytest test/test_connection_pool.py  或  python test/test_connection_pool.py
+"""
+import os
+import sys
+import asyncio
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from connection_pool import ConnectionPool
+from simulated_device import SimulatedBackend
+
+
+def test_notify_failure_disconnects_client():
+    backend = SimulatedBackend.with_default_band(connect_latency=0.0, fail_notify=True)
+
+    async def run():
+        pool = ConnectionPool(on_sample=lambda *args: None, backend=backend)
+        session = await pool.add(backend.bands[0].device)
+        return session
+
+    session = asyncio.run(run())
+    assert not session.is_connected and session.client is None
+    assert session.status.startswith("连接失败")
+    # 已建立的连接被断开，不会泄漏
+    assert backend.connects == 1 and backend.disconnects == 1
+
+
+def test_concurrent_add_connects_once():
+    backend = SimulatedBackend.with_default_band(connect_latency=0.2, notify_rate=10.0)
+
+    async def run():
+        pool = ConnectionPool(on_sample=lambda *args: None, backend=backend)
+        device = backend.bands[0].device
+        first, second = await asyncio.gather(pool.add(device), pool.add(device))
+        assert first is second and first.is_connected
+        await pool.close_all()
+
+    asyncio.run(run())
+    assert backend.connects == 1
+
+
+def test_stop_during_connect_cancels_it():
+    backend = SimulatedBackend.with_default_band(connect_latency=0.5, notify_rate=10.0)
+
+    async def run():
+        statuses = []
+        pool = ConnectionPool(
+            on_sample=lambda *args: None, backend=backend,
+            on_status=lambda session, status, connected: statuses.append(status),
+        )
+        device = backend.bands[0].device
+        add_task = asyncio.ensure_future(pool.add(device))
+        await asyncio.sleep(0.1)
+        session = pool.get(device.address)
+        assert session.connecting
+        await pool.remove(device.address)
+        # 进行中的add()得到未连接的会话，而不是异常
+        result = await add_task
+        await asyncio.sleep(0.6)
+        return result, statuses
+
+    session, statuses = asyncio.run(run())
+    assert session.client is None and not session.is_connected and not session.connecting
+    assert statuses == ["连接中...", "未连接"]
+    assert backend.connects == 0
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"{name}: 通过")
@@ -0,0 +1,105 @@
+"""
+单设备连接状态机测试：切换设备、取消卡住的连接、断开不响应的手环时的时限（模拟手环）
+
+运行: python -m pytest test/test_connection_state.py  或  python test/test_connection_state.py
+"""
+import os
+import sys
+import time
+import asyncio
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import connection_state
+from connection_state import ConnectionStateMachine, StepTimeouts
+from simulated_device import SimulatedBackend, SimulatedBand
+from reconnect import ReconnectPolicy
+
+
+def test_switch_devices_releases_previous_client():
+    async def run():
+        backend = SimulatedBackend.with_default_band(count=2, notify_rate=100.0, connect_latency=0.0)
+        states = []
+        samples = []
+        machine = ConnectionStateMachine(
+            backend, lambda sender, data: samples.append(data),
+            on_state=lambda state, detail: states.append(state),
+        )
+        await machine.connect(backend.bands[0].device)
+        first_client = machine.client
+        await asyncio.sleep(0.05)
+        await machine.connect(backend.bands[1].device)
+        second_count = len(samples)
+        await asyncio.sleep(0.05)
+        await machine.shutdown()
+        return machine, first_client, states, second_count, len(samples)
+
+    machine, first_client, states, second_count, total = asyncio.run(run())
+    C = connection_state
+    assert states == [
+        C.CONNECTING, C.SUBSCRIBING, C.CONNECTED,
+        C.DISCONNECTING, C.CONNECTING, C.SUBSCRIBING, C.CONNECTED,
+        C.DISCONNECTING, C.CLOSED,
+    ]
+    assert not first_client.is_connected
+    assert total > second_count > 0
+    assert machine.state == C.CLOSED and machine.connect(None) is None
+
+
+def test_hanging_connect_is_cancelled_and_times_out():
+    async def run():
+        backend = SimulatedBackend.with_default_band(count=2, connect_latency=60.0)
+        backend.bands[1].connect_latency = 0.0
+        machine = ConnectionStateMachine(backend, lambda sender, data: None)
+        machine.connect(backend.bands[0].device)
+        await asyncio.sleep(0.05)
+        assert machine.state == connection_state.CONNECTING
+
+        # 切换设备时不等卡住的连接
+        started = time.perf_counter()
+        await machine.connect(backend.bands[1].device)
+        switch_time = time.perf_counter() - started
+        assert machine.state == connection_state.CONNECTED
+
+        # 连接超时后回到未连接
+        machine.timeouts = StepTimeouts(connect=0.1)
+        await machine.connect(backend.bands[0].device)
+        await machine.shutdown()
+        return machine, switch_time
+
+    machine, switch_time = asyncio.run(run())
+    assert switch_time < 0.5
+    assert machine.last_error == "超时"
+
+
+def test_unresponsive_band_disconnects_within_bound():
+    timeouts = StepTimeouts(stop_notify=0.2, disconnect=0.3, cancel=0.1)
+
+    async def run():
+        band = SimulatedBand(notify_rate=50.0, connect_latency=0.0, disconnect_latency=30.0)
+        backend = SimulatedBackend([band])
+        machine = ConnectionStateMachine(
+            backend, lambda sender, data: None, timeouts=timeouts,
+            reconnect_policy=ReconnectPolicy(initial_delay=0.01),
+        )
+        await machine.connect(band.device)
+        started = time.perf_counter()
+        await machine.disconnect()
+        disconnect_time = time.perf_counter() - started
+
+        await machine.connect(band.device)
+        started = time.perf_counter()
+        await machine.shutdown()
+        return machine, disconnect_time, time.perf_counter() - started
+
+    machine, disconnect_time, shutdown_time = asyncio.run(run())
+    assert disconnect_time < timeouts.teardown + 0.1
+    assert shutdown_time < timeouts.teardown + 0.1
+    assert machine.state == connection_state.CLOSED
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"{name}: 通过")
@@ -0,0 +1,72 @@
+"""
+悬浮窗绘制测试（offscreen平台，无需显示器）
+
+运行: python -m pytest test/test_float_window.py  或  python test/test_float_window.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtWidgets import QApplication
+
+app = QApplication.instance() or QApplication(sys.argv)
+
+from float_window import FloatWindow, DialFloatWindow, GraphFloatWindow, create_float_window
+
+
+def process_events(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        app.processEvents()
+
+
+def test_digits_repaint_only_changed_cells():
+    window = FloatWindow()
+    window.show()
+    window.update_heart_rate(120)
+    process_events(0.05)
+
+    dirty = []
+    window.update = lambda rect=None: dirty.append(rect)
+    window.update_heart_rate(125)
+    rects = window._text_rects("125")
+    assert dirty == [rects[2]]
+
+    window.set_size(180)
+    assert window.isVisible() and window.width() == 180
+    window.close()
+
+
+def test_dial_needle_settles_on_target():
+    window = create_float_window("表盘样式")
+    assert isinstance(window, DialFloatWindow)
+    window.show()
+    window.update_heart_rate(150)
+    process_events(0.6)
+    assert window.needle_value == 150
+    assert not window._frame_timer.isActive()
+    window.show_disconnected()
+    assert window.text == "--"
+    window.close()
+
+
+def test_graph_ring_wraps_and_keeps_latest_column():
+    window = GraphFloatWindow(seconds=0.5)
+    window.set_size(100)
+    window.show()
+    window.update_heart_rate(90)
+    # 0.5秒走完整个宽度，运行1秒后环形位图至少绕回一次
+    process_events(1.0)
+    assert window._columns[window._column] == 90
+    assert set(window._ordered_columns()[-10:]) == {90}
+    window.close()
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"{name}: 通过")
@@ -0,0 +1,85 @@
+"""
+无界面模式测试（模拟手环，无需蓝牙硬件和Qt）
+
+运行: python -m pytest test/test_headless.py  或  python test/test_headless.py
+"""
+import io
+import os
+import sys
+import json
+import asyncio
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from headless import HeadlessMonitor, JsonLinesSink, BinarySink, read_binary_stream
+from simulated_device import SimulatedBackend
+from device_cache import DeviceCache
+
+
+def test_streams_json_lines_and_remembers_device():
+    backend = SimulatedBackend.with_default_band(notify_rate=100.0, connect_latency=0.0)
+    stream = io.StringIO()
+    cache = DeviceCache()
+    monitor = HeadlessMonitor(backend, JsonLinesSink(stream), device_cache=cache, max_samples=10)
+    assert asyncio.run(monitor.run(duration=5.0)) == 10
+
+    lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert len(lines) == 10
+    assert {line["address"] for line in lines} == {backend.bands[0].address}
+    assert all(40 <= line["hr"] <= 200 and line["contact"] is True and len(line["rr"]) == 1 for line in lines)
+    assert backend.bands[0].address in cache
+
+
+def test_binary_stream_round_trip_with_several_bands():
+    backend = SimulatedBackend.with_default_band(count=3, notify_rate=100.0, connect_latency=0.0)
+    stream = io.BytesIO()
+    sink = BinarySink(stream)
+    monitor = HeadlessMonitor(backend, sink, connect_all=True, scan_timeout=0.5)
+    count = asyncio.run(monitor.run(duration=0.3))
+
+    samples = list(read_binary_stream(io.BytesIO(stream.getvalue())))
+    assert len(samples) == count == sink.samples_written
+    assert {sample.address for sample in samples} == {band.address for band in backend.bands}
+    assert all(sample.sensor_contact is True and len(sample.rr_intervals) == 1 for sample in samples)
+    # 截断的流只丢弃最后一个不完整的记录
+    assert len(list(read_binary_stream(io.BytesIO(stream.getvalue()[:-1])))) == count - 1
+
+
+def test_sink_is_closed_when_connection_fails():
+    closed = []
+
+    class RecordingSink(JsonLinesSink):
+        def close(self):
+            closed.append(True)
+            super().close()
+
+    backend = SimulatedBackend.with_default_band(connect_latency=0.0, connect_failure_rate=1.0)
+    monitor = HeadlessMonitor(backend, RecordingSink(io.StringIO()), auto_reconnect=False, scan_timeout=0.5)
+    assert asyncio.run(monitor.run(duration=1.0)) == 0
+    assert closed == [True]
+
+
+def test_cli_does_not_import_qt():
+    code = (
+        "import sys, headless; "
+        "sys.exit(headless.main(['--simulate', '--samples', '3', '--notify-rate', '50']) "
+        "or any(name.startswith('PyQt5') for name in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, timeout=30
+    )
+    assert result.returncode == 0, result.stderr
+    # 标准输出只有样本数据，状态信息在标准错误中
+    lines = result.stdout.splitlines()
+    assert len(lines) == 3
+    assert all(json.loads(line)["hr"] > 0 for line in lines)
+    assert "已连接" in result.stderr
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"{name}: 通过")
@@ -0,0 +1,64 @@
+"""
+心率值过滤测试：滑动中值、接触检测、合理范围和变化速率限制
+
+运行: python -m pytest test/test_hr_filter.py  或  python test/test_hr_filter.py
+"""
+import os
+import sys
+import random
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hr_filter import HeartRateFilter, RunningMedian
+
+
+def test_running_median_matches_reference():
+    rng = random.Random(3)
+    for window in (1, 2, 5, 8, 31):
+        median = RunningMedian(window)
+        values = []
+        for _ in range(500):
+            value = rng.randint(0, 220)
+            values.append(value)
+            expected = statistics.median(values[-window:])
+            # 偶数个值时取中间两个值的平均并向上取整
+            assert median.add(value) == int(expected + 0.5)
+        median.clear()
+        assert len(median) == 0 and median.median() is None
+
+
+def test_rejects_spikes_no_contact_and_implausible_values():
+    hr_filter = HeartRateFilter(window=5, max_slew=0)
+    outputs = [hr_filter.update(t, hr, True) for t, hr in enumerate([70, 71, 70, 180, 71, 70])]
+    # 单个尖峰被中值去除
+    assert 180 not in outputs and max(outputs) <= 71
+
+    assert hr_filter.update(6, 0, True) is None
+    assert hr_filter.update(7, 250) is None
+    assert hr_filter.rejected_implausible == 2
+
+    assert hr_filter.update(8, 72, False) is None
+    assert hr_filter.rejected_no_contact == 1
+    # 重新接触后不与之前的数据混合
+    assert hr_filter.update(9, 95, True) == 95
+    assert hr_filter.rejected == 3
+
+
+def test_slew_limit_and_gap_reset():
+    hr_filter = HeartRateFilter(window=1, max_slew=5.0, gap_seconds=5.0)
+    assert hr_filter.update(0.0, 60) == 60
+    # 每秒最多变化5 bpm，真实的跳变以该速率跟随
+    assert [hr_filter.update(t, 120) for t in (1.0, 2.0, 3.0)] == [65, 70, 75]
+    assert hr_filter.slew_limited == 3
+    # 通知很密集时每个样本至少允许变化1 bpm
+    assert hr_filter.update(3.05, 120) == 76
+    # 数据中断后第一个值直接输出
+    assert hr_filter.update(20.0, 120) == 120
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"{name}: 通过")
@@ -0,0 +1,90 @@
+"""
+心率历史数据测试：降采样档、环形覆盖和按时间范围查询
+
+运行: python -m pytest test/test_hr_history.py  或  python test/test_hr_history.py
+"""
+import os
+import sys
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hr_history import HeartRateHistory
+
+
+def reference_buckets(samples, interval):
+    """按时间桶直接计算平均/最小/最大"""
+    buckets = {}
+    for timestamp, value in samples:
+        buckets.setdefault(timestamp - timestamp % interval, []).append(value)
+    return [(start, sum(values) / len(values), min(values), max(values))
+            for start, values in sorted(buckets.items())]
+
+
+def test_downsampling_tiers_match_reference():
+    rng = random.Random(5)
+    history = HeartRateHistory()
+    samples = []
+    timestamp = 1000.0
+    for _ in range(3000):
+        # 不均匀的采样间隔，同一秒内可能有多个样本
+        timestamp += rng.choice((0.25, 0.5, 1.0, 2.0))
+        value = rng.randint(50, 180)
+        samples.append((timestamp, value))
+        history.append(timestamp, value)
+
+    assert history.query(0, timestamp + 1) == samples
+    for tier, interval in (("1s", 1.0), ("1min", 60.0)):
+        points = history.query(0, timestamp + 1, tier)
+        expected = reference_buckets(samples, interval)
+        assert len(points) == len(expected)
+        for point, reference in zip(points, expected):
+            assert point[0] == reference[0] and point[2:] == reference[2:]
+            assert abs(point[1] - reference[1]) < 1e-3
+    # 范围查询只返回[start, end)内的点
+    assert history.query(1100.0, 1200.0) == [s for s in samples if 1100.0 <= s[0] < 1200.0]
+    assert [p[0] for p in history.query(1080.0, 1200.0, "1min")] == [1080.0, 1140.0]
+
+
+def test_full_rings_overwrite_oldest_without_growing():
+    history = HeartRateHistory(raw_capacity=10, second_capacity=5, minute_capacity=3)
+    memory = history.memory_bytes()
+    for second in range(400):
+        history.append(float(second), 60 + second % 50)
+    assert len(history) == 10 and history.memory_bytes() == memory
+    raw = history.query(0, 1000)
+    assert [t for t, _ in raw] == [float(s) for s in range(390, 400)]
+    assert history.latest() == (399.0, 60 + 399 % 50)
+    # 1秒档保留最近5个已写出的点和当前时间桶
+    assert [p[0] for p in history.query(0, 1000, "1s")] == [float(s) for s in range(394, 400)]
+    assert [p[0] for p in history.query(0, 1000, "1min")] == [180.0, 240.0, 300.0, 360.0]
+
+
+def test_backward_timestamps_and_auto_tier():
+    history = HeartRateHistory(raw_capacity=100)
+    assert history.latest() is None
+    history.append(10.0, 70)
+    # 时间戳回退时按上一个时间戳记录，保持单调
+    history.append(9.0, 71)
+    assert history.query(0, 20) == [(10.0, 70), (10.0, 71)]
+
+    history = HeartRateHistory(raw_capacity=100)
+    for second in range(1000):
+        history.append(float(second), 60)
+    # 原始数据不覆盖整个范围时改用1秒档，点数超过上限时改用1分钟档
+    assert history.query_auto(950, 1000)[0] == "raw"
+    assert history.query_auto(500, 1000)[0] == "1s"
+    assert history.query_auto(500, 1000, max_points=100)[0] == "1min"
+    try:
+        history.query(0, 1, "1h")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("未知档位应当抛出ValueError")
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"{name}: 通过")
@@ -0,0 +1,122 @@
+"""
+心率测量（0x2A37）解析测试：各标志位组合、格式错误的数据和批量解析
+
+运行: python -m pytest test/test_hrs_parser.py  或  python test/test_hrs_parser.py
+"""
+import os
+import sys
+import struct
+import itertools
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hrs_parser import (
+    FLAG_HEART_RATE_UINT16, FLAG_SENSOR_CONTACT_DETECTED, FLAG_SENSOR_CONTACT_SUPPORTED,
+    FLAG_ENERGY_EXPENDED, FLAG_RR_INTERVALS, CONTACT_UNSUPPORTED, CONTACT_NOT_DETECTED, CONTACT_DETECTED,
+    HRS_SERVICE_UUID, HrsParseError, parse_heart_rate_measurement, parse_batch, find_hrs_service_data,
+)
+
+
+def encode(flags, heart_rate, energy=None, rr_units=()):
+    """按标志位编码一条0x2A37数据"""
+    payload = bytearray([flags])
+    payload += struct.pack("<H", heart_rate) if flags & FLAG_HEART_RATE_UINT16 else bytes([heart_rate])
+    if flags & FLAG_ENERGY_EXPENDED:
+        payload += struct.pack("<H", energy)
+    if flags & FLAG_RR_INTERVALS:
+        payload += struct.pack(f"<{len(rr_units)}H", *rr_units)
+    return bytes(payload)
+
+
+def all_flag_combinations():
+    """所有标志位组合的数据及期望的解析结果"""
+    cases = []
+    for uint16, contact_bits, energy, rr in itertools.product(
+            (0, FLAG_HEART_RATE_UINT16),
+            (0, FLAG_SENSOR_CONTACT_DETECTED, FLAG_SENSOR_CONTACT_SUPPORTED,
+             FLAG_SENSOR_CONTACT_SUPPORTED | FLAG_SENSOR_CONTACT_DETECTED),
+            (0, FLAG_ENERGY_EXPENDED), (0, FLAG_RR_INTERVALS)):
+        flags = uint16 | contact_bits | energy | rr
+        heart_rate = 300 if uint16 else 72
+        rr_units = (1024, 800, 65535) if rr else ()
+        contact = None
+        if contact_bits & FLAG_SENSOR_CONTACT_SUPPORTED:
+            contact = bool(contact_bits & FLAG_SENSOR_CONTACT_DETECTED)
+        expected = (heart_rate, contact, 1234 if energy else None, tuple(u * 1000 / 1024 for u in rr_units))
+        cases.append((encode(flags, heart_rate, 1234, rr_units), expected))
+    return cases
+
+
+def test_all_flag_combinations():
+    cases = all_flag_combinations()
+    assert len(cases) == 32
+    for payload, (heart_rate, contact, energy, rr_intervals) in cases:
+        # 各种缓冲区类型都不需要先转换为bytes
+        for data in (payload, bytearray(payload), memoryview(payload)):
+            measurement = parse_heart_rate_measurement(data)
+            assert measurement.flags == payload[0]
+            assert measurement.heart_rate == heart_rate
+            assert measurement.sensor_contact is contact
+            assert measurement.energy_expended == energy
+            assert measurement.rr_intervals == rr_intervals
+
+
+def test_rr_list_edge_cases():
+    # 设置了RR标志但没有数据
+    assert parse_heart_rate_measurement(bytes([FLAG_RR_INTERVALS, 60])).rr_intervals == ()
+    # 末尾多出的单个字节被忽略
+    measurement = parse_heart_rate_measurement(encode(FLAG_RR_INTERVALS, 60, rr_units=(512,)) + b"\x01")
+    assert measurement.rr_intervals == (500.0,)
+    # 一条通知中的多个RR间期
+    units = tuple(range(700, 720))
+    assert len(parse_heart_rate_measurement(encode(FLAG_RR_INTERVALS, 60, rr_units=units)).rr_intervals) == 20
+
+
+def test_truncated_payloads_raise():
+    truncated = [
+        b"",
+        bytes([0x00]),
+        bytes([FLAG_HEART_RATE_UINT16, 60]),
+        bytes([FLAG_ENERGY_EXPENDED, 60, 0x01]),
+        bytes([FLAG_HEART_RATE_UINT16 | FLAG_ENERGY_EXPENDED, 60, 0]),
+    ]
+    for payload in truncated:
+        try:
+            parse_heart_rate_measurement(payload)
+        except HrsParseError:
+            continue
+        raise AssertionError(f"应当解析失败: {payload!r}")
+    # HrsParseError是ValueError，原来捕获ValueError的代码仍然有效
+    assert issubclass(HrsParseError, ValueError)
+
+
+def test_parse_batch_matches_single_parser():
+    cases = all_flag_combinations()
+    payloads = [payload for payload, _ in cases]
+    # 在中间插入格式错误的数据
+    payloads.insert(3, bytes([FLAG_HEART_RATE_UINT16, 60]))
+    payloads.insert(10, b"")
+    batch = parse_batch(payloads)
+    assert batch.errors == [3, 10]
+    assert len(batch) == len(cases)
+    contact_codes = {None: CONTACT_UNSUPPORTED, False: CONTACT_NOT_DETECTED, True: CONTACT_DETECTED}
+    for index, (_, (heart_rate, contact, energy, rr_intervals)) in enumerate(cases):
+        assert batch.heart_rate[index] == heart_rate
+        assert batch.sensor_contact[index] == contact_codes[contact]
+        assert batch.energy_expended[index] == (energy if energy is not None else -1)
+        assert tuple(batch.rr_intervals_of(index)) == rr_intervals
+
+
+def test_find_hrs_service_data():
+    data = bytes([0x06, 70])
+    assert find_hrs_service_data({HRS_SERVICE_UUID: data}) == data
+    assert find_hrs_service_data({"0x180d": data}) == data
+    assert find_hrs_service_data({"0000fee0-0000-1000-8000-00805f9b34fb": data}) is None
+    assert find_hrs_service_data(None) is None
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"{name}: 通过")
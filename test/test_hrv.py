@@ -0,0 +1,81 @@
+"""
+流式HRV统计测试：与逐窗口重新计算的结果对比
+
+运行: python -m pytest test/test_hrv.py  或  python test/test_hrv.py
+"""
+import os
+import sys
+import math
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hrv import RollingHrv, RR_UNITS_PER_MS
+
+
+def reference_stats(beats, window_seconds):
+    """按定义直接计算：beats为[(RR间期单位值, 是否与前一个心搏相连)]"""
+    window = []
+    total = 0
+    for rr, linked in reversed(beats):
+        if window and total + rr > window_seconds * 1024:
+            break
+        window.append((rr, linked))
+        total += rr
+    window.reverse()
+    values = [rr / RR_UNITS_PER_MS for rr, _ in window]
+    diffs = [
+        values[i] - values[i - 1] for i in range(1, len(window)) if window[i][1]
+    ]
+    mean = sum(values) / len(values)
+    sdnn = math.sqrt(sum((v - mean) ** 2 for v in values) / (len(values) - 1))
+    rmssd = math.sqrt(sum(d * d for d in diffs) / len(diffs))
+    pnn50 = 100.0 * sum(1 for d in diffs if abs(d) > 50) / len(diffs)
+    return rmssd, sdnn, pnn50, 60000.0 / mean, len(window)
+
+
+def test_matches_reference_with_artifacts_and_gaps():
+    rng = random.Random(7)
+    hrv = RollingHrv(window_seconds=30.0)
+    beats = []
+    linked = False
+    for i in range(2000):
+        if i % 97 == 0:
+            hrv.mark_gap()
+            linked = False
+        if i % 151 == 0:
+            # 伪迹：超出合理范围，被丢弃并中断差值链
+            assert not hrv.add(120.0)
+            linked = False
+            continue
+        rr_ms = max(320.0, min(1800.0, 800 + 150 * math.sin(i / 40) + rng.gauss(0, 40)))
+        assert hrv.add(rr_ms)
+        beats.append((int(round(rr_ms * RR_UNITS_PER_MS)), linked))
+        linked = True
+
+        if i > 100 and i % 50 == 0:
+            rmssd, sdnn, pnn50, mean_hr, count = reference_stats(beats, 30.0)
+            stats = hrv.stats()
+            assert stats.beats == count
+            assert math.isclose(stats.rmssd, rmssd, rel_tol=1e-9)
+            assert math.isclose(stats.sdnn, sdnn, rel_tol=1e-9)
+            assert math.isclose(stats.pnn50, pnn50, rel_tol=1e-9)
+            assert math.isclose(stats.mean_hr, mean_hr, rel_tol=1e-9)
+    assert hrv.rejected == len(range(0, 2000, 151))
+
+
+def test_constant_rhythm_has_no_variability():
+    hrv = RollingHrv(window_seconds=10.0)
+    hrv.add_intervals([1000.0] * 30)
+    stats = hrv.stats()
+    # 10秒窗口内只保留10个1秒的心搏
+    assert stats.beats == 10
+    assert stats.rmssd == stats.sdnn == stats.pnn50 == 0.0
+    assert math.isclose(stats.mean_hr, 60.0)
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"{name}: 通过")
@@ -0,0 +1,114 @@
+"""
+运行时指标测试：计数器、直方图分桶、抖动估计、/metrics 端点和广告解析错误计数
+
+运行: python -m pytest test/test_metrics.py  或  python test/test_metrics.py
+"""
+import os
+import sys
+import urllib.error
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics import MetricsRegistry, MetricsServer, IntervalTracker, CONTENT_TYPE
+
+
+def test_histogram_buckets_are_cumulative_and_inclusive():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("latency_seconds", "延迟", (1, 0.5, 2))
+    for value in (0.1, 0.5, 0.75, 1, 5):
+        histogram.observe(value)
+    # 等于上界的值计入该桶（le语义），分桶按上界排序
+    assert dict(histogram.samples()) == {
+        'latency_seconds_bucket{le="0.5"}': 2,
+        'latency_seconds_bucket{le="1"}': 4,
+        'latency_seconds_bucket{le="2"}': 4,
+        'latency_seconds_bucket{le="+Inf"}': 5,
+        "latency_seconds_sum": 7.35,
+        "latency_seconds_count": 5,
+    }
+
+
+def test_registry_render_and_duplicate_names():
+    registry = MetricsRegistry()
+    counter = registry.counter("events_total", "事件数")
+    assert registry.counter("events_total", "另一个说明") is counter
+    counter.inc()
+    counter.inc(2)
+    gauge = registry.gauge("devices", "设备数")
+    gauge.set(3)
+    gauge.dec()
+    assert registry.get("devices") is gauge and registry.get("missing") is None
+    assert registry.render() == (
+        "# HELP events_total 事件数\n"
+        "# TYPE events_total counter\n"
+        "events_total 3\n"
+        "# HELP devices 设备数\n"
+        "# TYPE devices gauge\n"
+        "devices 2\n"
+    )
+
+
+def test_interval_tracker_jitter():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("interval_seconds", "间隔", (0.5, 1, 2))
+    jitter = registry.gauge("jitter_seconds", "抖动")
+    tracker = IntervalTracker(histogram, jitter)
+    for now in (0.0, 1.0, 2.0, 3.0):
+        tracker.tick(now)
+    # 间隔恒定时没有抖动
+    assert histogram.count == 3 and jitter.value == 0
+    tracker.tick(4.5)
+    assert abs(jitter.value - 0.5 / 16) < 1e-9
+    # 断开后重新开始，不把断开期间算作一次间隔
+    tracker.reset()
+    tracker.tick(100.0)
+    assert histogram.count == 4
+
+
+def test_server_serves_metrics_endpoint():
+    registry = MetricsRegistry()
+    registry.counter("requests_total", "请求数").inc(7)
+    server = MetricsServer(port=0, registry=registry).start()
+    try:
+        url = f"http://127.0.0.1:{server.port}"
+        with urllib.request.urlopen(url + "/metrics", timeout=5) as response:
+            assert response.headers["Content-Type"] == CONTENT_TYPE
+            assert "requests_total 7\n" in response.read().decode("utf-8")
+        try:
+            urllib.request.urlopen(url + "/other", timeout=5)
+            assert False, "未知路径应返回404"
+        except urllib.error.HTTPError as e:
+            assert e.code == 404
+    finally:
+        server.stop()
+
+
+def test_malformed_advertisement_counts_parse_error():
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5.QtWidgets import QApplication
+    import main
+    import metrics
+    from hrs_parser import HRS_SERVICE_UUID
+    from simulated_device import SimulatedBackend, make_advertisement
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    window = main.HeartRateMonitor(None, SimulatedBackend())
+    try:
+        before = metrics.PARSE_ERRORS.value
+        # UINT16心率值被截断
+        truncated = make_advertisement(None, [HRS_SERVICE_UUID], {HRS_SERVICE_UUID: b"\x01\x48"})
+        assert window._parse_heart_rate_from_advertisement(truncated) is None
+        assert metrics.PARSE_ERRORS.value == before + 1
+        valid = make_advertisement(None, [HRS_SERVICE_UUID], {HRS_SERVICE_UUID: b"\x00\x48"})
+        assert window._parse_heart_rate_from_advertisement(valid).heart_rate == 0x48
+        assert metrics.PARSE_ERRORS.value == before + 1
+    finally:
+        window.close()
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"{name}: 通过")
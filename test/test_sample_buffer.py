@@ -0,0 +1,67 @@
+"""
+心率样本环形缓冲区测试
+
+运行: python -m pytest test/test_sample_buffer.py  或  python test/test_sample_buffer.py
+"""
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sample_buffer import SampleRingBuffer, MAX_RR_PER_SAMPLE
+
+
+def test_full_buffer_drops_newest_and_counts_overruns():
+    buffer = SampleRingBuffer(capacity=5)
+    # 容量取2的幂
+    assert buffer.capacity == 8
+    accepted = [buffer.push(float(i), 60 + i) for i in range(10)]
+    assert accepted == [True] * 8 + [False] * 2
+    assert buffer.overruns == 2 and len(buffer) == 8
+    # 缓冲区满时丢弃新样本，已写入的样本保持原顺序
+    assert [sample[1] for sample in buffer.drain(max_samples=3)] == [60, 61, 62]
+    assert buffer.push(10.0, 70)
+    assert [sample[1] for sample in buffer.drain()] == [63, 64, 65, 66, 67, 70]
+    assert len(buffer) == 0 and buffer.drain() == []
+
+
+def test_contact_and_rr_intervals_round_trip_across_wraparound():
+    buffer = SampleRingBuffer(capacity=4)
+    for round_index in range(3):
+        buffer.push(1.0, 80, True, (1000.0, 976.5625))
+        buffer.push(2.0, 81, False)
+        buffer.push(3.0, 82, None, tuple(500.0 + i for i in range(MAX_RR_PER_SAMPLE + 2)))
+        samples = buffer.drain()
+        assert samples[0] == (1.0, 80, True, (1000.0, 976.5625))
+        assert samples[1] == (2.0, 81, False, ())
+        timestamp, heart_rate, contact, rr_intervals = samples[2]
+        assert contact is None and len(rr_intervals) == MAX_RR_PER_SAMPLE
+        # 以1/1024秒存放，误差不超过半个单位
+        assert all(abs(rr - (500.0 + i)) <= 0.5 for i, rr in enumerate(rr_intervals))
+
+
+def test_producer_and_consumer_threads_without_lock():
+    buffer = SampleRingBuffer(capacity=64)
+    count = 5000
+    received = []
+
+    def produce():
+        for i in range(count):
+            while not buffer.push(float(i), i % 200, i % 2 == 0, (float(i % 1000),)):
+                pass
+
+    producer = threading.Thread(target=produce)
+    producer.start()
+    while len(received) < count:
+        received.extend(buffer.drain())
+    producer.join()
+    assert [sample[0] for sample in received] == [float(i) for i in range(count)]
+    assert all(sample[2] == (int(sample[0]) % 2 == 0) for sample in received)
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"{name}: 通过")
@@ -0,0 +1,44 @@
+"""
+扫描提前结束策略测试
+
+运行: python -m pytest test/test_scan_policy.py  或  python test/test_scan_policy.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scan_policy import ScanStopPolicy, FirstHrsDevicePolicy, KnownAddressPolicy, RssiThresholdPolicy
+from simulated_device import make_ble_device, make_advertisement
+
+DEVICE = make_ble_device("AA:BB:CC:DD:EE:01", "手环")
+
+
+def test_first_hrs_and_known_address():
+    advertisement = make_advertisement(rssi=-70)
+    assert not ScanStopPolicy().should_stop(DEVICE, advertisement, True)
+    assert FirstHrsDevicePolicy().should_stop(DEVICE, advertisement, True)
+    assert not FirstHrsDevicePolicy().should_stop(DEVICE, advertisement, False)
+    # 地址不区分大小写，空地址被忽略
+    policy = KnownAddressPolicy(["aa:bb:cc:dd:ee:01", "", None])
+    assert policy.addresses == {"AA:BB:CC:DD:EE:01"}
+    assert policy.should_stop(DEVICE, advertisement, False)
+    assert not policy.should_stop(make_ble_device("AA:BB:CC:DD:EE:02", None), advertisement, True)
+
+
+def test_rssi_threshold():
+    policy = RssiThresholdPolicy(min_rssi=-60)
+    assert policy.should_stop(DEVICE, make_advertisement(rssi=-60), True)
+    assert not policy.should_stop(DEVICE, make_advertisement(rssi=-61), True)
+    # 默认只考虑HRS设备
+    assert not policy.should_stop(DEVICE, make_advertisement(rssi=-40), False)
+    assert RssiThresholdPolicy(-60, hrs_only=False).should_stop(DEVICE, make_advertisement(rssi=-40), False)
+    # 没有RSSI的广告不满足条件
+    assert not policy.should_stop(DEVICE, object(), True)
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"{name}: 通过")
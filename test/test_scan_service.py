@@ -0,0 +1,117 @@
+"""
+常驻后台扫描服务测试：设备表过期与排序、按占空比扫描时发现和移除设备、boost按停止策略结束、首个设备出现耗时（模拟手环）
+
+运行: python -m pytest test/test_scan_service.py  或  python test/test_scan_service.py
+"""
+import os
+import sys
+import asyncio
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import metrics
+from scan_service import DeviceTable, DutyCycle, ScanService
+from scan_policy import KnownAddressPolicy
+from simulated_device import SimulatedBackend, SimulatedBand, make_ble_device, make_advertisement
+
+
+def test_device_table_ages_out_and_sorts():
+    table = DeviceTable(max_age=10.0)
+    plain = make_ble_device("AA:00", "耳机")
+    band = make_ble_device("BB:00", "手环")
+    assert table.update(plain, make_advertisement(rssi=-40), False, now=0.0)[1:] == (True, False)
+    assert table.update(band, make_advertisement(rssi=-80), False, now=1.0)[1:] == (True, False)
+    hrs = SimulatedBand(address="BB:00").advertisement()
+    assert table.update(band, hrs, True, now=5.0)[1:] == (False, True)
+    assert [entry.device.address for entry in table.entries()] == ["BB:00", "AA:00"]
+
+    expired = table.expire(now=12.0)
+    assert [entry.device.address for entry in expired] == ["AA:00"]
+    assert "AA:00" not in table and len(table) == 1
+
+
+def test_service_discovers_and_loses_devices_with_one_scanner():
+    async def run():
+        backend = SimulatedBackend.with_default_band(count=3, advertisement_rate=50.0)
+        found, lost = [], []
+        service = ScanService(
+            backend, DutyCycle("test", window=0.05, interval=0.15),
+            on_device_found=lambda device, is_hrs: found.append(device.address),
+            on_device_lost=lost.append, max_age=0.2,
+        )
+        task = asyncio.ensure_future(service.run())
+        await asyncio.sleep(0.5)
+        missing = backend.bands.pop()
+        await asyncio.sleep(0.8)
+        service.stop()
+        await task
+        return backend, service, found, lost, missing
+
+    backend, service, found, lost, missing = asyncio.run(run())
+    assert sorted(found) == sorted([band.address for band in backend.bands] + [missing.address])
+    assert lost == [missing.address]
+    assert service.scanner_created == 1 and service.scanner_starts >= 4
+    assert 0.2 < service.scanning_ratio < 0.6
+
+
+def test_boost_finishes_on_stop_policy():
+    async def run():
+        backend = SimulatedBackend.with_default_band(count=2, advertisement_rate=20.0)
+        late = backend.bands.pop()
+        finished = []
+        service = ScanService(
+            backend, DutyCycle("slow", window=0.2, interval=60.0),
+            on_boost_finished=lambda devices: finished.append([device.address for device in devices]),
+        )
+        task = asyncio.ensure_future(service.run())
+        await asyncio.sleep(0.3)
+        assert backend.bands[0].address in service.table
+
+        # 设备表中已有的设备：立即结束，不启动扫描
+        starts = service.scanner_starts
+        service.boost(5.0, KnownAddressPolicy([backend.bands[0].address]))
+        await asyncio.sleep(0.05)
+        assert len(finished) == 1 and service.scanner_starts == starts
+
+        # 新出现的设备：boost期间连续扫描，发现后结束
+        backend.bands.append(late)
+        service.boost(5.0, KnownAddressPolicy([late.address]))
+        await asyncio.sleep(0.5)
+        service.stop()
+        await task
+        return finished, late
+
+    finished, late = asyncio.run(run())
+    assert len(finished) == 2 and late.address in finished[1]
+
+
+
+def test_time_to_first_device_from_start_and_boost():
+    async def run():
+        backend = SimulatedBackend.with_default_band(advertisement_rate=50.0)
+        band = backend.bands.pop()
+        service = ScanService(backend, DutyCycle("test", window=0.05, interval=0.1))
+        task = asyncio.ensure_future(service.run())
+        await asyncio.sleep(0.2)
+        assert service.time_to_first_device is None
+        backend.bands.append(band)
+        await asyncio.sleep(0.2)
+        from_start = service.time_to_first_device
+        # boost时设备列表中已有设备
+        service.boost(1.0)
+        await asyncio.sleep(0.1)
+        from_boost = service.time_to_first_device
+        service.stop()
+        await task
+        return from_start, from_boost
+
+    from_start, from_boost = asyncio.run(run())
+    assert 0.15 < from_start < 0.4
+    assert from_boost == 0.0 and metrics.SCAN_TIME_TO_FIRST_DEVICE.value == 0.0
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"{name}: 通过")
@@ -0,0 +1,191 @@
+"""
+会话录制文件测试：编码往返、按时间查询、崩溃残留恢复、重新打开追加和数据块校验
+
+运行: python -m pytest test/test_session_recorder.py  或  python test/test_session_recorder.py
+"""
+import os
+import sys
+import random
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from session_recorder import SessionWriter, SessionReader, BLOCK_HEADER, FILE_HEADER
+
+ADDRESSES = ["AA:BB:CC:DD:EE:01", "AA:BB:CC:DD:EE:02", ""]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_samples(count, start=1_700_000_000.0, seed=1):
+    """模拟1 Hz左右的多设备样本：心率有升有降，接触状态和RR间期各种组合"""
+    rng = random.Random(seed)
+    samples = []
+    timestamp = start
+    heart_rate = 70
+    for _ in range(count):
+        timestamp += rng.choice((0.0, 0.25, 1.0, 1.0, 3.5))
+        heart_rate = max(30, min(250, heart_rate + rng.randint(-15, 15)))
+        contact = rng.choice((None, False, True))
+        rr = tuple(round(rng.uniform(300, 1500) * 1.024) / 1.024 for _ in range(rng.randint(0, 3)))
+        samples.append((round(timestamp, 3), heart_rate, contact, rr, rng.choice(ADDRESSES)))
+    return samples
+
+
+def write_samples(path, samples, **options):
+    with SessionWriter(path, fsync=False, max_batch=50, **options) as writer:
+        for sample in samples:
+            assert writer.write(*sample)
+    return writer
+
+
+def as_tuples(recorded):
+    return [(round(s.timestamp, 3), s.heart_rate, s.sensor_contact,
+             tuple(round(rr, 6) for rr in s.rr_intervals), s.address) for s in recorded]
+
+
+def normalized(samples):
+    return [(t, hr, contact, tuple(round(rr, 6) for rr in rr_intervals), address)
+            for t, hr, contact, rr_intervals, address in samples]
+
+
+def block_offsets(path):
+    """依次返回每个数据块的(偏移, 类型)"""
+    with open(path, "rb") as f:
+        data = f.read()
+    offset = FILE_HEADER.size
+    blocks = []
+    while offset + BLOCK_HEADER.size <= len(data):
+        block_type, length = BLOCK_HEADER.unpack_from(data, offset)[:2]
+        blocks.append((offset, block_type))
+        offset += BLOCK_HEADER.size + length
+    return blocks
+
+
+def test_round_trip_and_time_range_queries():
+    samples = make_samples(1000)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "session.xhr")
+        write_samples(path, samples)
+        with SessionReader(path) as reader:
+            assert len(reader) == len(samples) and reader.ordered and reader.corrupt_blocks == 0
+            assert sorted(reader.devices) == sorted(ADDRESSES)
+            assert as_tuples(reader) == normalized(samples)
+            assert reader.start_time == samples[0][0] and reader.end_time == samples[-1][0]
+            rng = random.Random(2)
+            for _ in range(50):
+                start = rng.uniform(samples[0][0] - 10, samples[-1][0])
+                end = start + rng.uniform(0, 300)
+                expected = [s for s in samples if int(round(start * 1000)) <= int(round(s[0] * 1000))
+                            < int(round(end * 1000))]
+                assert as_tuples(reader.query(start, end)) == normalized(expected)
+
+
+def test_torn_tail_is_dropped_and_reopen_appends():
+    samples = make_samples(300)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "session.xhr")
+        write_samples(path, samples)
+        last_offset = block_offsets(path)[-1][0]
+        with open(path, "rb") as f:
+            data = f.read()
+        # 模拟崩溃：最后一个数据块只写了一半
+        with open(path, "wb") as f:
+            f.write(data[:last_offset + (len(data) - last_offset) // 2])
+        with SessionReader(path) as reader:
+            kept = len(reader)
+            assert 0 < kept < len(samples) and reader.valid_end == last_offset
+            assert reader.corrupt_blocks == 0
+
+        # 重新打开追加：截掉残留，设备表沿用，新设备继续编号
+        more = [(samples[-1][0] + 10 + i, 80, True, (), "AA:BB:CC:DD:EE:03") for i in range(5)]
+        writer = write_samples(path, more)
+        assert writer.samples_written == 5
+        with SessionReader(path) as reader:
+            assert reader.devices[-1] == "AA:BB:CC:DD:EE:03" and len(reader.devices) == len(ADDRESSES) + 1
+            assert as_tuples(reader) == normalized(samples[:kept] + more)
+
+
+def test_corrupt_block_in_middle_is_skipped_not_truncated():
+    samples = make_samples(300)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "session.xhr")
+        write_samples(path, samples)
+        sample_blocks = [offset for offset, block_type in block_offsets(path) if block_type == b"S"]
+        size = os.path.getsize(path)
+        # 破坏第二个样本块的负载
+        with open(path, "r+b") as f:
+            f.seek(sample_blocks[1] + BLOCK_HEADER.size + 3)
+            byte = f.read(1)
+            f.seek(-1, os.SEEK_CUR)
+            f.write(bytes([byte[0] ^ 0xFF]))
+        with SessionReader(path) as reader:
+            assert reader.corrupt_blocks == 1 and reader.valid_end == size
+            recorded = as_tuples(reader)
+        assert recorded == normalized(samples[:50] + samples[100:])
+        # 重新打开追加不会截掉损坏块之后的数据
+        write_samples(path, [(samples[-1][0] + 1, 60, None, (), "")])
+        with SessionReader(path) as reader:
+            assert len(reader) == len(samples) - 50 + 1
+
+
+def test_out_of_order_samples_are_rejected():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "session.xhr")
+        with SessionWriter(path, fsync=False) as writer:
+            assert writer.write(100.0, 60)
+            assert writer.write(100.0, 61)
+            assert not writer.write(99.999, 62)
+            assert writer.write(101.0, 63)
+            assert writer.out_of_order == 1
+        # 重新打开后同样不能早于文件中最后一个样本
+        with SessionWriter(path, fsync=False) as writer:
+            assert not writer.write(100.5, 64)
+            assert writer.write(102.0, 65)
+        with SessionReader(path) as reader:
+            assert [s.heart_rate for s in reader] == [60, 61, 63, 65] and reader.ordered
+
+        # 样本块不按时间排列的文件（绕过写入时的顺序检查构造）查询逐块扫描
+        path = os.path.join(directory, "unordered.xhr")
+        with SessionWriter(path, fsync=False, max_batch=2) as writer:
+            for timestamp in (10.0, 11.0, 5.0, 6.0, 20.0, 21.0):
+                writer._last_timestamp = None
+                writer.write(timestamp, int(timestamp))
+        with SessionReader(path) as reader:
+            assert not reader.ordered
+            assert [s.heart_rate for s in reader.query(5.0, 12.0)] == [10, 11, 5, 6]
+
+
+def test_idle_flush_and_background_fsync():
+    clock = FakeClock()
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "session.xhr")
+        writer = SessionWriter(path, flush_interval=10.0, background_fsync=True, clock=clock)
+        writer.write(1.0, 60)
+        clock.now = 5.0
+        writer.flush_if_due()
+        assert writer.samples_written == 0
+        # 没有新样本时，到期后仍然写出
+        clock.now = 10.0
+        writer.flush_if_due()
+        assert writer.samples_written == 1
+        with SessionReader(path) as reader:
+            assert len(reader) == 1
+        writer.write(2.0, 61)
+        writer.close()
+        assert not writer._fsync_thread.is_alive()
+        with SessionReader(path) as reader:
+            assert [s.heart_rate for s in reader] == [60, 61]
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"{name}: 通过")
@@ -0,0 +1,215 @@
+"""
+使用模拟手环测试扫描、连接和心率解析流程（无需蓝牙硬件）
+
+运行: python -m pytest test/test_simulated_device.py  或  python test/test_simulated_device.py
+"""
+import os
+import sys
+import asyncio
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from hrs_parser import parse_heart_rate_measurement
+from connection_pool import ConnectionPool
+from advertisement_filter import AdvertisementFilter
+from simulated_device import SimulatedBackend, SimulatedBand
+from reconnect import ReconnectPolicy
+
+
+def test_payload_decodes():
+    band = SimulatedBand(seed=1)
+    measurement = parse_heart_rate_measurement(band.make_payload())
+    assert 40 <= measurement.heart_rate <= 200
+    assert measurement.sensor_contact is True
+    assert len(measurement.rr_intervals) == 1
+
+
+def test_pool_receives_notifications():
+    async def run():
+        backend = SimulatedBackend.with_default_band(count=3, notify_rate=200.0, connect_latency=0.0)
+        samples = []
+        pool = ConnectionPool(backend=backend, on_sample=lambda s, t, hr: samples.append(s.address))
+        for band in backend.bands:
+            await pool.add(band.device)
+        await asyncio.sleep(0.2)
+        await pool.close_all()
+        return backend, samples
+
+    backend, samples = asyncio.run(run())
+    assert {band.address for band in backend.bands} == set(samples)
+    assert len(samples) >= 3 * 20
+
+
+def test_malformed_payloads_are_counted():
+    async def run():
+        backend = SimulatedBackend.with_default_band(notify_rate=500.0, connect_latency=0.0, malformed_rate=0.5)
+        pool = ConnectionPool(backend=backend)
+        session = await pool.add(backend.bands[0].device)
+        await asyncio.sleep(0.2)
+        await pool.close_all()
+        return session
+
+    session = asyncio.run(run())
+    assert session.parse_errors > 0
+    assert session.notification_count > 0
+
+
+def test_session_reconnects_after_dropout():
+    async def run():
+        backend = SimulatedBackend.with_default_band(
+            notify_rate=50.0, connect_latency=0.0, dropout_interval=0.05, dropout_duration=0.0
+        )
+        pool = ConnectionPool(backend=backend, reconnect_policy=ReconnectPolicy(initial_delay=0.01))
+        session = await pool.add(backend.bands[0].device)
+        await asyncio.sleep(0.5)
+        await pool.close_all()
+        return backend, session
+
+    backend, session = asyncio.run(run())
+    assert backend.bands[0].dropouts >= 1
+    assert session.reconnect_count >= 1
+    assert session.recovery.last_recovery_time < 0.1
+
+
+def test_reconnect_backoff_is_bounded():
+    import random
+    policy = ReconnectPolicy(initial_delay=0.25, max_delay=10.0, jitter=0.5, rng=random.Random(1))
+    delays = [policy.delay(attempt) for attempt in range(1, 12)]
+    assert 0.125 <= delays[0] <= 0.25
+    assert all(5.0 <= delay <= 10.0 for delay in delays[7:])
+    assert not ReconnectPolicy(max_attempts=3).allows(4)
+
+
+def test_scanner_flood_is_filtered():
+    async def run():
+        backend = SimulatedBackend.with_default_band(
+            advertisement_rate=50.0, flood_devices=200, flood_rate=5000.0
+        )
+        advertisement_filter = AdvertisementFilter()
+        forwarded = []
+
+        def callback(device, advertisement_data):
+            is_hrs = bool(advertisement_data.service_uuids)
+            if advertisement_filter.accept(device, advertisement_data, is_hrs):
+                forwarded.append(device.address)
+
+        scanner = backend.create_scanner(callback)
+        await scanner.start()
+        await asyncio.sleep(0.3)
+        await scanner.stop()
+        return backend, advertisement_filter, forwarded
+
+    backend, advertisement_filter, forwarded = asyncio.run(run())
+    assert advertisement_filter.received > 1000
+    assert set(forwarded) == {backend.bands[0].address}
+    assert advertisement_filter.forwarded < 20
+
+
+def test_gui_scan_and_connect():
+    from PyQt5.QtWidgets import QApplication
+    from PyQt5.QtCore import QTimer
+    import main
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    backend = SimulatedBackend.with_default_band(notify_rate=20.0, connect_latency=0.0)
+    window = main.HeartRateMonitor(None, backend)
+    heart_rates = []
+    window.heart_rate_update.connect(heart_rates.append)
+
+    window._on_scan_clicked()
+
+    def wait_for_device():
+        if window.device_combo.count() == 0:
+            QTimer.singleShot(20, wait_for_device)
+            return
+        window.device_combo.setCurrentIndex(0)
+        window._on_connect_clicked()
+        QTimer.singleShot(1000, app.quit)
+
+    QTimer.singleShot(20, wait_for_device)
+    app.exec_()
+    window.close()
+
+    assert "[HRS]" in window.device_combo.itemText(0)
+    assert window.devices[0].address == backend.bands[0].address
+    assert len(heart_rates) >= 5
+
+
+def test_gui_multi_device_tags_samples_with_delivering_device():
+    from collections import Counter
+    from PyQt5.QtWidgets import QApplication
+    from PyQt5.QtCore import QTimer
+    import main
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    backend = SimulatedBackend.with_default_band(count=2, notify_rate=20.0, connect_latency=0.0)
+    window = main.HeartRateMonitor(None, backend)
+    recorded = Counter()
+    record_sample = window._record_sample
+
+    def count_sample(timestamp, heart_rate, measurement=None, address=""):
+        recorded[address] += 1
+        record_sample(timestamp, heart_rate, measurement, address)
+
+    window._record_sample = count_sample
+    window._on_scan_clicked()
+
+    def connect(index):
+        window.device_combo.setCurrentIndex(index)
+        window._on_connect_clicked()
+
+    def wait_for_devices():
+        if window.device_combo.count() < 2:
+            QTimer.singleShot(20, wait_for_devices)
+            return
+        connect(0)
+        # 第一台设备由单设备连接接收，第二台加入连接池
+        QTimer.singleShot(300, lambda: (window.multi_device_checkbox.setChecked(True), connect(1)))
+        QTimer.singleShot(1000, app.quit)
+
+    QTimer.singleShot(20, wait_for_devices)
+    app.exec_()
+    window.close()
+
+    # 每个样本都记在实际发出通知的设备下，第一台设备的样本不会混入第二台
+    sent = {band.address: band.notifications_sent for band in backend.bands}
+    assert all(count > 0 for count in sent.values())
+    assert dict(recorded) == sent
+
+
+def test_gui_connects_cached_device_on_startup():
+    import tempfile
+    from PyQt5.QtWidgets import QApplication
+    from PyQt5.QtCore import QTimer
+    from device_cache import DeviceCache
+    import main
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    backend = SimulatedBackend.with_default_band(
+        count=3, notify_rate=20.0, connect_latency=0.0, advertisement_rate=50.0
+    )
+    target = backend.bands[2]
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "devices.json")
+        DeviceCache(path).remember(target.address, target.name)
+
+        window = main.HeartRateMonitor(None, backend, DeviceCache(path))
+        heart_rates = []
+        window.heart_rate_update.connect(heart_rates.append)
+        QTimer.singleShot(1000, app.quit)
+        app.exec_()
+        window.close()
+
+        cached = DeviceCache(path).get(target.address)
+    assert window.selected_device.address == target.address
+    assert target.address in [device.address for device in window.devices]
+    assert len(heart_rates) >= 5
+    assert cached.supports_hrs and cached.rssi is not None
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"{name}: 通过")
@@ -0,0 +1,52 @@
+"""
+加速长时间运行测试的冒烟测试（短时间运行 benchmarks/soak.py，模拟手环，offscreen Qt）
+
+运行: python -m pytest test/test_soak.py  或  python test/test_soak.py
+"""
+import os
+import sys
+import json
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_soak(*options):
+    """运行几秒soak.py，返回(退出状态, 结果JSON)"""
+    env = dict(os.environ)
+    env["QT_QPA_PLATFORM"] = "offscreen"
+    with tempfile.TemporaryDirectory() as directory:
+        output = os.path.join(directory, "soak.json")
+        result = subprocess.run(
+            [sys.executable, os.path.join(ROOT, "benchmarks", "soak.py"), "--duration", "4",
+             "--warmup-cycles", "1", "--connected-seconds", "30", "--multi-every", "2",
+             "--sample-interval", "1", "--output", output, *options],
+            cwd=ROOT, env=env, capture_output=True, text=True, timeout=90,
+        )
+        assert os.path.exists(output), result.stdout + result.stderr
+        with open(output, encoding="utf-8") as f:
+            return result.returncode, json.load(f)
+
+
+def test_cycles_and_records_memory():
+    returncode, report = run_soak()
+    assert returncode == 0, report["failures"]
+    # 至少完成一次单设备和一次多设备循环
+    assert report["cycles"] >= 2
+    samples = report["samples"]
+    assert len(samples) >= 2 and samples[-1]["notifications"] > samples[0]["notifications"]
+    assert all(sample["objects"] > 0 and sample["traced_mb"] > 0 for sample in samples)
+
+
+def test_fails_when_growth_exceeds_threshold():
+    returncode, report = run_soak("--max-traced-growth", "-1000")
+    assert returncode == 1
+    assert report["failures"] == ["traced_mb"]
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"{name}: 通过")
@@ -0,0 +1,88 @@
+"""
+启动耗时分析测试：阶段耗时计算和首次绘制后执行推迟的任务（offscreen平台）
+
+运行: python -m pytest test/test_startup_profile.py  或  python test/test_startup_profile.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtWidgets import QApplication, QLabel, QVBoxLayout, QWidget
+
+app = QApplication.instance() or QApplication(sys.argv)
+
+from startup_profile import StartupProfiler
+
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def process_events(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        app.processEvents()
+
+
+def test_phases_are_measured_between_marks():
+    clock = FakeClock(10.0)
+    profiler = StartupProfiler(process_started_at=9.5, imports_done_at=9.8, clock=clock)
+    clock.now = 10.0
+    profiler.mark("app")
+    clock.now = 10.25
+    profiler.mark("ui")
+    phases = profiler.phases()
+    assert [round(phases[name]) for name in ("import", "app", "ui", "total")] == [300, 200, 250, 750]
+    assert abs(profiler.to_dict()["wall_started_at"] - (time.time() - 0.5)) < 0.1
+    assert profiler.summary() == "启动用时: 导入 300 ms, 初始化 200 ms, 界面 250 ms, 合计 750 ms"
+    assert not profiler.first_paint_done
+
+
+def test_deferred_tasks_run_once_after_first_paint():
+    profiler = StartupProfiler(time.perf_counter(), time.perf_counter())
+    window = QWidget()
+    QVBoxLayout(window).addWidget(QLabel("72"))
+    calls = []
+
+    def failing_task():
+        calls.append("failing")
+        raise RuntimeError("端口被占用")
+
+    profiler.after_first_paint(failing_task)
+    profiler.after_first_paint(lambda: calls.append("metrics"))
+    # 其他窗口的绘制不算首次绘制
+    other = QWidget()
+    profiler.watch(window)
+    other.show()
+    process_events(0.05)
+    assert not profiler.first_paint_done and calls == []
+
+    window.show()
+    deadline = time.perf_counter() + 2.0
+    while not calls and time.perf_counter() < deadline:
+        app.processEvents()
+    process_events(0.05)
+    # 一个任务失败不影响后续任务
+    assert profiler.first_paint_done and calls == ["failing", "metrics"]
+    assert [phase for phase, _ in profiler.marks] == ["import", "first_paint"]
+
+    # 之后的重绘不再记录或重复执行
+    window.update()
+    process_events(0.05)
+    assert calls == ["failing", "metrics"] and len(profiler.marks) == 2
+    window.close()
+    other.close()
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"{name}: 通过")